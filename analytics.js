@@ -496,6 +496,28 @@ class AnalyticsManager {
         return [headers, ...rows].join('\n');
     }
 
+    /**
+     * Obter rollup pré-calculado (gerado por analytics_rollup.py)
+     * Retorna null se o snapshot do chatbot ainda não existir
+     */
+    getRollup(chatbotId) {
+        const filename = `${String(chatbotId).replace(/[^A-Za-z0-9_-]/g, '_')}.json`;
+        const filepath = path.join(this.dataPath, 'rollups', filename);
+
+        if (!fs.existsSync(filepath)) {
+            return null;
+        }
+
+        try {
+            const rollup = JSON.parse(fs.readFileSync(filepath, 'utf8'));
+            // Nomes saneados podem colidir: confere o chatbot gravado no snapshot
+            return rollup.chatbot_id === chatbotId ? rollup : null;
+        } catch (error) {
+            console.error(`❌ Erro ao ler rollup de ${chatbotId}:`, error);
+            return null;
+        }
+    }
+
     /**
      * Limpar analytics antigos
      */
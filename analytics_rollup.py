@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Rollup offline de analytics a partir de data/linkmagico.db
+
+Lê o banco SQLite em modo somente leitura (funciona com o servidor rodando,
+em WAL), agrega as conversas por chatbot/dia/hora e junta as métricas
+diárias da tabela `analytics`. As agregações são feitas em colunas (chaves
+inteiras + somas por bucket): com NumPy usa bincount, sem NumPy cai para
+array da biblioteca padrão.
+
+Cada chatbot ganha um snapshot colunar em data/analytics/rollups/<id>.json,
+servido por GET /api/analytics/:chatbotId/rollup (ver analytics.js), para a
+aba Analytics não precisar varrer as linhas brutas.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DB_PATH = os.path.join('data', 'linkmagico.db')
+ROLLUP_DIR = os.path.join('data', 'analytics', 'rollups')
+INDEX_FILE = 'index.json'
+DEFAULT_DAYS = 30
+FETCH_SIZE = 50000
+
+# Colunas somadas por hora a partir da tabela conversations
+CONVERSATION_COLUMNS = ('conversations', 'messages', 'leads', 'resolved',
+                        'satisfaction_sum', 'satisfaction_count')
+# Colunas diárias vindas da tabela analytics (já é uma linha por chatbot/dia)
+ANALYTICS_COLUMNS = ('total_messages', 'total_conversations', 'avg_response_time', 'success_rate',
+                     'error_count', 'api_calls', 'tokens_used', 'cost_estimate')
+# Médias diárias: dia sem linha (ou com NULL) fica null no snapshot, nunca 0,
+# e é ignorado nas médias da semana e da janela
+AVERAGE_COLUMNS = ('avg_response_time', 'success_rate')
+
+_UNSAFE_NAME = re.compile(r'[^A-Za-z0-9_-]')
+
+
+def rollup_filename(chatbot_id):
+    """Mesmo saneamento usado em analytics.js (getRollup)"""
+    return _UNSAFE_NAME.sub('_', chatbot_id) + '.json'
+
+
+def connect_readonly(path=DB_PATH):
+    """Abre o banco sem nunca escrever nele (nem checkpoint do WAL)"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    conn.execute('PRAGMA query_only = 1')
+    return conn
+
+
+class Columns:
+    """Colunas de um resultado SQL, com os chatbots e sessões codificados em inteiros"""
+
+    def __init__(self, names):
+        self.names = names
+        self.data = {name: array('d') for name in names}
+        self.chatbot = array('q')
+        self.bucket = array('q')
+        self.session = array('q')
+
+    def __len__(self):
+        return len(self.bucket)
+
+
+def _code(codes, value):
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(codes)
+    return code
+
+
+def load_conversations(conn, since, until, chatbots):
+    """
+    Conversas entre `since` e `until` (datetime UTC), uma linha por conversa.
+    O bucket é a hora desde a época; as mensagens são contadas pelo próprio
+    SQLite (json_array_length), sem decodificar o JSON em Python.
+    """
+    cols = Columns(CONVERSATION_COLUMNS)
+    sessions = {}
+    cursor = conn.execute(
+        '''SELECT chatbot_id, session_id,
+                  CAST(strftime('%s', timestamp) AS INTEGER) / 3600,
+                  CASE WHEN json_valid(messages) THEN json_array_length(messages) ELSE 0 END,
+                  COALESCE(lead_captured, 0), COALESCE(resolved, 0), user_satisfaction
+           FROM conversations
+           WHERE timestamp >= ? AND timestamp < ?''',
+        (since.strftime('%Y-%m-%d %H:%M:%S'), until.strftime('%Y-%m-%d %H:%M:%S')))
+
+    data = cols.data
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for chatbot_id, session_id, hour, messages, lead, resolved, satisfaction in rows:
+            if hour is None:
+                continue
+            cols.chatbot.append(_code(chatbots, chatbot_id))
+            cols.session.append(_code(sessions, session_id))
+            cols.bucket.append(hour)
+            data['conversations'].append(1)
+            data['messages'].append(messages or 0)
+            data['leads'].append(1 if lead else 0)
+            data['resolved'].append(1 if resolved else 0)
+            data['satisfaction_sum'].append(satisfaction or 0)
+            data['satisfaction_count'].append(0 if satisfaction is None else 1)
+    return cols
+
+
+def load_daily_analytics(conn, since, until, chatbots):
+    """Linhas da tabela analytics entre `since` e `until`; o bucket é o dia desde a época"""
+    cols = Columns(ANALYTICS_COLUMNS)
+    cursor = conn.execute(
+        f'''SELECT chatbot_id, CAST(julianday(date) - 2440587.5 AS INTEGER),
+                   {', '.join(name if name in AVERAGE_COLUMNS else f'COALESCE({name}, 0)'
+                              for name in ANALYTICS_COLUMNS)}
+            FROM analytics
+            WHERE date >= ? AND date < ?''',
+        (since.strftime('%Y-%m-%d'), until.strftime('%Y-%m-%d')))
+
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            if row[1] is None:
+                continue
+            cols.chatbot.append(_code(chatbots, row[0]))
+            cols.bucket.append(row[1])
+            for name, value in zip(ANALYTICS_COLUMNS, row[2:]):
+                # NULL vira NaN na coluna (o dia só tem uma linha: a soma preserva o NaN)
+                cols.data[name].append(math.nan if value is None else value)
+    return cols
+
+
+# ----------------------------------------------------------------------
+# Agregação vetorizada
+# ----------------------------------------------------------------------
+def _group_keys(cols, first_bucket, width, divisor):
+    """Chave densa chatbot * largura + (bucket // divisor - primeiro bucket)"""
+    if np is not None:
+        chatbot = np.frombuffer(cols.chatbot, dtype=np.int64)
+        bucket = np.frombuffer(cols.bucket, dtype=np.int64)
+        return chatbot * width + (bucket // divisor - first_bucket)
+    return array('q', (c * width + (b // divisor - first_bucket)
+                       for c, b in zip(cols.chatbot, cols.bucket)))
+
+
+def _group_sum(keys, values, size):
+    if np is not None:
+        return np.bincount(keys, weights=np.frombuffer(values, dtype=np.float64), minlength=size)
+    totals = array('d', bytes(8 * size))
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return totals
+
+
+def _distinct_count(keys, codes, size):
+    """Sessões distintas por bucket"""
+    if np is not None:
+        sessions = np.frombuffer(codes, dtype=np.int64)
+        stride = int(sessions.max()) + 1
+        pairs = np.unique(keys * stride + sessions)
+        return np.bincount(pairs // stride, minlength=size)
+    totals = array('q', bytes(8 * size))
+    for key in set(zip(keys, codes)):
+        totals[key[0]] += 1
+    return totals
+
+
+def distinct_sessions(cols, n_chatbots):
+    """
+    Sessões distintas por chatbot na janela inteira: uma sessão que atravessa
+    dias (ou horas) conta uma vez só, ao contrário da soma das colunas diárias.
+    """
+    if not len(cols) or not n_chatbots:
+        return {}
+    keys = np.frombuffer(cols.chatbot, dtype=np.int64) if np is not None else cols.chatbot
+    counts = _distinct_count(keys, cols.session, n_chatbots)
+    return {code: int(counts[code]) for code in range(n_chatbots) if counts[code]}
+
+
+def _nonzero(counts):
+    if np is not None:
+        return np.flatnonzero(counts)
+    return [i for i, value in enumerate(counts) if value]
+
+
+def _take(totals, idx):
+    """Valores dos buckets `idx`; colunas só com inteiros saem como int"""
+    if np is not None:
+        values = np.asarray(totals, dtype=np.float64)[idx]
+        if np.array_equal(values, np.floor(values)):
+            return values.astype(np.int64).tolist()
+        return np.round(values, 4).tolist()
+    values = [totals[i] for i in idx]
+    if all(float(value).is_integer() for value in values):
+        return [int(value) for value in values]
+    return [round(value, 4) for value in values]
+
+
+def aggregate(cols, first_bucket, width, n_chatbots, divisor=1, distinct_sessions=False):
+    """
+    Soma todas as colunas por (chatbot, bucket // divisor) de uma vez.
+    Retorna {chatbot: {'bucket': [...], coluna: [...]}} só com buckets não vazios.
+    """
+    size = n_chatbots * width
+    if not len(cols) or not size:
+        return {}
+
+    keys = _group_keys(cols, first_bucket, width, divisor)
+    sums = {name: _group_sum(keys, values, size) for name, values in cols.data.items()}
+    if distinct_sessions:
+        sums['sessions'] = _distinct_count(keys, cols.session, size)
+
+    idx = _nonzero(_group_sum(keys, array('d', [1.0]) * len(cols), size))
+    columns = {name: _take(totals, idx) for name, totals in sums.items()}
+    if np is not None:
+        owners, offsets = (idx // width).tolist(), (idx % width).tolist()
+    else:
+        owners, offsets = [i // width for i in idx], [i % width for i in idx]
+
+    # Os índices vêm ordenados por chatbot: corta as colunas em fatias contíguas
+    result = {}
+    start = 0
+    for end in range(1, len(owners) + 1):
+        if end == len(owners) or owners[end] != owners[start]:
+            result[owners[start]] = {'bucket': offsets[start:end],
+                                     **{name: values[start:end] for name, values in columns.items()}}
+            start = end
+    return result
+
+
+# ----------------------------------------------------------------------
+# Snapshots
+# ----------------------------------------------------------------------
+def build_snapshot(chatbot_id, start, days, hourly, daily, analytics, sessions=0):
+    """
+    Snapshot colunar de um chatbot:
+      hourly.hour -> horas desde `start`; daily.day -> dias desde `start`
+      demais chaves -> uma lista por coluna, alinhada com hour/day
+    As colunas da tabela analytics entram no daily, nos dias em que existem;
+    nos outros as médias (AVERAGE_COLUMNS) ficam None e as somas, 0.
+    weekly.week -> semanas desde `start`, com as médias dos dias que as têm;
+    em totals as médias são da janela inteira, também só dos dias com valor.
+    totals.sessions é `sessions` (distintas na janela), não a soma dos dias.
+    """
+    hourly = hourly or {'bucket': []}
+    daily = daily or {'bucket': []}
+    names = [name for name in daily if name != 'bucket']
+
+    rows = {day: {name: daily[name][i] for name in names} for i, day in enumerate(daily['bucket'])}
+    if analytics:
+        names.extend(ANALYTICS_COLUMNS)
+        for i, day in enumerate(analytics['bucket']):
+            row = rows.setdefault(day, {})
+            for name in ANALYTICS_COLUMNS:
+                row[name] = analytics[name][i]
+    days_present = sorted(rows)
+
+    daily_columns = {name: [_average_value(rows[day].get(name)) if name in AVERAGE_COLUMNS
+                            else rows[day].get(name, 0) for day in days_present]
+                     for name in names}
+    totals = {name: round(sum(values), 4) for name, values in daily_columns.items()
+              if name not in AVERAGE_COLUMNS}
+    if 'sessions' in totals:
+        totals['sessions'] = sessions
+
+    averages = [name for name in AVERAGE_COLUMNS if name in daily_columns]
+    weeks = sorted({day // 7 for day in days_present})
+    weekly = {'week': weeks}
+    for name in averages:
+        totals[name] = _mean(daily_columns[name])
+        by_week = {week: [] for week in weeks}
+        for day, value in zip(days_present, daily_columns[name]):
+            by_week[day // 7].append(value)
+        weekly[name] = [_mean(by_week[week]) for week in weeks]
+
+    return {
+        'chatbot_id': chatbot_id,
+        'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'days': days,
+        'hourly': {'hour': hourly.pop('bucket'), **hourly},
+        'daily': {'day': days_present, **daily_columns},
+        'weekly': weekly,
+        'totals': totals,
+    }
+
+
+def _average_value(value):
+    """Média diária ausente (sem linha ou NULL -> NaN) sai como None"""
+    return None if value is None or value != value else value
+
+
+def _mean(values):
+    """Média só dos dias com valor; None se nenhum tiver"""
+    present = [value for value in values if value is not None]
+    return round(sum(present) / len(present), 4) if present else None
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def rollup(db_path=DB_PATH, output_dir=ROLLUP_DIR, days=DEFAULT_DAYS, now=None):
+    """Gera os snapshots dos últimos `days` dias; retorna o índice gravado"""
+    now = now or datetime.now(timezone.utc)
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    until = start + timedelta(days=days + 1)
+    first_hour = int(start.timestamp()) // 3600
+    first_day = first_hour // 24
+    width_hours = (days + 1) * 24
+    width_days = days + 1
+
+    started = time.perf_counter()
+    chatbots = {}
+    conn = connect_readonly(db_path)
+    try:
+        conversations = load_conversations(conn, start, until, chatbots)
+        analytics = load_daily_analytics(conn, start, until, chatbots)
+    finally:
+        conn.close()
+    loaded = time.perf_counter()
+
+    hourly = aggregate(conversations, first_hour, width_hours, len(chatbots), distinct_sessions=True)
+    daily = aggregate(conversations, first_day, width_days, len(chatbots), divisor=24,
+                      distinct_sessions=True)
+    daily_analytics = aggregate(analytics, first_day, width_days, len(chatbots))
+    sessions = distinct_sessions(conversations, len(chatbots))
+    aggregated = time.perf_counter()
+
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f).get('chatbots', {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = {}
+
+    entries = {}
+    written = 0
+    for chatbot_id, code in chatbots.items():
+        snapshot = build_snapshot(chatbot_id, start, days, hourly.get(code), daily.get(code),
+                                  daily_analytics.get(code), sessions.get(code, 0))
+        data = json.dumps(snapshot, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        filename = rollup_filename(chatbot_id)
+        path = os.path.join(output_dir, filename)
+        if previous.get(chatbot_id, {}).get('hash') != digest or not os.path.exists(path):
+            _write_atomic(path, data)
+            written += 1
+        entries[chatbot_id] = {'file': filename, 'hash': digest, 'bytes': len(data),
+                               'conversations': snapshot['totals'].get('conversations', 0)}
+
+    # Chatbots que saíram da janela: remove os snapshots antigos
+    for chatbot_id, entry in previous.items():
+        if chatbot_id not in entries:
+            stale = os.path.join(output_dir, entry['file'])
+            if os.path.exists(stale):
+                os.remove(stale)
+
+    index = {
+        'generated_at': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'days': days,
+        'backend': 'numpy' if np is not None else 'array',
+        'chatbots': entries,
+    }
+    _write_atomic(index_path, json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8'))
+
+    print(f"📥 {len(conversations)} conversas e {len(analytics)} linhas de analytics lidas "
+          f"em {(loaded - started) * 1000:.1f} ms")
+    print(f"🧮 Agregação ({index['backend']}) em {(aggregated - loaded) * 1000:.1f} ms")
+    print(f"📊 {len(entries)} chatbots, {written} snapshots atualizados em {output_dir}")
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera rollups de analytics por chatbot/dia/hora')
+    parser.add_argument('--db', default=DB_PATH, help='banco SQLite (aberto só para leitura)')
+    parser.add_argument('--output-dir', default=ROLLUP_DIR)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help='janela em dias')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Banco não encontrado: {args.db}")
+        return 1
+    try:
+        rollup(args.db, args.output_dir, args.days)
+    except sqlite3.Error as error:
+        print(f"❌ Erro ao ler {args.db}: {error}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
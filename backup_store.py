@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Armazenamento deduplicado dos backups de leads
+
+Os arquivos leads-backup-*.json de data/tenants/<apiKey>/backups/ são
+cópias completas e quase iguais de um dia para o outro. Aqui cada backup
+é quebrado em pedaços (um por lead, cortando nas fronteiras do array
+"leads" do JSON) e cada pedaço é gravado uma única vez, comprimido, em
+data/backup-store/, valendo para todos os dias e todos os tenants:
+
+  packs/pack-NNNNNN.pack  pedaços comprimidos (zlib), só acrescentados
+  packs/pack-NNNNNN.idx   tabela de largura fixa: hash, offset, tamanho
+  index.json              índice único: metadados de cada backup por tenant
+  tenants/<tenant>.json   só os backups do tenant (o que o server.js lê)
+
+O manifesto de um backup (lista dos pedaços) também vira um pedaço, em
+sequências de ids consecutivos: como os leads mantêm a ordem, um backup
+quase igual ao anterior custa só os leads alterados mais algumas faixas.
+
+O restore é byte a byte igual ao arquivo original (conferido por sha256)
+e é feito em streaming, pedaço por pedaço. O server.js lista os backups
+migrados pelo índice do tenant (ver LeadBackupSystem.listBackups), então
+o custo de listar não cresce com os outros tenants. `forget --keep N` (ou
+`migrate --keep N`) tira do índice os backups mais antigos de cada tenant.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+TENANTS_DIR = os.path.join('data', 'tenants')
+STORE_DIR = os.path.join('data', 'backup-store')
+INDEX_FILE = 'index.json'
+TENANT_INDEX_DIR = 'tenants'
+PACK_DIR = 'packs'
+PACK_LIMIT = 256 * 1024 * 1024
+FIXED_CHUNK = 64 * 1024
+
+# Entrada do .idx: 16 bytes do sha256, offset no .pack, tamanho comprimido
+_IDX_ENTRY = struct.Struct('<16sQI')
+
+# Primeiro item do array "leads" de um backup (ou de um leads.json), com a indentação
+_FIRST_ITEM = re.compile(rb'(?:"leads"\s*:\s*|^\s*)\[[ \t]*\r?\n([ \t]*)\{')
+_HEADER_FIELDS = {
+    'timestamp': re.compile(rb'"timestamp"\s*:\s*"([^"]*)"'),
+    'type': re.compile(rb'"type"\s*:\s*"([^"]*)"'),
+    'leadsCount': re.compile(rb'"leadsCount"\s*:\s*(\d+)'),
+}
+
+
+def split_chunks(data):
+    """
+    Posições de corte de um backup: um pedaço por lead (linhas que abrem um
+    item do array "leads" na indentação do primeiro item). Sem essa
+    estrutura (JSON minificado), corta em blocos de tamanho fixo.
+    """
+    m = _FIRST_ITEM.search(data)
+    if m is None:
+        return list(range(FIXED_CHUNK, len(data), FIXED_CHUNK))
+    item = re.compile(rb'\n(' + re.escape(m.group(1)) + rb'\{)')
+    return [c.start(1) for c in item.finditer(data, m.start(1) - 1)]
+
+
+def _varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_manifest(ids):
+    """Ids dos pedaços -> faixas (início, tamanho), com o início em delta zigzag"""
+    out = bytearray()
+    runs = []
+    for chunk_id in ids:
+        if runs and runs[-1][0] + runs[-1][1] == chunk_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([chunk_id, 1])
+    previous = 0
+    for start, count in runs:
+        delta = start - previous
+        _varint((delta << 1) ^ (delta >> 63), out)
+        _varint(count, out)
+        previous = start + count
+    return bytes(out)
+
+
+def decode_manifest(data):
+    pos = 0
+    previous = 0
+    values = []
+    while pos < len(data):
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        values.append(value)
+        if len(values) == 2:
+            delta = (values[0] >> 1) ^ -(values[0] & 1)
+            start = previous + delta
+            yield from range(start, start + values[1])
+            previous = start + values[1]
+            values = []
+
+
+class ChunkStore:
+    """
+    Pedaços endereçados por conteúdo, em packs só acrescentados. Com
+    writable=False (restore) nada no disco é criado ou alterado.
+    """
+
+    def __init__(self, directory, writable=True):
+        self.directory = os.path.join(directory, PACK_DIR)
+        self.writable = writable
+        if writable:
+            os.makedirs(self.directory, exist_ok=True)
+        self.by_hash = {}
+        self.pack_of = array('H')
+        self.offset_of = array('Q')
+        self.length_of = array('I')
+        self.packs = []
+        self._readers = {}
+        self._writer = None
+        self._pending = []
+        self._load()
+
+    def _load(self):
+        for idx_path in sorted(glob.glob(os.path.join(self.directory, 'pack-*.idx'))):
+            pack = len(self.packs)
+            self.packs.append(os.path.splitext(idx_path)[0] + '.pack')
+            with open(idx_path, 'rb') as f:
+                table = f.read()
+            whole = len(table) - len(table) % _IDX_ENTRY.size
+            if whole != len(table) and self.writable:
+                # Entrada incompleta de uma escrita interrompida (só quem grava corrige,
+                # sob o _StoreLock; a leitura apenas a ignora)
+                with open(idx_path, 'r+b') as f:
+                    f.truncate(whole)
+            for digest, offset, length in _IDX_ENTRY.iter_unpack(table[:whole]):
+                self.by_hash.setdefault(digest, len(self.pack_of))
+                self.pack_of.append(pack)
+                self.offset_of.append(offset)
+                self.length_of.append(length)
+
+    def __len__(self):
+        return len(self.pack_of)
+
+    def _open_writer(self):
+        if not self.writable:
+            raise ValueError('ChunkStore aberto só para leitura')
+        if self._writer is not None and self._writer.tell() < PACK_LIMIT:
+            return self._writer
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+        if not self.packs or os.path.getsize(self.packs[-1]) >= PACK_LIMIT:
+            self.packs.append(os.path.join(self.directory, f'pack-{len(self.packs):06d}.pack'))
+        self._writer = open(self.packs[-1], 'ab')
+        return self._writer
+
+    def put(self, data):
+        """Grava o pedaço se ainda não existir; retorna (id, bytes gravados)"""
+        digest = hashlib.sha256(data).digest()[:16]
+        chunk_id = self.by_hash.get(digest)
+        if chunk_id is not None:
+            return chunk_id, 0
+        writer = self._open_writer()
+        compressed = zlib.compress(data, 6)
+        offset = writer.tell()
+        writer.write(compressed)
+        chunk_id = len(self.pack_of)
+        self.by_hash[digest] = chunk_id
+        self.pack_of.append(len(self.packs) - 1)
+        self.offset_of.append(offset)
+        self.length_of.append(len(compressed))
+        self._pending.append(_IDX_ENTRY.pack(digest, offset, len(compressed)))
+        return chunk_id, len(compressed)
+
+    def flush(self):
+        """Dados do pack no disco antes das entradas do .idx que apontam para eles"""
+        if not self._pending:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        with open(os.path.splitext(self.packs[-1])[0] + '.idx', 'ab') as idx:
+            idx.write(b''.join(self._pending))
+            idx.flush()
+            os.fsync(idx.fileno())
+        self._pending = []
+
+    def get(self, chunk_id):
+        pack = self.pack_of[chunk_id]
+        reader = self._readers.get(pack)
+        if reader is None:
+            reader = self._readers[pack] = open(self.packs[pack], 'rb')
+        reader.seek(self.offset_of[chunk_id])
+        return zlib.decompress(reader.read(self.length_of[chunk_id]))
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for reader in self._readers.values():
+            reader.close()
+        self._readers = {}
+
+
+# ----------------------------------------------------------------------
+# Índice
+# ----------------------------------------------------------------------
+def load_index(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'version': 1, 'tenants': {}}
+
+
+def _write_json(path, data, indent=None):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_index(index, store_dir=STORE_DIR, tenants=None):
+    """Grava o index.json e o índice de cada tenant de `tenants` (None = todos)"""
+    _write_json(os.path.join(store_dir, INDEX_FILE), index, indent=1)
+    directory = os.path.join(store_dir, TENANT_INDEX_DIR)
+    os.makedirs(directory, exist_ok=True)
+    for tenant in index['tenants'] if tenants is None else tenants:
+        path = os.path.join(directory, f'{tenant}.json')
+        entries = index['tenants'].get(tenant)
+        if entries:
+            _write_json(path, {'version': 1, 'tenant': tenant, 'backups': entries})
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def forget(index, keep, tenants=None):
+    """
+    Tira do índice os backups além dos `keep` mais recentes de cada tenant.
+    Os pedaços continuam nos packs (só acrescentados); devolve os tenants alterados.
+    """
+    changed = []
+    for tenant, entries in index['tenants'].items():
+        if (tenants and tenant not in tenants) or len(entries) <= keep:
+            continue
+        entries.sort(key=_backup_time)
+        del entries[:len(entries) - keep]
+        changed.append(tenant)
+    return changed
+
+
+class _StoreLock:
+    """Um único processo escrevendo no store por vez"""
+
+    def __init__(self, store_dir):
+        self.path = os.path.join(store_dir, '.lock')
+
+    def __enter__(self):
+        self.file = open(self.path, 'w')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _header(data):
+    head = data[:4096]
+    fields = {}
+    for name, pattern in _HEADER_FIELDS.items():
+        m = pattern.search(head)
+        if m:
+            value = m.group(1).decode('utf-8')
+            fields[name] = int(value) if name == 'leadsCount' else value
+    return fields
+
+
+def store_backup(chunks, path):
+    """Quebra um backup em pedaços e grava os novos; retorna a entrada do índice"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    stat = os.stat(path)
+
+    ids = []
+    stored = 0
+    new = 0
+    start = 0
+    for cut in split_chunks(data) + [len(data)]:
+        if cut <= start:
+            continue
+        chunk_id, written = chunks.put(data[start:cut])
+        ids.append(chunk_id)
+        stored += written
+        new += 1 if written else 0
+        start = cut
+
+    manifest_id, written = chunks.put(encode_manifest(ids))
+    stored += written
+    header = _header(data)
+    return {
+        'filename': os.path.basename(path),
+        'timestamp': header.get('timestamp'),
+        'type': header.get('type'),
+        'leadsCount': header.get('leadsCount'),
+        'size': len(data),
+        'created': datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'manifest': manifest_id,
+        'chunks': len(ids),
+        'newChunks': new,
+        'storedBytes': stored,
+    }
+
+
+def migrate(tenants_dir=TENANTS_DIR, store_dir=STORE_DIR, tenants=None, prune=False, keep=None):
+    """Leva para o store os backups que ainda não estão no índice"""
+    os.makedirs(store_dir, exist_ok=True)
+    with _StoreLock(store_dir):
+        index = load_index(store_dir)
+        if not os.path.isdir(os.path.join(store_dir, TENANT_INDEX_DIR)):
+            # Store de antes dos índices por tenant
+            save_index(index, store_dir)
+        chunks = ChunkStore(store_dir)
+        total_in = total_stored = migrated = 0
+        start = time.perf_counter()
+        try:
+            for backups_dir in sorted(glob.glob(os.path.join(tenants_dir, '*', 'backups'))):
+                tenant = os.path.basename(os.path.dirname(backups_dir))
+                if tenants and tenant not in tenants:
+                    continue
+                entries = index['tenants'].setdefault(tenant, [])
+                known = {entry['filename'] for entry in entries}
+                paths = sorted(glob.glob(os.path.join(backups_dir, 'leads-backup-*.json')),
+                               key=os.path.getmtime)
+                for path in paths:
+                    if os.path.basename(path) in known:
+                        continue
+                    entry = store_backup(chunks, path)
+                    chunks.flush()
+                    entries.append(entry)
+                    save_index(index, store_dir, [tenant])
+                    migrated += 1
+                    total_in += entry['size']
+                    total_stored += entry['storedBytes']
+                    print(f"📦 {tenant}/{entry['filename']}: {entry['size']} → {entry['storedBytes']} bytes "
+                          f"({entry['newChunks']}/{entry['chunks']} pedaços novos)")
+
+                if prune:
+                    stored = {entry['filename'] for entry in entries}
+                    for path in paths:
+                        if os.path.basename(path) in stored:
+                            os.remove(path)
+            if keep is not None:
+                forgotten = forget(index, keep, tenants)
+                if forgotten:
+                    save_index(index, store_dir, forgotten)
+        finally:
+            chunks.close()
+
+    elapsed = (time.perf_counter() - start) * 1000
+    if migrated:
+        print(f"✅ {migrated} backups migrados: {total_in} → {total_stored} bytes "
+              f"({total_stored / total_in * 100:.1f}%) em {elapsed:.1f} ms")
+    else:
+        print("⏭️  Nenhum backup novo para migrar")
+    return index
+
+
+def parse_time(text):
+    """
+    ISO 8601 -> datetime em UTC. Aceita o 'Z' do toISOString() e datas sem
+    hora; sem fuso, vale UTC (como os timestamps gravados pelo server.js).
+    """
+    moment = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _backup_time(entry):
+    """Data do backup: timestamp do cabeçalho ou, se faltar/for inválido, o mtime"""
+    if entry['timestamp']:
+        try:
+            return parse_time(entry['timestamp'])
+        except ValueError:
+            pass
+    return parse_time(entry['created'])
+
+
+def find_backup(index, tenant, filename=None, at=None):
+    """Backup pelo nome ou o último criado até `at` (datetime ou ISO 8601)"""
+    entries = index['tenants'].get(tenant, [])
+    if filename:
+        return next((e for e in entries if e['filename'] == filename), None)
+    if isinstance(at, str):
+        at = parse_time(at)
+    candidates = [e for e in entries if at is None or _backup_time(e) <= at]
+    return max(candidates, key=_backup_time, default=None)
+
+
+def restore(entry, out, store_dir=STORE_DIR):
+    """Reconstrói o backup pedaço por pedaço em `out`; confere o sha256"""
+    chunks = ChunkStore(store_dir, writable=False)
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        for chunk_id in decode_manifest(chunks.get(entry['manifest'])):
+            data = chunks.get(chunk_id)
+            digest.update(data)
+            out.write(data)
+            written += len(data)
+    finally:
+        chunks.close()
+    if digest.hexdigest() != entry['sha256']:
+        raise ValueError(f"sha256 não confere para {entry['filename']}")
+    return written
+
+
+def _disk_usage(store_dir):
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(store_dir, PACK_DIR, '*')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Store deduplicado dos backups de leads')
+    parser.add_argument('--store', default=STORE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('migrate', help='leva os backups dos tenants para o store')
+    p.add_argument('--tenants-dir', default=TENANTS_DIR)
+    p.add_argument('--tenant', action='append', help='só estes tenants (pode repetir)')
+    p.add_argument('--prune', action='store_true', help='apaga os arquivos originais já migrados')
+    p.add_argument('--keep', type=int, help='mantém no índice só os N backups mais recentes de cada tenant')
+
+    p = sub.add_parser('forget', help='tira do índice os backups mais antigos')
+    p.add_argument('--keep', type=int, required=True, help='backups mantidos por tenant')
+    p.add_argument('--tenant', action='append', help='só estes tenants (pode repetir)')
+
+    p = sub.add_parser('list', help='lista os backups de um tenant')
+    p.add_argument('tenant')
+
+    p = sub.add_parser('restore', help='restaura um backup (por nome ou data)')
+    p.add_argument('tenant')
+    p.add_argument('--filename', help='nome do arquivo de backup')
+    p.add_argument('--at', type=parse_time,
+                   help='último backup até esta data/hora ISO, UTC se sem fuso (ex: 2025-10-03T12:00)')
+    p.add_argument('--output', '-o', help='arquivo de saída (padrão: saída padrão)')
+
+    sub.add_parser('stats', help='uso de disco do store')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        migrate(args.tenants_dir, args.store, args.tenant, args.prune, args.keep)
+        return 0
+
+    if args.command == 'forget':
+        with _StoreLock(args.store):
+            index = load_index(args.store)
+            changed = forget(index, args.keep, args.tenant)
+            if changed:
+                save_index(index, args.store, changed)
+        print(f"🗑️  {len(changed)} tenant(s) com backups antigos tirados do índice")
+        return 0
+
+    index = load_index(args.store)
+    if args.command == 'list':
+        for entry in sorted(index['tenants'].get(args.tenant, []),
+                            key=lambda e: e['created'], reverse=True):
+            print(f"{entry['created']}  {entry['filename']}  {entry['leadsCount']} leads  "
+                  f"{entry['size']} bytes ({entry['storedBytes']} novos)")
+        return 0
+
+    if args.command == 'stats':
+        entries = [e for tenant in index['tenants'].values() for e in tenant]
+        logical = sum(e['size'] for e in entries)
+        disk = _disk_usage(args.store)
+        print(json.dumps({'tenants': len(index['tenants']), 'backups': len(entries),
+                          'logical_bytes': logical, 'disk_bytes': disk,
+                          'ratio': round(disk / logical, 4) if logical else None}, indent=2))
+        return 0
+
+    entry = find_backup(index, args.tenant, args.filename, args.at)
+    if entry is None:
+        print("❌ Backup não encontrado", file=sys.stderr)
+        return 1
+    try:
+        if args.output:
+            tmp = args.output + '.tmp'
+            with open(tmp, 'wb') as out:
+                written = restore(entry, out, args.store)
+            os.replace(tmp, args.output)
+            print(f"✅ {entry['filename']} restaurado em {args.output} ({written} bytes)")
+        else:
+            restore(entry, sys.stdout.buffer, args.store)
+    except BrokenPipeError:
+        return 0
+    except ValueError as error:
+        if args.output and os.path.exists(args.output + '.tmp'):
+            os.remove(args.output + '.tmp')
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark e orçamento de tamanho dos scripts de patch do painel
+
+Roda integrate.py, enhance_panel.py e update_panel_v3.py (cada um num
+processo próprio) contra um server.js e um index_app.html sintéticos em
+várias escalas (1x a 50x) e mede tempo, pico de memória (RSS) e tamanho
+da saída. No fim confere os limites de panel_budgets.json: se o painel
+gerado ficar mais pesado ou algum script passar do tempo/memória, o
+processo sai com código 1 e o build falha.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUDGETS_PATH = os.path.join(ROOT, 'panel_budgets.json')
+SCALES = (1, 5, 10, 25, 50)
+
+# ~20 KB de server.js por unidade de escala
+_ROUTE = '''
+app.post('/api/rota-{n}', async (req, res) => {{
+    try {{
+        const {{ chatbotId, message }} = req.body;
+        // Comentário com "aspas", 'apóstrofos' e `crases` para o tokenizador
+        const pattern = /[a-z]+\\/{n}/gi;
+        const text = `Rota {n}: ${{message || ''}}`;
+        res.json({{ success: true, chatbotId, text, match: pattern.test(text) }});
+    }} catch (error) {{
+        logger.error('Erro na rota {n}:', error);
+        res.status(500).json({{ success: false, error: error.message }});
+    }}
+}});
+'''
+_ROUTES_PER_SCALE = 40
+
+# ~150 KB de painel por unidade de escala (o index_app.html real tem ~128 KB)
+_PANEL_FILLER = '''        <div class="card" style="padding: 20px; border-radius: 8px;">
+            <h3>Bloco {n}</h3>
+            <p style="color: #6b7280;">Conteúdo de preenchimento do painel</p>
+            <button onclick="doSomething({n})">Ação</button>
+        </div>
+'''
+_PANEL_BLOCKS_PER_SCALE = 600
+
+
+def synthetic_server(scale):
+    parts = ['require("dotenv").config();\n', 'const express = require("express");\n',
+             'const app = express();\n']
+    parts.extend(_ROUTE.format(n=n) for n in range(_ROUTES_PER_SCALE * scale))
+    parts.append('''
+const PORT = process.env.PORT || 3000;
+app.listen(PORT, () => {
+    console.log(`🚀 Servidor rodando em http://localhost:${PORT}`);
+});
+''')
+    return ''.join(parts)
+
+
+def synthetic_panel(scale):
+    """Painel com as âncoras que enhance_panel.py e update_panel_v3.py procuram"""
+    filler = ''.join(_PANEL_FILLER.format(n=n) for n in range(_PANEL_BLOCKS_PER_SCALE * scale))
+    return (
+        '<!DOCTYPE html>\n<html>\n<body>\n    <div class="container">\n' + filler +
+        '        <div class="new-systems-tabs">\n'
+        '                <button class="new-systems-tab" onclick="switchNewSystemsTab(\'system\')">\n'
+        '                    ⚙️ Sistema\n'
+        '                </button>\n'
+        '        </div>\n'
+        '            <div id="system-section" class="new-systems-section" style="display: none;">\n'
+        '                <h2>⚙️ Sistema</h2>\n'
+        '            </div>\n'
+        '    </div>\n</body>\n</html>\n'
+    )
+
+
+def run_script(args, cwd):
+    """Executa um script num processo filho; retorna (segundos, pico de RSS em MB)"""
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable] + args, cwd=cwd,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+        # wait4 devolve o rusage só deste filho (getrusage acumularia todos)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{os.path.basename(args[0])} falhou ({proc.returncode}):\n"
+                               f"{stderr.read().decode('utf-8', 'replace')}")
+
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return elapsed, rss_mb
+
+
+def _gzip_size(path):
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read(), compresslevel=9, mtime=0))
+
+
+def bench_scale(scale, workdir):
+    """Mede os três scripts numa escala; retorna a lista de resultados"""
+    os.makedirs(os.path.join(workdir, 'public'), exist_ok=True)
+    server_in = os.path.join(workdir, 'server.js.original')
+    server_out = os.path.join(workdir, 'server-melhorado.js')
+    panel = os.path.join(workdir, 'public', 'index_app.html')
+
+    with open(server_in, 'w', encoding='utf-8') as f:
+        f.write(synthetic_server(scale))
+    panel_html = synthetic_panel(scale)
+    with open(panel, 'w', encoding='utf-8') as f:
+        f.write(panel_html)
+    panel_in = len(panel_html.encode('utf-8'))
+    panel_in_gz = len(gzip.compress(panel_html.encode('utf-8'), compresslevel=9, mtime=0))
+
+    results = []
+    seconds, rss = run_script([os.path.join(ROOT, 'integrate.py'), server_in, server_out], workdir)
+    results.append({'script': 'integrate', 'scale': scale, 'seconds': seconds, 'rss_mb': rss,
+                    'input_bytes': os.path.getsize(server_in),
+                    'output_bytes': os.path.getsize(server_out)})
+
+    for name in ('enhance_panel', 'update_panel_v3'):
+        before = os.path.getsize(panel)
+        seconds, rss = run_script([os.path.join(ROOT, f'{name}.py'), 'public/index_app.html',
+                                   '--no-compress'], workdir)
+        results.append({'script': name, 'scale': scale, 'seconds': seconds, 'rss_mb': rss,
+                        'input_bytes': before, 'output_bytes': os.path.getsize(panel)})
+
+    # Peso que os scripts acrescentam ao painel (independe da escala da entrada)
+    results.append({'script': 'panel', 'scale': scale,
+                    'added_bytes': os.path.getsize(panel) - panel_in,
+                    'added_gzip_bytes': _gzip_size(panel) - panel_in_gz})
+    return results
+
+
+def check_budgets(results, budgets):
+    """Retorna a lista de violações dos limites"""
+    violations = []
+    for r in results:
+        if r['script'] == 'panel':
+            for key in ('added_bytes', 'added_gzip_bytes'):
+                limit = budgets.get(f'panel_{key}')
+                if limit is not None and r[key] > limit:
+                    violations.append(f"painel {r['scale']}x: {key} {r[key]} > {limit}")
+            continue
+        limit = budgets.get('max_seconds', {}).get(r['script'])
+        if limit is not None and r['seconds'] > limit:
+            violations.append(f"{r['script']} {r['scale']}x: {r['seconds']:.2f}s > {limit}s")
+        limit = budgets.get('max_rss_mb')
+        if limit is not None and r['rss_mb'] > limit:
+            violations.append(f"{r['script']} {r['scale']}x: {r['rss_mb']:.1f} MB > {limit} MB")
+    return violations
+
+
+def print_results(results):
+    print(f"{'script':<18}{'escala':>7}{'tempo ms':>10}{'RSS MB':>9}{'entrada':>11}{'saída':>11}")
+    for r in results:
+        if r['script'] == 'panel':
+            continue
+        print(f"{r['script']:<18}{r['scale']:>6}x{r['seconds'] * 1000:>10.1f}{r['rss_mb']:>9.1f}"
+              f"{r['input_bytes']:>11}{r['output_bytes']:>11}")
+    print()
+    print(f"{'painel':<18}{'escala':>7}{'+bytes':>10}{'+gzip':>9}")
+    for r in results:
+        if r['script'] == 'panel':
+            print(f"{'index_app.html':<18}{r['scale']:>6}x{r['added_bytes']:>10}{r['added_gzip_bytes']:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark e orçamento de tamanho do build do painel')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--budgets', default=BUDGETS_PATH, help='arquivo JSON com os limites')
+    parser.add_argument('--json', help='grava os resultados neste arquivo')
+    args = parser.parse_args(argv)
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='linkmagico-bench-')
+    try:
+        for scale in args.scales:
+            scale_dir = os.path.join(workdir, f'{scale}x')
+            os.makedirs(scale_dir)
+            results.extend(bench_scale(scale, scale_dir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("⏱️  Benchmark do build do painel")
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    try:
+        with open(args.budgets, 'r', encoding='utf-8') as f:
+            budgets = json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️  {args.budgets} não encontrado, limites não verificados")
+        return 0
+
+    violations = check_budgets(results, budgets)
+    if violations:
+        print("❌ Orçamento estourado:")
+        for violation in violations:
+            print(f"   - {violation}")
+        return 1
+    print("✅ Dentro do orçamento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,356 @@
+/**
+ * 🧠 MEMÓRIA LIMITADA (LRU + TTL) - Link Mágico
+ * Substitui os `new Map()` do server.js que só cresciam
+ *
+ * BoundedMap tem a mesma interface de Map (get/set/has/delete/size/iteração),
+ * mas com:
+ * - limite total de entradas, removendo a menos usada (ordem do próprio Map);
+ * - cota por tenant (tenantOf(key)), para um tenant não expulsar os outros;
+ * - TTL desde o último acesso, com varredura periódica só pelas mais antigas;
+ * - spill-to-disk opcional: a entrada removida vai para
+ *   data/memory-spill/<nome>/<hash>.json e volta no próximo get/has da chave
+ *   (menos as sessões anônimas, que nunca são consultadas de novo).
+ *
+ * O registro grava as estatísticas (tamanho, acertos, remoções) em
+ * data/memory-store/stats.json a cada 5 minutos e quando aparece o arquivo
+ * data/memory-store/dump.request (memory_inspect.py stats --refresh). Não
+ * usa sinal: o SIGUSR2 é o que o nodemon manda para reiniciar. Com
+ * MEMORY_STORE_TRACE=1 cada operação vai para trace.ndjson.
+ * memory_inspect.py lê esses arquivos, snapshots do heap e simula outras
+ * configurações a partir do trace.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+const DATA_DIR = process.env.MEMORY_STORE_DIR || path.join(__dirname, 'data');
+const SPILL_DIR = path.join(DATA_DIR, 'memory-spill');
+const STATS_DIR = path.join(DATA_DIR, 'memory-store');
+const SWEEP_INTERVAL = 60 * 1000;
+const DUMP_INTERVAL = parseInt(process.env.MEMORY_STORE_DUMP_INTERVAL || '300000', 10);
+const DUMP_REQUEST_FILE = path.join(STATS_DIR, 'dump.request');
+const DUMP_REQUEST_INTERVAL = 5 * 1000;
+const TRACE_ENABLED = process.env.MEMORY_STORE_TRACE === '1';
+const ISO_DATE = /^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$/;
+
+/**
+ * Tenant padrão: prefixo antes de ':' (ver tenantKeyFor no server.js),
+ * sessões anônimas (user_<timestamp>) num grupo próprio
+ */
+function defaultTenantOf(key) {
+    const text = String(key);
+    const colon = text.indexOf(':');
+    if (colon > 0) return text.slice(0, colon);
+    if (text.startsWith('user_')) return 'anonymous';
+    return 'default';
+}
+
+function reviveDates(key, value) {
+    return typeof value === 'string' && ISO_DATE.test(value) ? new Date(value) : value;
+}
+
+class BoundedMap {
+    constructor(name, options = {}) {
+        this.name = name;
+        this.maxEntries = options.maxEntries || 5000;
+        this.tenantQuota = options.tenantQuota || this.maxEntries;
+        this.ttl = options.ttl || 0;                       // 0 = sem expiração
+        this.tenantOf = options.tenantOf || defaultTenantOf;
+        this.spill = Boolean(options.spill);
+        // user_<timestamp> nunca é consultado de novo: não vale gravar em disco
+        this.noSpillTenants = new Set(options.noSpillTenants || ['anonymous']);
+        this.spillDir = path.join(SPILL_DIR, name);
+
+        this.items = new Map();                            // chave -> { value, tenant, touchedAt }
+        this.tenants = new Map();                          // tenant -> Map(chave -> true), mesma ordem LRU
+        this.stats = {
+            hits: 0, misses: 0, sets: 0, restored: 0, spilled: 0,
+            evictedLru: 0, evictedQuota: 0, expired: 0
+        };
+    }
+
+    get size() {
+        return this.items.size;
+    }
+
+    touch(key, entry) {
+        entry.touchedAt = Date.now();
+        this.items.delete(key);
+        this.items.set(key, entry);
+        const keys = this.tenants.get(entry.tenant);
+        keys.delete(key);
+        keys.set(key, true);
+    }
+
+    isExpired(entry, now = Date.now()) {
+        return this.ttl > 0 && now - entry.touchedAt > this.ttl;
+    }
+
+    lookup(key) {
+        let entry = this.items.get(key);
+        if (entry && this.isExpired(entry)) {
+            this.evict(key, 'expired');
+            entry = undefined;
+        }
+        if (!entry && this.spill && !this.noSpillTenants.has(this.tenantOf(key))) {
+            entry = this.restore(key);
+        }
+        return entry;
+    }
+
+    get(key) {
+        trace(this.name, 'get', key);
+        const entry = this.lookup(key);
+        if (!entry) {
+            this.stats.misses++;
+            return undefined;
+        }
+        this.stats.hits++;
+        this.touch(key, entry);
+        return entry.value;
+    }
+
+    has(key) {
+        // No server.js o padrão é has() -> set() -> get(): o has é quem diz se a sessão já existia
+        trace(this.name, 'has', key);
+        const found = this.lookup(key) !== undefined;
+        if (found) this.stats.hits++;
+        else this.stats.misses++;
+        return found;
+    }
+
+    set(key, value) {
+        trace(this.name, 'set', key);
+        this.stats.sets++;
+
+        const current = this.items.get(key);
+        if (current) {
+            current.value = value;
+            this.touch(key, current);
+            return this;
+        }
+
+        const tenant = this.tenantOf(key);
+        if (!this.tenants.has(tenant)) this.tenants.set(tenant, new Map());
+        const tenantKeys = this.tenants.get(tenant);
+
+        // Cota do tenant primeiro (remove a menos usada dele), depois o limite global
+        while (tenantKeys.size >= this.tenantQuota) {
+            this.evict(tenantKeys.keys().next().value, 'evictedQuota');
+        }
+        while (this.items.size >= this.maxEntries) {
+            this.evict(this.items.keys().next().value, 'evictedLru');
+        }
+
+        this.items.set(key, { value, tenant, touchedAt: Date.now() });
+        tenantKeys.set(key, true);
+        return this;
+    }
+
+    delete(key) {
+        const entry = this.items.get(key);
+        if (this.spill) {
+            fs.rmSync(this.spillPath(key), { force: true });
+        }
+        if (!entry) return false;
+        this.remove(key, entry);
+        return true;
+    }
+
+    remove(key, entry) {
+        this.items.delete(key);
+        const keys = this.tenants.get(entry.tenant);
+        keys.delete(key);
+        if (keys.size === 0) this.tenants.delete(entry.tenant);
+    }
+
+    evict(key, reason) {
+        const entry = this.items.get(key);
+        if (!entry) return;
+        this.stats[reason]++;
+        this.remove(key, entry);
+        if (this.spill && !this.noSpillTenants.has(entry.tenant)) this.spillEntry(key, entry, reason);
+    }
+
+    /**
+     * Remover as expiradas; como o Map está em ordem de uso, para na primeira válida
+     */
+    sweep() {
+        if (!this.ttl) return 0;
+        const now = Date.now();
+        let removed = 0;
+        for (const [key, entry] of this.items) {
+            if (!this.isExpired(entry, now)) break;
+            this.evict(key, 'expired');
+            removed++;
+        }
+        return removed;
+    }
+
+    clear() {
+        this.items.clear();
+        this.tenants.clear();
+    }
+
+    spillPath(key) {
+        const hash = crypto.createHash('sha1').update(String(key)).digest('hex');
+        return path.join(this.spillDir, hash.slice(0, 2), `${hash}.json`);
+    }
+
+    spillEntry(key, entry, reason) {
+        const file = this.spillPath(key);
+        try {
+            fs.mkdirSync(path.dirname(file), { recursive: true });
+            fs.writeFileSync(file, JSON.stringify({
+                key, tenant: entry.tenant, reason, evictedAt: Date.now(), touchedAt: entry.touchedAt, value: entry.value
+            }));
+            this.stats.spilled++;
+        } catch (error) {
+            console.error(`❌ Erro ao salvar ${this.name} em disco:`, error.message);
+        }
+    }
+
+    restore(key) {
+        const file = this.spillPath(key);
+        let saved;
+        try {
+            saved = JSON.parse(fs.readFileSync(file, 'utf8'), reviveDates);
+        } catch (error) {
+            return undefined;
+        }
+        fs.rmSync(file, { force: true });
+        if (saved.key !== String(key)) return undefined;
+
+        this.stats.restored++;
+        this.set(key, saved.value);
+        return this.items.get(key);
+    }
+
+    // ===== Interface de Map =====
+    *[Symbol.iterator]() {
+        for (const [key, entry] of this.items) yield [key, entry.value];
+    }
+
+    entries() {
+        return this[Symbol.iterator]();
+    }
+
+    *keys() {
+        yield* this.items.keys();
+    }
+
+    *values() {
+        for (const entry of this.items.values()) yield entry.value;
+    }
+
+    forEach(callback, thisArg) {
+        for (const [key, entry] of this.items) callback.call(thisArg, entry.value, key, this);
+    }
+
+    getStats() {
+        const lookups = this.stats.hits + this.stats.misses;
+        const tenants = {};
+        for (const [tenant, keys] of this.tenants) tenants[tenant] = keys.size;
+        return {
+            name: this.name,
+            size: this.items.size,
+            maxEntries: this.maxEntries,
+            tenantQuota: this.tenantQuota,
+            ttl: this.ttl,
+            spill: this.spill,
+            hitRate: lookups ? this.stats.hits / lookups : null,
+            ...this.stats,
+            tenants
+        };
+    }
+}
+
+// ===== Registro compartilhado =====
+const stores = new Map();
+let traceBuffer = [];
+let timersStarted = false;
+
+function trace(name, op, key) {
+    if (!TRACE_ENABLED) return;
+    traceBuffer.push(`{"t":${Date.now()},"s":${JSON.stringify(name)},"op":"${op}","k":${JSON.stringify(String(key))}}\n`);
+    if (traceBuffer.length >= 1000) flushTrace();
+}
+
+function flushTrace() {
+    if (traceBuffer.length === 0) return;
+    const data = traceBuffer.join('');
+    traceBuffer = [];
+    try {
+        fs.mkdirSync(STATS_DIR, { recursive: true });
+        fs.appendFileSync(path.join(STATS_DIR, 'trace.ndjson'), data);
+    } catch (error) {
+        console.error('❌ Erro ao gravar trace da memória:', error.message);
+    }
+}
+
+function getMemoryStats() {
+    const memory = process.memoryUsage();
+    return {
+        pid: process.pid,
+        timestamp: new Date().toISOString(),
+        uptime: process.uptime(),
+        rss: memory.rss,
+        heapUsed: memory.heapUsed,
+        stores: Array.from(stores.values(), store => store.getStats())
+    };
+}
+
+function dumpMemoryStats(file = path.join(STATS_DIR, 'stats.json')) {
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.writeFileSync(`${file}.tmp`, JSON.stringify(getMemoryStats(), null, 2));
+        fs.renameSync(`${file}.tmp`, file);
+    } catch (error) {
+        console.error('❌ Erro ao gravar estatísticas da memória:', error.message);
+    }
+    flushTrace();
+}
+
+function startTimers() {
+    if (timersStarted) return;
+    timersStarted = true;
+
+    setInterval(() => {
+        for (const store of stores.values()) store.sweep();
+        flushTrace();
+    }, SWEEP_INTERVAL).unref();
+
+    if (DUMP_INTERVAL > 0) {
+        setInterval(() => dumpMemoryStats(), DUMP_INTERVAL).unref();
+    }
+    setInterval(() => {
+        if (!fs.existsSync(DUMP_REQUEST_FILE)) return;
+        try {
+            fs.unlinkSync(DUMP_REQUEST_FILE);
+        } catch (error) {
+            // outro processo já atendeu o pedido
+        }
+        dumpMemoryStats();
+    }, DUMP_REQUEST_INTERVAL).unref();
+    process.on('exit', flushTrace);
+}
+
+/**
+ * Criar (ou reaproveitar) um mapa limitado registrado pelo nome
+ */
+function createBoundedMap(name, options = {}) {
+    if (!stores.has(name)) {
+        stores.set(name, new BoundedMap(name, options));
+        startTimers();
+    }
+    return stores.get(name);
+}
+
+module.exports = {
+    BoundedMap,
+    createBoundedMap,
+    getMemoryStats,
+    dumpMemoryStats,
+    defaultTenantOf
+};
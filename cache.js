@@ -13,6 +13,21 @@ const USE_REDIS = process.env.REDIS_URL || process.env.USE_REDIS === 'true';
 
 let cacheClient;
 let isRedisConnected = false;
+let usageCounters;                      // undefined = ainda não tentou abrir
+
+/**
+ * 📊 Contadores de uso em arquivo (data/usage.counters, gerado por usage_counters.py)
+ */
+function getUsageCounters() {
+    if (usageCounters === undefined) {
+        const { UsageCounters } = require('./usage-counters');
+        usageCounters = UsageCounters.open();
+        if (usageCounters) {
+            console.log('📊 Rate limiting usando contadores de uso em arquivo');
+        }
+    }
+    return usageCounters;
+}
 
 /**
  * 🔌 Inicializar cliente de cache
@@ -228,6 +243,15 @@ const CacheManager = {
         const key = `ratelimit:${apiKey}`;
         
         try {
+            // Sem Redis: janela e uso ficam no slot da key, sem Map em memória
+            if (!isRedisConnected && getUsageCounters()) {
+                const result = usageCounters.hit(apiKey, maxRequests, windowSeconds);
+                if (result) {
+                    if (!result.allowed) console.log(`⚠️ Rate limit excedido para ${apiKey}`);
+                    return result;
+                }
+            }
+
             const current = await cacheClient.incr(key);
             
             if (current === 1) {
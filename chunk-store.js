@@ -0,0 +1,260 @@
+/**
+ * 🧱 ARMAZENAMENTO DE TRECHOS POR CONTEÚDO - Link Mágico
+ * Uma cópia de cada trecho de texto extraído, referenciada por todos os tenants
+ *
+ * O dataCache do server.js, a tabela extraction_cache e as fontes de URL do
+ * KnowledgeBaseManager guardavam cada um o cleanText inteiro, e cada tenant
+ * que adicionava a mesma página tinha mais uma cópia. Aqui o texto é
+ * cortado em trechos de linhas inteiras definidos pelo conteúdo e gravado,
+ * sem alterar nada, uma vez em data/chunk-store/<aa>/<sha256>.txt. Os dados
+ * da página passam a levar só a lista de hashes em `chunks` (packPage) e
+ * unpackPage devolve exatamente o que foi empacotado (linhas vazias e
+ * espaços inclusos).
+ *
+ * O corte é por conteúdo, não por posição: depois de MIN_CHUNK_BYTES, uma
+ * linha cujo FNV-1a (da linha sem espaços repetidos) termina em 3 bits zero
+ * fecha o trecho. Inserir um parágrafo no topo da página só muda o trecho
+ * onde ele entrou. O mesmo
+ * algoritmo está em chunk_store.py (migração, coleta de lixo e o
+ * extraction_service.py); os dois precisam gerar os mesmos hashes.
+ *
+ * canonicalUrl() remove parâmetros de rastreamento, fragmento e barra final,
+ * para que variantes da mesma URL usem a mesma extração.
+ *
+ * CHUNK_STORE=0 desliga o empacotamento: os dados seguem inteiros como antes.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const { createBoundedMap } = require('./bounded-store');
+
+const STORE_DIR = process.env.CHUNK_STORE_DIR || path.join(__dirname, 'data', 'chunk-store');
+const ENABLED = process.env.CHUNK_STORE !== '0';
+const MIN_CHUNK_BYTES = 1024;
+const MAX_CHUNK_BYTES = 8192;
+const BOUNDARY_MASK = 7;
+
+// Campos de texto da extração: 'text' vira linhas, 'lines' é um array de linhas
+const TEXT_FIELDS = {
+    cleanText: 'text',
+    textos: 'lines'
+};
+
+const TRACKING_PARAMS = /^(utm_\w+|fbclid|gclid|gbraid|wbraid|mc_cid|mc_eid|_ga|ref|ref_src)$/i;
+
+const chunkCache = createBoundedMap('chunkCache', {
+    maxEntries: parseInt(process.env.CHUNK_CACHE_ENTRIES || '4096', 10)
+});
+
+const stats = {
+    pagesPacked: 0,
+    chunksWritten: 0,
+    chunksReused: 0,
+    bytesWritten: 0,
+    bytesReused: 0,
+    chunkReads: 0,
+    missingChunks: 0
+};
+
+/**
+ * URL canônica para chaves de cache: esquema e host em minúsculas, sem porta
+ * padrão, fragmento, parâmetros de rastreamento e barra final; parâmetros
+ * ordenados pelo nome. Só operações de texto (sem decodificar %XX), para o
+ * canonical_url do chunk_store.py dar exatamente o mesmo resultado.
+ */
+function canonicalUrl(url) {
+    const text = String(url).trim().split('#')[0];
+    const match = text.match(/^([a-zA-Z][a-zA-Z0-9+.-]*):\/\/([^/?]*)([^?]*)(?:\?(.*))?$/);
+    if (!match) return text;
+
+    const scheme = match[1].toLowerCase();
+    let host = match[2].toLowerCase();
+    if ((scheme === 'http' && host.endsWith(':80')) || (scheme === 'https' && host.endsWith(':443'))) {
+        host = host.slice(0, host.lastIndexOf(':'));
+    }
+    let pathname = match[3] || '/';
+    if (pathname.length > 1) pathname = pathname.replace(/\/+$/, '') || '/';
+
+    const params = (match[4] || '').split('&')
+        .filter(param => param && !TRACKING_PARAMS.test(param.split('=')[0]))
+        .map(param => [param.split('=')[0], param])
+        .sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0))
+        .map(([, param]) => param);
+
+    return `${scheme}://${host}${pathname}${params.length ? `?${params.join('&')}` : ''}`;
+}
+
+/**
+ * Linha sem espaços repetidos: só decide onde cortar, o trecho guarda a linha original
+ */
+function normalizeLine(line) {
+    return line.replace(/\s+/g, ' ').trim();
+}
+
+/**
+ * FNV-1a de 32 bits sobre os bytes UTF-8 (igual ao _fnv1a do chunk_store.py)
+ */
+function fnv1a(buffer) {
+    let hash = 0x811c9dc5;
+    for (const byte of buffer) {
+        hash ^= byte;
+        hash = Math.imul(hash, 0x01000193) >>> 0;
+    }
+    return hash;
+}
+
+/**
+ * Cortar linhas normalizadas em trechos definidos pelo conteúdo
+ */
+function chunkLines(lines) {
+    const chunks = [];
+    let current = [];
+    let size = 0;
+    for (const line of lines) {
+        current.push(line);
+        size += Buffer.byteLength(line, 'utf8') + 1;
+        const boundary = fnv1a(Buffer.from(normalizeLine(line), 'utf8'));
+        if (size >= MAX_CHUNK_BYTES || (size >= MIN_CHUNK_BYTES && (boundary & BOUNDARY_MASK) === 0)) {
+            chunks.push(current.join('\n'));
+            current = [];
+            size = 0;
+        }
+    }
+    if (current.length) chunks.push(current.join('\n'));
+    return chunks;
+}
+
+function hashChunk(chunk) {
+    return crypto.createHash('sha256').update(chunk, 'utf8').digest('hex');
+}
+
+function chunkPath(hash) {
+    return path.join(STORE_DIR, hash.slice(0, 2), `${hash}.txt`);
+}
+
+/**
+ * Gravar os trechos que ainda não existem; os existentes só têm o mtime
+ * renovado (a coleta de lixo não remove trechos usados há pouco)
+ */
+function putLines(lines) {
+    const refs = [];
+    const now = new Date();
+    for (const chunk of chunkLines(lines)) {
+        const hash = hashChunk(chunk);
+        const file = chunkPath(hash);
+        const bytes = Buffer.byteLength(chunk, 'utf8');
+        try {
+            fs.utimesSync(file, now, now);
+            stats.chunksReused++;
+            stats.bytesReused += bytes;
+        } catch (error) {
+            fs.mkdirSync(path.dirname(file), { recursive: true });
+            const tmp = `${file}.${process.pid}.tmp`;
+            fs.writeFileSync(tmp, chunk);
+            fs.renameSync(tmp, file);
+            stats.chunksWritten++;
+            stats.bytesWritten += bytes;
+        }
+        chunkCache.set(hash, chunk);
+        refs.push(hash);
+    }
+    return refs;
+}
+
+/**
+ * Ler um trecho (cache em memória primeiro); null se não existir mais
+ */
+function readChunk(hash) {
+    const cached = chunkCache.get(hash);
+    if (cached !== undefined) return cached;
+    try {
+        const chunk = fs.readFileSync(chunkPath(hash), 'utf8');
+        stats.chunkReads++;
+        chunkCache.set(hash, chunk);
+        return chunk;
+    } catch (error) {
+        stats.missingChunks++;
+        return null;
+    }
+}
+
+function getLines(refs) {
+    const lines = [];
+    for (const hash of refs) {
+        const chunk = readChunk(hash);
+        if (chunk === null) return null;
+        lines.push(...chunk.split('\n'));
+    }
+    return lines;
+}
+
+/**
+ * Linhas do campo, ou null se não der para remontar exatamente (array com
+ * item que não é texto ou que tem quebra de linha: fica inteiro nos dados)
+ */
+function fieldLines(kind, value) {
+    if (kind === 'text') return typeof value === 'string' ? value.split('\n') : null;
+    if (!Array.isArray(value)) return null;
+    return value.every(line => typeof line === 'string' && !line.includes('\n')) ? value : null;
+}
+
+/**
+ * Trocar os campos de texto da extração por referências aos trechos
+ */
+function packPage(data) {
+    if (!ENABLED || !data || typeof data !== 'object' || data.chunks) return data;
+
+    const packed = { ...data, chunks: {} };
+    try {
+        for (const [field, kind] of Object.entries(TEXT_FIELDS)) {
+            const lines = fieldLines(kind, data[field]);
+            if (lines === null) continue;
+            packed.chunks[field] = putLines(lines);
+            delete packed[field];
+        }
+    } catch (error) {
+        // Sem disco para os trechos: guarda a página inteira, como antes
+        console.error('❌ Erro ao gravar trechos da página:', error.message);
+        return data;
+    }
+    stats.pagesPacked++;
+    return packed;
+}
+
+/**
+ * Remontar os campos de texto; null se algum trecho foi removido
+ * (quem chama trata como cache vencido e extrai de novo)
+ */
+function unpackPage(data) {
+    if (!data || typeof data !== 'object' || !data.chunks) return data;
+
+    const unpacked = { ...data };
+    delete unpacked.chunks;
+    for (const [field, refs] of Object.entries(data.chunks)) {
+        if (!refs.length) {
+            // Array vazio não tem trecho (texto vazio vira um trecho '')
+            unpacked[field] = [];
+            continue;
+        }
+        const lines = getLines(refs);
+        if (lines === null) return null;
+        unpacked[field] = TEXT_FIELDS[field] === 'lines' ? lines : lines.join('\n');
+    }
+    return unpacked;
+}
+
+function getChunkStoreStats() {
+    const cache = chunkCache.getStats();
+    return { enabled: ENABLED, dir: STORE_DIR, ...stats, cacheSize: cache.size, cacheHitRate: cache.hitRate };
+}
+
+module.exports = {
+    canonicalUrl,
+    chunkLines,
+    normalizeLine,
+    packPage,
+    unpackPage,
+    getChunkStoreStats,
+    TEXT_FIELDS
+};
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Trechos de texto por conteúdo compartilhados entre tenants (chunk-store.js)
+
+O texto extraído das páginas (cleanText, textos) fica uma vez só em
+data/chunk-store/<aa>/<sha256>.txt. O dataCache do server.js, a tabela
+extraction_cache e as fontes de URL das bases de conhecimento guardam só a
+lista de hashes em `chunks`. Os trechos guardam as linhas sem alteração
+(unpack_page devolve exatamente o que foi empacotado). Este módulo tem o
+mesmo corte por conteúdo e a mesma URL canônica do chunk-store.js (os
+hashes precisam bater) e é usado também pelo extraction_service.py.
+
+Comandos:
+- migrate: empacota as linhas antigas da extraction_cache e as fontes de
+  URL de data/knowledge/*.json, e junta as linhas cuja URL canônica é a
+  mesma (variantes com utm_*, barra final, fragmento);
+- gc: marca os trechos referenciados pela extraction_cache (SQLite e, com
+  DATABASE_URL e psycopg2, Postgres) e pelas bases de conhecimento, e
+  remove os demais que não foram usados nas últimas --grace-hours (o
+  dataCache só vive em memória e renova o mtime dos trechos que usa);
+- stats: trechos únicos, bytes e quanto seria sem deduplicação;
+- benchmark: armazenamento e extrações por número de tenants, cópias
+  inteiras x trechos.
+
+Uso:
+  python3 chunk_store.py migrate [--db data/linkmagico.db] [--dry-run]
+  python3 chunk_store.py gc [--grace-hours 24] [--dry-run]
+  python3 chunk_store.py stats
+  python3 chunk_store.py benchmark [--tenants 1 10 100]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+STORE_DIR = os.path.join('data', 'chunk-store')
+DB_PATH = os.path.join('data', 'linkmagico.db')
+KNOWLEDGE_DIR = os.path.join('data', 'knowledge')
+MIN_CHUNK_BYTES = 1024
+MAX_CHUNK_BYTES = 8192
+BOUNDARY_MASK = 7
+TEXT_FIELDS = {'cleanText': 'text', 'textos': 'lines'}
+
+TRACKING_PARAMS = re.compile(r'utm_\w+|fbclid|gclid|gbraid|wbraid|mc_cid|mc_eid|_ga|ref|ref_src',
+                             re.IGNORECASE | re.ASCII)
+URL_PARTS = re.compile(r'([a-zA-Z][a-zA-Z0-9+.-]*)://([^/?]*)([^?]*)(?:\?(.*))?')
+# Mesmo conjunto do \s e do trim() do JavaScript (o \s do Python difere em \ufeff e \x1c-\x1f)
+JS_SPACES = ('\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a'
+             '\u2028\u2029\u202f\u205f\u3000\ufeff')
+JS_WHITESPACE = re.compile('[' + JS_SPACES + ']+')
+
+
+def canonical_url(url):
+    """Mesmo resultado do canonicalUrl do chunk-store.js"""
+    text = str(url).strip(JS_SPACES).split('#')[0]
+    match = URL_PARTS.fullmatch(text)
+    if not match:
+        return text
+    scheme, host, path, query = match.group(1).lower(), match.group(2).lower(), match.group(3), match.group(4)
+    if (scheme == 'http' and host.endswith(':80')) or (scheme == 'https' and host.endswith(':443')):
+        host = host[:host.rindex(':')]
+    path = path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    params = [param for param in (query or '').split('&')
+              if param and not TRACKING_PARAMS.fullmatch(param.split('=')[0])]
+    params.sort(key=lambda param: param.split('=')[0])
+    return f"{scheme}://{host}{path}{'?' + '&'.join(params) if params else ''}"
+
+
+def url_hash(url):
+    """url_hash da extraction_cache (sha256 da URL canônica)"""
+    return hashlib.sha256(canonical_url(url).encode('utf-8')).hexdigest()
+
+
+def normalize_line(line):
+    """Linha sem espaços repetidos: só decide onde cortar (normalizeLine do JS)"""
+    return JS_WHITESPACE.sub(' ', line).strip(' ')
+
+
+def _fnv1a(data):
+    value = 0x811c9dc5
+    for byte in data:
+        value = ((value ^ byte) * 0x01000193) & 0xffffffff
+    return value
+
+
+def chunk_lines(lines):
+    """Trechos definidos pelo conteúdo (igual ao chunkLines do chunk-store.js)"""
+    chunks, current, size = [], [], 0
+    for line in lines:
+        current.append(line)
+        size += len(line.encode('utf-8', 'replace')) + 1
+        boundary = _fnv1a(normalize_line(line).encode('utf-8', 'replace'))
+        if size >= MAX_CHUNK_BYTES or (size >= MIN_CHUNK_BYTES and boundary & BOUNDARY_MASK == 0):
+            chunks.append('\n'.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def _text_lines(kind, value):
+    """Linhas do campo, ou None se não der para remontar exatamente (fieldLines do JS)"""
+    if kind == 'text':
+        return value.split('\n') if isinstance(value, str) else None
+    if not isinstance(value, list):
+        return None
+    return value if all(isinstance(line, str) and '\n' not in line for line in value) else None
+
+
+class ChunkStore:
+    """data/chunk-store/<aa>/<sha256>.txt, gravados uma vez por conteúdo"""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.stats = {'written': 0, 'reused': 0, 'bytesWritten': 0, 'bytesReused': 0}
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], f'{digest}.txt')
+
+    def put_lines(self, lines):
+        refs = []
+        for chunk in chunk_lines(lines):
+            data = chunk.encode('utf-8', 'replace')
+            digest = hashlib.sha256(data).hexdigest()
+            path = self.path(digest)
+            try:
+                os.utime(path)
+                self.stats['reused'] += 1
+                self.stats['bytesReused'] += len(data)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f'{path}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self.stats['written'] += 1
+                self.stats['bytesWritten'] += len(data)
+            refs.append(digest)
+        return refs
+
+    def get_lines(self, refs):
+        lines = []
+        for digest in refs:
+            try:
+                with open(self.path(digest), 'r', encoding='utf-8', newline='') as f:
+                    lines.extend(f.read().split('\n'))
+            except FileNotFoundError:
+                return None
+        return lines
+
+    def pack_page(self, data):
+        if not isinstance(data, dict) or 'chunks' in data:
+            return data
+        packed = dict(data, chunks={})
+        for field, kind in TEXT_FIELDS.items():
+            lines = _text_lines(kind, data.get(field))
+            if lines is None:
+                continue
+            packed['chunks'][field] = self.put_lines(lines)
+            del packed[field]
+        return packed
+
+    def unpack_page(self, data):
+        """Dados com os campos de texto remontados; None se faltar algum trecho"""
+        if not isinstance(data, dict) or 'chunks' not in data:
+            return data
+        unpacked = {key: value for key, value in data.items() if key != 'chunks'}
+        for field, refs in data['chunks'].items():
+            if not refs:
+                unpacked[field] = []
+                continue
+            lines = self.get_lines(refs)
+            if lines is None:
+                return None
+            unpacked[field] = lines if TEXT_FIELDS.get(field) == 'lines' else '\n'.join(lines)
+        return unpacked
+
+    def iter_chunks(self):
+        """(hash ou None para temporários, caminho, bytes, mtime)"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                info = os.stat(path)
+                digest = name[:-4] if name.endswith('.txt') else None
+                yield digest, path, info.st_size, info.st_mtime
+
+
+def page_refs(data):
+    return [digest for refs in (data.get('chunks') or {}).values() for digest in refs] \
+        if isinstance(data, dict) else []
+
+
+# ----------------------------------------------------------------------
+# Fontes: extraction_cache (SQLite / Postgres) e data/knowledge
+# ----------------------------------------------------------------------
+def open_databases(db_path, database_url):
+    """[(nome, conexão, marcador de parâmetro)] das extraction_cache disponíveis"""
+    databases = []
+    if db_path and os.path.exists(db_path):
+        databases.append((db_path, sqlite3.connect(db_path, timeout=10), '?'))
+    if database_url:
+        if psycopg2 is None:
+            raise RuntimeError('DATABASE_URL definido mas psycopg2 não está instalado '
+                               '(pip install psycopg2-binary ou --database-url "")')
+        databases.append(('postgres', psycopg2.connect(database_url), '%s'))
+    return databases
+
+
+def _has_cache_table(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT 1 FROM extraction_cache LIMIT 1')
+        cursor.fetchall()
+        return True
+    except Exception:
+        conn.rollback()
+        return False
+
+
+def _load_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def cache_rows(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, url, extracted_data, expires_at, hit_count FROM extraction_cache')
+    return cursor.fetchall()
+
+
+def knowledge_files(directory=KNOWLEDGE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.json')]
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------
+# migrate
+# ----------------------------------------------------------------------
+def migrate_cache(store, conn, mark, dry_run=False):
+    """Empacota as linhas e junta as de mesma URL canônica; (linhas, juntadas, bytes antes, bytes depois)"""
+    groups = defaultdict(list)
+    before = after = 0
+    for row_id, url, extracted, expires_at, hit_count in cache_rows(conn):
+        raw = extracted if isinstance(extracted, str) else json.dumps(extracted, ensure_ascii=False)
+        before += len(raw.encode('utf-8'))
+        data = _load_json(extracted)
+        packed = data if dry_run else store.pack_page(data)
+        groups[canonical_url(url)].append((str(expires_at), row_id, hit_count or 0, packed))
+
+    merged = 0
+    cursor = conn.cursor()
+    for url, rows in groups.items():
+        rows.sort(reverse=True)                    # a mais nova fica
+        expires_at, keep_id, _, packed = rows[0]
+        text = json.dumps(packed, ensure_ascii=False)
+        after += len(text.encode('utf-8'))
+        merged += len(rows) - 1
+        if dry_run:
+            continue
+        for _, row_id, _, _ in rows[1:]:
+            cursor.execute(f'DELETE FROM extraction_cache WHERE id = {mark}', (row_id,))
+        cursor.execute(f'UPDATE extraction_cache SET url = {mark}, url_hash = {mark}, extracted_data = {mark}, '
+                       f'hit_count = {mark} WHERE id = {mark}',
+                       (url, url_hash(url), text, sum(row[2] for row in rows), keep_id))
+    if not dry_run:
+        conn.commit()
+    return sum(len(rows) for rows in groups.values()), merged, before, after
+
+
+def migrate_knowledge(store, directory=KNOWLEDGE_DIR, dry_run=False):
+    """Empacota as fontes de URL das bases; (bases, fontes, bytes antes, bytes depois)"""
+    bases = sources = before = after = 0
+    for path in knowledge_files(directory):
+        with open(path, 'r', encoding='utf-8') as f:
+            kb = json.load(f)
+        changed = False
+        for source in kb.get('sources', []):
+            data = source.get('data')
+            if source.get('type') != 'url' or not isinstance(data, dict) or 'chunks' in data:
+                continue
+            before += len(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+            if not dry_run:
+                source['data'] = store.pack_page(data)
+            after += len(json.dumps(source['data'], ensure_ascii=False).encode('utf-8'))
+            sources += 1
+            changed = True
+        if changed:
+            bases += 1
+            if not dry_run:
+                _write_json(path, kb)
+    return bases, sources, before, after
+
+
+# ----------------------------------------------------------------------
+# gc
+# ----------------------------------------------------------------------
+def referenced_chunks(databases, directory=KNOWLEDGE_DIR):
+    referenced = defaultdict(int)
+    for _, conn, _ in databases:
+        if not _has_cache_table(conn):
+            continue
+        for _, _, extracted, _, _ in cache_rows(conn):
+            for digest in page_refs(_load_json(extracted)):
+                referenced[digest] += 1
+    for path in knowledge_files(directory):
+        with open(path, 'r', encoding='utf-8') as f:
+            kb = json.load(f)
+        for source in kb.get('sources', []):
+            for digest in page_refs(source.get('data')):
+                referenced[digest] += 1
+    return referenced
+
+
+def collect_garbage(store, referenced, grace_hours=24.0, dry_run=False):
+    """Remove trechos sem referência e sem uso nas últimas grace_hours"""
+    cutoff = time.time() - grace_hours * 3600
+    result = {'kept': 0, 'keptBytes': 0, 'recent': 0, 'removed': 0, 'removedBytes': 0}
+    present = set()
+    for digest, path, size, mtime in store.iter_chunks():
+        if digest is not None:
+            present.add(digest)
+        if digest in referenced:
+            result['kept'] += 1
+            result['keptBytes'] += size
+        elif mtime > cutoff:
+            result['recent'] += 1                  # pode estar só no dataCache em memória
+        else:
+            result['removed'] += 1
+            result['removedBytes'] += size
+            if not dry_run:
+                os.remove(path)
+    result['missing'] = sum(1 for digest in referenced if digest not in present)
+    return result
+
+
+def store_stats(store, referenced):
+    chunks = unique_bytes = 0
+    sizes = {}
+    for digest, _, size, _ in store.iter_chunks():
+        if digest is None:
+            continue
+        chunks += 1
+        unique_bytes += size
+        sizes[digest] = size
+    logical = sum(sizes.get(digest, 0) * count for digest, count in referenced.items())
+    return {'chunks': chunks, 'bytes': unique_bytes, 'references': sum(referenced.values()), 'logicalBytes': logical}
+
+
+# ----------------------------------------------------------------------
+# benchmark
+# ----------------------------------------------------------------------
+def _site_pages(sites=20, pages_per_site=10, seed=11):
+    """Páginas com cabeçalho/rodapé comuns por site e corpo próprio"""
+    rng = random.Random(seed)
+    words = ('curso método resultado garantia bônus aula módulo suporte acesso comunidade '
+             'planilha mentoria desconto parcela certificado aluno prática estratégia').split()
+    pages = {}
+    for site in range(sites):
+        chrome = [' '.join(rng.choice(words) for _ in range(12)) + f' site {site}' for _ in range(40)]
+        for page in range(pages_per_site):
+            body = [' '.join(rng.choice(words) for _ in range(rng.randint(8, 30))) + f' {site}.{page}.{i}'
+                    for i in range(rng.randint(60, 200))]
+            text = '\n'.join(chrome[:25] + body + chrome[25:])
+            pages[f'https://site{site}.exemplo.com.br/pagina/{page}'] = {
+                'title': f'Página {page}', 'cleanText': text, 'textos': body[:40]}
+    return pages
+
+
+def benchmark(tenant_counts=(1, 10, 100), variants=3):
+    pages = _site_pages()
+    urls = list(pages)
+    rng = random.Random(5)
+    print(f"🧪 {len(urls)} páginas em {len({url.split('/')[2] for url in urls})} sites; cada tenant adiciona "
+          f"10 páginas à base de conhecimento, com {variants} variantes de URL (utm_*, barra final, #)")
+    print(f"{'tenants':>8}{'cópias inteiras':>18}{'trechos+refs':>15}{'redução':>9}"
+          f"{'extrações (URL crua)':>22}{'(canônica)':>12}")
+    for tenants in tenant_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ChunkStore(os.path.join(tmp, 'chunks'))
+            full_bytes = refs_bytes = 0
+            raw_keys, canonical_keys = set(), set()
+            for tenant in range(tenants):
+                for url in rng.sample(urls, 10):
+                    variant = rng.choice([url, url + '/', f'{url}?utm_source=t{tenant}', f'{url}#precos'][:variants + 1])
+                    data = pages[url]
+                    # antes: cache em memória + extraction_cache por URL crua, mais a cópia na base do tenant
+                    text = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                    if variant not in raw_keys:
+                        full_bytes += 2 * len(text)
+                    full_bytes += len(text)
+                    raw_keys.add(variant)
+                    # depois: referências nos três lugares, trechos uma vez
+                    key = canonical_url(variant)
+                    packed = json.dumps(store.pack_page(data), ensure_ascii=False).encode('utf-8')
+                    if key not in canonical_keys:
+                        refs_bytes += 2 * len(packed)
+                    refs_bytes += len(packed)
+                    canonical_keys.add(key)
+            chunk_bytes = sum(size for digest, _, size, _ in store.iter_chunks() if digest)
+            total = refs_bytes + chunk_bytes
+            print(f"{tenants:>8}{full_bytes / 1e6:>16.1f}MB{total / 1e6:>13.1f}MB{1 - total / full_bytes:>9.0%}"
+                  f"{len(raw_keys):>22}{len(canonical_keys):>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Trechos de texto por conteúdo (chunk-store.js)')
+    parser.add_argument('--store', default=STORE_DIR, help='diretório dos trechos')
+    parser.add_argument('--db', default=DB_PATH, help='banco SQLite com a extraction_cache')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', ''),
+                        help='Postgres com a extraction_cache (padrão: DATABASE_URL)')
+    parser.add_argument('--knowledge', default=KNOWLEDGE_DIR, help='diretório das bases de conhecimento')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('migrate', help='empacota dados antigos e junta variantes de URL')
+    p.add_argument('--dry-run', action='store_true')
+
+    p = sub.add_parser('gc', help='remove trechos sem referência')
+    p.add_argument('--grace-hours', type=float, default=24.0)
+    p.add_argument('--dry-run', action='store_true')
+
+    sub.add_parser('stats', help='trechos únicos e deduplicação')
+
+    p = sub.add_parser('benchmark', help='armazenamento por número de tenants')
+    p.add_argument('--tenants', type=int, nargs='+', default=[1, 10, 100])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.tenants)
+        return 0
+
+    store = ChunkStore(args.store)
+    try:
+        databases = open_databases(args.db, args.database_url)
+        if args.command == 'migrate':
+            for name, conn, mark in databases:
+                if not _has_cache_table(conn):
+                    continue
+                rows, merged, before, after = migrate_cache(store, conn, mark, args.dry_run)
+                print(f"🗄️  extraction_cache ({name}): {rows} linha(s), {merged} variante(s) de URL juntada(s), "
+                      f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+            bases, sources, before, after = migrate_knowledge(store, args.knowledge, args.dry_run)
+            print(f"📚 {sources} fonte(s) de URL em {bases} base(s): {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+            print(f"🧱 trechos novos: {store.stats['written']} ({store.stats['bytesWritten'] / 1e6:.1f} MB), "
+                  f"reaproveitados: {store.stats['reused']} ({store.stats['bytesReused'] / 1e6:.1f} MB)"
+                  + (' [simulação]' if args.dry_run else ''))
+        elif args.command == 'gc':
+            referenced = referenced_chunks(databases, args.knowledge)
+            result = collect_garbage(store, referenced, args.grace_hours, args.dry_run)
+            print(f"🧹 {result['kept']} trecho(s) referenciados ({result['keptBytes'] / 1e6:.1f} MB), "
+                  f"{result['recent']} recente(s) sem referência mantido(s), "
+                  f"{result['removed']} removido(s) ({result['removedBytes'] / 1e6:.1f} MB)"
+                  + (' [simulação]' if args.dry_run else ''))
+            if result['missing']:
+                print(f"⚠️  {result['missing']} trecho(s) referenciados não existem (serão extraídos de novo)")
+        else:
+            info = store_stats(store, referenced_chunks(databases, args.knowledge))
+            ratio = info['logicalBytes'] / info['bytes'] if info['bytes'] else 0.0
+            print(f"🧱 {info['chunks']} trecho(s) únicos, {info['bytes'] / 1e6:.1f} MB em {args.store}")
+            print(f"   {info['references']} referência(s) = {info['logicalBytes'] / 1e6:.1f} MB sem deduplicação "
+                  f"({ratio:.1f}x)")
+    except (OSError, ValueError, RuntimeError, sqlite3.Error) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,13 @@
 // compliance-middleware.js
 const fs = require('fs').promises;
+const fsSync = require('fs');
 const path = require('path');
 const crypto = require('crypto');
+const { createBoundedMap } = require('./bounded-store');
+
+const ROBOTS_TTL = 24 * 60 * 60 * 1000;
+const ROBOTS_ERROR_TTL = 60 * 60 * 1000;    // 5xx: reavaliar logo (ERROR_TTL_HOURS do robots_cache.py)
+const ROBOTS_CACHE_RELOAD = 5000;   // intervalo mínimo entre checagens do arquivo
 
 class ComplianceManager {
     constructor() {
@@ -9,6 +15,16 @@ class ComplianceManager {
         this.deletionRequests = [];
         this.dataProcessingLogs = [];
         this.rateLimitMap = new Map();
+        // Cache de robots.txt por origem (data/robots-cache.json mantido pelo robots_cache.py)
+        this.robotsCache = createBoundedMap('robotsCache', {
+            maxEntries: parseInt(process.env.ROBOTS_CACHE_ENTRIES || '5000', 10),
+            tenantOf: () => 'default'
+        });
+        // Absolutos desde já: gravações assíncronas não podem seguir um chdir posterior
+        this.robotsCacheFile = path.resolve(process.env.ROBOTS_CACHE_FILE || path.join('data', 'robots-cache.json'));
+        this.robotsPendingFile = path.join(path.dirname(this.robotsCacheFile), 'robots-cache.pending');
+        this.robotsCacheMtime = 0;
+        this.robotsCacheCheckedAt = 0;
         this.ensureDirectories();
     }
 
@@ -60,6 +76,25 @@ class ComplianceManager {
     async checkRobotsCompliance(url) {
         try {
             const urlObj = new URL(url);
+            const cached = this.getCachedRobots(urlObj.origin);
+
+            if (cached) {
+                if (!cached.rules) {
+                    await this.logRobotsCheck(url, null, false, 'No robots.txt found');
+                    return { allowed: true, reason: 'No robots.txt found', cached: true };
+                }
+
+                const blocked = this.isBlockedCompiled(cached.rules, urlObj.pathname);
+                await this.logRobotsCheck(url, cached.content, blocked);
+
+                return {
+                    allowed: !blocked,
+                    reason: blocked ? 'Disallowed by robots.txt' : 'Allowed by robots.txt',
+                    robotsContent: cached.content,
+                    cached: true
+                };
+            }
+
             const robotsUrl = `${urlObj.origin}/robots.txt`;
             
             console.log(`Verificando robots.txt em: ${robotsUrl}`);
@@ -74,15 +109,16 @@ class ComplianceManager {
 
             if (!response.ok) {
                 // Se não há robots.txt, assumimos que é permitido
+                this.rememberRobots(urlObj.origin, response.status, null);
                 await this.logRobotsCheck(url, null, false, 'No robots.txt found');
                 return { allowed: true, reason: 'No robots.txt found' };
             }
 
             const robotsText = await response.text();
-            const rules = this.parseRobotsTxt(robotsText);
+            const entry = this.rememberRobots(urlObj.origin, response.status, robotsText);
             
             // Verifica se nosso bot é explicitamente bloqueado
-            const blocked = this.isBlocked(rules, url);
+            const blocked = this.isBlockedCompiled(entry.rules, urlObj.pathname);
             
             await this.logRobotsCheck(url, robotsText, blocked);
             
@@ -178,6 +214,141 @@ class ComplianceManager {
         });
     }
 
+    /**
+     * Entrada válida do cache de robots.txt para a origem (ou null)
+     */
+    getCachedRobots(origin) {
+        this.reloadRobotsCache();
+
+        const entry = this.robotsCache.get(origin);
+        if (!entry || entry.expiresAt < Date.now()) {
+            return null;
+        }
+        return entry;
+    }
+
+    /**
+     * Recarregar data/robots-cache.json quando o robots_cache.py o regravar
+     */
+    reloadRobotsCache() {
+        const now = Date.now();
+        if (now - this.robotsCacheCheckedAt < ROBOTS_CACHE_RELOAD) return;
+        this.robotsCacheCheckedAt = now;
+
+        try {
+            const mtime = fsSync.statSync(this.robotsCacheFile).mtimeMs;
+            if (mtime === this.robotsCacheMtime) return;
+
+            const data = JSON.parse(fsSync.readFileSync(this.robotsCacheFile, 'utf8'));
+            for (const [origin, entry] of Object.entries(data.hosts || {})) {
+                const current = this.robotsCache.get(origin);
+                if (!current || current.fetchedAt <= entry.fetchedAt) {
+                    this.robotsCache.set(origin, entry);
+                }
+            }
+            this.robotsCacheMtime = mtime;
+        } catch (error) {
+            if (error.code !== 'ENOENT') {
+                console.error('Erro ao carregar cache de robots.txt:', error.message);
+            }
+        }
+    }
+
+    /**
+     * Guardar em memória o robots.txt recém-baixado e anotar a origem para o robots_cache.py
+     */
+    rememberRobots(origin, status, robotsText) {
+        const now = Date.now();
+        const entry = {
+            status,
+            fetchedAt: now,
+            expiresAt: now + (status >= 500 ? ROBOTS_ERROR_TTL : ROBOTS_TTL),
+            content: robotsText,
+            rules: robotsText === null ? null : this.compileRobotsRules(this.parseRobotsTxt(robotsText))
+        };
+        this.robotsCache.set(origin, entry);
+
+        fs.appendFile(this.robotsPendingFile, origin + '\n').catch(() => {});
+        return entry;
+    }
+
+    /**
+     * Compilar as regras: padrões literais numa trie de prefixos ('' marca o fim),
+     * padrões com '*' ou '$' quebrados nos pedaços entre os '*'
+     * (mesmo formato gerado pelo robots_cache.py)
+     */
+    compileRobotsRules(rules) {
+        const compilePatterns = (patterns) => {
+            const trie = {};
+            const wildcards = [];
+
+            for (const pattern of patterns) {
+                if (pattern === '' || pattern === '*') continue;
+
+                const anchored = pattern.endsWith('$');
+                const body = anchored ? pattern.slice(0, -1) : pattern.replace(/\*+$/, '');
+                if (anchored || body.includes('*')) {
+                    wildcards.push([body.split('*'), anchored]);
+                    continue;
+                }
+
+                let node = trie;
+                for (const char of body) {
+                    if (!Object.prototype.hasOwnProperty.call(node, char)) node[char] = {};
+                    node = node[char];
+                }
+                node[''] = 1;
+            }
+
+            return { trie, wildcards };
+        };
+
+        const compiled = {};
+        for (const group of ['linkmagico', '*']) {
+            compiled[group] = {
+                allow: compilePatterns(rules[group].allow),
+                disallow: compilePatterns(rules[group].disallow)
+            };
+        }
+        return compiled;
+    }
+
+    matchesCompiled(compiled, urlPath) {
+        let node = compiled.trie;
+        for (const char of urlPath) {
+            if (node[''] === 1) return true;
+            node = Object.prototype.hasOwnProperty.call(node, char) ? node[char] : null;
+            if (!node) break;
+        }
+        if (node && node[''] === 1) return true;
+
+        return compiled.wildcards.some(([parts, anchored]) => {
+            if (!urlPath.startsWith(parts[0])) return false;
+
+            let position = parts[0].length;
+            for (let i = 1; i < parts.length; i++) {
+                if (anchored && i === parts.length - 1) {
+                    return urlPath.length - parts[i].length >= position && urlPath.endsWith(parts[i]);
+                }
+                const found = urlPath.indexOf(parts[i], position);
+                if (found < 0) return false;
+                position = found + parts[i].length;
+            }
+            return !anchored || position === urlPath.length;
+        });
+    }
+
+    isBlockedCompiled(compiledRules, urlPath) {
+        // Mesma precedência do isBlocked: regras do LinkMagico, depois as gerais; allow antes de disallow
+        for (const group of ['linkmagico', '*']) {
+            const rules = compiledRules[group];
+            if (!rules) continue;
+            if (this.matchesCompiled(rules.allow, urlPath)) return false;
+            if (this.matchesCompiled(rules.disallow, urlPath)) return true;
+        }
+        return false;
+    }
+
     // Log de verificação robots.txt
     async logRobotsCheck(url, robotsContent, blocked, error = null) {
         const logEntry = {
@@ -0,0 +1,364 @@
+/**
+ * 🧮 MONTAGEM DE CONTEXTO COM ORÇAMENTO DE TOKENS - Link Mágico
+ * Etapa entre generateAIResponse e callGroq/callOpenRouter/callOpenAI
+ *
+ * Antes, cada chamada levava o histórico inteiro da conversa, e o prompt
+ * crescia junto com a sessão. assembleContext() limita as mensagens ao
+ * orçamento do modelo:
+ * - prompt do sistema, pergunta e resposta (maxTokens) sempre cabem;
+ * - os turnos mais recentes vão na íntegra (até HISTORY_SHARE do que sobra);
+ * - os turnos mais antigos viram um resumo extrativo acumulado, guardado por
+ *   conversa: a cada chamada só os turnos que saíram da janela são resumidos;
+ * - o texto extraído da página (cleanText) é quebrado em trechos, e entram só
+ *   os mais relevantes para a pergunta (BM25), na ordem original da página,
+ *   até CONTEXT_PAGE_TOKENS.
+ *
+ * Histórico e página são opcionais e vêm desligados: as rotas mandavam só o
+ * prompt do sistema e a pergunta, e ligar os dois aumenta o custo por
+ * chamada. CONTEXT_HISTORY=1 inclui o histórico e CONTEXT_PAGE_TOKENS=<n>
+ * inclui até n tokens da página; sem eles o prompt é o de antes.
+ *
+ * A contagem de tokens é estimada (CHARS_PER_TOKEN); o context_eval.py
+ * compara com o tiktoken quando instalado. Com CONTEXT_BUDGET_RECORD=1 cada
+ * chamada é gravada em data/context-budget/ para o replay offline.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+const { createBoundedMap } = require('./bounded-store');
+
+const CHARS_PER_TOKEN = 3.5;          // português fica entre 3 e 4 caracteres por token
+const MESSAGE_OVERHEAD = 4;           // tokens de papel/separadores por mensagem
+const HISTORY_SHARE = 0.6;            // fatia do espaço livre para o histórico; o resto vai para a página
+const MIN_RECENT_MESSAGES = 4;        // últimos 2 pares pergunta/resposta, se couberem
+const SUMMARY_SHARE = 0.35;           // fatia do orçamento do histórico para o resumo
+const SUMMARY_LINE_CHARS = 160;
+const CHUNK_CHARS = 600;
+const HISTORY_ENABLED = process.env.CONTEXT_HISTORY === '1';
+const PAGE_MAX_TOKENS = parseInt(process.env.CONTEXT_PAGE_TOKENS || '0', 10) || 0;
+
+/**
+ * Orçamento de entrada (tokens) por modelo; CONTEXT_TOKEN_BUDGET vale para todos
+ */
+const MODEL_BUDGETS = {
+    'llama-3.1-70b-versatile': 6000,
+    'llama-3.1-8b-instant': 4000,
+    'mistralai/mistral-7b-instruct': 3000,
+    'gpt-3.5-turbo': 3000,
+    'gpt-4': 2500,
+    'gpt-4-turbo': 4000,
+    default: 3000
+};
+
+const STOPWORDS = new Set(('a o e é de da do das dos em no na nos nas um uma uns umas para por com sem que se ' +
+    'como mais mas ou ao aos à às eu você voce vocês ele ela eles elas isso isto esse essa este esta meu minha ' +
+    'seu sua qual quais quando onde tem ter ser são sao foi vai vou pode posso sobre muito também tambem já ja ' +
+    'não nao sim me te lhe nós nos the and for you').split(' '));
+
+const RECORD_ENABLED = process.env.CONTEXT_BUDGET_RECORD === '1';
+const RECORD_DIR = process.env.CONTEXT_BUDGET_DIR || path.join(__dirname, 'data', 'context-budget');
+
+const summaries = createBoundedMap('contextSummaries', {
+    maxEntries: parseInt(process.env.MEMORY_MAX_SESSIONS || '5000', 10),
+    ttl: parseFloat(process.env.MEMORY_SESSION_TTL_HOURS || '24') * 60 * 60 * 1000
+});
+
+function estimateTokens(text) {
+    return text ? Math.ceil(String(text).length / CHARS_PER_TOKEN) : 0;
+}
+
+function messageTokens(message) {
+    return estimateTokens(message.content) + MESSAGE_OVERHEAD;
+}
+
+function budgetFor(model) {
+    const override = parseInt(process.env.CONTEXT_TOKEN_BUDGET || '', 10);
+    if (override > 0) return override;
+    return MODEL_BUDGETS[model] || MODEL_BUDGETS.default;
+}
+
+function fingerprint(text) {
+    return crypto.createHash('sha1').update(String(text)).digest('hex');
+}
+
+function terms(text) {
+    return String(text || '')
+        .toLowerCase()
+        .normalize('NFD').replace(/[\u0300-\u036f]/g, '')
+        .split(/[^a-z0-9]+/)
+        .filter(term => term.length > 2 && !STOPWORDS.has(term));
+}
+
+// ===== Resumo acumulado dos turnos antigos =====
+
+/**
+ * Uma linha por turno: a primeira frase, cortada em SUMMARY_LINE_CHARS
+ */
+function summarizeTurn(turn) {
+    const text = String(turn.content || '').replace(/\s+/g, ' ').trim();
+    if (text.split(' ').length < 3) return null;           // "oi", "ok", "obrigado"
+    let sentence = text.split(/(?<=[.!?])\s+/)[0];
+    if (sentence.length > SUMMARY_LINE_CHARS) {
+        sentence = sentence.slice(0, SUMMARY_LINE_CHARS - 1).replace(/\s+\S*$/, '') + '…';
+    }
+    return `${turn.role === 'user' ? 'Cliente' : 'Assistente'}: ${sentence}`;
+}
+
+/**
+ * Limitar o resumo ao orçamento: a primeira linha (o que o cliente veio buscar)
+ * fica, as seguintes saem das mais antigas para as mais novas
+ */
+function capSummary(lines, maxTokens) {
+    const result = lines.slice();
+    let total = result.reduce((sum, line) => sum + estimateTokens(line) + 1, 0);
+    while (result.length > 1 && total > maxTokens) {
+        total -= estimateTokens(result[1]) + 1;
+        result.splice(1, 1);
+    }
+    if (result.length === 1 && total > maxTokens) return [];
+    return result;
+}
+
+/**
+ * Resumo de turns[0..covered), reaproveitando o que já foi resumido da conversa.
+ * O cache é por conversa e orçamento do modelo e guarda as linhas limitadas a
+ * maxTokens; cada chamada ainda corta para o espaço que sobrou nela.
+ */
+function rollingSummary(conversationKey, turns, covered, budget, maxTokens) {
+    if (covered <= 0) return { lines: [], reused: 0 };
+
+    const cacheKey = conversationKey ? `${conversationKey}|${budget}` : null;
+    const cached = cacheKey ? summaries.get(cacheKey) : undefined;
+    let lines = [];
+    let start = 0;
+
+    // Só reaproveita se os turnos já resumidos continuam os mesmos
+    if (cached && cached.covered <= covered &&
+        cached.lastTurn === fingerprint(turns[cached.covered - 1].content)) {
+        lines = cached.lines;
+        start = cached.covered;
+    }
+
+    if (start < covered) {
+        for (let i = start; i < covered; i++) {
+            const line = summarizeTurn(turns[i]);
+            if (line) lines = lines.concat(line);
+        }
+        lines = capSummary(lines, maxTokens);
+        if (cacheKey) {
+            summaries.set(cacheKey, { covered, lastTurn: fingerprint(turns[covered - 1].content), lines });
+        }
+    }
+    return { lines, reused: start };
+}
+
+// ===== Trechos relevantes da página =====
+
+/**
+ * Quebrar o texto em trechos de até CHUNK_CHARS, respeitando linhas/parágrafos
+ */
+function chunkText(text) {
+    const chunks = [];
+    let current = '';
+    for (const rawLine of String(text || '').split(/\n+/)) {
+        const line = rawLine.trim();
+        if (!line) continue;
+        const pieces = line.length > CHUNK_CHARS ? line.split(/(?<=[.!?])\s+/) : [line];
+        for (const piece of pieces) {
+            if (current && current.length + piece.length + 1 > CHUNK_CHARS) {
+                chunks.push(current);
+                current = '';
+            }
+            current = current ? `${current}\n${piece}` : piece;
+        }
+    }
+    if (current) chunks.push(current);
+    return chunks;
+}
+
+/**
+ * Pontuação BM25 de cada trecho para os termos da pergunta
+ */
+function scoreChunks(chunks, question, k1 = 1.2, b = 0.75) {
+    const queryTerms = Array.from(new Set(terms(question)));
+    const chunkTerms = chunks.map(terms);
+    const avgLength = chunkTerms.reduce((sum, list) => sum + list.length, 0) / (chunks.length || 1) || 1;
+
+    const documentFrequency = new Map();
+    for (const list of chunkTerms) {
+        for (const term of new Set(list)) {
+            documentFrequency.set(term, (documentFrequency.get(term) || 0) + 1);
+        }
+    }
+
+    return chunkTerms.map(list => {
+        const counts = new Map();
+        for (const term of list) counts.set(term, (counts.get(term) || 0) + 1);
+        let score = 0;
+        for (const term of queryTerms) {
+            const tf = counts.get(term);
+            if (!tf) continue;
+            const df = documentFrequency.get(term);
+            const idf = Math.log(1 + (chunks.length - df + 0.5) / (df + 0.5));
+            score += idf * (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * list.length / avgLength));
+        }
+        return score;
+    });
+}
+
+/**
+ * Os trechos mais relevantes que cabem em maxTokens, na ordem da página;
+ * sem termos em comum com a pergunta, fica o começo da página
+ */
+// Cada trecho custa +1 token: cobre o separador '\n…\n' entre trechos
+const CHUNK_SEPARATOR = '\n…\n';
+const PAGE_HEADER = '\n\n📄 TRECHOS DA PÁGINA MAIS RELEVANTES PARA A PERGUNTA:\n';
+
+function selectPageChunks(text, question, maxTokens) {
+    const chunks = chunkText(text);
+    if (chunks.length === 0 || maxTokens <= 0) return { text: '', total: chunks.length, kept: 0 };
+
+    const scores = scoreChunks(chunks, question);
+    const order = chunks.map((_, index) => index)
+        .sort((a, b) => (scores[b] - scores[a]) || (a - b));
+
+    const selected = [];
+    let used = 0;
+    for (const index of order) {
+        const cost = estimateTokens(chunks[index]) + 1;
+        if (used + cost > maxTokens) continue;
+        selected.push(index);
+        used += cost;
+    }
+    selected.sort((a, b) => a - b);
+    return {
+        text: selected.map(index => chunks[index]).join(CHUNK_SEPARATOR),
+        total: chunks.length,
+        kept: selected.length
+    };
+}
+
+// ===== Montagem =====
+
+/**
+ * Montar as mensagens de uma chamada dentro do orçamento do modelo
+ *
+ * options: { model, systemPrompt, history, question, pageText, maxTokens, conversationKey,
+ *            includeHistory (padrão CONTEXT_HISTORY), pageTokens (padrão CONTEXT_PAGE_TOKENS) }
+ * Retorna { messages, stats }
+ */
+function assembleContext(options) {
+    const {
+        model = 'default',
+        systemPrompt = '',
+        question = '',
+        pageText = '',
+        maxTokens = 300,
+        conversationKey = null,
+        includeHistory = HISTORY_ENABLED,
+        pageTokens = PAGE_MAX_TOKENS
+    } = options;
+    const fullHistory = (options.history || []).filter(turn => turn && turn.content);
+    const history = includeHistory ? fullHistory : [];
+    const budget = budgetFor(model);
+
+    const questionMessage = { role: 'user', content: question };
+    const fixed = messageTokens({ content: systemPrompt }) + messageTokens(questionMessage) + maxTokens;
+    const free = Math.max(0, budget - fixed);
+    const historyBudget = history.length ? Math.floor(free * HISTORY_SHARE) : 0;
+
+    // Turnos recentes na íntegra, do fim para o começo
+    let historyUsed = 0;
+    let cut = history.length;
+    while (cut > 0) {
+        const cost = messageTokens(history[cut - 1]);
+        const isMinimum = history.length - cut < MIN_RECENT_MESSAGES;
+        const limit = isMinimum ? historyBudget : historyBudget * (1 - SUMMARY_SHARE);
+        if (historyUsed + cost > limit) break;
+        historyUsed += cost;
+        cut--;
+    }
+
+    const summaryCap = Math.floor(historyBudget * SUMMARY_SHARE);
+    const summary = rollingSummary(conversationKey, history, cut, budget, summaryCap);
+    const summaryLines = capSummary(summary.lines, Math.max(0, Math.min(historyBudget - historyUsed, summaryCap)));
+    const summaryMessage = summaryLines.length
+        ? { role: 'system', content: `Resumo da conversa até aqui:\n${summaryLines.join('\n')}` }
+        : null;
+    if (summaryMessage) historyUsed += messageTokens(summaryMessage);
+
+    // A página fica com o resto (inclusive o que o histórico não usou), até pageTokens;
+    // o cabeçalho dos trechos também sai desse resto
+    const pageBudget = Math.max(0, Math.min(pageTokens, free - historyUsed - estimateTokens(PAGE_HEADER)));
+    const page = pageBudget > 0 ? selectPageChunks(pageText, question, pageBudget) : { text: '', total: 0, kept: 0 };
+    const system = page.text ? `${systemPrompt}${PAGE_HEADER}${page.text}` : systemPrompt;
+
+    const messages = [
+        { role: 'system', content: system },
+        ...(summaryMessage ? [summaryMessage] : []),
+        ...history.slice(cut),
+        questionMessage
+    ];
+
+    const fullTokens = messageTokens({ content: systemPrompt }) + messageTokens(questionMessage) +
+        fullHistory.reduce((sum, turn) => sum + messageTokens(turn), 0) +
+        (pageText ? estimateTokens(pageText) + MESSAGE_OVERHEAD : 0);
+    const stats = {
+        model,
+        budget,
+        fullTokens,
+        // O que as rotas mandavam antes: só prompt do sistema + pergunta (histórico vazio, sem a página)
+        legacyTokens: messageTokens({ content: systemPrompt }) + messageTokens(questionMessage),
+        promptTokens: messages.reduce((sum, message) => sum + messageTokens(message), 0),
+        turns: history.length,
+        verbatimTurns: history.length - cut,
+        summarizedTurns: cut,
+        summaryReused: summary.reused,
+        pageChunks: page.total,
+        pageChunksKept: page.kept
+    };
+
+    if (RECORD_ENABLED) record(options, stats);
+    return { messages, stats };
+}
+
+/**
+ * Gravar a chamada para o context_eval.py (a página vai uma vez por conteúdo)
+ */
+function record(options, stats) {
+    try {
+        fs.mkdirSync(path.join(RECORD_DIR, 'pages'), { recursive: true });
+        let pageHash = null;
+        if (options.pageText) {
+            pageHash = fingerprint(options.pageText);
+            const pageFile = path.join(RECORD_DIR, 'pages', `${pageHash}.txt`);
+            if (!fs.existsSync(pageFile)) fs.writeFileSync(pageFile, options.pageText);
+        }
+        fs.appendFileSync(path.join(RECORD_DIR, 'calls.ndjson'), JSON.stringify({
+            t: Date.now(),
+            key: options.conversationKey || null,
+            model: stats.model,
+            maxTokens: options.maxTokens,
+            systemPrompt: options.systemPrompt,
+            history: options.history || [],
+            question: options.question,
+            pageHash,
+            stats
+        }) + '\n');
+    } catch (error) {
+        console.error('❌ Erro ao gravar chamada do orçamento de contexto:', error.message);
+    }
+}
+
+module.exports = {
+    assembleContext,
+    estimateTokens,
+    budgetFor,
+    chunkText,
+    selectPageChunks,
+    summarizeTurn,
+    MODEL_BUDGETS,
+    HISTORY_ENABLED,
+    PAGE_MAX_TOKENS
+};
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Avaliação offline do orçamento de contexto (context-budget.js)
+
+Com CONTEXT_BUDGET_RECORD=1 o servidor grava cada chamada de
+generateAIResponse em data/context-budget/calls.ndjson (prompt do sistema,
+histórico completo, pergunta, modelo) e o texto da página uma vez em
+data/context-budget/pages/<sha1>.txt. Este script reexecuta essas chamadas
+no próprio context-budget.js (via node, na ordem gravada, para o resumo
+acumulado ser reaproveitado como no servidor) e mostra, por chamada:
+
+- tokens do prompt de antes (só prompt do sistema + pergunta: as rotas
+  mandavam histórico vazio e nenhum texto da página), base real de comparação;
+- tokens do contexto completo (histórico inteiro + página inteira), um
+  cenário que o código antigo nunca enviava, só para medir o corte;
+- tokens do prompt montado e a diferença para os dois;
+- turnos na íntegra / resumidos, trechos da página usados;
+- cobertura: fração dos termos da pergunta que continuam no prompt, em
+  relação aos presentes no contexto completo (queda = trecho relevante cortado).
+
+As contagens são a estimativa do context-budget.js (caracteres / 3.5); com o
+tiktoken instalado o relatório mostra também a contagem real (cl100k_base).
+
+Uso:
+  python3 context_eval.py replay [data/context-budget/calls.ndjson] [--models gpt-3.5-turbo gpt-4] [--budget 2000]
+  python3 context_eval.py replay --per-call
+  python3 context_eval.py synthetic [--sessions 20] [--turns 40]
+
+Histórico e página só entram com CONTEXT_HISTORY=1 e CONTEXT_PAGE_TOKENS=<n>
+(como no servidor); sem eles o prompt montado é o de antes:
+  CONTEXT_HISTORY=1 CONTEXT_PAGE_TOKENS=1200 python3 context_eval.py synthetic
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import unicodedata
+from collections import defaultdict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RECORD_DIR = os.path.join('data', 'context-budget')
+CALLS_PATH = os.path.join(RECORD_DIR, 'calls.ndjson')
+
+STOPWORDS = set(('a o e é de da do das dos em no na nos nas um uma uns umas para por com sem que se '
+                 'como mais mas ou ao aos à às eu você voce vocês ele ela eles elas isso isto esse essa este esta meu minha '
+                 'seu sua qual quais quando onde tem ter ser são sao foi vai vou pode posso sobre muito também tambem já ja '
+                 'não nao sim me te lhe nós nos the and for you').split())
+
+REPLAY_SCRIPT = r"""
+const fs = require('fs');
+const { assembleContext } = require(process.argv[1]);
+console.log = () => {};
+const jobs = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+const results = jobs.map(job => {
+    const { messages, stats } = assembleContext(job);
+    return { stats, prompt: messages.map(message => message.content) };
+});
+fs.writeFileSync(process.argv[3], JSON.stringify(results));
+"""
+
+
+def terms(text):
+    text = unicodedata.normalize('NFD', (text or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return {term for term in re.split(r'[^a-z0-9]+', text) if len(term) > 2 and term not in STOPWORDS}
+
+
+def load_calls(path=CALLS_PATH):
+    pages_dir = os.path.join(os.path.dirname(path), 'pages')
+    pages, calls = {}, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                call = json.loads(line)
+            except ValueError:
+                continue                    # linha cortada no fim do arquivo
+            page_hash = call.get('pageHash')
+            if page_hash and page_hash not in pages:
+                try:
+                    with open(os.path.join(pages_dir, f'{page_hash}.txt'), 'r', encoding='utf-8') as page:
+                        pages[page_hash] = page.read()
+                except FileNotFoundError:
+                    pages[page_hash] = ''
+            call['pageText'] = pages.get(page_hash, '') if page_hash else ''
+            calls.append(call)
+    calls.sort(key=lambda call: call['t'])
+    return calls
+
+
+def run_node(jobs, budget=None):
+    """Montar os prompts no context-budget.js; retorna [{stats, prompt}] na ordem dos jobs"""
+    env = dict(os.environ)
+    env.pop('CONTEXT_BUDGET_RECORD', None)
+    if budget:
+        env['CONTEXT_TOKEN_BUDGET'] = str(budget)
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs_path, results_path = os.path.join(tmp, 'jobs.json'), os.path.join(tmp, 'results.json')
+        with open(jobs_path, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f)
+        output = subprocess.run(['node', '-e', REPLAY_SCRIPT, os.path.join(ROOT, 'context-budget.js'),
+                                 jobs_path, results_path],
+                                cwd=tmp, env=env, capture_output=True, text=True, timeout=600)
+        if output.returncode != 0:
+            raise RuntimeError(output.stderr.strip()[-500:])
+        with open(results_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def _real_tokens(encoding, texts):
+    return sum(len(encoding.encode(text)) + 4 for text in texts)
+
+
+def evaluate(calls, models=None, budget=None):
+    """Uma linha por (chamada, modelo) com tokens completos, montados e cobertura"""
+    encoding = tiktoken.get_encoding('cl100k_base') if tiktoken else None
+    rows = []
+    for model in models or [None]:
+        jobs = [{
+            'model': model or call['model'],
+            'systemPrompt': call['systemPrompt'],
+            'history': call['history'],
+            'question': call['question'],
+            'pageText': call['pageText'],
+            'maxTokens': call.get('maxTokens', 300),
+            'conversationKey': call.get('key'),
+        } for call in calls]
+        for call, job, result in zip(calls, jobs, run_node(jobs, budget)):
+            stats = result['stats']
+            full_texts = [job['systemPrompt'], job['question'], job['pageText']] + \
+                [turn['content'] for turn in job['history']]
+            question_terms = terms(job['question'])
+            in_full = question_terms & terms(' '.join(full_texts))
+            in_prompt = question_terms & terms(' '.join(result['prompt']))
+            row = {
+                'key': call.get('key') or '-',
+                'model': stats['model'],
+                'budget': stats['budget'],
+                'maxTokens': job['maxTokens'],
+                'full': stats['fullTokens'],
+                'legacy': stats['legacyTokens'],
+                'prompt': stats['promptTokens'],
+                'turns': stats['turns'],
+                'verbatim': stats['verbatimTurns'],
+                'summarized': stats['summarizedTurns'],
+                'chunks': f"{stats['pageChunksKept']}/{stats['pageChunks']}",
+                'coverage': len(in_prompt) / len(in_full) if in_full else 1.0,
+            }
+            if encoding:
+                row['fullReal'] = _real_tokens(encoding, [text for text in full_texts if text])
+                row['promptReal'] = _real_tokens(encoding, result['prompt'])
+            rows.append(row)
+    return rows
+
+
+def print_report(rows, per_call=False):
+    real = 'fullReal' in rows[0]
+    if per_call:
+        print(f"{'conversa':<28}{'modelo':<26}{'turnos':>7}{'íntegra':>8}{'resumo':>7}{'trechos':>9}"
+              f"{'antes':>7}{'completo':>10}{'prompt':>8}{'vs antes':>10}{'cobertura':>10}")
+        for row in rows:
+            print(f"{row['key'][:27]:<28}{row['model'][:25]:<26}{row['turns']:>7}{row['verbatim']:>8}"
+                  f"{row['summarized']:>7}{row['chunks']:>9}{row['legacy']:>7}{row['full']:>10}{row['prompt']:>8}"
+                  f"{row['prompt'] - row['legacy']:>+10}{row['coverage']:>10.0%}")
+        print()
+
+    by_model = defaultdict(list)
+    for row in rows:
+        by_model[(row['model'], row['budget'])].append(row)
+    print(f"{'modelo':<32}{'orçamento':>10}{'chamadas':>10}{'antes/ch':>10}{'completo/ch':>13}{'prompt/ch':>11}"
+          f"{'vs antes':>10}{'vs completo':>13}{'acima orç.':>11}{'cobertura':>11}")
+    for (model, budget), group in sorted(by_model.items()):
+        count = len(group)
+        legacy = sum(row['legacy'] for row in group) / count
+        full = sum(row['full'] for row in group) / count
+        prompt = sum(row['prompt'] for row in group) / count
+        over = sum(1 for row in group if row['prompt'] + row['maxTokens'] > row['budget'])
+        coverage = sum(row['coverage'] for row in group) / count
+        print(f"{model[:31]:<32}{budget:>10}{count:>10}{legacy:>10.0f}{full:>13.0f}{prompt:>11.0f}"
+              f"{prompt - legacy:>+10.0f}{prompt - full:>+13.0f}{over:>11}{coverage:>11.0%}")
+        if real:
+            full_real = sum(row['fullReal'] for row in group) / count
+            prompt_real = sum(row['promptReal'] for row in group) / count
+            print(f"{'  (tiktoken cl100k_base)':<62}{full_real:>13.0f}{prompt_real:>11.0f}"
+                  f"{'':>10}{prompt_real - full_real:>+13.0f}")
+    if not real:
+        print("   (tokens estimados; instale o tiktoken para a contagem real)")
+
+
+# ----------------------------------------------------------------------
+# synthetic
+# ----------------------------------------------------------------------
+QUESTIONS = [
+    'Qual o preço do plano anual?', 'Tem garantia se eu não gostar?', 'Quais são os bônus inclusos?',
+    'Como funciona o suporte depois da compra?', 'Posso parcelar no cartão?', 'Quanto tempo dura o acesso?',
+    'O curso tem certificado?', 'Quais módulos fazem parte do programa?', 'Como recebo o acesso?',
+]
+FACTS = [
+    'O plano anual custa R$ 997 à vista ou em 12 parcelas no cartão.',
+    'A garantia é de 7 dias: se não gostar, devolvemos todo o valor.',
+    'Os bônus inclusos são a comunidade exclusiva e as planilhas de planejamento.',
+    'O suporte funciona por WhatsApp e email em dias úteis, das 9h às 18h.',
+    'O acesso dura 12 meses e é liberado por email logo após o pagamento.',
+    'Ao concluir todos os módulos o aluno recebe o certificado digital.',
+    'O programa tem 8 módulos, do básico ao avançado, com aulas gravadas.',
+]
+
+
+def synthetic_calls(sessions=20, turns=40, seed=7):
+    rng = random.Random(seed)
+    filler = ['Nossa metodologia foi criada depois de anos de experiência com alunos de todo o Brasil.',
+              'Veja o que dizem os alunos que já passaram pelo programa e transformaram seus resultados.',
+              'Cada aula foi pensada para ser prática, com exemplos reais e exercícios guiados.']
+    calls, t = [], 0
+    for session in range(sessions):
+        lines = [rng.choice(filler) + f' Seção {i}.' for i in range(rng.randint(60, 240))]
+        for fact in FACTS:
+            lines.insert(rng.randrange(len(lines)), fact)
+        page = '\n'.join(lines)
+        history = []
+        for turn in range(turns):
+            question = rng.choice(QUESTIONS)
+            t += 1
+            calls.append({
+                't': t, 'key': f'synthetic:{session}', 'model': 'gpt-3.5-turbo', 'maxTokens': 250,
+                'systemPrompt': 'Você é um assistente de vendas. ' * 60,
+                'history': list(history), 'question': question, 'pageText': page,
+            })
+            answer = rng.choice(FACTS) + ' ' + rng.choice(filler) + ' Posso ajudar com mais alguma coisa?'
+            history += [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}]
+    return calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Avaliação offline do orçamento de contexto (context-budget.js)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('replay', help='reexecuta as chamadas gravadas com CONTEXT_BUDGET_RECORD=1')
+    p.add_argument('file', nargs='?', default=CALLS_PATH)
+
+    p2 = sub.add_parser('synthetic', help='sessões sintéticas (sem gravação do servidor)')
+    p2.add_argument('--sessions', type=int, default=20)
+    p2.add_argument('--turns', type=int, default=40)
+
+    for command in (p, p2):
+        command.add_argument('--models', nargs='+', help='modelos a simular (padrão: o gravado)')
+        command.add_argument('--budget', type=int, help='orçamento único para todos (CONTEXT_TOKEN_BUDGET)')
+        command.add_argument('--per-call', action='store_true', help='uma linha por chamada')
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'replay':
+            calls = load_calls(args.file)
+            if not calls:
+                print(f"⚠️  Nenhuma chamada em {args.file} (rode o servidor com CONTEXT_BUDGET_RECORD=1)")
+                return 1
+        else:
+            calls = synthetic_calls(args.sessions, args.turns)
+        print(f"🧮 {len(calls)} chamada(s) em {len({call.get('key') for call in calls})} conversa(s)")
+        print_report(evaluate(calls, args.models, args.budget), args.per_call)
+    except FileNotFoundError as error:
+        print(f"⚠️  {error.filename} não encontrado (rode o servidor com CONTEXT_BUDGET_RECORD=1)", file=sys.stderr)
+        return 1
+    except (OSError, ValueError, KeyError, RuntimeError, subprocess.TimeoutExpired) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,7 @@
 
 const fs = require('fs');
 const path = require('path');
+const { canonicalUrl, packPage, unpackPage } = require('./chunk-store');
 
 // Detectar ambiente e escolher banco apropriado
 const USE_POSTGRES = process.env.DATABASE_URL || process.env.USE_POSTGRES === 'true';
@@ -271,10 +272,44 @@ function getSQLiteTables() {
     ];
 }
 
+/**
+ * Converter placeholders `?` (SQLite) em `$1, $2...` (PostgreSQL), ignorando
+ * `?` dentro de literais entre aspas. Queries que já usam `$N` passam intactas.
+ */
+function toPostgresPlaceholders(query) {
+    if (/\$\d/.test(query)) return query;
+
+    let index = 0;
+    return query.replace(/'(?:[^']|'')*'|"(?:[^"]|"")*"|\?/g,
+        (token) => token === '?' ? `$${++index}` : token);
+}
+
 /**
  * 🔍 Funções auxiliares para queries
  */
 const DatabaseHelpers = {
+    /**
+     * Consultas genéricas (usadas pelo structured-leads.js e whitelabel.js),
+     * escritas com `?`; no PostgreSQL os placeholders viram `$N`. No SQLite vão
+     * direto ao statement para INSERT ... SELECT não cair no .all() do db.query
+     */
+    async run(query, params = []) {
+        if (db.sqlite) return db.sqlite.prepare(query).run(params);
+        return db.query(toPostgresPlaceholders(query), params);
+    },
+
+    async get(query, params = []) {
+        if (db.sqlite) return db.sqlite.prepare(query).get(params) || null;
+        const result = await db.query(toPostgresPlaceholders(query), params);
+        return result.rows[0] || null;
+    },
+
+    async all(query, params = []) {
+        if (db.sqlite) return db.sqlite.prepare(query).all(params);
+        const result = await db.query(toPostgresPlaceholders(query), params);
+        return result.rows;
+    },
+
     /**
      * Criar ou atualizar chatbot
      */
@@ -393,10 +428,11 @@ const DatabaseHelpers = {
 
     /**
      * Buscar ou criar cache de extração
+     * (url_hash da URL canônica; o texto fica no chunk-store.js, a linha guarda as referências)
      */
     async getOrCreateExtractionCache(url, extractionFunction) {
         const crypto = require('crypto');
-        const urlHash = crypto.createHash('sha256').update(url).digest('hex');
+        const urlHash = crypto.createHash('sha256').update(canonicalUrl(url)).digest('hex');
 
         // Buscar cache existente
         const query = USE_POSTGRES
@@ -413,12 +449,15 @@ const DatabaseHelpers = {
 
             await db.query(updateQuery, [urlHash]);
 
-            console.log('✅ Cache HIT para URL:', url);
             const cached = result.rows[0];
-            return USE_POSTGRES ? cached.extracted_data : JSON.parse(cached.extracted_data);
+            const data = unpackPage(USE_POSTGRES ? cached.extracted_data : JSON.parse(cached.extracted_data));
+            if (data) {
+                console.log('✅ Cache HIT para URL:', url);
+                return data;
+            }
         }
 
-        // Cache miss - extrair dados
+        // Cache miss (ou trechos já removidos pela coleta de lixo) - extrair dados
         console.log('❌ Cache MISS para URL:', url);
         const extractedData = await extractionFunction(url);
 
@@ -434,9 +473,9 @@ const DatabaseHelpers = {
                VALUES (?, ?, ?, ?)`;
 
         await db.query(insertQuery, [
-            url,
+            canonicalUrl(url),
             urlHash,
-            JSON.stringify(extractedData),
+            JSON.stringify(packPage(extractedData)),
             expiresAt.toISOString()
         ]);
 
@@ -480,5 +519,6 @@ module.exports = {
     db,
     initializeDatabase,
     DatabaseHelpers,
+    toPostgresPlaceholders,
     USE_POSTGRES
 };
@@ -2,22 +2,35 @@
 """
 Script para adicionar novos sistemas ao painel do Link Mágico
 sem quebrar funcionalidades existentes
+
+O bloco é injetado com marcadores e registrado no manifesto de
+panel_blocks.py, então rodar o script de novo não duplica o painel.
+Com --build o CSS/JS inline vira assets estáticos com hash (panel_build.py).
+Com --fragments só a aba padrão (Analytics) fica no HTML; as outras viram
+fragmentos em public/fragments/ carregados ao abrir a aba (panel_fragments.py).
+No fim os assets de public/ ganham versões .gz/.br (precompress.py).
 """
 
-def add_new_sections():
-    # Ler o HTML original
-    with open('public/index_app.html', 'r', encoding='utf-8') as f:
-        html = f.read()
-    
-    # Encontrar onde inserir (antes do </body>)
-    insert_pos = html.rfind('</body>')
-    
-    if insert_pos == -1:
-        print("❌ Não encontrou </body>")
-        return False
-    
-    # Novo HTML para adicionar
-    new_html = '''
+import argparse
+import sys
+
+from panel_blocks import upsert_block
+
+PANEL_PATH = 'public/index_app.html'
+BLOCK_NAME = 'v2-panel'
+ASSET_NAME = 'panel-v2'
+
+# Abas que viram fragmentos no modo --fragments (id do contêiner -> nome do fragmento)
+TAB_FRAGMENTS = {
+    'tab-webhooks': 'v2-webhooks',
+    'tab-knowledge': 'v2-knowledge',
+    'tab-billing': 'v2-billing',
+    'tab-llm': 'v2-llm',
+    'tab-system': 'v2-system',
+}
+
+# Novo HTML para adicionar (antes do </body>)
+NEW_PANEL_HTML = '''
     
     <!-- ===== NOVOS SISTEMAS - LINK MÁGICO V2.0 ===== -->
     <div id="newSystemsPanel" style="display:none; position:fixed; top:0; left:0; width:100%; height:100%; background:rgba(0,0,0,0.9); z-index:9999; overflow-y:auto;">
@@ -198,8 +211,9 @@ def add_new_sections():
     
     <script>
         // Funções para os novos sistemas
-        function openNewSystems() {
+        async function openNewSystems() {
             document.getElementById('newSystemsPanel').style.display = 'block';
+            if (window.loadTabFragment) await loadTabFragment('tab-system');
             loadSystemStatus();
         }
         
@@ -207,7 +221,9 @@ def add_new_sections():
             document.getElementById('newSystemsPanel').style.display = 'none';
         }
         
-        function showNewTab(tabName) {
+        async function showNewTab(tabName) {
+            const tabButton = event.target;
+            
             // Esconder todos os conteúdos
             document.querySelectorAll('.new-tab-content').forEach(el => el.style.display = 'none');
             
@@ -218,7 +234,10 @@ def add_new_sections():
             document.getElementById('tab-' + tabName).style.display = 'block';
             
             // Ativar tab
-            event.target.classList.add('active');
+            tabButton.classList.add('active');
+            
+            // Buscar o conteúdo da tab na primeira abertura (modo --fragments)
+            if (window.loadTabFragment) await loadTabFragment('tab-' + tabName);
             
             // Carregar dados da tab
             if (tabName === 'analytics') loadAnalytics();
@@ -402,16 +421,62 @@ def add_new_sections():
         }, 1000);
     </script>
     '''
-    
-    # Inserir o novo HTML
-    new_full_html = html[:insert_pos] + new_html + html[insert_pos:]
-    
-    # Salvar
-    with open('public/index_app.html', 'w', encoding='utf-8') as f:
-        f.write(new_full_html)
-    
-    print("✅ Painel melhorado criado com sucesso!")
+
+
+def add_new_sections(path=PANEL_PATH, build=False, fragments=False):
+    html = NEW_PANEL_HTML
+    if fragments:
+        from panel_fragments import LOADER_JS, split_fragments
+
+        html, sizes = split_fragments(html, TAB_FRAGMENTS)
+        html += LOADER_JS
+        print(f"🧩 {len(sizes)} abas em fragmentos ({sum(sizes.values())} bytes fora do carregamento inicial)")
+
+    if build:
+        from panel_build import build_block
+
+        html, stats = build_block(html, ASSET_NAME, scope='#newSystemsPanel')
+        print(f"🧱 Bloco do painel: {stats['original']} → {stats['html']} bytes")
+        for kind in ('css', 'js'):
+            if kind in stats:
+                print(f"📦 {stats[kind][0]}: {stats[kind][1]} bytes")
+
+    try:
+        status = upsert_block(path, BLOCK_NAME, html, anchor='</body>',
+                              legacy_marker='id="newSystemsPanel"')
+    except LookupError:
+        print("❌ Não encontrou </body>")
+        return False
+
+    if status == 'unchanged':
+        print("⏭️  Painel V2.0 já está atualizado, nada a fazer")
+    elif status == 'legacy':
+        print("⚠️  Painel V2.0 já existe sem marcadores (versão antiga do script); nada foi injetado")
+    elif status == 'replaced':
+        print("✅ Painel V2.0 atualizado (só o bloco alterado foi reescrito)")
+    else:
+        print("✅ Painel melhorado criado com sucesso!")
     return True
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Adiciona os novos sistemas ao painel')
+    parser.add_argument('path', nargs='?', default=PANEL_PATH)
+    parser.add_argument('--build', action='store_true',
+                        help='move o CSS/JS inline para assets com hash em public/')
+    parser.add_argument('--fragments', action='store_true',
+                        help='gera as abas como fragmentos carregados sob demanda')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='não gera as versões .gz/.br dos assets')
+    args = parser.parse_args(argv)
+
+    if not add_new_sections(args.path, build=args.build, fragments=args.fragments):
+        return 1
+    if not args.no_compress:
+        from precompress import precompress
+        precompress()
+    return 0
+
+
 if __name__ == '__main__':
-    add_new_sections()
+    sys.exit(main())
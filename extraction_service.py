@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""
+Serviço local de extração de páginas para o /api/extract
+
+O server.js extrai cada URL com axios + cheerio (e puppeteer como
+último recurso) em toda requisição: pedidos simultâneos da mesma URL
+extraem em paralelo. Este serviço asyncio roda ao lado do Node:
+
+- pool limitado de workers (downloads e parsing em threads);
+- pedidos da mesma URL em andamento esperam a mesma extração;
+- resultados vão para a tabela extraction_cache (mesmo schema e
+  url_hash do getOrCreateExtractionCache em database.js), com o texto
+  no chunk_store.py e a URL canônica como chave;
+- entradas vencidas são revalidadas com If-None-Match /
+  If-Modified-Since; um 304 só renova o expires_at.
+
+O Node chama POST /extract quando EXTRACTION_SERVICE_URL está definido
+e cai no extractPageData se o serviço falhar ou o texto vier curto
+(páginas dinâmicas continuam indo para o puppeteer).
+
+Uso:
+  python3 extraction_service.py serve [--workers 8]
+  python3 extraction_service.py extract URL
+  python3 extraction_service.py benchmark
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chunk_store import ChunkStore, STORE_DIR, canonical_url, url_hash
+
+DB_PATH = os.path.join('data', 'linkmagico.db')
+HOST = '127.0.0.1'
+PORT = 7803
+WORKERS = 8
+TTL = timedelta(hours=24)           # mesmo prazo do getOrCreateExtractionCache
+FETCH_TIMEOUT = 30
+MAX_BYTES = 5 * 1024 * 1024
+USER_AGENT = 'Mozilla/5.0 (compatible; LinkMagico-Bot/6.0; +https://linkmagico-comercial.onrender.com)'
+
+EXTRACTION_CACHE_SCHEMA = '''CREATE TABLE IF NOT EXISTS extraction_cache (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    url_hash TEXT UNIQUE NOT NULL,
+    extracted_data TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    hit_count INTEGER DEFAULT 0
+)'''
+
+
+# ----------------------------------------------------------------------
+# Extração (porta do caminho axios + cheerio do extractPageData)
+# ----------------------------------------------------------------------
+_SKIP = frozenset(('script', 'style', 'noscript', 'iframe'))
+_CHROME = frozenset(('nav', 'footer', 'aside'))
+_BLOCKS = ('h1', 'h2', 'h3', 'p', 'li', 'span', 'div')
+_VOID = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                   'param', 'source', 'track', 'wbr'))
+
+_PHONE = re.compile(r'(\+55\s?)?(\(?\d{2}\)?\s?)?\d{4,5}[-.\s]?\d{4}')
+_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_SITE = re.compile(r'(https?://[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})|(www\.[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+_BONUS = re.compile(r'(bônus|bonus|brinde|extra|grátis|template|planilha|checklist|e-book|ebook)', re.I)
+_WHATSAPP_WORDS = ('whatsapp', 'wa.me', 'whats-app', 'zap')
+
+
+def normalize_text(text):
+    return ' '.join((text or '').split())
+
+
+class PageParser(HTMLParser):
+    """Coleta título, metas, blocos de texto, texto do body e links numa passada"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = []
+        self.first_h1 = None
+        self.blocks = {tag: [] for tag in _BLOCKS}
+        self.body = []
+        self.links = []
+        self._stack = []            # [tag, buffer ou None]
+        self._skip = 0
+        self._chrome = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            name = attrs.get('name') or attrs.get('property')
+            if name and attrs.get('content') and name not in self.meta:
+                self.meta[name] = attrs['content']
+            return
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+        if tag in _VOID:
+            return
+        if tag in _SKIP:
+            self._skip += 1
+        elif tag in _CHROME:
+            self._chrome += 1
+        elif tag == 'title':
+            self._in_title = True
+        buffer = [] if tag in self.blocks and not self._chrome and not self._skip else None
+        self._stack.append([tag, buffer])
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, buffer = self._stack.pop()
+            if open_tag in _SKIP:
+                self._skip -= 1
+            elif open_tag in _CHROME:
+                self._chrome -= 1
+            if buffer is not None:
+                text = ''.join(buffer)
+                self.blocks[open_tag].append(text)
+                if open_tag == 'h1' and self.first_h1 is None:
+                    self.first_h1 = text
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_title:
+            self.title.append(data)
+            return
+        self.body.append(data)
+        if not self._chrome:
+            for _, buffer in self._stack:
+                if buffer is not None:
+                    buffer.append(data)
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self.handle_endtag(self._stack[-1][0])
+
+
+def format_phone(number):
+    """Porta do formatarNumeroBrasileiro"""
+    digits = re.sub(r'\D', '', number)
+    if digits.startswith('55') and len(digits) in (12, 13):
+        return f'+{digits}'
+    if len(digits) in (10, 11):
+        return f'+55{digits}'
+    return number
+
+
+def extract_contacts(body_text, links, url):
+    contacts = {'telefone': [], 'whatsapp': [], 'email': [], 'site': [url], 'endereco': []}
+    lower = body_text.lower()
+    for match in _PHONE.finditer(body_text):
+        digits = re.sub(r'\D', '', match.group(0))
+        if 10 <= len(digits) <= 13:
+            context = lower[max(0, match.start() - 50):match.start() + 50]
+            kind = 'whatsapp' if any(word in context for word in _WHATSAPP_WORDS) else 'telefone'
+            number = format_phone(digits)
+            if number not in contacts[kind]:
+                contacts[kind].append(number)
+    contacts['email'] = list(dict.fromkeys(_EMAIL.findall(body_text)))
+    sites = [m.group(0) for m in _SITE.finditer(body_text)][:3]
+    if sites:
+        contacts['site'] = list(dict.fromkeys(sites))
+    for href in links:
+        if 'wa.me' in href or 'whatsapp' in href:
+            digits = re.search(r'\d{10,13}', href)
+            if digits and format_phone(digits.group(0)) not in contacts['whatsapp']:
+                contacts['whatsapp'].append(format_phone(digits.group(0)))
+        elif href.startswith('tel:'):
+            digits = re.sub(r'\D', '', href[4:])
+            if len(digits) >= 10 and format_phone(digits) not in contacts['telefone']:
+                contacts['telefone'].append(format_phone(digits))
+        elif href.startswith('mailto:') and href[7:] and href[7:] not in contacts['email']:
+            contacts['email'].append(href[7:])
+    return contacts
+
+
+def extract_bonuses(text):
+    bonuses = []
+    for line in (line.strip() for line in text.splitlines()):
+        if line and 10 < len(line) < 200 and _BONUS.search(line) and line not in bonuses:
+            bonuses.append(line)
+            if len(bonuses) >= 5:
+                break
+    return bonuses
+
+
+def _summary(sentences):
+    return '. '.join(sentences[:3])[:400] + ('...' if len(sentences) > 3 else '')
+
+
+def parse_page(html, url):
+    """Mesmo formato de extractedData do server.js"""
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+    meta = parser.meta
+    data = {
+        'title': '', 'description': '', 'benefits': [], 'testimonials': [], 'cta': '', 'summary': '',
+        'cleanText': '', 'imagesText': [], 'url': url, 'extractionTime': 0, 'method': 'python-async',
+        'bonuses_detected': [], 'price_detected': [],
+    }
+
+    for candidate in (parser.first_h1, meta.get('og:title'), meta.get('twitter:title'), ''.join(parser.title)):
+        candidate = (candidate or '').strip()
+        if 5 < len(candidate) < 200:
+            data['title'] = candidate
+            break
+    for candidate in (meta.get('description'), meta.get('og:description')):
+        candidate = (candidate or '').strip()
+        if 50 < len(candidate) < 1000:
+            data['description'] = candidate
+            break
+
+    blocks = []
+    for tag in _BLOCKS:
+        blocks.extend(text for text in map(normalize_text, parser.blocks[tag]) if 15 < len(text) < 1000)
+    meta_description = (meta.get('description') or meta.get('og:description') or '').strip()
+    if len(meta_description) > 20:
+        blocks.insert(0, normalize_text(meta_description))
+    data['cleanText'] = '\n'.join(dict.fromkeys(block for block in blocks if block))
+
+    body_text = ''.join(parser.body)
+    sentences = [s.strip() for s in re.split(r'[.!?]+', normalize_text(body_text)) if s.strip()]
+    data['summary'] = _summary(sentences)
+    data['bonuses_detected'] = extract_bonuses(body_text)
+    data['contatos'] = extract_contacts(body_text, parser.links, url)
+
+    if not data['title'] and data['cleanText']:
+        data['title'] = next((line[:150] for line in data['cleanText'].split('\n') if 10 < len(line) < 150), '')
+    return data
+
+
+# ----------------------------------------------------------------------
+# Download condicional
+# ----------------------------------------------------------------------
+class _NoRedirectErrors(urllib.request.HTTPErrorProcessor):
+    """304 não é erro: devolve a resposta em vez de levantar HTTPError"""
+
+    def http_response(self, request, response):
+        if response.status == 304:
+            return response
+        return super().http_response(request, response)
+
+    https_response = http_response
+
+
+_OPENER = urllib.request.build_opener(_NoRedirectErrors)
+
+
+def fetch(url, validators=None):
+    """Retorna (status, html, url final, validadores)"""
+    headers = {'User-Agent': USER_AGENT,
+               'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+               'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8'}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('lastModified'):
+            headers['If-Modified-Since'] = validators['lastModified']
+    request = urllib.request.Request(url, headers=headers)
+    with _OPENER.open(request, timeout=FETCH_TIMEOUT) as response:
+        found = {'etag': response.headers.get('ETag'), 'lastModified': response.headers.get('Last-Modified')}
+        if response.status == 304:
+            return 304, '', response.geturl(), found
+        body = response.read(MAX_BYTES)
+        return response.status, _decode(body, response.headers.get_content_charset()), response.geturl(), found
+
+
+def _decode(body, charset):
+    """Decodifica o corpo; charset ausente, desconhecido (ex: "utf8mb4") ou que não é de texto cai em UTF-8"""
+    try:
+        return body.decode(charset or 'utf-8', 'replace')
+    except (LookupError, ValueError):
+        return body.decode('utf-8', 'replace')
+
+
+# ----------------------------------------------------------------------
+# extraction_cache
+# ----------------------------------------------------------------------
+def _iso(moment):
+    # Mesmo formato do expiresAt.toISOString() gravado pelo Node
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f'{moment.microsecond // 1000:03d}Z'
+
+
+class ExtractionCacheDB:
+    """Acesso à tabela extraction_cache (SQLite); uma conexão por thread.
+    O texto das páginas fica no ChunkStore; a linha guarda as referências."""
+
+    def __init__(self, path=DB_PATH, chunks=None):
+        self.path = path
+        self.chunks = chunks or ChunkStore()
+        self.local = threading.local()
+        self.conn().execute(EXTRACTION_CACHE_SCHEMA)
+        self.conn().commit()
+
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode = WAL')
+        return conn
+
+    def lookup(self, url):
+        """(dados, ainda válido?) ou (None, False)"""
+        row = self.conn().execute('SELECT extracted_data, expires_at FROM extraction_cache WHERE url_hash = ?',
+                                  (url_hash(url),)).fetchone()
+        if row is None:
+            return None, False
+        data = self.chunks.unpack_page(json.loads(row[0]))
+        if data is None:
+            return None, False                  # trechos removidos pela coleta de lixo
+        return data, row[1] > _iso(datetime.now(timezone.utc))
+
+    def hit(self, url):
+        with self.conn() as conn:
+            conn.execute('UPDATE extraction_cache SET hit_count = hit_count + 1 WHERE url_hash = ?', (url_hash(url),))
+
+    def store(self, url, data):
+        expires = _iso(datetime.now(timezone.utc) + TTL)
+        with self.conn() as conn:
+            conn.execute('INSERT OR REPLACE INTO extraction_cache (url, url_hash, extracted_data, expires_at) '
+                         'VALUES (?, ?, ?, ?)', (canonical_url(url), url_hash(url),
+                                                 json.dumps(self.chunks.pack_page(data), ensure_ascii=False), expires))
+
+    def renew(self, url):
+        expires = _iso(datetime.now(timezone.utc) + TTL)
+        with self.conn() as conn:
+            conn.execute('UPDATE extraction_cache SET expires_at = ? WHERE url_hash = ?', (expires, url_hash(url)))
+
+
+# ----------------------------------------------------------------------
+# Serviço
+# ----------------------------------------------------------------------
+class ExtractionService:
+    """Pool limitado de extrações com deduplicação de URLs em andamento"""
+
+    def __init__(self, db, workers=WORKERS):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='extract')
+        self.inflight = {}
+        self.stats = {'requests': 0, 'extracted': 0, 'cacheHits': 0, 'revalidated': 0,
+                      'deduplicated': 0, 'errors': 0}
+
+    async def extract(self, url, force=False):
+        self.stats['requests'] += 1
+        key = canonical_url(url)                # variantes (utm_*, barra final) esperam a mesma extração
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats['deduplicated'] += 1
+        else:
+            task = asyncio.ensure_future(self._extract(url, force))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield: um cliente que desiste não cancela a extração dos outros
+        return await asyncio.shield(task)
+
+    async def _extract(self, url, force):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self._extract_sync, url, force)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+
+    def _extract_sync(self, url, force):
+        cached, fresh = self.db.lookup(url)
+        if cached is not None and fresh and not force:
+            self.db.hit(url)
+            self.stats['cacheHits'] += 1
+            return cached, 'cache'
+
+        start = time.perf_counter()
+        validators = cached.get('httpCache') if cached else None
+        status, html, final_url, found = fetch(url, validators)
+        if status == 304 and cached is not None:
+            self.db.renew(url)
+            self.stats['revalidated'] += 1
+            return cached, 'revalidated'
+
+        data = parse_page(html, final_url or url)
+        data['extractionTime'] = int((time.perf_counter() - start) * 1000)
+        if found['etag'] or found['lastModified']:
+            data['httpCache'] = {key: value for key, value in found.items() if value}
+        self.db.store(url, data)
+        self.stats['extracted'] += 1
+        return data, 'extracted'
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return method, path, body
+
+
+async def _handle_client(service, reader, writer):
+    try:
+        request = await _read_request(reader)
+        if request is None:
+            return
+        method, path, body = request
+        status, payload = 404, {'success': False, 'error': 'Rota não encontrada'}
+        if method == 'GET' and path == '/stats':
+            status, payload = 200, {'success': True, 'stats': service.stats, 'inflight': len(service.inflight)}
+        elif method == 'POST' and path == '/extract':
+            try:
+                params = json.loads(body or b'{}')
+                url = params['url']
+                data, source = await service.extract(url, bool(params.get('force')))
+                status, payload = 200, {'success': True, 'source': source, 'data': data}
+            except (KeyError, ValueError) as error:
+                status, payload = 400, {'success': False, 'error': f'Requisição inválida: {error}'}
+            except (OSError, urllib.error.URLError) as error:
+                status, payload = 502, {'success': False, 'error': f'Falha ao baixar a página: {error}'}
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                     f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n'
+                     'Connection: close\r\n\r\n'.encode('latin-1') + data)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host=HOST, port=PORT):
+    server = await asyncio.start_server(lambda r, w: _handle_client(service, r, w), host, port)
+    print(f"🌐 Serviço de extração em http://{host}:{port} ({service.executor._max_workers} workers)",
+          file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+# ----------------------------------------------------------------------
+# Benchmark com origem local
+# ----------------------------------------------------------------------
+_PAGE = '''<!DOCTYPE html><html><head><title>Produto {n} - Loja Exemplo</title>
+<meta name="description" content="Página de exemplo número {n} com descrição longa o bastante para o extrator.">
+</head><body><nav><a href="/">Início</a></nav><h1>Produto incrível número {n}</h1>
+{paragraphs}
+<p>Fale conosco pelo WhatsApp (11) 98765-{n:04d} ou contato{n}@exemplo.com.br</p>
+<footer>Rodapé da loja</footer><script>var x = {n};</script></body></html>'''
+
+
+def _origin_handler(latency):
+    class Origin(BaseHTTPRequestHandler):
+        def do_GET(self):
+            n = int(re.sub(r'\D', '', self.path) or 0)
+            etag = f'"page-{n}"'
+            time.sleep(latency)
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            paragraphs = '\n'.join(f'<p>Parágrafo {i} do produto {n}: benefícios, garantia e bônus exclusivo.</p>'
+                                   for i in range(40))
+            body = _PAGE.format(n=n, paragraphs=paragraphs).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', 'Mon, 05 Oct 2026 10:00:00 GMT')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Origin
+
+
+async def _run_batch(service, urls):
+    start = time.perf_counter()
+    await asyncio.gather(*(service.extract(url) for url in urls))
+    return len(urls) / (time.perf_counter() - start)
+
+
+def benchmark(pages=200, latency=0.05, workers=(1, 8, 32)):
+    origin = ThreadingHTTPServer(('127.0.0.1', 0), _origin_handler(latency))
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{origin.server_address[1]}'
+    urls = [f'{base}/produto/{n}' for n in range(pages)]
+
+    print(f"⏱️  Benchmark do serviço de extração ({pages} páginas, origem com {latency * 1000:.0f} ms)")
+    print(f"{'workers':>8}{'frio/s':>10}{'dup x5/s':>10}{'cache/s':>10}{'304/s':>10}")
+    try:
+        for count in workers:
+            with tempfile.TemporaryDirectory() as tmp:
+                db = ExtractionCacheDB(os.path.join(tmp, 'bench.db'), ChunkStore(os.path.join(tmp, 'chunks')))
+                service = ExtractionService(db, count)
+
+                async def scenario():
+                    cold = await _run_batch(service, urls)
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, lambda: db.conn().execute('DELETE FROM extraction_cache').connection.commit())
+                    # 5 pedidos simultâneos por URL: só um download cada
+                    duplicated = await _run_batch(service, [url for url in urls for _ in range(5)])
+                    warm = await _run_batch(service, urls)
+                    expire = lambda: db.conn().execute(
+                        "UPDATE extraction_cache SET expires_at = '2000-01-01T00:00:00.000Z'").connection.commit()
+                    await asyncio.get_running_loop().run_in_executor(service.executor, expire)
+                    revalidated = await _run_batch(service, urls)
+                    return cold, duplicated, warm, revalidated
+
+                cold, duplicated, warm, revalidated = asyncio.run(scenario())
+                service.close()
+                print(f"{count:>8}{cold:>10.1f}{duplicated:>10.1f}{warm:>10.1f}{revalidated:>10.1f}")
+    finally:
+        origin.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serviço local de extração de páginas')
+    parser.add_argument('--db', default=DB_PATH, help='banco SQLite com a tabela extraction_cache')
+    parser.add_argument('--chunks', default=STORE_DIR, help='diretório dos trechos de texto (chunk_store.py)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='serve POST /extract e GET /stats')
+    p.add_argument('--host', default=HOST)
+    p.add_argument('--port', type=int, default=PORT)
+    p.add_argument('--workers', type=int, default=WORKERS)
+
+    p = sub.add_parser('extract', help='extrai uma URL (usa e grava o cache)')
+    p.add_argument('url')
+    p.add_argument('--force', action='store_true', help='ignora o cache válido')
+
+    p = sub.add_parser('benchmark', help='extrações por segundo contra uma origem local')
+    p.add_argument('--pages', type=int, default=200)
+    p.add_argument('--latency-ms', type=float, default=50)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.pages, args.latency_ms / 1000, args.workers)
+        return 0
+
+    service = ExtractionService(ExtractionCacheDB(args.db, ChunkStore(args.chunks)), getattr(args, 'workers', 1))
+    try:
+        if args.command == 'extract':
+            try:
+                data, source = asyncio.run(service.extract(args.url, args.force))
+            except (OSError, urllib.error.URLError) as error:
+                print(f"❌ Falha ao extrair {args.url}: {error}", file=sys.stderr)
+                return 1
+            print(f"✅ {args.url} ({source})", file=sys.stderr)
+            print(json.dumps(data, indent=2, ensure_ascii=False))
+            return 0
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Inserção de HTML em pontos nomeados, numa única passada
+
+Cada âncora (tag + atributo) é resolvida para o elemento inteiro, com o
+fechamento balanceado: só o conteúdo do próprio elemento é tokenizado
+(comentários e o conteúdo de <script>/<style> são pulados). Todas as
+inserções são aplicadas depois numa única escrita sequencial
+(patch_engine.apply_insertions).
+Uma âncora ausente gera erro em vez de passar em silêncio.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from patch_engine import Insertion, apply_insertions
+
+# Ponto de inserção nomeado:
+#   name     -> nome do ponto (aparece nas mensagens de erro)
+#   anchor   -> (tag, atributo, valor) do elemento de referência
+#   position -> 'before' | 'prepend' | 'append' | 'after' em relação ao elemento
+#   html     -> conteúdo a inserir
+#   present  -> trecho que indica que o conteúdo já está no documento (ou None)
+InsertionPoint = namedtuple('InsertionPoint', 'name anchor position html present')
+
+# Elemento encontrado: início da tag de abertura, fim dela, início e fim da de fechamento
+Element = namedtuple('Element', 'start open_end close_start end')
+
+_TAG = re.compile(r'''<!--.*?-->|<(/?)([A-Za-z][\w:-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''', re.DOTALL)
+_ATTR = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+_VOID = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                   'link', 'meta', 'source', 'track', 'wbr'))
+_RAW_TEXT_CLOSE = {tag: re.compile(r'</%s\s*>' % tag, re.IGNORECASE) for tag in ('script', 'style')}
+
+
+def _attributes(raw):
+    return {m.group(1).lower(): m.group(2) if m.group(2) is not None else
+            m.group(3) if m.group(3) is not None else (m.group(4) or '')
+            for m in _ATTR.finditer(raw)}
+
+
+def _open_tag_at(html, hit, anchor):
+    """Tag de abertura que contém a posição `hit`, se for a âncora pedida"""
+    lt = html.rfind('<', 0, hit)
+    if lt == -1:
+        return None
+    m = _TAG.match(html, lt)
+    if m is None or m.group(1) or m.group(2) is None or m.end() <= hit:
+        return None
+    tag, attr, value = anchor
+    if m.group(2).lower() != tag.lower():
+        return None
+    if _attributes(m.group(3)).get(attr.lower()) != value:
+        return None
+    return m
+
+
+def _element_end(html, m):
+    """Fecha o elemento aberto em `m`, contando só tags de mesmo nome"""
+    tag = m.group(2).lower()
+    if tag in _VOID or m.group(3).rstrip().endswith('/'):
+        return Element(m.start(), m.end(), m.end(), m.end())
+    if tag in _RAW_TEXT_CLOSE:
+        cm = _RAW_TEXT_CLOSE[tag].search(html, m.end())
+        if cm is None:
+            return None
+        return Element(m.start(), m.end(), cm.start(), cm.end())
+
+    depth = 1
+    pos = m.end()
+    search = _TAG.search
+    while True:
+        t = search(html, pos)
+        if t is None:
+            return None
+        pos = t.end()
+        name = t.group(2)
+        if name is None:        # comentário
+            continue
+        name = name.lower()
+        if name in _RAW_TEXT_CLOSE and not t.group(1):
+            cm = _RAW_TEXT_CLOSE[name].search(html, pos)
+            pos = cm.end() if cm else len(html)
+            continue
+        if name != tag:
+            continue
+        if t.group(1):
+            depth -= 1
+            if depth == 0:
+                return Element(m.start(), m.end(), t.start(), t.end())
+        elif not t.group(3).rstrip().endswith('/'):
+            depth += 1
+
+
+def find_elements(html, anchors):
+    """
+    Resolve as âncoras (tag, atributo, valor).
+    Cada âncora é localizada por busca direta do valor do atributo e só o
+    conteúdo do próprio elemento é tokenizado até o fechamento balanceado.
+    Retorna {âncora: Element} com a primeira ocorrência de cada uma.
+    """
+    found = {}
+    for anchor in anchors:
+        value = anchor[2]
+        pos = html.find(value)
+        while pos != -1:
+            m = _open_tag_at(html, pos, anchor)
+            if m is not None:
+                element = _element_end(html, m)
+                if element is not None:
+                    found[anchor] = element
+                break
+            pos = html.find(value, pos + 1)
+    return found
+
+
+def _present_markers(html, markers):
+    """
+    Marcadores que aparecem em `html`. Marcadores com o mesmo começo são
+    procurados juntos, pelo prefixo comum: uma varredura do documento por
+    grupo em vez de uma por marcador.
+    """
+    groups = {}
+    for marker in markers:
+        groups.setdefault(marker[:4], []).append(marker)
+
+    found = set()
+    for group in groups.values():
+        prefix = os.path.commonprefix(group)
+        pending = set(group)
+        pos = html.find(prefix)
+        while pos != -1 and pending:
+            hits = {marker for marker in pending if html.startswith(marker, pos)}
+            found |= hits
+            pending -= hits
+            pos = html.find(prefix, pos + 1)
+    return found
+
+
+def resolve(html, points):
+    """
+    Converte os pontos nomeados em inserções.
+    Pontos cujo conteúdo já está presente são ignorados; âncoras ausentes
+    geram LookupError com a lista completa de pontos não resolvidos.
+    """
+    present = _present_markers(html, {p.present for p in points if p.present})
+    active = [p for p in points if p.present not in present]
+    elements = find_elements(html, {p.anchor for p in active})
+
+    missing = [p.name for p in active if p.anchor not in elements]
+    if missing:
+        raise LookupError('Âncora não encontrada para: ' + ', '.join(missing))
+
+    insertions = []
+    for point in active:
+        element = elements[point.anchor]
+        offset = {
+            'before': element.start,
+            'prepend': element.open_end,
+            'append': element.close_start,
+            'after': element.end,
+        }[point.position]
+        insertions.append(Insertion(offset, point.html))
+    skipped = [p.name for p in points if p not in active]
+    return insertions, skipped
+
+
+def insert_into_file(path, points, output_path=None):
+    """
+    Aplica todos os pontos de inserção em `path` numa única passada.
+    A saída vai para um temporário que substitui o destino (os.replace).
+    Retorna (caracteres escritos, nomes dos pontos já presentes).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    insertions, skipped = resolve(html, points)
+    if not insertions:
+        return len(html), skipped
+
+    # Grava num temporário e troca no fim: uma falha no meio não trunca o painel
+    target = output_path or path
+    tmp_path = target + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            written = apply_insertions(html, insertions, out)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target)
+    return written, skipped
@@ -1,32 +1,32 @@
 #!/usr/bin/env python3
 """
 Script para integrar as melhorias no server.js mantendo toda funcionalidade existente
+
+O arquivo de origem é mapeado em memória e a saída é gravada em trechos
+(ver patch_engine.patch_file); ao final o script informa o pico de memória.
 """
 
+import argparse
+import functools
+import glob
+import hashlib
+import json
+import os
 import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 
-print("🔧 Integrando melhorias no server.js...")
-
-# Ler server original
-with open('server.js.original', 'r', encoding='utf-8') as f:
-    original = f.read()
-
-# Encontrar a linha do dotenv
-dotenv_match = re.search(r'require\("dotenv"\)\.config\(\);', original)
-if not dotenv_match:
-    print("❌ Não foi possível encontrar require('dotenv').config()")
-    exit(1)
-
-dotenv_pos = dotenv_match.end()
-
-# Parte antes do dotenv
-before_dotenv = original[:dotenv_pos]
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
-# Parte depois do dotenv
-after_dotenv = original[dotenv_pos:]
+from patch_engine import AnchorIndex, Insertion, patch_file
 
 # Imports dos novos módulos
-new_imports = '''
+NEW_IMPORTS = '''
 
 // ===== NOVOS MÓDULOS - MELHORIAS IMPLEMENTADAS =====
 const { db, initializeDatabase, DatabaseHelpers, USE_POSTGRES } = require('./database');
@@ -42,18 +42,8 @@ const { initialize } = require('./init');
 console.log('✅ Módulos de melhorias carregados');
 '''
 
-# Encontrar onde está app.listen
-listen_match = re.search(r'app\.listen\(PORT.*?\);', after_dotenv, re.DOTALL)
-if not listen_match:
-    listen_match = re.search(r'const PORT.*?app\.listen.*?\);', after_dotenv, re.DOTALL)
-
-if listen_match:
-    before_listen = after_dotenv[:listen_match.start()]
-    listen_code = after_dotenv[listen_match.start():listen_match.end()]
-    after_listen = after_dotenv[listen_match.end():]
-    
-    # Adicionar inicialização e novas rotas antes do listen
-    init_code = '''
+# Adicionar inicialização e novas rotas antes do listen
+INIT_CODE = '''
 
 // ===== CONFIGURAR NOVAS ROTAS =====
 setupRoutes(app);
@@ -61,36 +51,357 @@ setupRoutes(app);
 // ===== INICIALIZAR SISTEMAS =====
 (async () => {
     await initialize();
-    
+
     // Iniciar servidor
     '''
-    
-    # Fechar a função async
-    close_async = '''
-    
+
+# Fechar a função async
+CLOSE_ASYNC = '''
+
     console.log(`🌐 Servidor rodando em http://localhost:${PORT}`);
     console.log(`📊 Dashboard: http://localhost:${PORT}/api/system/status`);
 })();
 '''
-    
-    # Montar o novo server.js
-    new_server = (
-        before_dotenv +
-        new_imports +
-        before_listen +
-        init_code +
-        listen_code +
-        close_async +
-        after_listen
-    )
-else:
+
+# Medição de latência (opcional, --timing): middleware antes do primeiro app.use
+# e funções do caminho quente embrulhadas para a quebra por função
+TIMED_FUNCTIONS = ['extractPageData', 'generateAIResponse', 'generateLocalResponse',
+                   'callGroq', 'callOpenRouter', 'callOpenAI']
+
+TIMING_CODE = '''// ===== MEDIÇÃO DE LATÊNCIA POR ROTA =====
+const routeTiming = require('./route-timing');
+app.use(routeTiming.middleware());
+''' + ''.join(f"if (typeof {name} === 'function') {name} = routeTiming.wrap('{name}', {name});\n"
+              for name in TIMED_FUNCTIONS) + '\n'
+
+# Variantes do servidor usadas no benchmark
+SERVER_VARIANTS = ['server.js', 'server-new.js', 'server-melhorado.js', 'server.js.original']
+
+# Modo lote: diretório de saída padrão e cache de hashes da última execução
+BATCH_OUTPUT_DIR = 'integrated'
+BATCH_CACHE_FILE = '.integrate-cache.json'
+
+# Muda quando os trechos injetados mudam, invalidando o cache do modo lote
+TEMPLATE_DIGEST = hashlib.sha256((NEW_IMPORTS + INIT_CODE + CLOSE_ASYNC).encode('utf-8')).hexdigest()
+TIMING_DIGEST = hashlib.sha256((TEMPLATE_DIGEST + TIMING_CODE).encode('utf-8')).hexdigest()
+
+
+def _timing_insertion(index):
+    first_route = next((a for a in index.routes() if a.depth == 0), None)
+    if first_route is None:
+        raise LookupError("Não foi possível encontrar app.use/app.get no nível do módulo para a medição")
+    return Insertion(first_route.stmt_start, TIMING_CODE)
+
+
+def build_insertions(index, timing=False):
+    """
+    Monta as inserções a partir do índice de âncoras.
+    Retorna None se o arquivo já estiver integrado.
+    Com timing=True injeta também a medição de latência (route-timing.js) —
+    inclusive num arquivo já integrado que ainda não a tenha.
+    """
+    if index.require('./init') is not None:
+        if timing and index.require('./route-timing') is None:
+            return [_timing_insertion(index)]
+        return None
+
+    dotenv = index.require('dotenv')
+    if dotenv is None:
+        raise LookupError("Não foi possível encontrar require('dotenv').config()")
+
+    insertions = [Insertion(dotenv.stmt_end, NEW_IMPORTS)]
+
+    listen = index.listen()
+    if listen is not None:
+        insertions.append(Insertion(listen.stmt_start, INIT_CODE))
+        insertions.append(Insertion(listen.end, CLOSE_ASYNC))
     # Se não encontrar app.listen, apenas adicionar os imports
-    new_server = before_dotenv + new_imports + after_dotenv
 
-# Salvar novo server.js
-with open('server-melhorado.js', 'w', encoding='utf-8') as f:
-    f.write(new_server)
+    if timing:
+        insertions.append(_timing_insertion(index))
+
+    return insertions
+
+
+def peak_rss_mb():
+    """Pico de RSS do processo atual em MB (None onde não há `resource`)"""
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _print_memory(heap_peak=None):
+    rss = peak_rss_mb()
+    parts = []
+    if heap_peak is not None:
+        parts.append(f"heap Python {heap_peak / 1024:.1f} KB")
+    if rss is not None:
+        parts.append(f"RSS do processo {rss:.1f} MB")
+    if parts:
+        print(f"🧠 Pico de memória: {', '.join(parts)}")
+
+
+def integrate(source_path='server.js.original', output_path='server-melhorado.js', trace_memory=False,
+              timing=False):
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        result = patch_file(source_path, output_path, functools.partial(build_insertions, timing=timing))
+    except (LookupError, OSError, ValueError) as error:
+        print(f"❌ {error}")
+        return False
+    finally:
+        heap_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+    if result is None:
+        print(f"⏭️  {source_path} já está integrado, nada a fazer")
+        return True
+
+    written, lines = result
+    print(f"✅ {output_path} criado com sucesso!")
+    print(f"📝 Total de linhas: {lines}")
+    print(f"📦 Tamanho: {written} bytes")
+    _print_memory(heap_peak)
+    return True
+
+
+def _file_digest(path, timing=False):
+    digest = hashlib.sha256((TIMING_DIGEST if timing else TEMPLATE_DIGEST).encode('ascii'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_jobs(patterns, manifest, output_dir):
+    """
+    Monta a lista de (origem, destino) a partir de globs e/ou de um manifesto.
+    O manifesto é uma lista JSON de caminhos ou de {"source": ..., "output": ...}.
+    """
+    jobs = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isfile(path):
+                jobs.append((path, os.path.join(output_dir, os.path.basename(path))))
+
+    if manifest:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                if isinstance(item, str):
+                    jobs.append((item, os.path.join(output_dir, os.path.basename(item))))
+                else:
+                    jobs.append((item['source'],
+                                 item.get('output') or os.path.join(output_dir, os.path.basename(item['source']))))
+
+    seen = set()
+    unique = []
+    for job in jobs:
+        if job[0] not in seen:
+            seen.add(job[0])
+            unique.append(job)
+    return unique
+
+
+def _output_collisions(jobs):
+    """{destino: [origens]} para destinos usados por mais de uma origem (ex.: mesmo nome em pastas diferentes)"""
+    sources = {}
+    for source_path, output_path in jobs:
+        sources.setdefault(os.path.normpath(output_path), []).append(source_path)
+    return {output: paths for output, paths in sources.items() if len(paths) > 1}
+
+
+def _integrate_job(job):
+    """Executado nos processos do pool: integra um arquivo e mede o tempo"""
+    source_path, output_path, timing = job
+    start = time.perf_counter()
+    try:
+        result = patch_file(source_path, output_path, functools.partial(build_insertions, timing=timing))
+        error = None
+    except (LookupError, OSError, ValueError) as exc:
+        result, error = None, str(exc)
+    return source_path, output_path, result, error, (time.perf_counter() - start) * 1000, peak_rss_mb()
+
+
+def integrate_batch(patterns=(), manifest=None, output_dir=BATCH_OUTPUT_DIR,
+                    cache_file=BATCH_CACHE_FILE, workers=None, force=False, timing=False):
+    """
+    Integra vários arquivos em paralelo num pool de processos, pulando os que
+    não mudaram desde a última execução (hash do conteúdo + dos trechos injetados).
+    """
+    jobs = _load_jobs(patterns, manifest, output_dir)
+    if not jobs:
+        print("❌ Nenhum arquivo encontrado para integrar")
+        return False
+
+    collisions = _output_collisions(jobs)
+    if collisions:
+        for output_path, sources in collisions.items():
+            print(f"❌ {output_path}: mesmo destino para {', '.join(sources)} "
+                  f"(use {{\"source\", \"output\"}} no manifesto)")
+        return False
+
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+
+    ok = True
+    pending = []
+    digests = {}
+    for source_path, output_path in jobs:
+        try:
+            digest = _file_digest(source_path, timing)
+        except OSError as exc:
+            ok = False
+            cache.pop(source_path, None)
+            print(f"❌ {source_path}: {exc.strerror or exc}")
+            continue
+        digests[source_path] = digest
+        cached = cache.get(source_path)
+        if (not force and cached and cached['hash'] == digest
+                and cached['output'] == output_path
+                and (cached['status'] == 'integrated' and os.path.exists(output_path)
+                     or cached['status'] == 'already')):
+            print(f"⏭️  {source_path}: sem mudanças desde a última execução")
+            continue
+        pending.append((source_path, output_path, timing))
+
+    for _, output_path, _ in pending:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    worker_rss = None
+    total_start = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for source_path, output_path, result, error, elapsed, rss in pool.map(_integrate_job, pending):
+                if rss is not None:
+                    worker_rss = max(worker_rss or 0, rss)
+                if error:
+                    ok = False
+                    cache.pop(source_path, None)
+                    print(f"❌ {source_path}: {error}")
+                    continue
+                if result is None:
+                    status = 'already'
+                    print(f"⏭️  {source_path}: já está integrado ({elapsed:.1f} ms)")
+                else:
+                    status = 'integrated'
+                    written, lines = result
+                    print(f"✅ {source_path} → {output_path}: {lines} linhas, {written} bytes ({elapsed:.1f} ms)")
+                cache[source_path] = {'hash': digests[source_path], 'output': output_path, 'status': status}
+
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+
+    print(f"📦 {len(pending)} de {len(jobs)} arquivos processados em "
+          f"{(time.perf_counter() - total_start) * 1000:.1f} ms")
+    if worker_rss is not None:
+        print(f"🧠 Pico de RSS por processo do pool: {worker_rss:.1f} MB")
+    return ok
+
+
+def _regex_splice(original):
+    """Implementação anterior (regex + fatias), mantida só para o benchmark"""
+    dotenv_match = re.search(r'require\("dotenv"\)\.config\(\);', original)
+    if not dotenv_match:
+        return original
+    before_dotenv = original[:dotenv_match.end()]
+    after_dotenv = original[dotenv_match.end():]
+    listen_match = re.search(r'app\.listen\(PORT.*?\);', after_dotenv, re.DOTALL)
+    if not listen_match:
+        return before_dotenv + NEW_IMPORTS + after_dotenv
+    return (
+        before_dotenv + NEW_IMPORTS +
+        after_dotenv[:listen_match.start()] + INIT_CODE +
+        after_dotenv[listen_match.start():listen_match.end()] + CLOSE_ASYNC +
+        after_dotenv[listen_match.end():]
+    )
+
+
+def benchmark(paths=SERVER_VARIANTS, rounds=20):
+    """Compara o motor de âncoras com o splice por regex em cada variante"""
+    import io
+    import tempfile
+    from patch_engine import apply_insertions
+
+    print(f"⏱️  Benchmark de integração ({rounds} rodadas por arquivo)")
+    print(f"{'arquivo':<24}{'bytes':>10}{'âncoras':>9}{'regex ms':>11}{'âncoras ms':>12}"
+          f"{'regex KB':>10}{'stream KB':>11}")
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            print(f"{path:<24}{'(não encontrado)':>42}")
+            continue
+        source = data.decode('utf-8')
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            _regex_splice(source)
+        regex_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            index = AnchorIndex(data)
+            insertions = build_insertions(index) or []
+            apply_insertions(data, insertions, io.BytesIO())
+        anchor_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        # Pico de heap de cada abordagem, do arquivo em disco até a saída gravada
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'out.js')
+            tracemalloc.start()
+            with open(path, 'r', encoding='utf-8') as f, open(output, 'w', encoding='utf-8') as out:
+                out.write(_regex_splice(f.read()))
+            regex_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.reset_peak()
+            patch_file(path, output, lambda index: build_insertions(index) or [])
+            stream_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+        print(f"{path:<24}{len(data):>10}{len(index.anchors):>9}{regex_ms:>11.2f}{anchor_ms:>12.2f}"
+              f"{regex_kb:>10.1f}{stream_kb:>11.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Integra as melhorias no server.js')
+    parser.add_argument('source', nargs='?', default='server.js.original')
+    parser.add_argument('output', nargs='?', default='server-melhorado.js')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='mede o tempo de patch de todas as variantes do servidor')
+    parser.add_argument('--batch', nargs='+', metavar='GLOB',
+                        help='integra todos os arquivos que casam com os globs (ex: "server*.js*")')
+    parser.add_argument('--manifest', help='lista JSON de arquivos para o modo lote')
+    parser.add_argument('--output-dir', default=BATCH_OUTPUT_DIR,
+                        help='diretório de saída do modo lote')
+    parser.add_argument('--workers', type=int, help='processos do pool (padrão: nº de CPUs)')
+    parser.add_argument('--force', action='store_true',
+                        help='ignora o cache de hashes e reprocessa tudo')
+    parser.add_argument('--timing', action='store_true',
+                        help='injeta a medição de latência por rota (route-timing.js)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='mede também o pico de heap Python (tracemalloc, mais lento)')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark()
+        return 0
+
+    if args.batch or args.manifest:
+        print("🔧 Integrando melhorias em lote...")
+        ok = integrate_batch(args.batch or (), args.manifest, args.output_dir,
+                             workers=args.workers, force=args.force, timing=args.timing)
+        return 0 if ok else 1
+
+    print("🔧 Integrando melhorias no server.js...")
+    return 0 if integrate(args.source, args.output, args.trace_memory, args.timing) else 1
+
 
-print(f"✅ server-melhorado.js criado com sucesso!")
-print(f"📝 Total de linhas: {len(new_server.splitlines())}")
-print(f"📦 Tamanho: {len(new_server)} bytes")
+if __name__ == '__main__':
+    sys.exit(main())
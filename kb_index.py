@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Índice invertido BM25 das bases de conhecimento (knowledge-base.js)
+
+O KnowledgeBaseManager.search percorre todas as FAQs, documentos e
+entradas manuais do chatbot a cada busca (includes + RegExp). Aqui cada
+arquivo data/knowledge/<chatbotId>.json vira um índice BM25 persistente
+em data/knowledge-index/<chatbotId>.bm25:
+
+- tokenização com acentos removidos, stopwords e um stemmer leve de
+  português (plurais, femininos e sufixos comuns);
+- postings em arrays compactos (doc id uint32 + frequência uint16),
+  localizados pelo offset do termo no vocabulário ordenado;
+- manifest.json guarda o sha256 de cada arquivo: só as bases que
+  mudaram são reindexadas.
+
+Uso:
+  python3 kb_index.py build                     # (re)indexa o que mudou
+  python3 kb_index.py search CHATBOT "consulta" # busca pelo terminal
+  python3 kb_index.py serve                     # HTTP local (KB_INDEX_URL)
+  python3 kb_index.py benchmark                 # índice x varredura linear
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import random
+import re
+import struct
+import sys
+import time
+import unicodedata
+from array import array
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KB_DIR = os.path.join('data', 'knowledge')
+INDEX_DIR = os.path.join('data', 'knowledge-index')
+MANIFEST = 'manifest.json'
+# Muda quando tokenize()/stem() mudam: índices gravados com outra versão são refeitos
+TOKENIZER_VERSION = 2
+HOST = '127.0.0.1'
+PORT = 7802
+
+MAGIC = b'KBX1'
+_HEADER = struct.Struct('<4sI')
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2        # termos do título/pergunta contam em dobro
+MAX_TF = 0xFFFF
+
+STOPWORDS = frozenset('''
+a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela delas dele deles
+depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estas este estes
+eu foi for foram ha isso isto ja la lhe lhes mais mas me mesmo meu meus minha minhas muito na nas
+nao nem no nos nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por qual
+quando que quem se sem ser seu seus so sua suas tambem te tem teu tu tua um uma umas uns voce
+voces vos
+'''.split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_PLURALS = (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+            ('ns', 'm'), ('res', 'r'), ('les', 'l'))
+_SUFFIXES = ('amente', 'mente', 'acao', 'icao', 'cao', 'idade', 'ismo', 'ista', 'avel', 'ivel',
+             'osa', 'oso')
+
+
+def strip_accents(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Stemmer leve de português (acentos já removidos)"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _PLURALS:
+        if word.endswith(suffix) and len(word) >= len(suffix) + 2:
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            word = word[:-1]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word[-1] in 'aeo':
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(t) for t in _TOKEN.findall(strip_accents(text or '')) if t not in STOPWORDS]
+
+
+# ----------------------------------------------------------------------
+# Documentos de uma base
+# ----------------------------------------------------------------------
+def kb_documents(kb):
+    """(tipo, id, título, corpo) de cada entrada ativa, como no search() do JS"""
+    for faq in kb.get('faqs') or []:
+        if faq.get('active'):
+            yield 'faq', faq.get('id'), faq.get('question'), faq.get('answer')
+    for doc in kb.get('documents') or []:
+        if doc.get('active'):
+            yield 'document', doc.get('id'), doc.get('title'), doc.get('content')
+    for entry in kb.get('manualEntries') or []:
+        if entry.get('active'):
+            tags = ' '.join(entry.get('tags') or [])
+            yield 'manual', entry.get('id'), entry.get('title'), f"{entry.get('content') or ''} {tags}"
+
+
+class BM25Index:
+    """Índice BM25 de uma base; vocabulário ordenado + postings em arrays"""
+
+    def __init__(self, docs, doc_len, vocab, offsets, postings, freqs):
+        self.docs = docs
+        self.doc_len = doc_len
+        self.vocab = vocab
+        self.terms = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.postings = postings
+        self.freqs = freqs
+        n = len(doc_len)
+        avgdl = (sum(doc_len) / n) if n else 1.0
+        self.norm = [K1 * (1 - B + B * dl / avgdl) for dl in doc_len]
+        if np is not None:
+            self._np = (np.frombuffer(postings, dtype=np.uint32) if len(postings) else np.zeros(0, np.uint32),
+                        np.frombuffer(freqs, dtype=np.uint16).astype(np.float64) if len(freqs) else np.zeros(0),
+                        np.array(self.norm, dtype=np.float64))
+
+    @classmethod
+    def build(cls, kb):
+        docs, doc_len, index = [], array('I'), {}
+        for doc_id, (kind, entry_id, title, body) in enumerate(kb_documents(kb)):
+            counts = {}
+            title_tokens = tokenize(title)
+            for token in title_tokens:
+                counts[token] = counts.get(token, 0) + TITLE_WEIGHT
+            body_tokens = tokenize(body)
+            for token in body_tokens:
+                counts[token] = counts.get(token, 0) + 1
+            docs.append([kind, entry_id])
+            doc_len.append(len(title_tokens) * TITLE_WEIGHT + len(body_tokens))
+            for token, tf in counts.items():
+                index.setdefault(token, []).append((doc_id, min(tf, MAX_TF)))
+
+        vocab = sorted(index)
+        offsets, postings, freqs = array('I', [0]), array('I'), array('H')
+        for term in vocab:
+            for doc_id, tf in index[term]:
+                postings.append(doc_id)
+                freqs.append(tf)
+            offsets.append(len(postings))
+        return cls(docs, doc_len, vocab, offsets, postings, freqs)
+
+    def _ranges(self, query):
+        """(início, fim, idf) das postings de cada termo da consulta"""
+        n = len(self.doc_len)
+        for term in set(tokenize(query)):
+            i = self.terms.get(term)
+            if i is not None:
+                start, end = self.offsets[i], self.offsets[i + 1]
+                df = end - start
+                yield start, end, math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, limit=5):
+        ranges = list(self._ranges(query))
+        if np is not None:
+            best = self._search_numpy(ranges, limit)
+        else:
+            scores = {}
+            postings, freqs, norm = self.postings, self.freqs, self.norm
+            for start, end, idf in ranges:
+                for p in range(start, end):
+                    doc, tf = postings[p], freqs[p]
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (K1 + 1) / (tf + norm[doc])
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [{'type': self.docs[doc][0], 'id': self.docs[doc][1], 'score': round(score, 4)}
+                for doc, score in best]
+
+    def _search_numpy(self, ranges, limit):
+        if not ranges:
+            return []
+        postings, freqs, norm = self._np
+        docs = np.concatenate([postings[start:end] for start, end, _ in ranges])
+        tf = np.concatenate([freqs[start:end] for start, end, _ in ranges])
+        idf = np.concatenate([np.full(end - start, idf) for start, end, idf in ranges])
+        scores = np.bincount(docs, weights=idf * tf * (K1 + 1) / (tf + norm[docs]))
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return list(zip(hits.tolist(), scores[hits].tolist()))
+
+    # ------------------------------------------------------------------
+    # Arquivo .bm25: cabeçalho, metadados JSON e arrays little-endian
+    # ------------------------------------------------------------------
+    def save(self, path):
+        meta = json.dumps({'docs': self.docs, 'vocab': self.vocab,
+                           'counts': [len(self.doc_len), len(self.offsets), len(self.postings)]},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(meta)))
+            f.write(meta)
+            for values in (self.doc_len, self.offsets, self.postings, self.freqs):
+                if sys.byteorder == 'big':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, meta_len = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: arquivo de índice inválido')
+        position = _HEADER.size + meta_len
+        meta = json.loads(data[_HEADER.size:position])
+        arrays = []
+        for typecode, count in zip('IIIH', meta['counts'] + [meta['counts'][2]]):
+            values = array(typecode)
+            size = count * values.itemsize
+            values.frombytes(data[position:position + size])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            arrays.append(values)
+            position += size
+        return cls(meta['docs'], arrays[0], meta['vocab'], *arrays[1:])
+
+
+# ----------------------------------------------------------------------
+# Manifesto e atualização incremental
+# ----------------------------------------------------------------------
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_filename(chatbot_id):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', chatbot_id) + '.bm25'
+
+
+def load_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': 1, 'chatbots': {}}
+
+
+def save_manifest(index_dir, manifest):
+    path = os.path.join(index_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def update_index(kb_dir=KB_DIR, index_dir=INDEX_DIR, only=None):
+    """Reindexa as bases cujo sha256 mudou; retorna (reindexadas, inalteradas, removidas)"""
+    os.makedirs(index_dir, exist_ok=True)
+    manifest = load_manifest(index_dir)
+    entries = manifest['chatbots']
+    files = {name[:-len('.json')]: os.path.join(kb_dir, name)
+             for name in (os.listdir(kb_dir) if os.path.isdir(kb_dir) else [])
+             if name.endswith('.json')}
+    if only is not None:
+        files = {chatbot: path for chatbot, path in files.items() if chatbot in only}
+
+    rebuilt, unchanged, removed = [], [], []
+    for chatbot_id, path in sorted(files.items()):
+        stat = os.stat(path)
+        entry = entries.get(chatbot_id)
+        if entry and entry.get('tokenizer') != TOKENIZER_VERSION:
+            entry = None
+        # mtime+tamanho iguais dispensam até o hash
+        if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            unchanged.append(chatbot_id)
+            continue
+        digest = file_sha256(path)
+        if entry and entry['sha256'] == digest:
+            entry.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+            unchanged.append(chatbot_id)
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            index = BM25Index.build(json.load(f))
+        index.save(os.path.join(index_dir, index_filename(chatbot_id)))
+        entries[chatbot_id] = {'sha256': digest, 'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                               'file': index_filename(chatbot_id), 'tokenizer': TOKENIZER_VERSION,
+                               'docs': len(index.docs),
+                               'terms': len(index.vocab), 'postings': len(index.postings)}
+        rebuilt.append(chatbot_id)
+
+    if only is None:
+        for chatbot_id in sorted(set(entries) - set(files)):
+            try:
+                os.remove(os.path.join(index_dir, entries.pop(chatbot_id)['file']))
+            except FileNotFoundError:
+                pass
+            removed.append(chatbot_id)
+
+    save_manifest(index_dir, manifest)
+    return rebuilt, unchanged, removed
+
+
+class IndexCache:
+    """Índices carregados em memória, recarregados quando o arquivo da base muda"""
+
+    def __init__(self, kb_dir=KB_DIR, index_dir=INDEX_DIR):
+        self.kb_dir = kb_dir
+        self.index_dir = index_dir
+        self.loaded = {}
+        self.lock = Lock()
+
+    def get(self, chatbot_id):
+        try:
+            stat = os.stat(os.path.join(self.kb_dir, f'{chatbot_id}.json'))
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.loaded.get(chatbot_id)
+            if cached is None or cached[0] != signature:
+                update_index(self.kb_dir, self.index_dir, only={chatbot_id})
+                entry = load_manifest(self.index_dir)['chatbots'][chatbot_id]
+                index = BM25Index.load(os.path.join(self.index_dir, entry['file']))
+                cached = self.loaded[chatbot_id] = (signature, index)
+            return cached[1]
+
+    def search(self, chatbot_id, query, limit=5):
+        index = self.get(chatbot_id)
+        return index.search(query, limit) if index else []
+
+
+# ----------------------------------------------------------------------
+# Serviço HTTP
+# ----------------------------------------------------------------------
+def make_handler(cache):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                start = time.perf_counter()
+                results = cache.search(request['chatbotId'], request['query'], int(request.get('limit', 5)))
+                status, body = 200, {'success': True, 'results': results,
+                                     'elapsedMs': round((time.perf_counter() - start) * 1000, 3)}
+            except (KeyError, ValueError) as error:
+                status, body = 400, {'success': False, 'error': str(error)}
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+_WORDS = ('plano preço pagamento entrega frete garantia suporte cancelamento assinatura cartão boleto '
+          'pix desconto cupom integração whatsapp instagram relatório painel usuário conta senha acesso '
+          'contrato nota fiscal troca devolução prazo horário atendimento produto serviço cliente '
+          'empresa equipe mensal anual profissional básico premium limite mensagens chatbot site').split()
+
+
+def synthetic_kb(entries, seed=11):
+    """Base sintética com vocabulário de ~5000 palavras em distribuição de Zipf"""
+    rng = random.Random(seed)
+    syllables = ['ba', 'ca', 'de', 'fi', 'go', 'la', 'me', 'ni', 'po', 'ra', 'se', 'ti', 'vo', 'xu', 'ção']
+    vocabulary = list(_WORDS) + [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+                                 for _ in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    phrase = lambda n: ' '.join(rng.choices(vocabulary, weights, k=n))
+    kb = {'chatbotId': 'bench', 'sources': [], 'faqs': [], 'documents': [], 'manualEntries': []}
+    for i in range(entries):
+        if i % 3:
+            kb['faqs'].append({'id': f'f{i}', 'question': phrase(8) + '?', 'answer': phrase(40), 'active': True})
+        else:
+            kb['documents'].append({'id': f'd{i}', 'title': phrase(5), 'content': phrase(300), 'active': True})
+    return kb
+
+
+def linear_search(kb, query, limit=5):
+    """Porta do KnowledgeBaseManager.search (includes + contagem por RegExp)"""
+    q = query.lower()
+    words = [re.compile(re.escape(w), re.I) for w in q.split() if len(w) >= 3]
+    results = []
+    for kind, entry_id, title, body in kb_documents(kb):
+        title, body = (title or '').lower(), (body or '').lower()
+        if q in title or q in body:
+            text = title if kind == 'faq' else f'{title} {body}'
+            results.append((sum(len(w.findall(text)) for w in words), kind, entry_id))
+    results.sort(key=lambda r: -r[0])
+    return results[:limit]
+
+
+def benchmark(sizes=(1000, 5000, 20000), queries=300):
+    import tempfile
+    print("⏱️  Benchmark do índice BM25 das bases de conhecimento")
+    print(f"{'entradas':>9}{'build ms':>10}{'no-op ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'linear ms':>11}{'KB':>9}")
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_dir, index_dir = os.path.join(tmp, 'kb'), os.path.join(tmp, 'index')
+        os.makedirs(kb_dir)
+        for size in sizes:
+            kb = synthetic_kb(size)
+            with open(os.path.join(kb_dir, 'bench.json'), 'w', encoding='utf-8') as f:
+                json.dump(kb, f, indent=2, ensure_ascii=False)
+            start = time.perf_counter()
+            update_index(kb_dir, index_dir)
+            build = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            update_index(kb_dir, index_dir)
+            incremental = (time.perf_counter() - start) * 1000
+
+            cache = IndexCache(kb_dir, index_dir)
+            index = cache.get('bench')
+            sample = [' '.join(rng.choice(_WORDS) for _ in range(3)) for _ in range(queries)]
+            timings = []
+            for query in sample:
+                start = time.perf_counter()
+                index.search(query)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            start = time.perf_counter()
+            for query in sample[:20]:
+                linear_search(kb, query.split()[0])
+            linear = (time.perf_counter() - start) * 1000 / 20
+            size_kb = os.path.getsize(os.path.join(index_dir, 'bench.bm25')) / 1024
+            print(f"{size:>9}{build:>10.1f}{incremental:>10.2f}{timings[len(timings) // 2]:>9.3f}"
+                  f"{timings[int(len(timings) * 0.99)]:>9.3f}{linear:>11.2f}{size_kb:>9.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Índice BM25 das bases de conhecimento')
+    parser.add_argument('--kb-dir', default=KB_DIR)
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('build', help='reindexa as bases que mudaram')
+
+    p = sub.add_parser('search', help='busca numa base')
+    p.add_argument('chatbot_id')
+    p.add_argument('query')
+    p.add_argument('--limit', type=int, default=5)
+
+    p = sub.add_parser('serve', help='serve buscas por HTTP local')
+    p.add_argument('--host', default=HOST)
+    p.add_argument('--port', type=int, default=PORT)
+
+    p = sub.add_parser('benchmark', help='mede build, reindexação e latência de busca')
+    p.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.sizes)
+        return 0
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        rebuilt, unchanged, removed = update_index(args.kb_dir, args.index_dir)
+        print(f"✅ Índice atualizado em {(time.perf_counter() - start) * 1000:.1f} ms: "
+              f"{len(rebuilt)} reindexada(s), {len(unchanged)} inalterada(s), {len(removed)} removida(s)")
+        for chatbot_id in rebuilt:
+            print(f"   📚 {chatbot_id}")
+        return 0
+
+    cache = IndexCache(args.kb_dir, args.index_dir)
+
+    if args.command == 'search':
+        if cache.get(args.chatbot_id) is None:
+            print(f"❌ Base de conhecimento não encontrada: {args.chatbot_id}", file=sys.stderr)
+            return 1
+        print(json.dumps(cache.search(args.chatbot_id, args.query, args.limit), indent=2, ensure_ascii=False))
+        return 0
+
+    update_index(args.kb_dir, args.index_dir)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cache))
+    print(f"📚 Índice das bases de conhecimento em http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
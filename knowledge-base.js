@@ -13,6 +13,7 @@
 const fs = require('fs');
 const path = require('path');
 const crypto = require('crypto');
+const { packPage, unpackPage } = require('./chunk-store');
 
 class KnowledgeBaseManager {
     constructor() {
@@ -112,11 +113,12 @@ class KnowledgeBaseManager {
 
         const sourceId = crypto.randomBytes(8).toString('hex');
         
+        // O texto extraído vai para o chunk-store.js: tenants com a mesma página compartilham os trechos
         const source = {
             id: sourceId,
             type: 'url',
             url,
-            data: extractedData,
+            data: packPage(extractedData),
             addedAt: new Date().toISOString(),
             lastUpdated: new Date().toISOString(),
             active: true
@@ -370,6 +372,40 @@ class KnowledgeBaseManager {
         return results.slice(0, limit);
     }
 
+    /**
+     * Buscar usando o índice BM25 (kb_index.py serve em KB_INDEX_URL)
+     * Mesmo formato do search(); sem o serviço ou em caso de erro usa o search()
+     */
+    async searchIndexed(chatbotId, query, limit = 5) {
+        const indexUrl = process.env.KB_INDEX_URL;
+        const kb = this.knowledgeBases.get(chatbotId);
+
+        if (!indexUrl || !kb) {
+            return this.search(chatbotId, query, limit);
+        }
+
+        try {
+            const response = await fetch(`${indexUrl}/search`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ chatbotId, query, limit }),
+                signal: AbortSignal.timeout(200)
+            });
+            const { results } = await response.json();
+            const collections = { faq: kb.faqs, document: kb.documents, manual: kb.manualEntries };
+
+            return results
+                .map(result => ({
+                    type: result.type,
+                    score: result.score,
+                    data: (collections[result.type] || []).find(entry => entry.id === result.id)
+                }))
+                .filter(result => result.data);
+        } catch (error) {
+            return this.search(chatbotId, query, limit);
+        }
+    }
+
     /**
      * Calcular score de relevância (simplificado)
      */
@@ -395,7 +431,13 @@ class KnowledgeBaseManager {
      * Obter toda a base de conhecimento
      */
     getKnowledgeBase(chatbotId) {
-        return this.knowledgeBases.get(chatbotId) || null;
+        const kb = this.knowledgeBases.get(chatbotId);
+        if (!kb) return null;
+
+        return {
+            ...kb,
+            sources: kb.sources.map(source => (source.data ? { ...source, data: unpackPage(source.data) } : source))
+        };
     }
 
     /**
@@ -454,8 +496,9 @@ class KnowledgeBaseManager {
             context += '\n🌐 INFORMAÇÕES DO SITE:\n\n';
             
             for (const source of kb.sources.filter(s => s.active && s.type === 'url')) {
-                if (source.data && source.data.textos) {
-                    const textos = source.data.textos.slice(0, 10).join('\n');
+                const data = unpackPage(source.data);
+                if (data && data.textos) {
+                    const textos = data.textos.slice(0, 10).join('\n');
                     
                     if (context.length + textos.length > maxLength) break;
                     
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Reprocessamento em lote da pontuação dos leads estruturados
+
+O structured-leads.js pontua cada lead no saveLead com as regras de
+lead-scoring-rules.json. Quando as regras mudam, os leads antigos ficam com
+o score e o status da versão anterior; este script recalcula todos.
+
+A tabela structured_leads é lida em blocos de colunas (paginação pelo
+rowid) e as regras são aplicadas com NumPy sobre o bloco inteiro. Só as
+linhas cujo score/status mudou são gravadas, uma transação por bloco. O
+status só é trocado quando ainda é automático (hot/warm/cold); status
+manuais (contacted, qualified, converted, lost...) são mantidos.
+
+Os contadores da aba Leads vêm de structured_leads_summary, mantida por
+triggers criados no initialize() do structured-leads.js. Durante o
+reprocessamento o trigger de UPDATE é removido e recriado dentro da
+transação de cada bloco, e as diferenças por chatbot são aplicadas de uma
+vez (o trigger por linha deixaria 1M de atualizações ~4x mais lentas).
+
+Uso:
+    python3 lead_scoring.py rescore [--dry-run]
+    python3 lead_scoring.py summary           # reconstrói o resumo do zero
+    python3 lead_scoring.py stats [--verify]
+    python3 lead_scoring.py benchmark --leads 1000000
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DB_PATH = os.path.join('data', 'linkmagico.db')
+RULES_FILE = 'lead-scoring-rules.json'
+LEADS_MODULE = 'structured-leads.js'
+CHUNK_SIZE = 50000
+
+SUMMARY_TABLE = 'structured_leads_summary'
+UPDATE_TRIGGER = 'structured_leads_summary_update'
+# Status automáticos com coluna própria no resumo
+SUMMARY_STATUSES = ('hot', 'warm', 'cold')
+
+_COLUMN_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def load_rules(path=RULES_FILE):
+    """Ler e validar as regras (as chaves viram nomes de coluna no SQL)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    columns = list(rules.get('filled', {})) + list(rules.get('values', {})) + list(rules.get('above', {}))
+    for column in columns:
+        if not _COLUMN_NAME.match(column):
+            raise ValueError(f"coluna inválida nas regras: {column!r}")
+    statuses = [rule['status'] for rule in rules.get('status', [])]
+    if not statuses or any(status not in SUMMARY_STATUSES for status in statuses):
+        raise ValueError(f"status das regras devem estar em {SUMMARY_STATUSES}")
+
+    rules.setdefault('filled', {})
+    rules.setdefault('values', {})
+    rules.setdefault('above', {})
+    rules['status'] = sorted(rules['status'], key=lambda rule: rule['min'], reverse=True)
+    return rules
+
+
+def connect(path=DB_PATH, readonly=False):
+    """
+    Autocommit: as transações são abertas explicitamente (BEGIN IMMEDIATE).
+    readonly abre sem nunca escrever no banco (stats, rescore --dry-run)
+    """
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA query_only = 1')
+    else:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA busy_timeout = 30000')
+    conn.execute('PRAGMA cache_size = -131072')
+    conn.execute('PRAGMA mmap_size = 268435456')
+    return conn
+
+
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _trigger_sql(conn, name):
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _select_sql(rules):
+    """
+    Projeção do bloco: campos preenchidos já viram 0/1 no SQLite e textos
+    NULL viram '' (arrays de texto de largura fixa, bem mais rápidos que object)
+    """
+    exprs = ['rowid', 'chatbot_id', 'COALESCE(lead_score, 0)', "COALESCE(lead_status, '')"]
+    exprs += [f"COALESCE(length({column}), 0) > 0" for column in rules['filled']]
+    exprs += [f"COALESCE({column}, '')" for column in rules['values']]
+    exprs += list(rules['above'])
+    return f"SELECT {', '.join(exprs)} FROM structured_leads WHERE rowid > ? ORDER BY rowid LIMIT ?"
+
+
+def score_block(rules, columns):
+    """
+    Mesmo cálculo do calculateLeadScore/determineLeadStatus do
+    structured-leads.js, vetorizado sobre as colunas de um bloco
+    """
+    filled = columns[4:4 + len(rules['filled'])]
+    values = columns[4 + len(rules['filled']):4 + len(rules['filled']) + len(rules['values'])]
+    above = columns[4 + len(rules['filled']) + len(rules['values']):]
+    n = len(columns[0])
+
+    score = np.zeros(n, dtype=np.int64)
+    for points, column in zip(rules['filled'].values(), filled):
+        score += np.asarray(column, dtype=np.int64) * points
+    for options, column in zip(rules['values'].values(), values):
+        column = np.asarray(column, dtype=str)
+        for value, points in options.items():
+            score += (column == value) * points
+    for rule, column in zip(rules['above'].values(), above):
+        # NULL vira NaN, e NaN > x é falso (como null > x no JS)
+        score += (np.asarray(column, dtype=np.float64) > rule['than']) * rule['points']
+    np.minimum(score, rules['maxScore'], out=score)
+
+    statuses = [rule['status'] for rule in rules['status']]
+    conditions = [score >= rule['min'] for rule in rules['status']]
+    status = np.select(conditions, statuses, default=statuses[-1])
+    return score, status
+
+
+def _summary_deltas(chatbots, old_score, new_score, old_status, new_status):
+    """Diferenças por chatbot para as linhas alteradas de um bloco"""
+    ids, inverse = np.unique(chatbots, return_inverse=True)
+    deltas = [np.bincount(inverse, weights=(new_status == status).astype(np.int64)
+                          - (old_status == status).astype(np.int64), minlength=len(ids))
+              for status in SUMMARY_STATUSES]
+    deltas.append(np.bincount(inverse, weights=new_score - old_score, minlength=len(ids)))
+    matrix = np.rint(np.vstack(deltas)).astype(np.int64)
+    return [tuple(int(value) for value in matrix[:, i]) + (ids[i],)
+            for i in range(len(ids)) if matrix[:, i].any()]
+
+
+def rescore(conn, rules, chunk_size=CHUNK_SIZE, dry_run=False):
+    """Recalcular score/status de todos os leads, um bloco por transação"""
+    query = _select_sql(rules)
+    has_summary = _has_table(conn, SUMMARY_TABLE)
+    trigger_sql = _trigger_sql(conn, UPDATE_TRIGGER)
+    result = {'leads': 0, 'changed': 0, 'statusChanged': 0, 'blocks': 0}
+    last_rowid = 0
+
+    while True:
+        if not dry_run:
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(query, (last_rowid, chunk_size)).fetchall()
+            if not rows:
+                if not dry_run:
+                    conn.execute('COMMIT')
+                break
+
+            columns = list(zip(*rows))
+            old_score = np.asarray(columns[2], dtype=np.int64)
+            old_status = np.asarray(columns[3], dtype=str)
+            new_score, new_status = score_block(rules, columns)
+
+            # Status manual fica como está
+            automatic = np.isin(old_status, SUMMARY_STATUSES)
+            new_status = np.where(automatic, new_status, old_status).astype(str)
+
+            status_changed = new_status != old_status
+            changed = np.flatnonzero((new_score != old_score) | status_changed)
+            result['leads'] += len(rows)
+            result['changed'] += len(changed)
+            result['statusChanged'] += int(status_changed.sum())
+            result['blocks'] += 1
+            last_rowid = rows[-1][0]
+
+            if dry_run or not len(changed):
+                if not dry_run:
+                    conn.execute('COMMIT')
+                continue
+
+            rowids = np.asarray(columns[0], dtype=np.int64)[changed]
+            if trigger_sql:
+                conn.execute(f'DROP TRIGGER {UPDATE_TRIGGER}')
+            conn.executemany(
+                'UPDATE structured_leads SET lead_score = ?, lead_status = ? WHERE rowid = ?',
+                zip(new_score[changed].tolist(), [status or None for status in new_status[changed].tolist()],
+                    rowids.tolist())
+            )
+            if trigger_sql:
+                conn.executemany(
+                    f'UPDATE {SUMMARY_TABLE} SET hot = hot + ?, warm = warm + ?, cold = cold + ?, '
+                    'score_sum = score_sum + ?, updated_at = CURRENT_TIMESTAMP WHERE chatbot_id = ?',
+                    _summary_deltas(np.asarray(columns[1], dtype=str)[changed], old_score[changed],
+                                    new_score[changed], old_status[changed], new_status[changed])
+                )
+                conn.execute(trigger_sql)
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    if has_summary and not dry_run:
+        if not trigger_sql:
+            # Sem triggers o resumo não acompanhou as mudanças: refaz do zero
+            rebuild_summary(conn, chunk_size)
+        conn.execute(f'UPDATE {SUMMARY_TABLE} SET rules_version = ?, rescored_at = CURRENT_TIMESTAMP',
+                     (rules.get('version'),))
+    result['summary'] = has_summary
+    return result
+
+
+def _load_summary_columns(conn, chunk_size):
+    chatbots, statuses, scores, converted = [], [], [], []
+    last_rowid = 0
+    query = ("SELECT rowid, chatbot_id, COALESCE(lead_status, ''), COALESCE(lead_score, 0), converted_at IS NOT NULL "
+             'FROM structured_leads WHERE rowid > ? ORDER BY rowid LIMIT ?')
+    while True:
+        rows = conn.execute(query, (last_rowid, chunk_size)).fetchall()
+        if not rows:
+            break
+        columns = list(zip(*rows))
+        chatbots.extend(columns[1])
+        statuses.extend(columns[2])
+        scores.extend(columns[3])
+        converted.extend(columns[4])
+        last_rowid = rows[-1][0]
+    return (np.asarray(chatbots, dtype=str), np.asarray(statuses, dtype=str),
+            np.asarray(scores, dtype=np.int64), np.asarray(converted, dtype=np.int64))
+
+
+def aggregate_summary(chatbots, statuses, scores, converted):
+    """Contadores por chatbot com bincount (mesmas colunas do resumo)"""
+    if not len(chatbots):
+        return {}
+    ids, inverse = np.unique(chatbots, return_inverse=True)
+    size = len(ids)
+    totals = np.bincount(inverse, minlength=size)
+    by_status = [np.bincount(inverse, weights=(statuses == status), minlength=size) for status in SUMMARY_STATUSES]
+    converted_count = np.bincount(inverse, weights=converted, minlength=size)
+    score_sum = np.bincount(inverse, weights=scores, minlength=size)
+    return {
+        ids[i]: (int(totals[i]), *(int(counts[i]) for counts in by_status),
+                 int(converted_count[i]), int(score_sum[i]))
+        for i in range(size)
+    }
+
+
+def rebuild_summary(conn, chunk_size=CHUNK_SIZE):
+    """Refazer structured_leads_summary a partir da tabela (numa transação só)"""
+    if not _has_table(conn, SUMMARY_TABLE):
+        raise RuntimeError(f"{SUMMARY_TABLE} não existe (criada pelo initialize() do {LEADS_MODULE})")
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        summary = aggregate_summary(*_load_summary_columns(conn, chunk_size))
+        previous = {row[0]: row[1:] for row in
+                    conn.execute(f'SELECT chatbot_id, rules_version, rescored_at FROM {SUMMARY_TABLE}')}
+        conn.execute(f'DELETE FROM {SUMMARY_TABLE}')
+        conn.executemany(
+            f'INSERT INTO {SUMMARY_TABLE} (chatbot_id, total, hot, warm, cold, converted, score_sum, '
+            'rules_version, rescored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(chatbot_id, *counts, *previous.get(chatbot_id, (None, None)))
+             for chatbot_id, counts in summary.items()]
+        )
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    return summary
+
+
+def verify_summary(conn, chunk_size=CHUNK_SIZE):
+    """Chatbots cujo resumo diverge da tabela: {chatbot_id: (resumo, real)}"""
+    expected = aggregate_summary(*_load_summary_columns(conn, chunk_size))
+    stored = {row[0]: tuple(row[1:]) for row in conn.execute(
+        f'SELECT chatbot_id, total, hot, warm, cold, converted, score_sum FROM {SUMMARY_TABLE} WHERE total > 0')}
+    return {chatbot_id: (stored.get(chatbot_id), expected.get(chatbot_id))
+            for chatbot_id in set(stored) | set(expected)
+            if stored.get(chatbot_id) != expected.get(chatbot_id)}
+
+
+def print_stats(conn, verify=False, limit=20):
+    if not _has_table(conn, SUMMARY_TABLE):
+        print(f"⚠️ {SUMMARY_TABLE} não existe (criada pelo initialize() do {LEADS_MODULE})")
+        return 1
+
+    rows = conn.execute(
+        f'SELECT chatbot_id, total, hot, warm, cold, converted, score_sum, rules_version, rescored_at '
+        f'FROM {SUMMARY_TABLE} WHERE total > 0 ORDER BY total DESC'
+    ).fetchall()
+    print(f"📊 {len(rows)} chatbots, {sum(row[1] for row in rows)} leads")
+    print(f"{'chatbot':<32} {'total':>8} {'hot':>7} {'warm':>7} {'cold':>7} {'conv.':>6} {'média':>6}  regras")
+    for chatbot_id, total, hot, warm, cold, converted, score_sum, version, rescored_at in rows[:limit]:
+        rate = converted / total * 100
+        print(f"{chatbot_id[:32]:<32} {total:>8} {hot:>7} {warm:>7} {cold:>7} {rate:>5.1f}% "
+              f"{score_sum / total:>6.1f}  v{version or '-'} {rescored_at or ''}")
+    if len(rows) > limit:
+        print(f"   ... mais {len(rows) - limit} chatbots")
+
+    if verify:
+        drift = verify_summary(conn)
+        if drift:
+            print(f"❌ {len(drift)} chatbots com resumo divergente (rode: python3 lead_scoring.py summary)")
+            for chatbot_id, (stored, expected) in list(drift.items())[:10]:
+                print(f"   {chatbot_id}: resumo={stored} real={expected}")
+            return 1
+        print("✅ Resumo confere com a tabela structured_leads")
+    return 0
+
+
+def _leads_schema(module_path):
+    """CREATE TABLE/TRIGGER do structured-leads.js, para o benchmark usar o mesmo schema"""
+    with open(module_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    statements = re.findall(r'`\s*((?:CREATE|INSERT OR IGNORE INTO)\s[^`]*?structured_leads[^`]*)`', source)
+    table = [sql for sql in statements if sql.startswith('CREATE TABLE IF NOT EXISTS structured_leads (')]
+    return table, [sql for sql in statements if sql not in table]
+
+
+def benchmark(total, rules, chunk_size=CHUNK_SIZE, chatbots=500, module_path=LEADS_MODULE):
+    """Gerar leads sintéticos num banco temporário e medir o reprocessamento"""
+    rng = np.random.default_rng(42)
+    table, summary_schema = _leads_schema(module_path)
+    workdir = tempfile.mkdtemp(prefix='lead-scoring-')
+    try:
+        conn = connect(os.path.join(workdir, 'leads.db'))
+        conn.execute('PRAGMA journal_mode = WAL')
+        for sql in table:
+            conn.execute(sql)
+
+        started = time.perf_counter()
+        # Scores/status "antigos" aleatórios, como se as regras tivessem mudado
+        bots = rng.integers(0, chatbots, total)
+        optional = rng.random((6, total)) < 0.5
+        levels = np.array(['high', 'medium', 'low', None], dtype=object)[rng.integers(0, 4, total)]
+        messages = rng.integers(0, 20, total)
+        duration = rng.integers(0, 600, total)
+        old_score = rng.integers(0, 101, total)
+        old_status = np.array(['hot', 'warm', 'cold', 'hot', 'warm', 'cold', 'contacted', 'converted'],
+                              dtype=object)[rng.integers(0, 8, total)]
+
+        def rows():
+            for i in range(total):
+                yield (f'lead_{i}', f'bot_{bots[i]}', f'Lead {i}', f'lead{i}@exemplo.com',
+                       '11999990000' if optional[0, i] else None, 'Empresa' if optional[1, i] else None,
+                       'Gerente' if optional[2, i] else None, 'https://exemplo.com' if optional[3, i] else None,
+                       'Plano Pro' if optional[4, i] else None, levels[i], 'R$ 1-5 mil' if optional[5, i] else None,
+                       int(messages[i]), int(duration[i]), int(old_score[i]), old_status[i],
+                       '2026-01-01 00:00:00' if old_status[i] == 'converted' else None)
+
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO structured_leads (id, chatbot_id, name, email, phone, company, position, website, '
+            'interest_product, interest_level, budget_range, total_messages, conversation_duration, '
+            'lead_score, lead_status, converted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows()
+        )
+        conn.execute('COMMIT')
+        # Resumo e triggers depois da carga, como num banco que já tinha leads
+        for sql in summary_schema:
+            conn.execute(sql)
+        print(f"🧪 {total} leads sintéticos ({chatbots} chatbots) gerados em {time.perf_counter() - started:.1f} s")
+
+        started = time.perf_counter()
+        result = rescore(conn, rules, chunk_size)
+        elapsed = time.perf_counter() - started
+        print(f"⚡ {result['leads']} leads reprocessados em {elapsed:.2f} s "
+              f"({result['leads'] / elapsed:,.0f} leads/s, {result['blocks']} blocos de {chunk_size})")
+        print(f"   {result['changed']} alterados, {result['statusChanged']} com status novo")
+
+        started = time.perf_counter()
+        drift = verify_summary(conn, chunk_size)
+        print(f"🔍 Conferência do resumo em {time.perf_counter() - started:.2f} s: "
+              f"{'✅ ok' if not drift else f'❌ {len(drift)} chatbots divergentes'}")
+        conn.close()
+        return 0 if not drift else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reprocessa a pontuação dos leads estruturados em lote')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--rules', default=RULES_FILE)
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help='linhas por bloco/transação')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rescore_parser = sub.add_parser('rescore', help='recalcula score/status com as regras atuais')
+    rescore_parser.add_argument('--dry-run', action='store_true', help='só conta o que mudaria')
+    sub.add_parser('summary', help='reconstrói structured_leads_summary')
+    stats_parser = sub.add_parser('stats', help='mostra o resumo por chatbot')
+    stats_parser.add_argument('--verify', action='store_true', help='confere o resumo com a tabela')
+    bench_parser = sub.add_parser('benchmark', help='mede o reprocessamento com leads sintéticos')
+    bench_parser.add_argument('--leads', type=int, default=1000000)
+    bench_parser.add_argument('--chatbots', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("❌ NumPy é necessário para o reprocessamento em lote (pip install numpy)")
+        return 1
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"❌ Regras inválidas em {args.rules}: {error}")
+        return 1
+
+    if args.command == 'benchmark':
+        return benchmark(args.leads, rules, args.chunk, args.chatbots)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Banco não encontrado: {args.db}")
+        return 1
+    conn = connect(args.db, readonly=args.command == 'stats' or getattr(args, 'dry_run', False))
+    try:
+        if not _has_table(conn, 'structured_leads'):
+            print(f"⚠️ Tabela structured_leads não existe em {args.db}")
+            return 1
+        if args.command == 'rescore':
+            started = time.perf_counter()
+            result = rescore(conn, rules, args.chunk, args.dry_run)
+            verb = 'mudariam' if args.dry_run else 'alterados'
+            print(f"🎯 {result['leads']} leads em {time.perf_counter() - started:.2f} s: "
+                  f"{result['changed']} {verb} ({result['statusChanged']} de status), regras v{rules.get('version')}")
+            if not result['summary']:
+                print(f"⚠️ {SUMMARY_TABLE} não existe; contadores da aba Leads seguem agregando a tabela")
+        elif args.command == 'summary':
+            summary = rebuild_summary(conn, args.chunk)
+            print(f"📊 Resumo reconstruído: {len(summary)} chatbots")
+        elif args.command == 'stats':
+            return print_stats(conn, args.verify)
+    except (sqlite3.Error, RuntimeError) as error:
+        print(f"❌ Erro em {args.db}: {error}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Manutenção dos leads: log append-only, snapshot compactado e export CSV
+
+Converte o leads.json de cada tenant (data/tenants/leads-<apiKey>.json) e
+os backups em <apiKey>/backups/leads-backup-*.json num armazenamento em
+data/tenants/<apiKey>/leadlog/:
+
+  leads.ndjson      log append-only, uma operação por linha (put/del)
+  snapshot-N.ndjson versão compactada (geração N): uma linha por lead vivo
+  index.json        id -> (arquivo, offset) da versão atual de cada lead
+
+Importar de novo só acrescenta ao log o que mudou (hash por lead); o
+compact reescreve o snapshot e zera o log. O export CSV lê lead a lead
+pelo índice, com as colunas da aba Leads (update_panel_v3.py), sem
+carregar os arquivos inteiros.
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+TENANTS_DIR = os.path.join('data', 'tenants')
+STORE_DIRNAME = 'leadlog'
+LOG_FILE = 'leads.ndjson'
+SNAPSHOT_FILE = 'snapshot-{generation}.ndjson'
+INDEX_FILE = 'index.json'
+
+# Colunas da tabela da aba Leads -> campos possíveis do lead (leads.json ou structured_leads)
+CSV_COLUMNS = [
+    ('Nome', ('nome', 'name')),
+    ('Email', ('email',)),
+    ('Telefone', ('telefone', 'phone', 'whatsapp')),
+    ('Empresa', ('empresa', 'company')),
+    ('Score', ('score', 'lead_score')),
+    ('Status', ('status', 'lead_status')),
+    ('Data', ('timestamp', 'created_at')),
+]
+
+_CHUNK = 1 << 16
+_TENANT_FILE = re.compile(r'^leads-(.+)\.json$')
+_BACKUP_TIME = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}-\d{3}Z)')
+_SNAPSHOT, _LOG = 's', 'l'
+
+
+def iter_json_array(path, key=None):
+    """
+    Lê um array JSON item a item, em blocos, sem carregar o arquivo inteiro.
+    Com `key`, lê o array do campo `key` de um objeto (ex.: "leads" dos backups).
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key) if key else r'\s*\[')
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(_CHUNK)
+        eof = not buf
+        m = start.search(buf) if key else start.match(buf)
+        while m is None and not eof:
+            more = f.read(_CHUNK)
+            eof = not more
+            buf += more
+            m = start.search(buf) if key else start.match(buf)
+        if m is None:
+            raise ValueError(f'array "{key}" não encontrado' if key else 'array JSON não encontrado')
+        pos = m.end()
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                if pos >= len(buf):
+                    raise ValueError('fim do bloco')
+                item, end = decoder.raw_decode(buf, pos)
+                if end == len(buf) and not eof:
+                    raise ValueError('item pode continuar no próximo bloco')
+            except ValueError:
+                if eof:
+                    raise ValueError('JSON truncado')
+                buf = buf[pos:]
+                pos = 0
+                more = f.read(_CHUNK)
+                eof = not more
+                buf += more
+                continue
+            yield item
+            pos = end
+            if pos > _CHUNK:
+                buf = buf[pos:]
+                pos = 0
+
+
+def lead_key(lead):
+    return str(lead.get('id') or lead.get('email') or '')
+
+
+def lead_hash(lead):
+    data = json.dumps(lead, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+def _dumps(record):
+    return (json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LeadLog:
+    """Log append-only de um tenant, com snapshot e índice id -> offset"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    # ------------------------------------------------------------------
+    # Índice
+    # ------------------------------------------------------------------
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        self.generation = index.get('generation', 0)
+        self.log_size = index.get('log_size', 0)
+        self.leads = index.get('leads', {})   # id -> [arquivo, offset, hash]
+        self.imported = index.get('imported', {})
+        self._recover()
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, SNAPSHOT_FILE.format(generation=self.generation))
+
+    def _recover(self):
+        """Reaplica o que foi gravado no log depois do último índice salvo"""
+        if not os.path.exists(self.log_path):
+            self.log_size = 0
+            return
+        size = os.path.getsize(self.log_path)
+        if size <= self.log_size:
+            self.log_size = min(self.log_size, size)
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.log_size)
+            offset = self.log_size
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break   # escrita interrompida: a linha incompleta é descartada
+                self._apply(json.loads(line), offset)
+                offset += len(line)
+        if offset < size:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+        self.log_size = offset
+        self.save_index()
+
+    def _apply(self, record, offset):
+        if record['op'] == 'put':
+            self.leads[record['id']] = [_LOG, offset, record['hash']]
+        else:
+            self.leads.pop(record['id'], None)
+
+    def save_index(self):
+        index = {
+            'version': 1,
+            'generation': self.generation,
+            'log_size': self.log_size,
+            'count': len(self.leads),
+            'imported': self.imported,
+            'leads': self.leads,
+        }
+        _write_atomic(self.index_path, json.dumps(index, separators=(',', ':')).encode('utf-8'))
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def sync(self, leads, ts, source, remove_missing=True):
+        """
+        Acrescenta ao log só as diferenças entre `leads` (iterável) e o estado atual.
+        Se a leitura de `leads` falhar no meio, o log volta ao tamanho anterior.
+        Retorna (novos/alterados, removidos).
+        """
+        before = dict(self.leads)
+        seen = set()
+        changed = removed = 0
+        try:
+            with open(self.log_path, 'ab') as log:
+                offset = self.log_size
+                for lead in leads:
+                    key = lead_key(lead)
+                    # Id repetido: vale a primeira ocorrência, como o find() do server.js
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    digest = lead_hash(lead)
+                    current = self.leads.get(key)
+                    if current is not None and current[2] == digest:
+                        continue
+                    line = _dumps({'op': 'put', 'id': key, 'ts': ts, 'hash': digest, 'lead': lead})
+                    log.write(line)
+                    self.leads[key] = [_LOG, offset, digest]
+                    offset += len(line)
+                    changed += 1
+
+                if remove_missing:
+                    for key in [k for k in self.leads if k not in seen]:
+                        line = _dumps({'op': 'del', 'id': key, 'ts': ts})
+                        log.write(line)
+                        del self.leads[key]
+                        offset += len(line)
+                        removed += 1
+                log.flush()
+                os.fsync(log.fileno())
+        except BaseException:
+            self.leads = before
+            with open(self.log_path, 'r+b') as log:
+                log.truncate(self.log_size)
+            raise
+
+        self.log_size = offset
+        self.imported[source] = ts
+        self.save_index()
+        return changed, removed
+
+    def compact(self):
+        """
+        Grava o snapshot da próxima geração com a versão atual de cada lead e
+        zera o log. O índice só passa a apontar para o snapshot novo depois
+        que ele está completo em disco.
+        """
+        old_snapshot = self.snapshot_path
+        new_snapshot = os.path.join(self.directory, SNAPSHOT_FILE.format(generation=self.generation + 1))
+        leads = {}
+        with open(new_snapshot, 'wb') as out:
+            offset = 0
+            for key, lead in self.iter_leads():
+                entry = self.leads[key]
+                line = _dumps({'id': key, 'hash': entry[2], 'lead': lead})
+                out.write(line)
+                leads[key] = [_SNAPSHOT, offset, entry[2]]
+                offset += len(line)
+            out.flush()
+            os.fsync(out.fileno())
+
+        # Índice novo antes de zerar o log: se cair no meio, o log só é reaplicado
+        self.leads = leads
+        self.generation += 1
+        self.log_size = 0
+        self.save_index()
+        with open(self.log_path, 'wb'):
+            pass
+        if os.path.exists(old_snapshot):
+            os.remove(old_snapshot)
+        return offset
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def iter_leads(self):
+        """
+        (id, lead) de cada lead vivo, lidos pelo índice em ordem de arquivo e
+        offset (leitura sequencial, um lead por vez na memória).
+        """
+        order = sorted(self.leads.items(), key=lambda item: (item[1][0] != _SNAPSHOT, item[1][1]))
+        files = {}
+        try:
+            for key, (where, offset, _) in order:
+                f = files.get(where)
+                if f is None:
+                    f = files[where] = open(self.snapshot_path if where == _SNAPSHOT else self.log_path, 'rb')
+                f.seek(offset)
+                yield key, json.loads(f.readline())['lead']
+        finally:
+            for f in files.values():
+                f.close()
+
+    def get(self, key):
+        entry = self.leads.get(key)
+        if entry is None:
+            return None
+        with open(self.snapshot_path if entry[0] == _SNAPSHOT else self.log_path, 'rb') as f:
+            f.seek(entry[1])
+            return json.loads(f.readline())['lead']
+
+    def stats(self):
+        def size(path):
+            return os.path.getsize(path) if os.path.exists(path) else 0
+        return {
+            'leads': len(self.leads),
+            'generation': self.generation,
+            'log_bytes': size(self.log_path),
+            'snapshot_bytes': size(self.snapshot_path),
+            'in_log': sum(1 for entry in self.leads.values() if entry[0] == _LOG),
+        }
+
+
+# ----------------------------------------------------------------------
+# Tenants
+# ----------------------------------------------------------------------
+def tenant_paths(leads_path):
+    """(diretório do leadlog, diretório de backups) de um arquivo de leads"""
+    directory = os.path.dirname(leads_path) or '.'
+    m = _TENANT_FILE.match(os.path.basename(leads_path))
+    base = os.path.join(directory, m.group(1)) if m else directory
+    return os.path.join(base, STORE_DIRNAME), os.path.join(base, 'backups')
+
+
+def _backup_time(path):
+    m = _BACKUP_TIME.search(os.path.basename(path))
+    if m:
+        date, clock = m.group(1).split('T')
+        h, mi, s, ms = clock[:-1].split('-')
+        return f'{date}T{h}:{mi}:{s}.{ms}Z'
+    return datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def import_tenant(leads_path, store_dir=None, backups_dir=None, compact=False):
+    """Importa os backups (em ordem cronológica) e depois o leads.json atual"""
+    default_store, default_backups = tenant_paths(leads_path)
+    log = LeadLog(store_dir or default_store)
+    backups_dir = backups_dir or default_backups
+
+    sources = sorted(((_backup_time(path), path, 'leads')
+                      for path in glob.glob(os.path.join(backups_dir, 'leads-backup-*.json'))))
+    if os.path.exists(leads_path):
+        mtime = datetime.fromtimestamp(os.path.getmtime(leads_path), timezone.utc)
+        sources.append((mtime.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z', leads_path, None))
+
+    for ts, path, key in sources:
+        source = os.path.abspath(path)
+        if key is not None and source in log.imported:
+            continue    # backups são imutáveis: importados uma vez só
+        start = time.perf_counter()
+        try:
+            changed, removed = log.sync(iter_json_array(path, key), ts, source)
+        except (ValueError, OSError) as error:
+            print(f"⚠️  {path}: {error}")
+            continue
+        print(f"📥 {os.path.basename(path)}: +{changed} alterados, -{removed} removidos "
+              f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    if compact:
+        size = log.compact()
+        print(f"🗜️  Snapshot compactado: {len(log.leads)} leads, {size} bytes")
+    stats = log.stats()
+    print(f"✅ {log.directory}: {stats['leads']} leads, log {stats['log_bytes']} bytes, "
+          f"snapshot {stats['snapshot_bytes']} bytes")
+    return log
+
+
+def export_csv(log, out):
+    """Escreve o CSV da aba Leads lead a lead; retorna o número de linhas"""
+    writer = csv.writer(out)
+    writer.writerow([title for title, _ in CSV_COLUMNS])
+    rows = 0
+    for _, lead in log.iter_leads():
+        row = []
+        for _, fields in CSV_COLUMNS:
+            value = next((lead[field] for field in fields if lead.get(field) not in (None, '')), '')
+            row.append(value)
+        writer.writerow(row)
+        rows += 1
+    return rows
+
+
+def _store_for(args):
+    if args.store:
+        return LeadLog(args.store)
+    return LeadLog(tenant_paths(args.leads)[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Log append-only, compactação e export CSV dos leads')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('import', help='converte leads.json e backups para o log')
+    p.add_argument('leads', nargs='*', help='arquivos de leads (padrão: todos os tenants)')
+    p.add_argument('--store', help='diretório do log (padrão: <tenant>/leadlog)')
+    p.add_argument('--backups', help='diretório dos backups (padrão: <tenant>/backups)')
+    p.add_argument('--compact', action='store_true', help='compacta ao final')
+
+    for name, text in (('compact', 'reescreve o snapshot e zera o log'),
+                       ('export', 'exporta CSV com as colunas da aba Leads'),
+                       ('get', 'mostra um lead pelo id'),
+                       ('stats', 'tamanho do log e do snapshot')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('leads', help='arquivo de leads do tenant (para achar o log)')
+        p.add_argument('--store', help='diretório do log')
+        if name == 'export':
+            p.add_argument('--output', '-o', help='arquivo CSV (padrão: saída padrão)')
+        if name == 'get':
+            p.add_argument('id')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        paths = args.leads or sorted(glob.glob(os.path.join(TENANTS_DIR, 'leads-*.json')))
+        if not paths:
+            print("❌ Nenhum arquivo de leads encontrado")
+            return 1
+        if args.store and len(paths) > 1:
+            print("❌ --store só pode ser usado com um único arquivo de leads")
+            return 1
+        for path in paths:
+            import_tenant(path, args.store, args.backups, args.compact)
+        return 0
+
+    log = _store_for(args)
+    if args.command == 'compact':
+        size = log.compact()
+        print(f"🗜️  Snapshot compactado: {len(log.leads)} leads, {size} bytes")
+    elif args.command == 'export':
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                rows = export_csv(log, out)
+            print(f"📄 {rows} leads exportados para {args.output}")
+        else:
+            export_csv(log, sys.stdout)
+    elif args.command == 'get':
+        lead = log.get(args.id)
+        if lead is None:
+            print(f"❌ Lead não encontrado: {args.id}")
+            return 1
+        print(json.dumps(lead, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(log.stats(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
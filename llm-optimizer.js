@@ -10,6 +10,7 @@
  */
 
 const crypto = require('crypto');
+const fs = require('fs');
 
 /**
  * 💰 Tabela de custos por provedor (por 1M tokens)
@@ -148,6 +149,14 @@ class ResponseCache {
         this.cache = new Map();
         this.maxCacheSize = 1000;
         this.similarityThreshold = 0.85;
+
+        // Índice de similaridade (similarity_index.py serve); sem ele, varredura linear
+        this.indexUrl = process.env.SIMILARITY_INDEX_URL || null;
+        this.indexCandidates = 5;
+        this.indexTimeoutMs = 50;
+        // Índice sem candidatos: com o cache até este tamanho ainda confere tudo
+        // (o índice pode não ter recebido um add que falhou)
+        this.indexFallbackMax = parseInt(process.env.SIMILARITY_INDEX_FALLBACK_MAX || '500', 10);
     }
 
     /**
@@ -236,6 +245,90 @@ class ResponseCache {
         return null;
     }
 
+    /**
+     * Buscar resposta similar usando o índice de similaridade
+     * Só os top-k candidatos do índice passam pelo Levenshtein; se o serviço
+     * não estiver configurado, falhar ou responder sem lista de candidatos, cai
+     * na varredura linear (findSimilar). Sem candidatos confirmados, cache
+     * pequeno (indexFallbackMax) também passa pela varredura linear
+     */
+    async findSimilarIndexed(question, chatbotId) {
+        if (!this.indexUrl) {
+            return this.findSimilar(question, chatbotId);
+        }
+
+        const exactMatch = this.cache.get(`${chatbotId}:${this.generateHash(question)}`);
+        if (exactMatch) {
+            console.log('✅ Cache HIT (exato)');
+            return exactMatch.response;
+        }
+
+        let candidates;
+        try {
+            const response = await fetch(`${this.indexUrl}/similar`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ chatbotId, question, k: this.indexCandidates }),
+                signal: AbortSignal.timeout(this.indexTimeoutMs)
+            });
+            ({ candidates } = await response.json());
+        } catch (error) {
+            return this.findSimilar(question, chatbotId);
+        }
+        if (!Array.isArray(candidates)) {
+            return this.findSimilar(question, chatbotId);
+        }
+
+        const normalizedQuestion = question.toLowerCase().trim();
+        for (const candidate of candidates) {
+            const value = this.cache.get(candidate.key);
+            if (!value) continue;
+
+            const similarity = this.calculateSimilarity(
+                normalizedQuestion,
+                value.question.toLowerCase().trim()
+            );
+
+            if (similarity >= this.similarityThreshold) {
+                console.log(`✅ Cache HIT (similaridade: ${(similarity * 100).toFixed(1)}%, índice)`);
+                return value.response;
+            }
+        }
+
+        if (this.cache.size <= this.indexFallbackMax) {
+            return this.findSimilar(question, chatbotId);
+        }
+
+        console.log('❌ Cache MISS');
+        return null;
+    }
+
+    /**
+     * Avisar o índice de similaridade (sem bloquear; falhas são ignoradas)
+     */
+    notifyIndex(op, payload) {
+        if (!this.indexUrl) return;
+        fetch(`${this.indexUrl}/${op}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload),
+            signal: AbortSignal.timeout(this.indexTimeoutMs * 10)
+        }).catch(() => {});
+    }
+
+    /**
+     * Exportar as perguntas do cache (NDJSON) para o similarity_index.py build
+     */
+    exportQuestions(filePath = 'data/response-cache-questions.ndjson') {
+        const lines = [];
+        for (const [key, value] of this.cache.entries()) {
+            const chatbotId = key.slice(0, key.lastIndexOf(':'));
+            lines.push(JSON.stringify({ key, chatbotId, question: value.question }));
+        }
+        fs.writeFileSync(filePath, lines.length ? lines.join('\n') + '\n' : '');
+        return lines.length;
+    }
+
     /**
      * Adicionar resposta ao cache
      */
@@ -247,6 +340,7 @@ class ResponseCache {
         if (this.cache.size >= this.maxCacheSize) {
             const firstKey = this.cache.keys().next().value;
             this.cache.delete(firstKey);
+            this.notifyIndex('remove', { key: firstKey });
         }
 
         this.cache.set(key, {
@@ -256,6 +350,7 @@ class ResponseCache {
             timestamp: Date.now(),
             hits: 0
         });
+        this.notifyIndex('add', { key, chatbotId, question });
     }
 
     /**
@@ -294,7 +389,7 @@ class LLMOptimizer {
      */
     async optimizeCall(chatbotId, question, context = {}) {
         // 1. Verificar cache primeiro
-        const cachedResponse = this.responseCache.findSimilar(question, chatbotId);
+        const cachedResponse = await this.responseCache.findSimilarIndexed(question, chatbotId);
         
         if (cachedResponse) {
             this.trackUsage(chatbotId, 'cache', 0, 0);
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Inspeção e replay da memória limitada do servidor (bounded-store.js)
+
+Os mapas do server.js (conversationHistories, dataCache e os da
+superinteligência) são BoundedMap: LRU + TTL com cota por tenant e
+spill-to-disk. Este script:
+
+- stats: lê data/memory-store/stats.json (gravado a cada 5 min ou, com
+  --refresh, na hora: o servidor atende data/memory-store/dump.request) e
+  mostra tamanho, taxa de acerto e remoções por mapa;
+- heap: resume um .heapsnapshot do V8 (node --heapsnapshot-signal ou
+  DevTools) por construtor, para achar o que ainda cresce fora dos mapas;
+- replay: reexecuta o trace (MEMORY_STORE_TRACE=1) com outros limites e
+  mostra a taxa de acerto de cada configuração;
+- spill: tamanho do data/memory-spill e limpeza por idade;
+- soak: dirige os mapas no Node com tráfego sintético e compara o heap
+  com Map comum.
+
+Uso:
+  python3 memory_inspect.py stats [data/memory-store/stats.json ...] [--refresh]
+  python3 memory_inspect.py heap arquivo.heapsnapshot [--top 25]
+  python3 memory_inspect.py replay [data/memory-store/trace.ndjson] --max-entries 1000 5000
+  python3 memory_inspect.py spill [--gc-days 30]
+  python3 memory_inspect.py soak [--sessions 300000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import OrderedDict, defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATS_PATH = os.path.join('data', 'memory-store', 'stats.json')
+TRACE_PATH = os.path.join('data', 'memory-store', 'trace.ndjson')
+DUMP_REQUEST_PATH = os.path.join('data', 'memory-store', 'dump.request')
+SPILL_DIR = os.path.join('data', 'memory-spill')
+
+
+def _mb(value):
+    return f'{value / (1024 * 1024):.1f} MB'
+
+
+def default_tenant_of(key):
+    """Mesma regra do defaultTenantOf do bounded-store.js"""
+    head, sep, _ = key.partition(':')
+    if sep and head:
+        return head
+    return 'anonymous' if key.startswith('user_') else 'default'
+
+
+# ----------------------------------------------------------------------
+# stats
+# ----------------------------------------------------------------------
+def request_dump(stats_path=STATS_PATH, timeout=15.0):
+    """Pedir ao servidor um stats.json novo (o bounded-store.js confere o pedido a cada 5 s)"""
+    before = os.path.getmtime(stats_path) if os.path.exists(stats_path) else 0
+    os.makedirs(os.path.dirname(DUMP_REQUEST_PATH), exist_ok=True)
+    with open(DUMP_REQUEST_PATH, 'w', encoding='utf-8') as f:
+        f.write(str(time.time()))
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(stats_path) and os.path.getmtime(stats_path) > before:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def print_stats(paths):
+    dumps = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            dumps.append(json.load(f))
+    dumps.sort(key=lambda dump: dump['timestamp'])
+
+    if len(dumps) > 1:
+        print(f"{'quando':<26}{'uptime':>10}{'RSS':>12}{'heap':>12}{'entradas':>10}")
+        for dump in dumps:
+            entries = sum(store['size'] for store in dump['stores'])
+            print(f"{dump['timestamp']:<26}{dump['uptime'] / 3600:>9.1f}h{_mb(dump['rss']):>12}"
+                  f"{_mb(dump['heapUsed']):>12}{entries:>10}")
+        print()
+
+    dump = dumps[-1]
+    print(f"🧠 pid {dump['pid']} em {dump['timestamp']}: RSS {_mb(dump['rss'])}, heap {_mb(dump['heapUsed'])}")
+    print(f"{'mapa':<24}{'tamanho':>15}{'acerto':>8}{'sets':>9}{'LRU':>8}{'cota':>7}{'TTL':>8}"
+          f"{'disco':>8}{'volta':>7}")
+    for store in dump['stores']:
+        hit_rate = f"{store['hitRate']:.0%}" if store['hitRate'] is not None else '-'
+        print(f"{store['name']:<24}{store['size']:>7}/{store['maxEntries']:<7}{hit_rate:>8}{store['sets']:>9}"
+              f"{store['evictedLru']:>8}{store['evictedQuota']:>7}{store['expired']:>8}"
+              f"{store['spilled']:>8}{store['restored']:>7}")
+        top = sorted(store['tenants'].items(), key=lambda item: item[1], reverse=True)[:5]
+        if top:
+            print(f"{'':<24}tenants: " + ', '.join(f'{tenant}={count}' for tenant, count in top))
+
+
+# ----------------------------------------------------------------------
+# heap
+# ----------------------------------------------------------------------
+def summarize_heap(path, top=25):
+    """Contagem e self size por (tipo, construtor) de um .heapsnapshot do V8"""
+    with open(path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    meta = snapshot['snapshot']['meta']
+    fields = meta['node_fields']
+    width = len(fields)
+    type_index, name_index, size_index = fields.index('type'), fields.index('name'), fields.index('self_size')
+    types = meta['node_types'][0]
+    strings = snapshot['strings']
+    nodes = snapshot['nodes']
+
+    groups = defaultdict(lambda: [0, 0])
+    total = 0
+    for i in range(0, len(nodes), width):
+        node_type = types[nodes[i + type_index]]
+        size = nodes[i + size_index]
+        total += size
+        name = strings[nodes[i + name_index]] if node_type in ('object', 'closure', 'native') else f'({node_type})'
+        group = groups[(node_type, name)]
+        group[0] += 1
+        group[1] += size
+
+    rows = sorted(groups.items(), key=lambda item: item[1][1], reverse=True)
+    print(f"🧠 {path}: {len(nodes) // width} nós, {_mb(total)} de self size")
+    print(f"{'tipo':<10}{'construtor':<40}{'objetos':>10}{'self size':>14}{'%':>7}")
+    for (node_type, name), (count, size) in rows[:top]:
+        print(f"{node_type:<10}{name[:39]:<40}{count:>10}{_mb(size):>14}{size / total:>7.1%}")
+    for name in ('BoundedMap', 'Map'):
+        count, size = groups.get(('object', name), (0, 0))
+        print(f"   {name}: {count} instância(s), {_mb(size)} de self size")
+    return rows
+
+
+# ----------------------------------------------------------------------
+# replay
+# ----------------------------------------------------------------------
+class ReplayStore:
+    """Mesma política do BoundedMap, contando acertos do trace"""
+
+    def __init__(self, max_entries, tenant_quota, ttl_ms):
+        self.max_entries = max_entries
+        self.tenant_quota = tenant_quota or max_entries
+        self.ttl_ms = ttl_ms
+        self.items = OrderedDict()          # chave -> (tenant, último acesso)
+        self.tenants = defaultdict(OrderedDict)
+        self.evicted = set()
+        self.hits = self.misses = self.restorable = self.evictions = 0
+
+    def _remove(self, key):
+        tenant, _ = self.items.pop(key)
+        del self.tenants[tenant][key]
+        if tenant != 'anonymous':          # sessões anônimas não vão para o disco
+            self.evicted.add(key)
+        self.evictions += 1
+
+    def _touch(self, key, tenant, now):
+        self.items[key] = (tenant, now)
+        self.items.move_to_end(key)
+        self.tenants[tenant][key] = True
+        self.tenants[tenant].move_to_end(key)
+
+    def get(self, key, now, touch=True):
+        item = self.items.get(key)
+        if item is not None and self.ttl_ms and now - item[1] > self.ttl_ms:
+            self._remove(key)
+            item = None
+        if item is None:
+            self.misses += 1
+            if key in self.evicted:
+                self.restorable += 1        # o BoundedMap traria de volta do disco
+            return
+        self.hits += 1
+        if touch:
+            self._touch(key, item[0], now)
+
+    def set(self, key, now):
+        if key in self.items:
+            self._touch(key, self.items[key][0], now)
+            return
+        tenant = default_tenant_of(key)
+        while len(self.tenants[tenant]) >= self.tenant_quota:
+            self._remove(next(iter(self.tenants[tenant])))
+        while len(self.items) >= self.max_entries:
+            self._remove(next(iter(self.items)))
+        self.evicted.discard(key)
+        self._touch(key, tenant, now)
+
+
+def replay(path, max_entries_options, tenant_quota=None, ttl_hours=24.0, store_filter=None):
+    ops = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            if store_filter and op['s'] != store_filter:
+                continue
+            ops[op['s']].append((op['t'], op['op'], op['k']))
+
+    results = []
+    for name, store_ops in sorted(ops.items()):
+        for max_entries in max_entries_options:
+            store = ReplayStore(max_entries, tenant_quota, ttl_hours * 3600 * 1000)
+            for now, op, key in store_ops:
+                if op in ('get', 'has'):
+                    store.get(key, now, touch=op == 'get')
+                else:
+                    store.set(key, now)
+            lookups = store.hits + store.misses
+            results.append({
+                'store': name, 'maxEntries': max_entries, 'ops': len(store_ops),
+                'hitRate': store.hits / lookups if lookups else None,
+                'restorable': store.restorable, 'evictions': store.evictions, 'size': len(store.items),
+            })
+    return results
+
+
+# ----------------------------------------------------------------------
+# spill
+# ----------------------------------------------------------------------
+def spill_usage(spill_dir=SPILL_DIR, gc_days=None):
+    cutoff = time.time() - gc_days * 86400 if gc_days is not None else None
+    usage = defaultdict(lambda: [0, 0, 0])  # arquivos, bytes, removidos
+    try:
+        stores = sorted(os.listdir(spill_dir))
+    except FileNotFoundError:
+        return {}
+    for store in stores:
+        for folder, _, names in os.walk(os.path.join(spill_dir, store)):
+            for name in names:
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                if cutoff is not None and stat.st_mtime < cutoff:
+                    os.remove(path)
+                    usage[store][2] += 1
+                    continue
+                usage[store][0] += 1
+                usage[store][1] += stat.st_size
+    return usage
+
+
+# ----------------------------------------------------------------------
+# soak
+# ----------------------------------------------------------------------
+SOAK_SCRIPT = r"""
+const { createBoundedMap } = require(process.argv[1]);
+const [sessions, leads, bounded] = [Number(process.argv[2]), Number(process.argv[3]), process.argv[4] === '1'];
+const TENANTS = 20;
+console.log = () => {};
+const options = { maxEntries: 5000, tenantQuota: 2000, ttl: 24 * 3600 * 1000, spill: false };
+const memoria = bounded ? createBoundedMap('memoriaConversacional', options) : new Map();
+const padroes = bounded ? createBoundedMap('padroesSucesso', options) : new Map();
+const samples = [];
+for (let i = 1; i <= sessions; i++) {
+    // 90% anônimos (user_<timestamp>), 10% leads recorrentes com o prefixo do tenant (tenantKeyFor)
+    const lead = (i / 10) % leads;
+    const userId = i % 10 === 0 ? `tenant${lead % TENANTS}:lead_${lead}` : `user_${i}`;
+    if (!memoria.has(userId)) {
+        memoria.set(userId, { historico: [], preferencias: {}, ultimaInteracao: new Date() });
+    }
+    const memory = memoria.get(userId);
+    memory.historico.push({ timestamp: new Date(), mensagem: 'Quero saber o preço do plano ' + i });
+    if (memory.historico.length > 50) memory.historico = memory.historico.slice(-50);
+    if (!padroes.has(userId)) padroes.set(userId, []);
+    const lista = padroes.get(userId);
+    lista.push({ tipoMensagem: 'pergunta', timestamp: new Date() });
+    if (lista.length > 100) lista.splice(0, lista.length - 100);
+    if (i % Math.floor(sessions / 10) === 0) {
+        global.gc();
+        samples.push([i, process.memoryUsage().heapUsed, memoria.size]);
+    }
+}
+process.stdout.write(JSON.stringify(samples));
+"""
+
+
+def soak(sessions=300000, leads=20000):
+    results = {}
+    for bounded in (False, True):
+        output = subprocess.run(['node', '--expose-gc', '-e', SOAK_SCRIPT, os.path.join(ROOT, 'bounded-store.js'),
+                                 str(sessions), str(leads), '1' if bounded else '0'],
+                                capture_output=True, text=True, timeout=600)
+        if output.returncode != 0:
+            print(output.stderr.strip()[-500:], file=sys.stderr)
+            return None
+        results[bounded] = json.loads(output.stdout)
+
+    print(f"🧪 {sessions} interações (90% anônimas, {leads} leads recorrentes)")
+    print(f"{'interações':>12}{'Map heap':>14}{'entradas':>10}{'BoundedMap heap':>18}{'entradas':>10}")
+    for plain, bounded in zip(results[False], results[True]):
+        print(f"{plain[0]:>12}{_mb(plain[1]):>14}{plain[2]:>10}{_mb(bounded[1]):>18}{bounded[2]:>10}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspeção da memória limitada (bounded-store.js)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('stats', help='estatísticas gravadas pelo servidor')
+    p.add_argument('files', nargs='*', default=[STATS_PATH])
+    p.add_argument('--refresh', action='store_true', help='pede ao servidor um stats.json novo antes de ler')
+
+    p = sub.add_parser('heap', help='resumo de um .heapsnapshot por construtor')
+    p.add_argument('snapshot')
+    p.add_argument('--top', type=int, default=25)
+
+    p = sub.add_parser('replay', help='simula outros limites a partir do trace')
+    p.add_argument('trace', nargs='?', default=TRACE_PATH)
+    p.add_argument('--max-entries', type=int, nargs='+', default=[1000, 5000, 20000])
+    p.add_argument('--tenant-quota', type=int)
+    p.add_argument('--ttl-hours', type=float, default=24.0)
+    p.add_argument('--store', help='só um mapa')
+
+    p = sub.add_parser('spill', help='uso do data/memory-spill')
+    p.add_argument('--dir', default=SPILL_DIR)
+    p.add_argument('--gc-days', type=float, help='remove o que foi para o disco há mais de N dias')
+
+    p = sub.add_parser('soak', help='heap com Map comum x BoundedMap sob tráfego sintético')
+    p.add_argument('--sessions', type=int, default=300000)
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'stats':
+            if args.refresh and not request_dump():
+                print("⚠️  O servidor não atualizou o stats.json em 15 s (está rodando?)")
+            print_stats(args.files)
+        elif args.command == 'heap':
+            summarize_heap(args.snapshot, args.top)
+        elif args.command == 'replay':
+            results = replay(args.trace, args.max_entries, args.tenant_quota, args.ttl_hours, args.store)
+            print(f"{'mapa':<24}{'limite':>8}{'ops':>10}{'acerto':>8}{'do disco':>10}{'remoções':>10}")
+            for row in results:
+                hit_rate = f"{row['hitRate']:.1%}" if row['hitRate'] is not None else '-'
+                print(f"{row['store']:<24}{row['maxEntries']:>8}{row['ops']:>10}{hit_rate:>8}"
+                      f"{row['restorable']:>10}{row['evictions']:>10}")
+        elif args.command == 'spill':
+            usage = spill_usage(args.dir, args.gc_days)
+            if not usage:
+                print(f"⚠️  Nada em {args.dir}")
+            for store, (files, size, removed) in sorted(usage.items()):
+                print(f"💾 {store:<24}{files:>8} arquivo(s){_mb(size):>12}"
+                      + (f"  ({removed} removido(s))" if removed else ''))
+        else:
+            return 0 if soak(args.sessions) else 1
+    except (OSError, ValueError, KeyError) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+OCR em lote de imagens para a base de conhecimento
+
+Usa o modelo português que acompanha o repositório (por.traineddata):
+cada processo do pool carrega o Tesseract uma única vez (tesserocr) e
+reconhece lotes de imagens; o resultado de cada imagem fica em cache
+pelo sha256 do arquivo (data/ocr-cache), então reprocessar uma pasta só
+custa as imagens novas. O texto vira documentos no formato do
+knowledge-base.js (type 'ocr'), gravados direto em
+data/knowledge/<chatbotId>.json ou enviados para
+POST /api/knowledge/:chatbotId/document com o servidor no ar.
+
+Com o servidor rodando, use --api: o KnowledgeBaseManager mantém o JSON
+da base em memória e regrava o arquivo inteiro, apagando o que foi escrito
+por fora. Sem --api o script recusa gravar se encontrar o servidor em
+--server (padrão http://localhost:$PORT); --force ignora a checagem.
+
+Dependências opcionais: Pillow + tesserocr (modelo carregado uma vez por
+processo) ou pytesseract (chama o binário tesseract a cada imagem).
+
+Uso:
+  python3 ocr_batch.py CHATBOT pasta/ imagem.png ... [--workers 8]
+  python3 ocr_batch.py CHATBOT folhetos/ --api http://localhost:3000 --api-key KEY
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import secrets
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TESSDATA_DIR = ROOT                     # por.traineddata fica na raiz do repositório
+LANG = 'por'
+KB_DIR = os.path.join('data', 'knowledge')
+CACHE_DIR = os.path.join('data', 'ocr-cache')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.webp', '.gif')
+BATCH_SIZE = 8
+SERVER_URL = f"http://localhost:{os.environ.get('PORT', '3000')}"
+MIN_TEXT = 20                           # abaixo disso a imagem não vira documento
+
+
+def engine_name():
+    if Image is None:
+        return None
+    if tesserocr is not None:
+        return 'tesserocr'
+    if pytesseract is not None:
+        return 'pytesseract'
+    return None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def collect_images(paths):
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                images.extend(os.path.join(folder, name) for name in sorted(names)
+                              if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+    return sorted(dict.fromkeys(images))
+
+
+# ----------------------------------------------------------------------
+# Cache por hash
+# ----------------------------------------------------------------------
+def cache_path(cache_dir, sha256):
+    return os.path.join(cache_dir, sha256[:2], f'{sha256}.json')
+
+
+def load_cached(cache_dir, sha256):
+    try:
+        with open(cache_path(cache_dir, sha256), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def store_cached(cache_dir, result):
+    path = cache_path(cache_dir, result['sha256'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+# ----------------------------------------------------------------------
+# Workers: o modelo é carregado uma vez por processo
+# ----------------------------------------------------------------------
+_api = None
+
+
+def _init_worker(tessdata_dir):
+    global _api
+    if tesserocr is not None:
+        _api = tesserocr.PyTessBaseAPI(path=tessdata_dir + os.sep, lang=LANG)
+
+
+def _recognize(path, tessdata_dir):
+    with Image.open(path) as image:
+        image = image.convert('L')
+        if _api is not None:
+            _api.SetImage(image)
+            return _api.GetUTF8Text(), float(_api.MeanTextConf())
+        config = f'--tessdata-dir "{tessdata_dir}"'
+        data = pytesseract.image_to_data(image, lang=LANG, config=config, output_type=pytesseract.Output.DICT)
+        words = [(w, float(c)) for w, c in zip(data['text'], data['conf']) if w.strip() and float(c) >= 0]
+        confidence = sum(c for _, c in words) / len(words) if words else 0.0
+        return pytesseract.image_to_string(image, lang=LANG, config=config), confidence
+
+
+def ocr_batch(batch, tessdata_dir=TESSDATA_DIR):
+    """Reconhece um lote de (caminho, sha256); erros ficam no resultado da imagem"""
+    results = []
+    for path, sha256 in batch:
+        start = time.perf_counter()
+        try:
+            text, confidence = _recognize(path, tessdata_dir)
+            error = None
+        except (OSError, RuntimeError, ValueError) as exc:
+            text, confidence, error = '', 0.0, str(exc)
+        results.append({
+            'sha256': sha256,
+            'file': os.path.basename(path),
+            'text': '\n'.join(line.strip() for line in text.splitlines() if line.strip()),
+            'confidence': round(confidence, 1),
+            'engine': engine_name(),
+            'seconds': round(time.perf_counter() - start, 3),
+            'error': error,
+        })
+    return results
+
+
+def run_ocr(images, workers, cache_dir=CACHE_DIR, tessdata_dir=TESSDATA_DIR):
+    """Resultados na ordem das imagens; só as que não estão no cache vão para o pool"""
+    hashed = [(path, file_sha256(path)) for path in images]
+    results, pending, seen = {}, [], set()
+    for path, sha256 in hashed:
+        if sha256 in seen:
+            continue
+        seen.add(sha256)
+        cached = load_cached(cache_dir, sha256)
+        if cached is not None:
+            results[sha256] = dict(cached, file=os.path.basename(path), cached=True)
+        else:
+            pending.append((path, sha256))
+
+    batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+    if batches:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tessdata_dir,)) as pool:
+            for batch in pool.map(ocr_batch, batches, [tessdata_dir] * len(batches)):
+                for result in batch:
+                    if result['error'] is None:
+                        store_cached(cache_dir, result)
+                    results[result['sha256']] = dict(result, cached=False)
+    return [dict(results[sha256], path=path) for path, sha256 in hashed]
+
+
+# ----------------------------------------------------------------------
+# Formato da base de conhecimento
+# ----------------------------------------------------------------------
+def _now():
+    # Mesmo formato do new Date().toISOString()
+    now = datetime.now(timezone.utc)
+    return now.strftime('%Y-%m-%dT%H:%M:%S.') + f'{now.microsecond // 1000:03d}Z'
+
+
+def to_document(result):
+    """Documento como o addDocument do knowledge-base.js monta"""
+    metadata = {'type': 'ocr', 'source': result['file'], 'sha256': result['sha256'],
+                'confidence': result['confidence'], 'engine': result['engine']}
+    return {
+        'id': secrets.token_hex(8),
+        'type': 'ocr',
+        'title': os.path.splitext(result['file'])[0],
+        'content': result['text'],
+        'metadata': metadata,
+        'addedAt': _now(),
+        'active': True,
+    }
+
+
+def add_to_kb_file(chatbot_id, results, kb_dir=KB_DIR):
+    """Acrescenta documentos ao JSON da base (imagens já presentes, pelo sha256, são puladas)"""
+    path = os.path.join(kb_dir, f'{chatbot_id}.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            kb = json.load(f)
+    except FileNotFoundError:
+        kb = {'chatbotId': chatbot_id, 'sources': [], 'faqs': [], 'documents': [], 'manualEntries': [],
+              'lastUpdated': _now(), 'totalEntries': 0}
+
+    known = {(doc.get('metadata') or {}).get('sha256') for doc in kb['documents']}
+    added = []
+    for result in results:
+        if result['sha256'] in known:
+            continue
+        known.add(result['sha256'])
+        kb['documents'].append(to_document(result))
+        added.append(result)
+    if added:
+        kb['totalEntries'] = kb.get('totalEntries', 0) + len(added)
+        kb['lastUpdated'] = _now()
+        os.makedirs(kb_dir, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(kb, f, indent=2, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    return added
+
+
+def post_to_api(chatbot_id, results, api_url, api_key=None):
+    """Envia cada documento para POST /api/knowledge/:chatbotId/document"""
+    added = []
+    for result in results:
+        document = to_document(result)
+        body = json.dumps({'title': document['title'], 'content': document['content'],
+                           'metadata': document['metadata']}).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if api_key:
+            # requireApiKey (server.js) lê apiKey da query/corpo ou Authorization: Bearer
+            headers['Authorization'] = f'Bearer {api_key}'
+        url = f"{api_url.rstrip('/')}/api/knowledge/{chatbot_id}/document"
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=30) as response:
+            if response.geturl() != url:
+                # Sem chave válida o servidor redireciona para "/"
+                raise ValueError('API key ausente ou inválida (redirecionado para a página inicial)')
+            if json.load(response).get('success'):
+                added.append(result)
+    return added
+
+
+def server_running(url):
+    """Qualquer resposta HTTP (mesmo erro/redirect) indica servidor no ar"""
+    try:
+        with urllib.request.urlopen(url, timeout=2):
+            return True
+    except urllib.error.HTTPError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='OCR em lote (por.traineddata) para a base de conhecimento')
+    parser.add_argument('chatbot_id')
+    parser.add_argument('paths', nargs='+', help='imagens ou pastas')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--kb-dir', default=KB_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--tessdata', default=TESSDATA_DIR, help='pasta com por.traineddata')
+    parser.add_argument('--api', help='URL do servidor (envia pela API em vez de gravar o JSON)')
+    parser.add_argument('--api-key')
+    parser.add_argument('--server', default=SERVER_URL,
+                        help='sem --api, recusa gravar o JSON se este servidor responder')
+    parser.add_argument('--force', action='store_true',
+                        help='grava o JSON mesmo com o servidor no ar (o servidor pode sobrescrever)')
+    parser.add_argument('--min-text', type=int, default=MIN_TEXT)
+    args = parser.parse_args(argv)
+
+    if engine_name() is None:
+        print("❌ OCR indisponível: instale Pillow e tesserocr (ou pytesseract + tesseract)", file=sys.stderr)
+        return 1
+    if not os.path.exists(os.path.join(args.tessdata, f'{LANG}.traineddata')):
+        print(f"❌ {LANG}.traineddata não encontrado em {args.tessdata}", file=sys.stderr)
+        return 1
+
+    if not args.api and not args.force and server_running(args.server):
+        print(f"❌ Servidor no ar em {args.server}: use --api {args.server} --api-key KEY "
+              f"(gravar {args.kb_dir} direto seria sobrescrito pelo servidor) ou --force", file=sys.stderr)
+        return 1
+
+    images = collect_images(args.paths)
+    if not images:
+        print("⚠️  Nenhuma imagem encontrada")
+        return 0
+
+    start = time.perf_counter()
+    results = run_ocr(images, args.workers, args.cache_dir, args.tessdata)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if r['error']]
+    usable = [r for r in results if not r['error'] and len(r['text']) >= args.min_text]
+    cached = sum(1 for r in results if r['cached'])
+    print(f"🔍 {len(results)} imagem(ns) em {elapsed:.1f}s com {args.workers} worker(s) ({engine_name()}): "
+          f"{cached} do cache, {len(failed)} com erro, {len(usable)} com texto")
+    for result in failed:
+        print(f"   ❌ {result['path']}: {result['error']}")
+
+    try:
+        if args.api:
+            added = post_to_api(args.chatbot_id, usable, args.api, args.api_key)
+        else:
+            added = add_to_kb_file(args.chatbot_id, usable, args.kb_dir)
+    except (OSError, urllib.error.URLError, ValueError) as error:
+        print(f"❌ Erro ao gravar na base de conhecimento: {error}", file=sys.stderr)
+        return 1
+
+    print(f"✅ {len(added)} documento(s) adicionados à base {args.chatbot_id}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Blocos injetados no painel com marcadores e manifesto de hashes
+
+Cada bloco injetado fica entre marcadores HTML com o sha256 do conteúdo:
+
+    <!-- linkmagico:block nome sha256=... -->
+    ...
+    <!-- /linkmagico:block nome -->
+
+O manifesto (public/.panel-manifest.json) guarda, por arquivo, o tamanho,
+o mtime e o hash de cada bloco. Numa nova execução:
+  - bloco igual ao registrado e arquivo intocado -> nada é lido nem escrito
+  - bloco presente com hash diferente            -> reescreve só a partir do bloco
+  - bloco ausente                                -> insere antes da âncora
+Assim rodar o script várias vezes nunca duplica o HTML.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+MANIFEST_PATH = os.path.join('public', '.panel-manifest.json')
+
+_START_PREFIX = '<!-- linkmagico:block {name} sha256='
+_START = _START_PREFIX + '{digest} -->'
+_END = '<!-- /linkmagico:block {name} -->'
+
+
+def block_digest(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def wrap_block(name, html):
+    """Envolve o HTML com os marcadores do bloco"""
+    return (_START.format(name=name, digest=block_digest(html)) + html +
+            _END.format(name=name))
+
+
+def find_block(data, name):
+    """
+    Procura o bloco `name` nos bytes do arquivo.
+    Retorna (início, fim, sha256) em bytes ou None.
+    """
+    start_re = re.compile(re.escape(_START_PREFIX.format(name=name).encode('utf-8')) +
+                          rb'([0-9a-f]{64}) -->')
+    m = start_re.search(data)
+    if m is None:
+        return None
+    end_marker = _END.format(name=name).encode('utf-8')
+    end = data.find(end_marker, m.end())
+    if end == -1:
+        raise ValueError(f'Bloco "{name}" sem marcador de fim')
+    return m.start(), end + len(end_marker), m.group(1).decode('ascii')
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def upsert_block(path, name, html, anchor='</body>', legacy_marker=None,
+                 manifest_path=MANIFEST_PATH):
+    """
+    Garante que o bloco `name` com o conteúdo `html` está em `path`.
+
+    Retorna 'unchanged', 'replaced', 'inserted' ou 'legacy' (o conteúdo já
+    existe no arquivo sem marcadores, injetado por uma versão antiga do script).
+    Lança LookupError se a âncora de inserção não existir.
+    """
+    digest = block_digest(html)
+    manifest = load_manifest(manifest_path)
+    entry = manifest.get(path, {})
+    recorded = entry.get('blocks', {}).get(name)
+
+    # Caminho rápido: arquivo não mudou desde a última execução
+    size, mtime = _stat_key(path)
+    if recorded and recorded['hash'] == digest and entry.get('size') == size and entry.get('mtime_ns') == mtime:
+        return 'unchanged'
+
+    with open(path, 'r+b') as f:
+        data = f.read()
+        found = find_block(data, name)
+        block = wrap_block(name, html).encode('utf-8')
+
+        if found is not None:
+            start, end, current = found
+            if current == digest:
+                status = 'unchanged'
+            else:
+                f.seek(start)
+                if end - start == len(block):
+                    f.write(block)
+                else:
+                    f.write(block + data[end:])
+                    f.truncate()
+                status = 'replaced'
+            end = start + len(block)
+        else:
+            if legacy_marker and legacy_marker.encode('utf-8') in data:
+                return 'legacy'
+            start = data.rfind(anchor.encode('utf-8'))
+            if start == -1:
+                raise LookupError(f'Âncora "{anchor}" não encontrada em {path}')
+            f.seek(start)
+            f.write(block + data[start:])
+            end = start + len(block)
+            status = 'inserted'
+
+    size, mtime = _stat_key(path)
+    entry['size'] = size
+    entry['mtime_ns'] = mtime
+    entry.setdefault('blocks', {})[name] = {'hash': digest, 'start': start, 'end': end}
+    manifest[path] = entry
+    save_manifest(manifest, manifest_path)
+    return status
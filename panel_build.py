@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Build do painel: tira o CSS/JS inline do HTML injetado e gera assets estáticos
+
+- estilos inline repetidos viram classes geradas (lm-s1, lm-s2, ...)
+- o <style> e o <script> do bloco vão para public/<prefixo>.<hash>.css/.js,
+  minificados, ao lado de public/app_scripts.js
+- o HTML passa a referenciar os dois arquivos
+
+Como o nome leva o hash do conteúdo, os assets podem ser servidos com cache
+de longo prazo (ver setStaticCacheHeaders no server.js).
+"""
+
+import glob
+import hashlib
+import os
+import re
+
+ASSET_DIR = 'public'
+
+_STYLE_BLOCK = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.DOTALL | re.IGNORECASE)
+_SCRIPT_BLOCK = re.compile(r'<script\b[^>]*>(.*?)</script\s*>', re.DOTALL | re.IGNORECASE)
+_OPEN_TAG = re.compile(r'''<([A-Za-z][\w-]*)((?:[^>"']|"[^"]*"|'[^']*')*)>''')
+_STYLE_ATTR = re.compile(r'''\sstyle\s*=\s*"([^"]*)"''')
+_CLASS_ATTR = re.compile(r'''\sclass\s*=\s*"([^"]*)"''')
+_ID_ATTR = re.compile(r'''\sid\s*=\s*"''')
+
+
+def normalize_style(style):
+    """'color:red ;  padding: 1rem' -> 'color:red;padding:1rem'"""
+    declarations = []
+    for declaration in style.split(';'):
+        if ':' in declaration:
+            prop, value = declaration.split(':', 1)
+            declarations.append(f"{prop.strip().lower()}:{' '.join(value.split())}")
+    return ';'.join(declarations)
+
+
+def extract_blocks(html):
+    """Separa o markup do conteúdo dos blocos <style> e <script> (sem src)"""
+    css = [m.group(1) for m in _STYLE_BLOCK.finditer(html)]
+    html = _STYLE_BLOCK.sub('', html)
+
+    js = []
+
+    def take_script(m):
+        if 'src=' in m.group(0)[:m.start(1) - m.start(0)]:
+            return m.group(0)
+        js.append(m.group(1))
+        return ''
+
+    html = _SCRIPT_BLOCK.sub(take_script, html)
+    return html, '\n'.join(css), '\n'.join(js)
+
+
+def hoist_inline_styles(markup, scope='', min_count=2, prefix='lm-s'):
+    """
+    Troca estilos inline que aparecem `min_count` vezes ou mais por classes.
+    Elementos com id ficam de fora: o JS do painel altera element.style deles.
+    Retorna (markup, css das classes geradas).
+    """
+    def candidates():
+        for m in _OPEN_TAG.finditer(markup):
+            attrs = m.group(2)
+            if _ID_ATTR.search(attrs):
+                continue
+            style = _STYLE_ATTR.search(attrs)
+            if style:
+                yield normalize_style(style.group(1))
+
+    counts = {}
+    for style in candidates():
+        counts[style] = counts.get(style, 0) + 1
+
+    classes = {}
+    for style, count in counts.items():
+        if count >= min_count and style:
+            classes[style] = f'{prefix}{len(classes) + 1}'
+
+    def rewrite(m):
+        attrs = m.group(2)
+        if _ID_ATTR.search(attrs):
+            return m.group(0)
+        style = _STYLE_ATTR.search(attrs)
+        if not style:
+            return m.group(0)
+        name = classes.get(normalize_style(style.group(1)))
+        if name is None:
+            return m.group(0)
+        attrs = attrs[:style.start()] + attrs[style.end():]
+        existing = _CLASS_ATTR.search(attrs)
+        if existing:
+            attrs = (attrs[:existing.start(1)] + existing.group(1) + ' ' + name +
+                     attrs[existing.end(1):])
+        else:
+            attrs = f' class="{name}"' + attrs
+        return f'<{m.group(1)}{attrs}>'
+
+    markup = _OPEN_TAG.sub(rewrite, markup)
+    selector = f'{scope} ' if scope else ''
+    css = '\n'.join(f'{selector}.{name}{{{style}}}' for style, name in classes.items())
+    return markup, css
+
+
+# At-rules cujo bloco contém regras (seletores), não declarações.
+_CSS_RULE_BLOCKS = ('@media', '@supports', '@document', '@layer', '@container',
+                    '@scope', '@keyframes', '@-webkit-keyframes')
+_CSS_TIGHT = '{};,>'
+# Depois destes caracteres (ou palavras) uma '/' abre regex, não divisão.
+_JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                      'delete', 'void', 'throw', 'yield', 'await', 'instanceof'}
+
+
+def _scan_quoted(text, i, quote):
+    """Índice logo após a string iniciada em text[i] (respeita escapes)."""
+    i += 1
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+            continue
+        if text[i] == quote or (quote != '`' and text[i] == '\n'):
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_css(css):
+    """
+    Remove comentários e espaços redundantes sem tocar em strings. Espaço
+    antes/depois de ':' só é removido dentro de blocos de declaração — no
+    seletor ele é um combinador ('div :hover' != 'div:hover').
+    """
+    out = []
+    stack = []
+    prelude_start = 0
+    pending_space = False
+    i = 0
+    while i < len(css):
+        c = css[i]
+        if c.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end < 0 else end + 2
+            pending_space = True
+            continue
+
+        in_declarations = bool(stack) and stack[-1] == 'decl'
+        tight = _CSS_TIGHT + ':' if in_declarations else _CSS_TIGHT
+        if pending_space and out and out[-1][-1] not in tight and c not in tight:
+            out.append(' ')
+        pending_space = False
+
+        if c in '"\'':
+            end = _scan_quoted(css, i, c)
+            out.append(css[i:end])
+            i = end
+            continue
+        if c == '{':
+            prelude = ''.join(out[prelude_start:]).strip()
+            stack.append('rules' if prelude.lower().startswith(_CSS_RULE_BLOCKS) else 'decl')
+        elif c == '}':
+            if stack:
+                stack.pop()
+            if out and out[-1] == ';':
+                out.pop()
+        out.append(c)
+        if c in '{};':
+            prelude_start = len(out)
+        i += 1
+    return ''.join(out).strip()
+
+
+def _js_regex_allowed(code):
+    """Uma '/' depois de `code` começa um literal de regex?"""
+    stripped = code.rstrip()
+    if not stripped:
+        return True
+    if stripped[-1] in _JS_REGEX_PRECEDERS:
+        return True
+    word = re.search(r'[\w$]+$', stripped)
+    return bool(word) and word.group(0) in _JS_REGEX_KEYWORDS
+
+
+def _scan_regex(js, i):
+    """Índice logo após o literal de regex iniciado em js[i] (inclui flags)."""
+    i += 1
+    in_class = False
+    while i < len(js) and js[i] != '\n':
+        c = js[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(js) and (js[i].isalnum() or js[i] == '_'):
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _scan_template(js, i):
+    """Índice logo após o template literal iniciado em js[i], com ${...} aninhados."""
+    i += 1
+    while i < len(js):
+        c = js[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '`':
+            return i + 1
+        if js.startswith('${', i):
+            depth = 1
+            i += 2
+            while i < len(js) and depth:
+                c = js[i]
+                if c in '"\'`':
+                    i = _scan_template(js, i) if c == '`' else _scan_quoted(js, i, c)
+                    continue
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    depth -= 1
+                i += 1
+            continue
+        i += 1
+    return i
+
+
+def minify_js(js):
+    """
+    Minificação conservadora: remove comentários, indentação e linhas em
+    branco. Strings, template literals e regex passam intactos, e as quebras
+    de linha ficam (sem risco com ASI).
+    """
+    out = []
+    code = []
+
+    def flush_code():
+        if code:
+            out.append(re.sub(r'[ \t]*\n\s*', '\n', ''.join(code)))
+            code.clear()
+
+    i = 0
+    while i < len(js):
+        c = js[i]
+        if js.startswith('//', i):
+            end = js.find('\n', i)
+            i = len(js) if end < 0 else end
+            continue
+        if js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            end = len(js) if end < 0 else end + 2
+            code.append('\n' if '\n' in js[i:end] else ' ')
+            i = end
+            continue
+        literal = c in '"\'`'
+        if c == '/':
+            before = ''.join(code[-32:])
+            if not before.strip() and out:
+                before = out[-1][-32:]
+            literal = _js_regex_allowed(before)
+        if literal:
+            if c == '`':
+                end = _scan_template(js, i)
+            elif c == '/':
+                end = _scan_regex(js, i)
+            else:
+                end = _scan_quoted(js, i, c)
+            flush_code()
+            out.append(js[i:end])
+            i = end
+            continue
+        code.append(c)
+        i += 1
+    flush_code()
+    return ''.join(out).strip()
+
+
+def write_hashed_asset(name, ext, content, directory=ASSET_DIR):
+    """
+    Grava public/<name>.<hash>.<ext> e remove versões antigas do mesmo asset.
+    Retorna o nome do arquivo gerado.
+    """
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:8]
+    filename = f'{name}.{digest}.{ext}'
+    path = os.path.join(directory, filename)
+
+    for old in glob.glob(os.path.join(directory, f'{name}.*.{ext}')):
+        if os.path.basename(old) != filename and re.fullmatch(
+                rf'{re.escape(name)}\.[0-9a-f]{{8}}\.{ext}', os.path.basename(old)):
+            os.remove(old)
+
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    return filename
+
+
+def build_block(html, name, scope='', directory=ASSET_DIR):
+    """
+    Gera os assets do bloco `html` e devolve o HTML reescrito e as estatísticas.
+    """
+    markup, css, js = extract_blocks(html)
+    markup, class_css = hoist_inline_styles(markup, scope=scope)
+
+    css = minify_css(class_css + '\n' + css)
+    js = minify_js(js)
+
+    parts = []
+    stats = {'original': len(html.encode('utf-8'))}
+    if css:
+        css_file = write_hashed_asset(name, 'css', css, directory)
+        parts.append(f'\n    <link rel="stylesheet" href="/{css_file}">')
+        stats['css'] = (css_file, len(css.encode('utf-8')))
+    parts.append(markup)
+    if js:
+        js_file = write_hashed_asset(name, 'js', js, directory)
+        parts.append(f'<script src="/{js_file}"></script>\n    ')
+        stats['js'] = (js_file, len(js.encode('utf-8')))
+
+    built = ''.join(parts)
+    stats['html'] = len(built.encode('utf-8'))
+    return built, stats
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Fragmentos de abas carregados sob demanda
+
+O conteúdo de cada aba sai do HTML do painel e vira um arquivo em
+public/fragments/. No painel fica só o contêiner vazio com
+data-fragment="/fragments/<nome>.html?v=<hash>", e o LOADER_JS busca o
+fragmento na primeira vez que a aba é aberta.
+"""
+
+import hashlib
+import os
+import re
+
+from html_insert import find_elements
+
+FRAGMENT_DIR = os.path.join('public', 'fragments')
+FRAGMENT_URL = '/fragments'
+
+# Loader: define loadTabFragment(containerId) e lazyTabs(nomeDaFunção, idDoContêiner)
+LOADER_JS = '''
+    <script>
+        // Carrega sob demanda o conteúdo das abas gerado em public/fragments/
+        window.loadTabFragment = window.loadTabFragment || function (containerId) {
+            const container = document.getElementById(containerId);
+            if (!container || !container.dataset.fragment) return Promise.resolve();
+            if (!container._fragmentPromise) {
+                container._fragmentPromise = fetch(container.dataset.fragment)
+                    .then(response => {
+                        if (!response.ok) throw new Error('HTTP ' + response.status);
+                        return response.text();
+                    })
+                    .then(html => {
+                        container.innerHTML = html;
+                        delete container.dataset.fragment;
+                    })
+                    .catch(error => {
+                        container._fragmentPromise = null;
+                        console.error('Erro ao carregar aba:', error);
+                    });
+            }
+            return container._fragmentPromise;
+        };
+
+        // Envolve uma função de troca de aba para buscar o fragmento antes de abrir
+        window.lazyTabs = window.lazyTabs || function (fnName, containerIdFor) {
+            const original = window[fnName];
+            if (typeof original !== 'function' || original._lazy) return;
+            const wrapped = function (name) {
+                const self = this;
+                const args = arguments;
+                return window.loadTabFragment(containerIdFor(name)).then(() => original.apply(self, args));
+            };
+            wrapped._lazy = true;
+            window[fnName] = wrapped;
+        };
+    </script>
+'''
+
+
+_FRAGMENT_ATTR = re.compile(r'data-fragment="' + re.escape(FRAGMENT_URL) + r'/([\w.-]+)\?v=([0-9a-f]*)"')
+
+
+def _fragment_filename(name):
+    return f'{name}.html'
+
+
+def _fragment_version(data):
+    return hashlib.sha256(data).hexdigest()[:8]
+
+
+def write_fragment(name, html, directory=FRAGMENT_DIR):
+    """Grava o fragmento e devolve a URL com o hash do conteúdo como versão"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _fragment_filename(name))
+    data = html.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            unchanged = f.read() == data
+    except FileNotFoundError:
+        unchanged = False
+    if not unchanged:
+        with open(path, 'wb') as f:
+            f.write(data)
+    return f'{FRAGMENT_URL}/{_fragment_filename(name)}?v={_fragment_version(data)}'
+
+
+def refresh_fragment_urls(path, directory=FRAGMENT_DIR):
+    """
+    Acerta o ?v= de cada data-fragment de `path` com o conteúdo atual do
+    fragmento em disco (ex.: seção já presente no painel cujo fragmento foi
+    regravado). Devolve quantas URLs mudaram.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    changed = 0
+
+    def rewrite(match):
+        nonlocal changed
+        try:
+            with open(os.path.join(directory, match.group(1)), 'rb') as f:
+                version = _fragment_version(f.read())
+        except FileNotFoundError:
+            return match.group(0)
+        if version == match.group(2):
+            return match.group(0)
+        changed += 1
+        return f'data-fragment="{FRAGMENT_URL}/{match.group(1)}?v={version}"'
+
+    html = _FRAGMENT_ATTR.sub(rewrite, html)
+    if changed:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+    return changed
+
+
+def split_fragments(html, containers, directory=FRAGMENT_DIR):
+    """
+    Esvazia os contêineres {id do elemento: nome do fragmento} de `html`,
+    grava o conteúdo de cada um como fragmento e devolve
+    (html só com os contêineres vazios, {nome: tamanho em bytes}).
+    Lança LookupError se algum contêiner não existir.
+    """
+    anchors = {('div', 'id', element_id): name for element_id, name in containers.items()}
+    elements = find_elements(html, anchors)
+    missing = [anchor[2] for anchor in anchors if anchor not in elements]
+    if missing:
+        raise LookupError('Contêiner não encontrado: ' + ', '.join(missing))
+
+    parts = []
+    sizes = {}
+    pos = 0
+    for anchor, element in sorted(elements.items(), key=lambda item: item[1].start):
+        name = anchors[anchor]
+        inner = html[element.open_end:element.close_start]
+        url = write_fragment(name, inner, directory)
+        sizes[name] = len(inner.encode('utf-8'))
+
+        open_tag = html[element.start:element.open_end]
+        parts.append(html[pos:element.start])
+        parts.append(open_tag[:-1] + f' data-fragment="{url}">')
+        pos = element.close_start
+    parts.append(html[pos:])
+    return ''.join(parts), sizes
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Motor de patch por âncoras para os arquivos server*.js do Link Mágico
+
+O fonte JS é tokenizado UMA única vez (strings, comentários, template
+literals e regex literais são ignorados) e vira um índice de âncoras:
+blocos require(...), registros de rotas app.get/post/... e app.listen(...).
+As inserções são aplicadas depois numa única escrita sequencial, sem
+reconstruir o arquivo a partir de vários pedaços.
+
+O índice trabalha sobre bytes (bytes ou mmap) e as posições são offsets
+em bytes: patch_file mapeia o arquivo em memória e grava a saída como uma
+sequência de (trecho do original, texto inserido), sem nunca montar o
+arquivo novo inteiro numa string.
+"""
+
+import mmap
+import os
+import re
+from collections import namedtuple
+from contextlib import nullcontext
+
+# Âncora encontrada no fonte:
+#   kind       -> 'require', 'route' ou 'listen'
+#   name       -> 'require', método HTTP da rota ou 'listen'
+#   arg        -> primeiro argumento string (caminho do módulo / rota), se houver
+#   start/end  -> posição (offset em bytes) da chamada (end inclui ')' e o ';' opcional)
+#   stmt_start -> início da linha do statement (pega "const server = app.listen(")
+#   stmt_end   -> fim do statement (pega "require(...).config();")
+#   depth      -> profundidade de chaves onde a chamada aparece
+#   line       -> linha (1-based) da chamada
+Anchor = namedtuple('Anchor', 'kind name arg start end stmt_start stmt_end depth line')
+
+# Inserção de texto numa posição do fonte original (offset em bytes para
+# patch_file, em caracteres quando apply_insertions recebe str)
+Insertion = namedtuple('Insertion', 'offset text')
+
+# Strings e comentários de linha sem ( ) { } (nem quebra de linha, nas strings) não
+# mudam parênteses nem chaves: o prefixo os atravessa junto com o código e eles nem
+# precisam ser zerados
+_PLAIN_SPAN = (rb'"[^"\\\n(){}]*(?:\\[^\n(){}][^"\\\n(){}]*)*"'
+                 rb"|'[^'\\\n(){}]*(?:\\[^\n(){}][^'\\\n(){}]*)*'"
+                 rb'|//[^\n(){}]*(?![^\n])')
+# Próximo trecho que não é código. Fora de template: strings e comentários saem
+# inteiros no próprio match; crase e "/" (regex ou divisão) são decididos no loop
+_NON_CODE_TAIL = (rb"""(?P<str>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')|(?P<quote>["'])"""
+                  rb"""|(?P<line>//[^\n]*)|(?P<block>/\*(?s:.*?)(?:\*/|\Z))|(?P<tpl>`)|(?P<slash>/)""")
+_NON_CODE = re.compile(rb"""[^"'`/]*(?:(?:""" + _PLAIN_SPAN + rb""")[^"'`/]*)*(?:"""
+                       + _NON_CODE_TAIL + rb')?')
+# Dentro de ${...} as chaves também contam (para achar o "}" que volta ao template)
+_NON_CODE_EXPR = re.compile(rb"""[^"'`/{}]*(?:(?:""" + _PLAIN_SPAN + rb""")[^"'`/{}]*)*(?:"""
+                            + _NON_CODE_TAIL + rb'|(?P<open>\{)|(?P<close>\}))?')
+# Chamadas indexadas, conferidas no fonte já sem strings/comentários/templates/regex
+# a partir de cada "app"/"require" achado com bytes.find
+_CALL = re.compile(rb'(?<![\w$.])(?:app\s*\.\s*(get|post|put|patch|delete|use|listen)|require)\s*\(')
+
+# Caracteres que interrompem o corpo de um template literal (busca direta,
+# sem a pilha de backtracking de um (?:...)* sobre templates de vários KB)
+_TEMPLATE_STOP = re.compile(rb'[`\\$]')
+_REGEX_LITERAL = re.compile(rb'/(?:[^/\\\n\[]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*')
+_FIRST_STRING = re.compile(rb'''\s*(?:"((?:[^"\\\n]|\\.)*)"|'((?:[^'\\\n]|\\.)*)'|`([^`$]*)`)''')
+
+# Palavras após as quais uma "/" abre um regex literal e não uma divisão
+_REGEX_KEYWORDS = frozenset((b'return', b'typeof', b'case', b'do', b'else', b'in', b'of',
+                             b'new', b'delete', b'void', b'throw', b'instanceof', b'yield', b'await'))
+_SPACE = frozenset(b' \t\r\n')
+# Bytes de identificador (>= 0x80 cobre letras acentuadas em UTF-8)
+_IDENT = frozenset(b'_$0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ') | frozenset(range(0x80, 0x100))
+_LINE_CHUNK = 1 << 16
+
+
+class AnchorIndex:
+    """
+    Índice de âncoras de um fonte JS, construído numa única passada.
+    `source` é bytes ou mmap (UTF-8); as posições das âncoras são em bytes.
+
+    Uma única regex atravessa o código junto com as strings e comentários de
+    linha que não têm ( ) { }; a passada só para nos trechos que podem enganar
+    a contagem (as demais strings e comentários, templates, regex literais) e
+    os apaga numa cópia do fonte, com o mesmo tamanho. Chamadas, parênteses e
+    chaves são depois procurados nessa cópia com bytes.find/bytes.count, sem
+    percorrer o arquivo caractere a caractere em Python.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.anchors = []
+        self._tokenize()
+
+    # ------------------------------------------------------------------
+    # Tokenização
+    # ------------------------------------------------------------------
+    def _tokenize(self):
+        code = self._blank_non_code()
+        depth, last = 0, 0
+        for start in sorted(_find_all(code, b'app') + _find_all(code, b'require')):
+            m = _CALL.match(code, start)
+            if m is None:
+                continue
+            paren = m.end() - 1
+            close = _matching_paren(code, paren)
+            if close is None:
+                continue
+            depth += code.count(b'{', last, start) - code.count(b'}', last, start)
+            last = start
+            method = m.group(1) and m.group(1).decode('ascii')
+            self._add_anchor({
+                'kind': 'require' if method is None else ('listen' if method == 'listen' else 'route'),
+                'name': method or 'require',
+                'start': start,
+                'open': paren + 1,
+                'depth': depth,
+            }, close + 1)
+
+        self._number_lines()
+
+    def _blank_non_code(self):
+        """Cópia do fonte com comentários, templates, regex literais e strings com ( ) { } zerados"""
+        src = self.source
+        code = bytearray(src)
+        stack = []          # uma entrada por ${ aberto: chaves abertas dentro da expressão
+        pos = 0
+
+        while True:
+            m = (_NON_CODE_EXPR if stack else _NON_CODE).match(src, pos)
+            kind = m.lastgroup
+            if kind is None:
+                break
+            start, end = m.span(kind)
+
+            if kind == 'quote':
+                pos = end
+                continue
+            if kind == 'slash':
+                if not self._starts_regex(start):
+                    pos = end
+                    continue
+                rm = _REGEX_LITERAL.match(src, start)
+                if rm is None:
+                    pos = end
+                    continue
+                end = rm.end()
+            elif kind == 'tpl':
+                end = self._template_body(end, stack)
+            elif kind == 'open':
+                stack[-1] += 1
+                pos = end
+                continue
+            elif kind == 'close':
+                if stack[-1]:
+                    stack[-1] -= 1
+                    pos = end
+                    continue
+                # "}" que fecha o ${: o resto do template também não é código
+                stack.pop()
+                end = self._template_body(end, stack)
+
+            code[start:end] = bytes(end - start)
+            pos = end
+        return code
+
+    def _number_lines(self):
+        """Preenche a linha de cada âncora contando quebras de linha uma única vez"""
+        self.anchors.sort(key=lambda a: a.start)
+        src = self.source
+        line, last = 1, 0
+        for i, anchor in enumerate(self.anchors):
+            line += _count_newlines(src, last, anchor.start)
+            last = anchor.start
+            self.anchors[i] = anchor._replace(line=line)
+
+    def _starts_regex(self, pos):
+        """Decide se a "/" em `pos` abre um regex literal (e não uma divisão)"""
+        src = self.source
+        prev = pos - 1
+        while prev >= 0 and src[prev] in _SPACE:
+            prev -= 1
+        if prev < 0:
+            return True
+        char = src[prev]
+        if char in b')]':
+            return False
+        if char in _IDENT:
+            word_start = prev
+            while word_start > 0 and src[word_start - 1] in _IDENT:
+                word_start -= 1
+            return src[word_start:prev + 1] in _REGEX_KEYWORDS
+        return True
+
+    def _template_body(self, pos, stack):
+        """Consome o corpo de um template literal; empilha uma expressão ao achar ${"""
+        src = self.source
+        search = _TEMPLATE_STOP.search
+        while True:
+            m = search(src, pos)
+            if m is None:
+                return len(src)
+            pos = m.start()
+            char = src[pos:pos + 1]
+            if char == b'\\':
+                pos += 2
+            elif char == b'$':
+                if src[pos + 1:pos + 2] == b'{':
+                    stack.append(0)
+                    return pos + 2
+                pos += 1
+            else:
+                return pos + 1  # crase de fechamento
+
+    def _add_anchor(self, entry, close_end):
+        src = self.source
+        end = close_end
+        # ';' opcional logo após a chamada
+        probe = end
+        while probe < len(src) and src[probe] in b' \t':
+            probe += 1
+        if src[probe:probe + 1] == b';':
+            end = probe + 1
+
+        start = entry['start']
+        line_start = src.rfind(b'\n', 0, start) + 1
+        indent = src[line_start:start]
+        stmt_start = line_start + (len(indent) - len(indent.lstrip()))
+
+        line_end = src.find(b'\n', end)
+        if line_end == -1:
+            line_end = len(src)
+        stmt_end = end
+        if src[end - 1:end] != b';':
+            semi = src.find(b';', end, line_end)
+            if semi != -1:
+                stmt_end = semi + 1
+
+        arg = None
+        sm = _FIRST_STRING.match(src, entry['open'])
+        if sm:
+            raw = sm.group(1) or sm.group(2) or sm.group(3)
+            arg = raw.decode('utf-8', 'replace') if raw is not None else None
+
+        self.anchors.append(Anchor(
+            kind=entry['kind'],
+            name=entry['name'],
+            arg=arg,
+            start=start,
+            end=end,
+            stmt_start=stmt_start,
+            stmt_end=stmt_end,
+            depth=entry['depth'],
+            line=0,
+        ))
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def find(self, kind, name=None, arg=None):
+        """Retorna as âncoras de um tipo, em ordem de posição no fonte"""
+        found = [a for a in self.anchors
+                 if a.kind == kind
+                 and (name is None or a.name == name)
+                 and (arg is None or a.arg == arg)]
+        return found
+
+    def first(self, kind, name=None, arg=None):
+        found = self.find(kind, name, arg)
+        return found[0] if found else None
+
+    def require(self, module):
+        """Primeiro require('module') do arquivo"""
+        return self.first('require', arg=module)
+
+    def routes(self, method=None):
+        return self.find('route', name=method)
+
+    def listen(self):
+        """Último app.listen(...) do arquivo (o que sobe o servidor)"""
+        found = self.find('listen')
+        return found[-1] if found else None
+
+
+def _find_all(data, needle):
+    """Posições de `needle` em `data` (bytes.find é bem mais rápido que um regex aqui)"""
+    found = []
+    pos = data.find(needle)
+    while pos != -1:
+        found.append(pos)
+        pos = data.find(needle, pos + 1)
+    return found
+
+
+def _matching_paren(code, paren):
+    """
+    Posição do ")" que fecha o "(" em `paren` (None se não fechar): pula de ")"
+    em ")" contando com bytes.count os "(" que abrem no caminho
+    """
+    needed, pos = 1, paren + 1
+    while True:
+        close = code.find(b')', pos)
+        if close == -1:
+            return None
+        needed += code.count(b'(', pos, close) - 1
+        if not needed:
+            return close
+        pos = close + 1
+
+
+def _count_newlines(buffer, start=0, end=None):
+    """Conta quebras de linha em blocos (mmap não tem .count)"""
+    end = len(buffer) if end is None else end
+    if not isinstance(buffer, mmap.mmap):
+        return buffer.count(b'\n', start, end)
+    count = 0
+    for chunk_start in range(start, end, _LINE_CHUNK):
+        count += buffer[chunk_start:min(chunk_start + _LINE_CHUNK, end)].count(b'\n')
+    return count
+
+
+def _write_segments(source, insertions, out, encode):
+    pos = 0
+    written = 0
+    for offset, text in sorted(insertions, key=lambda ins: ins.offset):
+        if offset < pos or offset > len(source):
+            raise ValueError(f'Posição de inserção inválida: {offset}')
+        written += out.write(source[pos:offset])
+        written += out.write(encode(text))
+        pos = offset
+    written += out.write(source[pos:])
+    return written
+
+
+def apply_insertions(source, insertions, out):
+    """
+    Aplica as inserções numa única passada sequencial, escrevendo em `out`.
+    Inserções na mesma posição mantêm a ordem em que foram informadas.
+
+    Com `source` str, `out` é um arquivo texto e os offsets são em caracteres.
+    Com bytes/mmap, `out` é binário: cada trecho do original sai como
+    memoryview (sem cópia) e o texto inserido é codificado em UTF-8.
+    Retorna o total de caracteres (ou bytes) escritos.
+    """
+    if isinstance(source, str):
+        return _write_segments(source, insertions, out, lambda text: text)
+    with memoryview(source) as view:
+        return _write_segments(view, insertions, out, lambda text: text.encode('utf-8'))
+
+
+def patch_file(source_path, output_path, build_insertions):
+    """
+    Mapeia `source_path` em memória, indexa as âncoras, chama
+    build_insertions(index) e grava o resultado em `output_path` como uma
+    sequência de trechos do original intercalados com o texto inserido.
+    Os bytes do original são preservados (inclusive CRLF); a saída vai para
+    um arquivo temporário e substitui o destino no fim, então `output_path`
+    pode ser o próprio `source_path`.
+    Retorna (bytes escritos, linhas) ou None se não houver inserções.
+    """
+    tmp_path = output_path + '.tmp'
+    with open(source_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else nullcontext(b'')
+        with mapped as source:
+            index = AnchorIndex(source)
+            insertions = build_insertions(index)
+            if insertions is None:
+                return None
+
+            # O original é copiado byte a byte: o texto inserido segue o mesmo fim de linha
+            first_newline = source.find(b'\n')
+            if first_newline > 0 and source[first_newline - 1:first_newline] == b'\r':
+                insertions = [Insertion(offset, text.replace('\r\n', '\n').replace('\n', '\r\n'))
+                              for offset, text in insertions]
+
+            try:
+                with open(tmp_path, 'wb') as out:
+                    written = apply_insertions(source, insertions, out)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            lines = _count_newlines(source) + sum(text.count('\n') for _, text in insertions)
+            if size and source[size - 1:size] != b'\n':
+                lines += 1
+
+    os.replace(tmp_path, output_path)
+    return written, lines
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Gera versões pré-comprimidas (.gz e .br) dos assets de public/
+
+O server.js serve esses arquivos direto quando o navegador aceita gzip/brotli
+(ver sendPrecompressed), sem comprimir nada a cada requisição. Cada arquivo
+só é comprimido de novo quando o hash do conteúdo muda (manifesto em
+public/.precompress-manifest.json).
+
+O brotli é opcional: sem o pacote `brotli` instalado só os .gz são gerados.
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PUBLIC_DIR = 'public'
+MANIFEST_PATH = os.path.join(PUBLIC_DIR, '.precompress-manifest.json')
+
+# Arquivos comprimidos ao fim do build do painel (globs relativos a public/)
+DEFAULT_ASSETS = [
+    'index_app.html',
+    'app_scripts.js',
+    'app_styles.css',
+    'widget.js',
+    'chat.html',
+    'panel-v2.*.js',
+    'panel-v2.*.css',
+    'fragments/*.html',
+]
+
+# Abaixo disso a versão comprimida não compensa o cabeçalho extra
+MIN_SIZE = 1024
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compress_file(path):
+    """Comprime um arquivo; roda nas threads do pool (zlib e brotli liberam o GIL)"""
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sizes = {'original': len(data)}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_atomic(path + '.gz', gz)
+    sizes['gz'] = len(gz)
+
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        _write_atomic(path + '.br', br)
+        sizes['br'] = len(br)
+
+    return path, sizes, (time.perf_counter() - start) * 1000
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _expand(patterns, directory):
+    paths = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            if os.path.isfile(path) and not path.endswith(('.gz', '.br')) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def precompress(patterns=DEFAULT_ASSETS, directory=PUBLIC_DIR, manifest_path=MANIFEST_PATH,
+                workers=None, force=False):
+    """Gera .gz/.br em paralelo para os arquivos cujo conteúdo mudou"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    encodings = ['gz', 'br'] if brotli is not None else ['gz']
+    pending = []
+    digests = {}
+    for path in _expand(patterns, directory):
+        if os.path.getsize(path) < MIN_SIZE:
+            continue
+        digest = _digest(path)
+        digests[path] = digest
+        entry = manifest.get(path)
+        fresh = (entry and entry['hash'] == digest and
+                 all(os.path.exists(f'{path}.{enc}') for enc in encodings))
+        if fresh and not force:
+            continue
+        pending.append(path)
+
+    if not pending:
+        print("⏭️  Assets pré-comprimidos já estão atualizados")
+    else:
+        if brotli is None:
+            print("⚠️  Pacote brotli não instalado, gerando só .gz")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, sizes, elapsed in pool.map(_compress_file, pending):
+                manifest[path] = {'hash': digests[path], **sizes}
+                parts = ', '.join(f"{enc} {sizes[enc]}" for enc in ('gz', 'br') if enc in sizes)
+                print(f"🗜️  {path}: {sizes['original']} → {parts} bytes ({elapsed:.1f} ms)")
+
+    # Arquivos que não existem mais: sai do manifesto junto com os .gz/.br órfãos
+    for path in [p for p in manifest if not os.path.exists(p)]:
+        del manifest[path]
+        for enc in ('gz', 'br'):
+            if os.path.exists(f'{path}.{enc}'):
+                os.remove(f'{path}.{enc}')
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera .gz/.br dos assets de public/')
+    parser.add_argument('patterns', nargs='*', default=DEFAULT_ASSETS,
+                        help='globs relativos a public/')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--force', action='store_true', help='recomprime tudo')
+    args = parser.parse_args(argv)
+    return 0 if precompress(args.patterns, workers=args.workers, force=args.force) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
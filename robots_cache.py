@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Cache persistente de robots.txt por host para o compliance-middleware.js
+
+O ComplianceManager.checkRobotsCompliance baixava e reinterpretava o
+robots.txt a cada URL do /api/extract e testava cada padrão com uma
+RegExp nova. Este script mantém data/robots-cache.json com, por origem
+(o mesmo URL.origin do Node):
+
+- status, ETag/Last-Modified (revalidação com GET condicional), conteúdo
+  e validade (TTL, 24h por padrão);
+- as regras já compiladas dos grupos 'linkmagico' e '*': os padrões de
+  allow/disallow sem curinga viram uma trie de prefixos (um nó por
+  caractere, '' marca o fim de um padrão), então a verificação percorre
+  o caminho uma vez; os poucos padrões com '*' ou '$' ficam numa lista à
+  parte, já quebrados nos pedaços entre os '*'.
+
+O middleware consulta o cache sem ir à rede; origens que ele não conhece
+são verificadas como antes e anotadas em data/robots-cache.pending para
+o próximo `refresh --pending`.
+
+Uso:
+  python3 robots_cache.py refresh https://site.com/pagina ...   # busca/atualiza origens
+  python3 robots_cache.py refresh --pending --expiring 60      # pendentes + que vencem em 1h
+  python3 robots_cache.py check https://site.com/privado/x
+  python3 robots_cache.py stats
+  python3 robots_cache.py benchmark [--checks 20000]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+CACHE_PATH = os.path.join('data', 'robots-cache.json')
+PENDING_PATH = os.path.join('data', 'robots-cache.pending')
+USER_AGENT = 'LinkMagico-Bot/6.0 (+https://link-m-gico-v6-0-hmpl.onrender.com/robot-info)'
+TTL_HOURS = 24
+ERROR_TTL_HOURS = 1
+TIMEOUT = 5
+WORKERS = 8
+GROUPS = ('linkmagico', '*')                # ordem de precedência do isBlocked
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def origin_of(url):
+    """Mesmo valor do URL.origin do Node"""
+    parts = urlsplit(url)
+    if parts.scheme not in _DEFAULT_PORTS or not parts.hostname:
+        raise ValueError(f'URL inválida: {url}')
+    port = parts.port
+    host = parts.hostname if ':' not in parts.hostname else f'[{parts.hostname}]'
+    suffix = f':{port}' if port and port != _DEFAULT_PORTS[parts.scheme] else ''
+    return f'{parts.scheme}://{host}{suffix}'
+
+
+# ----------------------------------------------------------------------
+# Interpretação e compilação (mesma semântica do parseRobotsTxt/isBlocked)
+# ----------------------------------------------------------------------
+def parse_robots(text):
+    """Porta do parseRobotsTxt: linhas em minúsculas, só os grupos '*' e linkmagico"""
+    rules = {group: {'disallow': [], 'allow': []} for group in GROUPS}
+    current = None
+    for line in text.split('\n'):
+        trimmed = line.strip().lower()
+        if trimmed.startswith('user-agent:'):
+            agent = trimmed.split(':')[1].strip()
+            current = '*' if agent == '*' else 'linkmagico' if 'linkmagico' in agent else None
+        if current and trimmed.startswith('disallow:'):
+            rules[current]['disallow'].append(trimmed.split(':')[1].strip())
+        if current and trimmed.startswith('allow:'):
+            rules[current]['allow'].append(trimmed.split(':')[1].strip())
+    return rules
+
+
+def compile_patterns(patterns):
+    """{'trie': prefixos literais, 'wildcards': [[pedaços entre '*'], termina com '$']}"""
+    trie, wildcards = {}, []
+    for pattern in patterns:
+        if pattern in ('', '*'):
+            continue                        # pathMatches nunca casa esses
+        anchored = pattern.endswith('$')
+        body = pattern[:-1] if anchored else pattern.rstrip('*')   # '*' final sem '$' não muda nada
+        if anchored or '*' in body:
+            wildcards.append([body.split('*'), anchored])
+            continue
+        node = trie
+        for char in body:
+            node = node.setdefault(char, {})
+        node[''] = 1
+    return {'trie': trie, 'wildcards': wildcards}
+
+
+def compile_rules(rules):
+    return {group: {kind: compile_patterns(rules[group][kind]) for kind in ('allow', 'disallow')}
+            for group in GROUPS}
+
+
+def _wildcard_matches(path, parts, anchored):
+    if not path.startswith(parts[0]):
+        return False
+    position = len(parts[0])
+    for i in range(1, len(parts)):
+        part = parts[i]
+        if anchored and i == len(parts) - 1:
+            return len(path) - len(part) >= position and path.endswith(part)
+        found = path.find(part, position)
+        if found < 0:
+            return False
+        position = found + len(part)
+    return not anchored or position == len(path)
+
+
+def matches(compiled, path):
+    node = compiled['trie']
+    for char in path:
+        if '' in node:
+            return True
+        node = node.get(char)
+        if node is None:
+            break
+    else:
+        if '' in node:
+            return True
+    return any(_wildcard_matches(path, parts, anchored) for parts, anchored in compiled['wildcards'])
+
+
+def is_blocked(compiled_rules, path):
+    """Allow tem precedência dentro de cada grupo; linkmagico antes de '*'"""
+    for group in GROUPS:
+        rules = compiled_rules.get(group)
+        if not rules:
+            continue
+        if matches(rules['allow'], path):
+            return False
+        if matches(rules['disallow'], path):
+            return True
+    return False
+
+
+# ----------------------------------------------------------------------
+# Arquivo de cache
+# ----------------------------------------------------------------------
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': 1, 'hosts': {}}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    cache['updatedAt'] = int(time.time() * 1000)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def fetch_entry(origin, previous=None, ttl_hours=TTL_HOURS):
+    """Baixa (ou revalida) o robots.txt de uma origem e devolve a entrada do cache"""
+    headers = {'User-Agent': USER_AGENT}
+    if previous and previous.get('status') == 200:
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('lastModified'):
+            headers['If-Modified-Since'] = previous['lastModified']
+
+    now = int(time.time() * 1000)
+    expires = now + int(ttl_hours * 3600 * 1000)
+    request = urllib.request.Request(f'{origin}/robots.txt', headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            content = response.read().decode('utf-8', 'replace')
+            etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as error:
+        if error.code == 304 and previous:
+            return dict(previous, fetchedAt=now, expiresAt=expires, revalidated=True)
+        # Como no middleware: sem robots.txt (qualquer status de erro) tudo é permitido;
+        # erro do servidor fica só ERROR_TTL_HOURS para ser reavaliado logo
+        if error.code >= 500:
+            expires = now + int(min(ttl_hours, ERROR_TTL_HOURS) * 3600 * 1000)
+        return {'status': error.code, 'fetchedAt': now, 'expiresAt': expires, 'content': None, 'rules': None}
+
+    return {
+        'status': 200,
+        'fetchedAt': now,
+        'expiresAt': expires,
+        'etag': etag,
+        'lastModified': last_modified,
+        'sha256': hashlib.sha256(content.encode('utf-8')).hexdigest(),
+        'content': content,
+        'rules': compile_rules(parse_robots(content)),
+    }
+
+
+def take_pending(path=PENDING_PATH):
+    """Origens anotadas pelo middleware; o arquivo é consumido"""
+    try:
+        os.replace(path, path + '.processing')
+    except FileNotFoundError:
+        return []
+    with open(path + '.processing', 'r', encoding='utf-8') as f:
+        origins = [line.strip() for line in f if line.strip()]
+    os.remove(path + '.processing')
+    return origins
+
+
+def refresh(origins, cache_path=CACHE_PATH, ttl_hours=TTL_HOURS, workers=WORKERS):
+    """Busca as origens em paralelo; falhas de rede não entram no cache"""
+    cache = load_cache(cache_path)
+    hosts = cache['hosts']
+    origins = list(dict.fromkeys(origins))
+    results = {'ok': 0, 'revalidated': 0, 'missing': 0, 'failed': []}
+
+    def job(origin):
+        try:
+            return origin, fetch_entry(origin, hosts.get(origin), ttl_hours), None
+        except (OSError, ValueError) as error:
+            return origin, None, str(error)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for origin, entry, error in pool.map(job, origins):
+            if entry is None:
+                results['failed'].append((origin, error))
+                continue
+            if entry.pop('revalidated', False):
+                results['revalidated'] += 1
+            elif entry['rules'] is None:
+                results['missing'] += 1
+            else:
+                results['ok'] += 1
+            hosts[origin] = entry
+    save_cache(cache, cache_path)
+    return results
+
+
+def expiring(cache, minutes, now_ms=None):
+    now_ms = now_ms if now_ms is not None else time.time() * 1000
+    limit = now_ms + minutes * 60000
+    return [origin for origin, entry in cache['hosts'].items() if entry['expiresAt'] <= limit]
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+def _original_path_matches(path, patterns):
+    """Porta literal do pathMatches (RegExp por padrão), só para comparação"""
+    for pattern in patterns:
+        if pattern == '/':
+            return True
+        if pattern in ('', '*'):
+            continue
+        try:
+            if re.match(pattern.replace('*', '.*'), path):
+                return True
+        except re.error:
+            if path.startswith(pattern):
+                return True
+    return False
+
+
+def _original_check(url):
+    """Fluxo antigo: baixa, interpreta e testa com regex a cada verificação"""
+    origin = origin_of(url)
+    request = urllib.request.Request(f'{origin}/robots.txt', headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            text = response.read().decode('utf-8', 'replace')
+    except urllib.error.HTTPError:
+        return False
+    rules = parse_robots(text)
+    path = urlsplit(url).path or '/'
+    for group in GROUPS:
+        if _original_path_matches(path, rules[group]['allow']):
+            return False
+        if _original_path_matches(path, rules[group]['disallow']):
+            return True
+    return False
+
+
+def _robots_text(seed, rules=40):
+    lines = ['User-agent: *']
+    for i in range(rules):
+        lines.append(f'Disallow: /area{seed}-{i}/privado')
+        if i % 5 == 0:
+            lines.append(f'Allow: /area{seed}-{i}/privado/publico')
+    lines += ['Disallow: /*/rascunho$', 'Disallow: /busca*ordem=', '', 'User-agent: LinkMagico-Bot',
+              f'Disallow: /somente-humanos{seed}', 'Allow: /somente-humanos/ok']
+    return '\n'.join(lines) + '\n'
+
+
+class _RobotsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.server.robots.encode('utf-8') if self.path == '/robots.txt' else b''
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _sample_urls(origins, count, seed=7):
+    import random
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        origin = origins[i % len(origins)]
+        n, area = rng.randrange(len(origins)), rng.randrange(50)
+        urls.append(rng.choice([
+            f'{origin}/area{n}-{area}/privado/doc{i}',
+            f'{origin}/area{n}-{area}/privado/publico/{i}',
+            f'{origin}/produtos/{i}/rascunho',
+            f'{origin}/busca?q=x&ordem=preco',
+            f'{origin}/somente-humanos{n}/pagina',
+            f'{origin}/blog/post-{i}',
+        ]))
+    return urls
+
+
+def _node_checks(tmp, cache_path, urls):
+    """checks/s do ComplianceManager no Node usando o cache (inclui o log de cada verificação)"""
+    urls_path = os.path.join(tmp, 'urls.json')
+    with open(urls_path, 'w', encoding='utf-8') as f:
+        json.dump(urls, f)
+    script = f"""
+const {{ ComplianceManager }} = require({json.dumps(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compliance-middleware.js'))});
+console.log = () => {{}};
+const manager = new ComplianceManager();
+manager.robotsCacheFile = {json.dumps(cache_path)};
+const urls = JSON.parse(require('fs').readFileSync({json.dumps(urls_path)}, 'utf8'));
+(async () => {{
+    await manager.checkRobotsCompliance(urls[0]);
+    const start = process.hrtime.bigint();
+    let blocked = 0;
+    for (const url of urls) {{
+        const result = await manager.checkRobotsCompliance(url);
+        if (!result.allowed) blocked++;
+    }}
+    const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+    process.stdout.write(JSON.stringify({{ rate: urls.length / seconds, blocked }}));
+}})();
+"""
+    try:
+        output = subprocess.run(['node', '-e', script], cwd=tmp, capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.TimeoutExpired) as error:
+        print(f"⚠️  Benchmark no Node não executado: {error}", file=sys.stderr)
+        return None
+    if output.returncode != 0:
+        print(output.stderr.strip()[-500:], file=sys.stderr)
+        return None
+    return json.loads(output.stdout)
+
+
+def benchmark(hosts=8, checks=20000, baseline_checks=500):
+    servers, origins = [], []
+    for i in range(hosts):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _RobotsHandler)
+        server.daemon_threads = True
+        server.robots = _robots_text(i)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        origins.append(f'http://127.0.0.1:{server.server_address[1]}')
+
+    tmp = tempfile.mkdtemp(prefix='robots-bench-')
+    try:
+        urls = _sample_urls(origins, checks)
+        cache_path = os.path.join(tmp, 'robots-cache.json')
+
+        start = time.perf_counter()
+        baseline_decisions = [_original_check(url) for url in urls[:baseline_checks]]
+        baseline_rate = baseline_checks / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        refresh(origins, cache_path)
+        refresh_ms = (time.perf_counter() - start) * 1000
+        cache = load_cache(cache_path)
+
+        start = time.perf_counter()
+        decisions = [is_blocked(cache['hosts'][origin_of(url)]['rules'], urlsplit(url).path or '/') for url in urls]
+        lookup_rate = checks / (time.perf_counter() - start)
+        # '$' e '.' têm semântica de regex no pathMatches; os padrões do teste não dependem disso
+        mismatches = sum(1 for a, b in zip(baseline_decisions, decisions) if a != b)
+
+        node = _node_checks(tmp, cache_path, urls)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"🤖 {hosts} hosts locais com ~{_robots_text(0).count(chr(10))} linhas de robots.txt, {checks} verificações")
+    print(f"   fluxo antigo (busca + parse + regex a cada URL): {baseline_rate:,.0f} verificações/s")
+    print(f"   refresh do cache: {refresh_ms:.0f} ms para {hosts} hosts")
+    print(f"   trie compilada (Python): {lookup_rate:,.0f} verificações/s, {sum(decisions)} bloqueadas, "
+          f"{mismatches} divergência(s) com o fluxo antigo")
+    if node is not None:
+        print(f"   checkRobotsCompliance com cache (Node, com log): {node['rate']:,.0f} verificações/s, "
+              f"{node['blocked']} bloqueadas")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cache de robots.txt por host (regras compiladas)')
+    parser.add_argument('--cache', default=CACHE_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('refresh', help='busca/revalida origens')
+    p.add_argument('urls', nargs='*', help='URLs ou origens')
+    p.add_argument('--pending', action='store_true', help='inclui as origens anotadas pelo middleware')
+    p.add_argument('--pending-file', default=PENDING_PATH)
+    p.add_argument('--expiring', type=float, metavar='MINUTOS', help='inclui as que vencem nesse prazo')
+    p.add_argument('--ttl', type=float, default=TTL_HOURS, help='validade em horas')
+    p.add_argument('--workers', type=int, default=WORKERS)
+
+    p = sub.add_parser('check', help='decisão para uma URL usando o cache')
+    p.add_argument('url')
+
+    sub.add_parser('stats', help='hosts no cache e validade')
+
+    p = sub.add_parser('benchmark', help='verificações por segundo contra servidores locais')
+    p.add_argument('--hosts', type=int, default=8)
+    p.add_argument('--checks', type=int, default=20000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.hosts, args.checks)
+        return 0
+
+    if args.command == 'refresh':
+        try:
+            origins = [origin_of(url) for url in args.urls]
+        except ValueError as error:
+            print(f"❌ {error}", file=sys.stderr)
+            return 1
+        if args.pending:
+            origins += take_pending(args.pending_file)
+        if args.expiring is not None:
+            origins += expiring(load_cache(args.cache), args.expiring)
+        if not origins:
+            print("⚠️  Nenhuma origem para atualizar")
+            return 0
+        results = refresh(origins, args.cache, args.ttl, args.workers)
+        print(f"✅ {results['ok']} baixado(s), {results['revalidated']} revalidado(s) (304), "
+              f"{results['missing']} sem robots.txt, {len(results['failed'])} falha(s)")
+        for origin, error in results['failed']:
+            print(f"   ❌ {origin}: {error}")
+        return 1 if results['failed'] else 0
+
+    cache = load_cache(args.cache)
+    if args.command == 'check':
+        entry = cache['hosts'].get(origin_of(args.url))
+        if entry is None or entry['expiresAt'] < time.time() * 1000:
+            print(f"⚠️  {origin_of(args.url)} fora do cache ou vencido (rode refresh)")
+            return 1
+        blocked = entry['rules'] is not None and is_blocked(entry['rules'], urlsplit(args.url).path or '/')
+        print(f"{'🚫 BLOQUEADO' if blocked else '✅ PERMITIDO'}: {args.url}")
+        return 0
+
+    now = time.time() * 1000
+    valid = sum(1 for entry in cache['hosts'].values() if entry['expiresAt'] >= now)
+    print(f"🤖 {len(cache['hosts'])} host(s) no cache, {valid} válido(s), "
+          f"{len(expiring(cache, 60))} vencem em até 1h")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+/**
+ * ⏱️ MEDIÇÃO DE LATÊNCIA POR ROTA - Link Mágico
+ * Injetado pelo integrate.py (--timing) antes do primeiro app.use do servidor
+ *
+ * Cada requisição das rotas medidas vira uma linha em data/route-timing.ndjson:
+ *   {"t": início em ms, "r": rota, "m": método, "s": status, "d": duração ms,
+ *    "sp": [[caminho, início relativo ms, duração ms], ...]}
+ *
+ * "sp" são os trechos das funções embrulhadas com wrap() (ex: generateAIResponse,
+ * callGroq) executados dentro da requisição; o caminho usa ';' entre níveis, no
+ * formato de pilha dobrada dos flame graphs. As linhas ficam num buffer e vão
+ * para o arquivo em um único append por segundo. route_timing_report.py gera
+ * as tabelas p50/p95/p99 e a quebra por função.
+ */
+
+const fs = require('fs');
+const path = require('path');
+const { AsyncLocalStorage } = require('async_hooks');
+
+const TIMED_ROUTES = new Set([
+    '/api/chat-universal',
+    '/api/process-chat-inteligente',
+    '/api/extract',
+    '/api/capture-lead'
+]);
+
+const FLUSH_INTERVAL = 1000;
+const MAX_BUFFERED = 256 * 1024;
+const MAX_FILE_SIZE = 64 * 1024 * 1024;   // acima disso o arquivo vira .1 e recomeça
+
+const storage = new AsyncLocalStorage();
+const timingFile = process.env.ROUTE_TIMING_FILE || path.join(__dirname, 'data', 'route-timing.ndjson');
+let buffer = [];
+let bufferedBytes = 0;
+let flushTimer = null;
+
+function elapsedMs(start) {
+    return Number(process.hrtime.bigint() - start) / 1e6;
+}
+
+function round(ms) {
+    return Math.round(ms * 1000) / 1000;
+}
+
+/**
+ * Gravar as linhas acumuladas (um append por flush)
+ */
+function flush() {
+    if (buffer.length === 0) return;
+
+    const data = buffer.join('');
+    buffer = [];
+    bufferedBytes = 0;
+
+    try {
+        fs.mkdirSync(path.dirname(timingFile), { recursive: true });
+        try {
+            if (fs.statSync(timingFile).size > MAX_FILE_SIZE) {
+                fs.renameSync(timingFile, `${timingFile}.1`);
+            }
+        } catch (error) {
+            // arquivo ainda não existe
+        }
+        fs.appendFileSync(timingFile, data);
+    } catch (error) {
+        console.error('❌ Erro ao gravar medições de latência:', error.message);
+    }
+}
+
+function record(entry) {
+    const line = JSON.stringify(entry) + '\n';
+    buffer.push(line);
+    bufferedBytes += line.length;
+
+    if (bufferedBytes >= MAX_BUFFERED) {
+        flush();
+    } else if (!flushTimer) {
+        flushTimer = setTimeout(() => {
+            flushTimer = null;
+            flush();
+        }, FLUSH_INTERVAL);
+        flushTimer.unref();
+    }
+}
+
+/**
+ * Middleware: mede as rotas de TIMED_ROUTES do início da cadeia até o fim da resposta
+ */
+function middleware(routes = TIMED_ROUTES) {
+    return (req, res, next) => {
+        const route = req.path;
+        if (!routes.has(route)) {
+            return next();
+        }
+
+        const context = {
+            start: process.hrtime.bigint(),
+            startedAt: Date.now(),
+            stack: '',
+            spans: []
+        };
+
+        let done = false;
+        const finish = () => {
+            if (done) return;
+            done = true;
+            record({
+                t: context.startedAt,
+                r: route,
+                m: req.method,
+                s: res.headersSent ? res.statusCode : 0,   // 0 = conexão fechada antes da resposta
+                d: round(elapsedMs(context.start)),
+                sp: context.spans
+            });
+        };
+        res.on('finish', finish);
+        res.on('close', finish);
+
+        storage.run(context, next);
+    };
+}
+
+/**
+ * Embrulhar uma função para registrar seu tempo dentro da requisição medida
+ * (fora de uma requisição medida, chama a função original sem custo extra)
+ */
+function wrap(name, fn) {
+    if (typeof fn !== 'function') return fn;
+
+    const wrapped = function (...args) {
+        const context = storage.getStore();
+        if (!context) {
+            return fn.apply(this, args);
+        }
+
+        const stack = context.stack ? `${context.stack};${name}` : name;
+        const start = process.hrtime.bigint();
+        const offset = round(Number(start - context.start) / 1e6);
+        const end = () => {
+            context.spans.push([stack, offset, round(elapsedMs(start))]);
+        };
+
+        return storage.run({ ...context, stack, spans: context.spans }, () => {
+            let result;
+            try {
+                result = fn.apply(this, args);
+            } catch (error) {
+                end();
+                throw error;
+            }
+            if (result && typeof result.then === 'function') {
+                return result.then(
+                    (value) => { end(); return value; },
+                    (error) => { end(); throw error; }
+                );
+            }
+            end();
+            return result;
+        });
+    };
+
+    Object.defineProperty(wrapped, 'name', { value: fn.name });
+    return wrapped;
+}
+
+process.on('exit', flush);
+
+console.log(`⏱️ Medição de latência por rota ativa (${timingFile})`);
+
+module.exports = {
+    middleware,
+    wrap,
+    flush,
+    TIMED_ROUTES
+};
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Relatório de latência por rota a partir de data/route-timing.ndjson
+
+O arquivo é gravado pelo route-timing.js (injetado com
+`python3 integrate.py --timing`): uma linha por requisição das rotas
+medidas, com a duração total e os trechos das funções do caminho quente.
+
+O relatório mostra, por rota:
+- contagem, erros (status >= 500 ou conexão fechada), média, p50/p95/p99 e máximo;
+- histograma em faixas de potência de 2 (--histogram);
+- quebra por função no estilo flame graph: tempo próprio de cada pilha
+  (duração menos a das funções chamadas), em % do tempo total da rota.
+
+--folded grava as pilhas dobradas ("rota;função;função microssegundos"),
+que o flamegraph.pl e o speedscope abrem direto.
+
+Uso:
+  python3 route_timing_report.py [--since 60] [--route /api/extract] [--histogram]
+  python3 route_timing_report.py --folded data/route-timing.folded
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+TIMING_PATH = os.path.join('data', 'route-timing.ndjson')
+SELF = '(próprio)'
+BAR_WIDTH = 30
+
+
+def load_entries(path=TIMING_PATH, since_ms=None, route=None, include_rotated=False):
+    paths = ([path + '.1'] if include_rotated else []) + [path]
+    entries, invalid = [], 0
+    for name in paths:
+        try:
+            f = open(name, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    invalid += 1            # linha cortada no fim do arquivo
+                    continue
+                if since_ms is not None and entry['t'] < since_ms:
+                    continue
+                if route is not None and entry['r'] != route:
+                    continue
+                entries.append(entry)
+    return entries, invalid
+
+
+def percentile(values, fraction):
+    """Nearest-rank sobre uma lista já ordenada"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def latency_table(entries):
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for entry in entries:
+        by_route[entry['r']].append(entry['d'])
+        if entry['s'] >= 500 or entry['s'] == 0:
+            errors[entry['r']] += 1
+
+    rows = []
+    for route, durations in by_route.items():
+        durations.sort()
+        rows.append({
+            'route': route,
+            'count': len(durations),
+            'errors': errors[route],
+            'mean': sum(durations) / len(durations),
+            'p50': percentile(durations, 0.50),
+            'p95': percentile(durations, 0.95),
+            'p99': percentile(durations, 0.99),
+            'max': durations[-1],
+        })
+    rows.sort(key=lambda row: row['count'], reverse=True)
+    return rows
+
+
+def histogram(durations):
+    """Contagem por faixa [2^k, 2^(k+1)) ms"""
+    buckets = defaultdict(int)
+    for duration in durations:
+        buckets[max(0, math.floor(math.log2(duration))) if duration >= 1 else -1] += 1
+    return sorted(buckets.items())
+
+
+def self_times(entry):
+    """Tempo próprio (ms) de cada pilha de uma requisição, incluindo a própria rota"""
+    totals = defaultdict(float)
+    for stack, _, duration in entry['sp']:
+        totals[stack] += duration
+
+    children = defaultdict(float)
+    for stack, duration in totals.items():
+        parent = stack.rpartition(';')[0]
+        children[parent] += duration    # '' = chamadas direto da rota
+
+    result = {SELF: max(0.0, entry['d'] - children[''])}
+    for stack, duration in totals.items():
+        result[stack] = max(0.0, duration - children[stack])
+    return result
+
+
+def breakdown(entries):
+    """{rota: {pilha: tempo próprio somado em ms}}"""
+    result = defaultdict(lambda: defaultdict(float))
+    for entry in entries:
+        for stack, duration in self_times(entry).items():
+            result[entry['r']][stack] += duration
+    return result
+
+
+def write_folded(entries, path):
+    """Pilhas dobradas em microssegundos (flamegraph.pl / speedscope)"""
+    lines = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for route, stacks in sorted(breakdown(entries).items()):
+            for stack, duration in sorted(stacks.items()):
+                micros = round(duration * 1000)
+                if micros <= 0:
+                    continue
+                folded = route if stack == SELF else f'{route};{stack}'
+                f.write(f'{folded} {micros}\n')
+                lines += 1
+    return lines
+
+
+def _bar(fraction):
+    return '█' * round(fraction * BAR_WIDTH)
+
+
+def print_report(entries, show_histogram=False):
+    print(f"{'rota':<34}{'req':>7}{'erros':>7}{'média':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>10}")
+    for row in latency_table(entries):
+        print(f"{row['route']:<34}{row['count']:>7}{row['errors']:>7}{row['mean']:>9.1f}{row['p50']:>9.1f}"
+              f"{row['p95']:>9.1f}{row['p99']:>9.1f}{row['max']:>10.1f}")
+    print("   (tempos em ms)")
+
+    if show_histogram:
+        by_route = defaultdict(list)
+        for entry in entries:
+            by_route[entry['r']].append(entry['d'])
+        for route, durations in sorted(by_route.items()):
+            print(f"\n📊 {route}")
+            buckets = histogram(durations)
+            peak = max(count for _, count in buckets)
+            for exponent, count in buckets:
+                label = '< 1 ms' if exponent < 0 else f'{2 ** exponent}-{2 ** (exponent + 1)} ms'
+                print(f"   {label:>16} {count:>7} {_bar(count / peak)}")
+
+    totals = defaultdict(float)
+    for entry in entries:
+        totals[entry['r']] += entry['d']
+    for route, stacks in sorted(breakdown(entries).items()):
+        print(f"\n🔥 {route}: tempo próprio por função ({totals[route] / 1000:.1f}s no total)")
+        for stack, duration in sorted(stacks.items(), key=lambda item: (item[0] != SELF, item[0])):
+            fraction = duration / totals[route] if totals[route] else 0.0
+            depth = 0 if stack == SELF else stack.count(';')
+            name = stack.rpartition(';')[2]
+            print(f"   {'  ' * depth + name:<36}{fraction:>7.1%}  {_bar(fraction)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Relatório de latência por rota (route-timing.ndjson)')
+    parser.add_argument('--file', default=TIMING_PATH)
+    parser.add_argument('--since', type=float, help='só os últimos N minutos')
+    parser.add_argument('--route', help='só uma rota (ex: /api/chat-universal)')
+    parser.add_argument('--include-rotated', action='store_true', help='inclui o arquivo .1 anterior')
+    parser.add_argument('--histogram', action='store_true', help='histograma por rota')
+    parser.add_argument('--folded', metavar='ARQUIVO', help='grava as pilhas dobradas para flame graph')
+    args = parser.parse_args(argv)
+
+    since_ms = (time.time() - args.since * 60) * 1000 if args.since is not None else None
+    entries, invalid = load_entries(args.file, since_ms, args.route, args.include_rotated)
+    if not entries:
+        print(f"⚠️  Nenhuma medição em {args.file} (integre com `python3 integrate.py --timing`)")
+        return 1
+
+    print(f"⏱️  {len(entries)} requisição(ões) medidas em {args.file}"
+          + (f" ({invalid} linha(s) inválida(s) ignorada(s))" if invalid else ''))
+    print_report(entries, args.histogram)
+
+    if args.folded:
+        lines = write_folded(entries, args.folded)
+        print(f"\n💾 {lines} pilha(s) dobradas gravadas em {args.folded}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
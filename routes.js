@@ -82,6 +82,36 @@ function setupRoutes(app) {
         }
     });
 
+    /**
+     * GET /api/analytics/:chatbotId/rollup
+     * Rollup colunar por dia/hora pré-calculado por analytics_rollup.py
+     */
+    app.get('/api/analytics/:chatbotId/rollup', (req, res) => {
+        try {
+            const { chatbotId } = req.params;
+            const rollup = analyticsManager.getRollup(chatbotId);
+
+            if (!rollup) {
+                return res.status(404).json({
+                    success: false,
+                    error: 'Rollup não encontrado (execute analytics_rollup.py)'
+                });
+            }
+
+            res.json({
+                success: true,
+                chatbotId,
+                rollup
+            });
+        } catch (error) {
+            console.error('❌ Erro ao obter rollup de analytics:', error);
+            res.status(500).json({
+                success: false,
+                error: 'Erro ao obter rollup de analytics'
+            });
+        }
+    });
+
     // ===== ROTAS DE WEBHOOKS =====
     
     /**
@@ -491,6 +521,37 @@ function setupRoutes(app) {
         }
     });
 
+    /**
+     * GET /api/knowledge/:chatbotId/search?q=...&limit=5
+     * Buscar na base de conhecimento (índice BM25 quando disponível)
+     */
+    app.get('/api/knowledge/:chatbotId/search', async (req, res) => {
+        try {
+            const { chatbotId } = req.params;
+            const { q, limit } = req.query;
+
+            if (!q) {
+                return res.status(400).json({
+                    success: false,
+                    error: 'Parâmetro q é obrigatório'
+                });
+            }
+
+            const results = await knowledgeBaseManager.searchIndexed(chatbotId, q, parseInt(limit) || 5);
+
+            res.json({
+                success: true,
+                results
+            });
+        } catch (error) {
+            console.error('❌ Erro ao buscar na base de conhecimento:', error);
+            res.status(500).json({
+                success: false,
+                error: 'Erro ao buscar na base de conhecimento'
+            });
+        }
+    });
+
     /**
      * DELETE /api/knowledge/:chatbotId/:entryType/:entryId
      * Remover entrada da base de conhecimento
@@ -37,6 +37,9 @@ const { chatgptManager } = require('./chatgpt-integration');
 const { crmIntegrations } = require('./crm-integrations');
 const { whitelabelManager } = require('./whitelabel');
 const { structuredLeadsManager } = require('./structured-leads');
+const { createBoundedMap } = require('./bounded-store');
+const { assembleContext } = require('./context-budget');
+const { canonicalUrl, packPage, unpackPage, getChunkStoreStats } = require('./chunk-store');
 console.log('✅ Módulos V3.0 carregados');
 
 const crypto = require("crypto");
@@ -63,8 +66,42 @@ try {
 
 const app = express();
 
+// ===== MEMÓRIA LIMITADA: LRU + TTL, cota por tenant, sessões removidas vão para disco =====
+const SESSION_STORE_OPTIONS = {
+    maxEntries: parseInt(process.env.MEMORY_MAX_SESSIONS || '5000', 10),
+    tenantQuota: parseInt(process.env.MEMORY_TENANT_QUOTA || '2000', 10),
+    ttl: parseFloat(process.env.MEMORY_SESSION_TTL_HOURS || '24') * 60 * 60 * 1000,
+    spill: true
+};
+
 // Declarando conversationHistories no escopo global ou adequado
-const conversationHistories = new Map();
+const conversationHistories = createBoundedMap('conversationHistories', SESSION_STORE_OPTIONS);
+const MAX_STORED_TURNS = 100;   // o context-budget.js resume o que não cabe no prompt
+
+/**
+ * Chave com o tenant (hash da API key) como prefixo: a cota por tenant dos
+ * mapas limitados usa o que vem antes de ':'
+ */
+function tenantKeyFor(apiKey, id) {
+    if (!id) return null;
+    const tenant = crypto.createHash("sha1").update(String(apiKey || "default")).digest("hex").slice(0, 12);
+    return `${tenant}:${id}`;
+}
+
+/**
+ * Chave da conversa: tenant + conversationId do widget
+ */
+function conversationKeyFor(apiKey, conversationId) {
+    return tenantKeyFor(apiKey, conversationId);
+}
+
+function rememberTurns(conversationKey, userMessage, assistantMessage) {
+    if (!conversationKey) return;
+    const history = conversationHistories.get(conversationKey) || [];
+    history.push({ role: "user", content: userMessage }, { role: "assistant", content: assistantMessage });
+    if (history.length > MAX_STORED_TURNS) history.splice(0, history.length - MAX_STORED_TURNS);
+    conversationHistories.set(conversationKey, history);
+}
 
 // ===== SISTEMA DE SUPERINTELIGÊNCIA CONVERSACIONAL AVANÇADA =====
 class SuperInteligenciaConversacional {
@@ -72,11 +109,11 @@ class SuperInteligenciaConversacional {
         console.log("🧠 SUPERINTELIGÊNCIA CONVERSACIONAL - Inicializando Sistema Avançado");
         
         // Sistema de Memória Conversacional Avançada
-        this.memoriaConversacional = new Map();
+        this.memoriaConversacional = createBoundedMap('memoriaConversacional', SESSION_STORE_OPTIONS);
         this.personalidades = new Map();
-        this.historicoEmocional = new Map();
-        this.preferenciasUsuarios = new Map();
-        this.padroesSucesso = new Map();
+        this.historicoEmocional = createBoundedMap('historicoEmocional', SESSION_STORE_OPTIONS);
+        this.preferenciasUsuarios = createBoundedMap('preferenciasUsuarios', SESSION_STORE_OPTIONS);
+        this.padroesSucesso = createBoundedMap('padroesSucesso', SESSION_STORE_OPTIONS);
         
         // Configurações da Personalidade
         this.configPersonalidade = {
@@ -669,7 +706,13 @@ class SuperInteligenciaConversacional {
                 this.padroesSucesso.set(userId, []);
             }
 
-            this.padroesSucesso.get(userId).push(padrao);
+            const padroes = this.padroesSucesso.get(userId);
+            padroes.push(padrao);
+
+            // Manter apenas os últimos 100 padrões por usuário
+            if (padroes.length > 100) {
+                padroes.splice(0, padroes.length - 100);
+            }
         }
     }
 
@@ -848,6 +891,20 @@ function getTenantBackupDirPath(apiKey) {
     return backupDir;
 }
 
+// JSON lido do disco uma vez por versão do arquivo (mtime + tamanho)
+const jsonFileCache = createBoundedMap('jsonFileCache', { maxEntries: 1000, tenantOf: () => 'default' });
+
+function readJsonCached(filePath) {
+    const stats = fs.statSync(filePath);
+    const cached = jsonFileCache.get(filePath);
+    if (cached && cached.mtimeMs === stats.mtimeMs && cached.size === stats.size) {
+        return cached.data;
+    }
+    const data = JSON.parse(fs.readFileSync(filePath, "utf8"));
+    jsonFileCache.set(filePath, { mtimeMs: stats.mtimeMs, size: stats.size, data });
+    return data;
+}
+
 class LeadBackupSystem {
     constructor(leadSystem, apiKey) {
         this.leadSystem = leadSystem;
@@ -927,10 +984,45 @@ class LeadBackupSystem {
         }
     }
 
+    // Backups já migrados para o store deduplicado (backup_store.py): índice só do tenant,
+    // relido quando o backup_store.py o regrava (mtime)
+    loadStoredBackups() {
+        try {
+            const storeDir = path.join(__dirname, "data", "backup-store");
+            const tenantIndex = path.join(storeDir, "tenants", `${this.apiKey}.json`);
+            let entries;
+            if (fs.existsSync(tenantIndex)) {
+                entries = readJsonCached(tenantIndex).backups || [];
+            } else {
+                // Store migrado antes dos índices por tenant
+                const indexPath = path.join(storeDir, "index.json");
+                if (!fs.existsSync(indexPath)) return new Map();
+                const index = readJsonCached(indexPath);
+                entries = (index.tenants && index.tenants[this.apiKey]) || [];
+            }
+            return new Map(entries.map(entry => [entry.filename, entry]));
+        } catch (error) {
+            console.error("❌ Erro ao ler índice do store de backups:", error);
+            return new Map();
+        }
+    }
+
     listBackups() {
         try {
+            // Backups migrados vêm do índice, sem stat nem leitura do arquivo
+            const stored = this.loadStoredBackups();
+            const backups = [...stored.values()].map(entry => ({
+                filename: entry.filename,
+                timestamp: entry.timestamp,
+                type: entry.type,
+                leadsCount: entry.leadsCount,
+                size: entry.size,
+                created: new Date(entry.created),
+                stored: true
+            }));
+
             const files = fs.readdirSync(this.backupDir)
-                .filter(f => f.startsWith("leads-backup-"))
+                .filter(f => f.startsWith("leads-backup-") && !stored.has(f))
                 .map(f => {
                     const filePath = path.join(this.backupDir, f);
                     const stats = fs.statSync(filePath);
@@ -943,10 +1035,10 @@ class LeadBackupSystem {
                         size: stats.size,
                         created: stats.mtime
                     };
-                })
+                });
+
+            return backups.concat(files)
                 .sort((a, b) => new Date(b.created) - new Date(a.created));
-            
-            return files;
         } catch (error) {
             console.error("❌ Erro ao listar backups:", error);
             return [];
@@ -958,6 +1050,12 @@ class LeadBackupSystem {
             const backupPath = path.join(this.backupDir, filename);
             
             if (!fs.existsSync(backupPath)) {
+                if (this.loadStoredBackups().has(filename)) {
+                    return {
+                        success: false,
+                        error: "Backup arquivado no store: restaure com python3 backup_store.py restore"
+                    };
+                }
                 return { success: false, error: "Backup não encontrado" };
             }
             
@@ -2430,7 +2528,11 @@ app.post("/validate-api-key", (req, res) => {
 });
 
 app.get("/app", (req, res) => {
-    res.sendFile(path.join(__dirname, "public", "index_app.html"));
+    const panelPath = path.join(__dirname, "public", "index_app.html");
+    if (!sendPrecompressed(req, res, panelPath)) {
+        setStaticCacheHeaders(res, panelPath);
+        res.sendFile(panelPath);
+    }
 });
 
 app.get("/privacy.html", (req, res) => {
@@ -2754,16 +2856,104 @@ app.get("/chatbot", async (req, res) => {
     }
 });
 
+// ===== Assets pré-comprimidos (.br/.gz gerados por precompress.py) =====
+const PRECOMPRESSED_ENCODINGS = [
+    { encoding: 'br', ext: '.br' },
+    { encoding: 'gzip', ext: '.gz' }
+];
+
+// Só tipos que o precompress.py gera; o resto vai direto para o express.static
+const PRECOMPRESSED_EXTENSIONS = new Set(['.js', '.css', '.html', '.svg', '.json', '.map', '.txt']);
+const PRECOMPRESSED_RECHECK_MS = 10 * 1000;
+// Caminho -> versões comprimidas em dia; revalidado a cada 10s (sem stat por requisição)
+const precompressedLookups = createBoundedMap('precompressedLookups', { maxEntries: 1000 });
+
+function lookupPrecompressed(filePath) {
+    const cached = precompressedLookups.get(filePath);
+    if (cached && Date.now() - cached.checkedAt < PRECOMPRESSED_RECHECK_MS) return cached.variants;
+
+    const variants = [];
+    const original = fs.statSync(filePath, { throwIfNoEntry: false });
+    if (original && original.isFile()) {
+        for (const { encoding, ext } of PRECOMPRESSED_ENCODINGS) {
+            const compressed = fs.statSync(filePath + ext, { throwIfNoEntry: false });
+            // Só usa a versão comprimida se ela não estiver desatualizada
+            if (compressed && compressed.mtimeMs >= original.mtimeMs) {
+                variants.push({ encoding, path: filePath + ext });
+            }
+        }
+    }
+    precompressedLookups.set(filePath, { checkedAt: Date.now(), variants });
+    return variants;
+}
+
+function findPrecompressed(req, filePath) {
+    const accepted = req.headers['accept-encoding'] || '';
+    if (!accepted) return null;
+    return lookupPrecompressed(filePath).find(({ encoding }) => accepted.includes(encoding)) || null;
+}
+
+function sendPrecompressed(req, res, filePath) {
+    const match = findPrecompressed(req, filePath);
+    if (!match) return false;
+
+    res.setHeader('Content-Encoding', match.encoding);
+    res.setHeader('Vary', 'Accept-Encoding');
+    res.type(path.extname(filePath));
+    // Cache-Control decidido pelo caminho original (o .br/.gz não tem hash nem .html no fim)
+    setStaticCacheHeaders(res, filePath);
+    res.sendFile(match.path, { maxAge: '1d' });
+    return true;
+}
+
+function precompressedStatic(root) {
+    const resolvedRoot = path.resolve(root);
+    return (req, res, next) => {
+        if (req.method !== 'GET' && req.method !== 'HEAD') return next();
+        if (!PRECOMPRESSED_EXTENSIONS.has(path.extname(req.path).toLowerCase())) return next();
+        if (!req.headers['accept-encoding']) return next();
+        let relativePath;
+        try {
+            relativePath = decodeURIComponent(req.path);
+        } catch (error) {
+            return next();
+        }
+        const filePath = path.resolve(resolvedRoot, '.' + relativePath);
+        if (!filePath.startsWith(resolvedRoot + path.sep)) return next();
+        if (!sendPrecompressed(req, res, filePath)) next();
+    };
+}
+
+// Assets gerados com hash no nome (ex: panel-v2.1a2b3c4d.js) nunca mudam: cache de 1 ano.
+// HTML (painel, fragmentos) é sempre revalidado: é ele que aponta para os hashes novos
+const HASHED_ASSET_REGEX = /\.[0-9a-f]{8}\.(js|css)$/;
+function setStaticCacheHeaders(res, filePath) {
+    if (HASHED_ASSET_REGEX.test(filePath)) {
+        res.setHeader('Cache-Control', 'public, max-age=31536000, immutable');
+    } else if (path.extname(filePath).toLowerCase() === '.html') {
+        res.setHeader('Cache-Control', 'no-cache');
+    }
+}
+
+// Só em /public, /fragments e arquivos na raiz de public/ (panel-v2.<hash>.js etc.):
+// rotas da API nunca passam pelo lookup
+const ROOT_ASSET_ROUTE = /^\/[\w.-]+\.(js|css|html)$/;
+app.use("/public", precompressedStatic(path.join(__dirname, "public")));
+app.use("/fragments", precompressedStatic(path.join(__dirname, "public", "fragments")));
+app.get(ROOT_ASSET_ROUTE, precompressedStatic(path.join(__dirname, "public")));
+
 app.use("/public", express.static(path.join(__dirname, "public"), {
     maxAge: "1d",
     etag: true,
-    lastModified: true
+    lastModified: true,
+    setHeaders: setStaticCacheHeaders
 }));
 
 app.use(express.static("public", {
     maxAge: "1d",
     etag: true,
-    lastModified: true
+    lastModified: true,
+    setHeaders: setStaticCacheHeaders
 }));
 
 // ===== Analytics & Cache =====
@@ -2794,17 +2984,22 @@ app.use((req, res, next) => {
     next();
 });
 
-const dataCache = new Map();
 const CACHE_TTL = 30 * 60 * 1000;
+const dataCache = createBoundedMap('dataCache', {
+    maxEntries: parseInt(process.env.DATA_CACHE_MAX_ENTRIES || '500', 10),
+    ttl: CACHE_TTL
+});
 
+// O texto da página fica no chunk-store.js (uma cópia por conteúdo); aqui só as referências
 function setCacheData(key, data) {
-    dataCache.set(key, { data, timestamp: Date.now() });
+    dataCache.set(key, { data: packPage(data), timestamp: Date.now() });
 }
 
 function getCacheData(key) {
     const cached = dataCache.get(key);
     if (cached && (Date.now() - cached.timestamp) < CACHE_TTL) {
-        return cached.data;
+        const data = unpackPage(cached.data);
+        if (data) return data;
     }
     dataCache.delete(key);
     return null;
@@ -2952,7 +3147,7 @@ async function extractPageData(url) {
     try {
         if (!url) throw new Error("URL is required");
 
-        const cacheKey = url;
+        const cacheKey = canonicalUrl(url);
         const cached = getCacheData(cacheKey);
         if (cached) {
             logger.info(`Cache hit for ${url}`);
@@ -3183,11 +3378,15 @@ async function extractPageData(url) {
 }
 
 // ===== LLM Integration =====
+const GROQ_MODEL = process.env.GROQ_MODEL || "llama-3.1-70b-versatile";
+const OPENROUTER_MODEL = process.env.OPENROUTER_MODEL || "mistralai/mistral-7b-instruct";
+const OPENAI_MODEL = process.env.OPENAI_MODEL || "gpt-3.5-turbo";
+
 async function callGroq(messages, temperature = 0.4, maxTokens = 300) {
     if (!process.env.GROQ_API_KEY) throw new Error("GROQ_API_KEY missing");
 
     const payload = {
-        model: process.env.GROQ_MODEL || "llama-3.1-70b-versatile",
+        model: GROQ_MODEL,
         messages,
         temperature,
         max_tokens: maxTokens
@@ -3209,7 +3408,7 @@ async function callOpenRouter(messages, temperature = 0.4, maxTokens = 300) {
     if (!process.env.OPENROUTER_API_KEY) throw new Error("OPENROUTER_API_KEY missing");
 
     const payload = {
-        model: process.env.OPENROUTER_MODEL || "mistralai/mistral-7b-instruct",
+        model: OPENROUTER_MODEL,
         messages,
         temperature,
         max_tokens: maxTokens
@@ -3231,7 +3430,7 @@ async function callOpenAI(messages, temperature = 0.4, maxTokens = 300) {
     if (!process.env.OPENAI_API_KEY) throw new Error("OPENAI_API_KEY missing");
 
     const payload = {
-        model: process.env.OPENAI_MODEL || "gpt-3.5-turbo",
+        model: OPENAI_MODEL,
         messages,
         temperature,
         max_tokens: maxTokens
@@ -3259,7 +3458,7 @@ function shouldActivateSalesMode(instructions) {
 }
 
 // ===== FUNÇÃO APRIMORADA DE RESPOSTA DA IA COM SUPERINTELIGÊNCIA =====
-async function generateAIResponse(userMessage, pageData = {}, conversationHistory = [], instructions = "", leadId = null) {
+async function generateAIResponse(userMessage, pageData = {}, conversationHistory = [], instructions = "", leadId = null, conversationKey = null, memoryKey = null) {
     const startTime = Date.now();
     try {
         if (!userMessage || !String(userMessage).trim()) {
@@ -3273,7 +3472,8 @@ async function generateAIResponse(userMessage, pageData = {}, conversationHistor
         }
 
         // 🎯 SUPERINTELIGÊNCIA: Análise Avançada
-        const userId = leadId || `user_${Date.now()}`;
+        // memoryKey = tenantKeyFor(apiKey, leadId): memória do lead fica na cota do tenant
+        const userId = memoryKey || `user_${Date.now()}`;
         const estadoEmocional = superInteligenciaGlobal.analisarEstadoEmocional(cleanUserMessage);
         
         // 🎯 ATUALIZAR MEMÓRIA DO USUÁRIO
@@ -3392,14 +3592,21 @@ Inteligência emocional
 
 NUNCA inclua tags HTML como <s> [OUT] ou qualquer marcação`;
 
-        const messages = [
-            {
-                role: "system",
-                content: systemPrompt
-            },
-            ...conversationHistory,
-            { role: "user", content: cleanUserMessage }
-        ];
+        // 🧮 Contexto dentro do orçamento de cada modelo: turnos recentes na íntegra,
+        // resumo dos antigos e só os trechos da página relevantes para a pergunta
+        const buildMessages = (model, maxTokens) => {
+            const { messages, stats } = assembleContext({
+                model,
+                systemPrompt,
+                history: conversationHistory,
+                question: cleanUserMessage,
+                pageText: pageData.cleanText || "",
+                maxTokens,
+                conversationKey
+            });
+            logger.info(`Context ${model}: ${stats.promptTokens}/${stats.budget} tokens (${stats.verbatimTurns} turns verbatim, ${stats.summarizedTurns} summarized, ${stats.pageChunksKept}/${stats.pageChunks} page chunks)`);
+            return messages;
+        };
 
         let response = "";
         let usedProvider = "none";
@@ -3407,7 +3614,7 @@ NUNCA inclua tags HTML como <s> [OUT] ou qualquer marcação`;
         // Try Groq first
         if (process.env.GROQ_API_KEY) {
             try {
-                response = await callGroq(messages, 0.4, 300);
+                response = await callGroq(buildMessages(GROQ_MODEL, 300), 0.4, 300);
                 usedProvider = "groq";
                 logger.info("Groq API call successful");
             } catch (groqError) {
@@ -3418,7 +3625,7 @@ NUNCA inclua tags HTML como <s> [OUT] ou qualquer marcação`;
         // Try OpenRouter if Groq failed
         if (!response && process.env.OPENROUTER_API_KEY) {
             try {
-                response = await callOpenRouter(messages, 0.3, 250);
+                response = await callOpenRouter(buildMessages(OPENROUTER_MODEL, 250), 0.3, 250);
                 usedProvider = "openrouter";
                 logger.info("OpenRouter API call successful");
             } catch (openrouterError) {
@@ -3429,7 +3636,7 @@ NUNCA inclua tags HTML como <s> [OUT] ou qualquer marcação`;
         // Try OpenAI if others failed
         if (!response && process.env.OPENAI_API_KEY) {
             try {
-                response = await callOpenAI(messages, 0.2, 250);
+                response = await callOpenAI(buildMessages(OPENAI_MODEL, 250), 0.2, 250);
                 usedProvider = "openai";
                 logger.info("OpenAI API call successful");
             } catch (openaiError) {
@@ -3610,6 +3817,7 @@ app.get("/health", (req, res) => {
             successfulExtractions: analytics.successfulExtractions,
             failedExtractions: analytics.failedExtractions,
             cacheSize: dataCache.size,
+            chunkStore: getChunkStoreStats(),
             leadsCaptured: analytics.leadsCaptured
         },
         services: {
@@ -3702,7 +3910,11 @@ app.post("/api/chat-universal", requireApiKey, async (req, res) => {
             leadSystem.updateLeadConversation(leadId, message, true);
         }
 
-        const aiResponse = await generateAIResponse(message, processedPageData || {}, [], instructions, leadId);
+        const conversationKey = conversationKeyFor(req.cliente.apiKey, conversationId);
+        const history = conversationKey ? conversationHistories.get(conversationKey) || [] : [];
+        const aiResponse = await generateAIResponse(message, processedPageData || {}, history, instructions, leadId, conversationKey,
+            tenantKeyFor(req.cliente.apiKey, leadId));
+        rememberTurns(conversationKey, message, aiResponse);
 
         // 🎯 ATUALIZAR RESPOSTA NO LEAD SE EXISTIR
         if (leadId) {
@@ -3822,7 +4034,11 @@ app.post("/api/process-chat-inteligente", requireApiKey, async (req, res) => {
             console.log(`🎭 Resposta emocional inteligente gerada`);
         } else {
             // 🎯 USAR SISTEMA ORIGINAL COM MELHORIAS EMOCIONAIS
-            const respostaIA = await generateAIResponse(message, processedPageData || {}, [], instructions, leadId);
+            const conversationKey = conversationKeyFor(req.cliente.apiKey, conversationId);
+            const history = conversationKey ? conversationHistories.get(conversationKey) || [] : [];
+            const respostaIA = await generateAIResponse(message, processedPageData || {}, history, instructions, leadId, conversationKey,
+                tenantKeyFor(req.cliente.apiKey, leadId));
+            rememberTurns(conversationKey, message, respostaIA);
             
             // Aplicar melhorias emocionais na resposta
             if (analiseEmocional.emocao === "negativo" && analiseEmocional.intensidade >= 2) {
@@ -3931,6 +4147,26 @@ app.post("/api/extract-enhanced", async (req, res) => {
     }
 });
 
+// ===== Extração pelo serviço local (extraction_service.py) =====
+// Retorna null sem o serviço, em caso de falha ou com texto curto demais
+// (páginas dinâmicas seguem para o extractPageData e o puppeteer)
+async function extractViaService(url) {
+    const serviceUrl = process.env.EXTRACTION_SERVICE_URL;
+    if (!serviceUrl) return null;
+
+    try {
+        const response = await axios.post(`${serviceUrl}/extract`, { url }, { timeout: 60000 });
+        const data = response.data && response.data.success ? response.data.data : null;
+        if (data && data.cleanText && data.cleanText.length >= 200) {
+            logger.info(`Extraction service returned ${url} (${response.data.source})`);
+            return data;
+        }
+    } catch (error) {
+        logger.warn(`Extraction service failed for ${url}: ${error.message || error}`);
+    }
+    return null;
+}
+
 // /api/extract endpoint (ORIGINAL - mantido para compatibilidade)
 app.post("/api/extract", async (req, res) => {
     analytics.extractRequests++;
@@ -3957,7 +4193,7 @@ app.post("/api/extract", async (req, res) => {
 
         logger.info(`Starting extraction for URL: ${url}`);
         
-        const extractedData = await extractPageData(url);
+        const extractedData = await extractViaService(url) || await extractPageData(url);
         
         if (instructions) extractedData.custom_instructions = instructions;
         if (robotName) extractedData.robot_name = robotName;
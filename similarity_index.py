@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Índice de similaridade para o cache de respostas do LLM (llm-optimizer.js)
+
+O ResponseCache.findSimilar compara a pergunta com TODAS as entradas do
+cache usando Levenshtein. Aqui cada pergunta vira uma assinatura MinHash
+dos trigramas de caracteres (matriz NumPy), e as assinaturas são
+divididas em faixas (LSH): cada faixa vira um hash de 64 bits ordenado,
+consultado com searchsorted. Uma busca só olha as entradas que colidem
+em alguma faixa e ordena esses candidatos pela similaridade estimada.
+
+O serviço devolve os top-k candidatos; o ResponseCache confirma com o
+próprio calculateSimilarity só esses k (ver findSimilarIndexed).
+
+Uso:
+  python3 similarity_index.py build            # export do cache -> índice .npz
+  python3 similarity_index.py serve            # HTTP local (SIMILARITY_INDEX_URL)
+  python3 similarity_index.py serve --stdin    # NDJSON pela entrada padrão
+  python3 similarity_index.py benchmark        # índice x varredura linear atual
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import unicodedata
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EXPORT_PATH = os.path.join('data', 'response-cache-questions.ndjson')
+INDEX_PATH = os.path.join('data', 'similarity-index.npz')
+HOST = '127.0.0.1'
+PORT = 7801
+
+NGRAM = 3
+NUM_PERM = 60
+BANDS = 15                  # 15 faixas de 4 linhas
+TOP_K = 5
+MERGE_EVERY = 1024          # inserções online ficam num buffer até serem ordenadas
+MERGE_FRACTION = 8          # ... ou até o buffer/removidos chegarem a 1/8 do índice
+
+_PRIME = 4294967311         # primo > 2^32
+_MIX = 0x9E3779B97F4A7C15
+_BAND_MULT = 0x100000001B3
+
+
+def normalize(text):
+    """Mesma normalização do ResponseCache (toLowerCase + trim), sem acentos"""
+    text = unicodedata.normalize('NFKD', text.lower().strip())
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def shingles(text):
+    text = f' {normalize(text)} '
+    if len(text) <= NGRAM:
+        return [zlib.crc32(text.encode('utf-8'))]
+    return list({zlib.crc32(text[i:i + NGRAM].encode('utf-8')) for i in range(len(text) - NGRAM + 1)})
+
+
+class SimilarityIndex:
+    """
+    Assinaturas MinHash + faixas LSH ordenadas, com buffer para inserções online
+
+    Os arrays têm capacidade dobrada (só as primeiras len(keys) linhas valem),
+    então uma inserção online custa O(1) amortizado. As linhas removidas só
+    saem dos arrays no _merge, que também reordena as faixas.
+    """
+
+    def __init__(self, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+        self.rows = NUM_PERM // BANDS
+        self.keys = []
+        self.questions = []
+        self.chatbots = {}
+        self.positions = {}
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self.owner = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.band_hashes = np.zeros((0, BANDS), dtype=np.uint64)
+        self._sorted = np.zeros(0, dtype=np.uint64)
+        self._order = np.zeros(0, dtype=np.int64)
+        self._merged = 0
+        self._removed = 0
+        self.lock = Lock()
+
+    # ------------------------------------------------------------------
+    # Assinaturas
+    # ------------------------------------------------------------------
+    def signature(self, text):
+        hashes = np.fromiter(shingles(text), dtype=np.uint64)
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def signatures_for(self, texts, batch=100000):
+        """Assinaturas de muitos textos de uma vez (reduceat por texto)"""
+        out = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+        groups = [shingles(text) for text in texts]
+        start = 0
+        while start < len(groups):
+            end = start
+            total = 0
+            while end < len(groups) and (total < batch or end == start):
+                total += len(groups[end])
+                end += 1
+            hashes = np.fromiter((h for group in groups[start:end] for h in group), dtype=np.uint64, count=total)
+            bounds = np.cumsum([0] + [len(group) for group in groups[start:end - 1]])
+            values = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME
+            out[start:end] = np.minimum.reduceat(values, bounds, axis=1).T
+            start = end
+        return out
+
+    def _bands(self, signatures, owners):
+        sig = signatures.astype(np.uint64).reshape(len(signatures), BANDS, self.rows)
+        hashed = np.broadcast_to(np.arange(1, BANDS + 1, dtype=np.uint64), (len(signatures), BANDS))
+        for row in range(self.rows):
+            hashed = hashed * np.uint64(_BAND_MULT) ^ sig[:, :, row]
+        # O chatbot entra no hash: faixas de chatbots diferentes não colidem
+        return hashed ^ (owners.astype(np.uint64)[:, None] * np.uint64(_MIX))
+
+    # ------------------------------------------------------------------
+    # Construção e atualização
+    # ------------------------------------------------------------------
+    def _chatbot_code(self, chatbot_id):
+        code = self.chatbots.get(chatbot_id)
+        if code is None:
+            code = self.chatbots[chatbot_id] = len(self.chatbots)
+        return code
+
+    def _reserve(self, extra):
+        """Garante capacidade para mais `extra` linhas, dobrando os arrays"""
+        needed = len(self.keys) + extra
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        used = len(self.keys)
+        for name in ('signatures', 'owner', 'alive', 'band_hashes'):
+            old = getattr(self, name)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:used] = old[:used]
+            setattr(self, name, grown)
+
+    def add_many(self, entries):
+        """entries: iterável de (key, chatbotId, question)"""
+        entries = list(entries)
+        if not entries:
+            return
+        # Assinaturas fora do lock: as buscas seguem enquanto o lote é calculado
+        sigs = self.signatures_for([question for _, _, question in entries])
+        with self.lock:
+            for key, _, _ in entries:
+                old = self.positions.get(key)
+                if old is not None:
+                    self.alive[old] = False
+                    self._removed += 1
+            owners = np.array([self._chatbot_code(chatbot) for _, chatbot, _ in entries], dtype=np.int64)
+            self._reserve(len(entries))
+            start = len(self.keys)
+            end = start + len(entries)
+            for i, (key, _, question) in enumerate(entries):
+                self.keys.append(key)
+                self.questions.append(question)
+                self.positions[key] = start + i
+            self.signatures[start:end] = sigs
+            self.owner[start:end] = owners
+            self.alive[start:end] = True
+            self.band_hashes[start:end] = self._bands(sigs, owners)
+            self._maybe_merge()
+
+    def add(self, key, chatbot_id, question):
+        self.add_many([(key, chatbot_id, question)])
+
+    def remove(self, key):
+        with self.lock:
+            position = self.positions.pop(key, None)
+            if position is not None:
+                self.alive[position] = False
+                self._removed += 1
+                self._maybe_merge()
+
+    def _maybe_merge(self):
+        threshold = max(MERGE_EVERY, len(self.keys) // MERGE_FRACTION)
+        if len(self.keys) - self._merged + self._removed >= threshold:
+            self._merge()
+
+    def _compact(self):
+        """Remove dos arrays as linhas mortas (removidas ou substituídas)"""
+        used = len(self.keys)
+        live = np.flatnonzero(self.alive[:used])
+        if len(live) == used:
+            return
+        self.keys = [self.keys[i] for i in live.tolist()]
+        self.questions = [self.questions[i] for i in live.tolist()]
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.signatures = self.signatures[live]
+        self.owner = self.owner[live]
+        self.band_hashes = self.band_hashes[live]
+        self.alive = np.ones(len(live), dtype=bool)
+
+    def _merge(self):
+        """Descarta as linhas mortas e ordena os hashes de todas as faixas num
+        único vetor (o número da faixa já faz parte do hash); as inserções do
+        buffer passam a usar searchsorted"""
+        self._compact()
+        flat = self.band_hashes[:len(self.keys)].ravel()
+        order = np.argsort(flat, kind='stable')
+        self._sorted = flat[order]
+        self._order = order // BANDS
+        self._merged = len(self.keys)
+        self._removed = 0
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+    def query(self, chatbot_id, question, k=TOP_K):
+        """Top-k (key, pergunta, similaridade estimada) do mesmo chatbot"""
+        code = self.chatbots.get(chatbot_id)
+        if code is None:
+            return []
+        sig = self.signature(question)
+        bands = self._bands(sig[None, :], np.array([code]))[0]
+
+        with self.lock:
+            lows = self._sorted.searchsorted(bands, 'left')
+            highs = self._sorted.searchsorted(bands, 'right')
+            found = [self._order[lo:hi] for lo, hi in zip(lows.tolist(), highs.tolist()) if hi > lo]
+            if self._merged < len(self.keys):
+                pending = self.band_hashes[self._merged:len(self.keys)]
+                found.append(self._merged + np.flatnonzero((pending == bands).any(axis=1)))
+            if not found:
+                return []
+
+            candidates = np.unique(np.concatenate(found))
+            candidates = candidates[self.alive[candidates] & (self.owner[candidates] == code)]
+            if not len(candidates):
+                return []
+            scores = (self.signatures[candidates] == sig).mean(axis=1)
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k)[:k]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            return [{'key': self.keys[i], 'question': self.questions[i], 'score': round(float(s), 4)}
+                    for i, s in zip(candidates[order].tolist(), scores[order].tolist())]
+
+    def __len__(self):
+        return int(self.alive[:len(self.keys)].sum())
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+    def save(self, path):
+        alive = np.flatnonzero(self.alive[:len(self.keys)])
+        codes = {code: chatbot for chatbot, code in self.chatbots.items()}
+        meta = json.dumps({
+            'keys': [self.keys[i] for i in alive.tolist()],
+            'questions': [self.questions[i] for i in alive.tolist()],
+            'chatbots': [codes[int(c)] for c in self.owner[alive].tolist()],
+        }, ensure_ascii=False).encode('utf-8')
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, signatures=self.signatures[alive], meta=np.frombuffer(meta, dtype=np.uint8))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            signatures = data['signatures']
+        index.keys = meta['keys']
+        index.questions = meta['questions']
+        index.positions = {key: i for i, key in enumerate(index.keys)}
+        index.owner = np.array([index._chatbot_code(c) for c in meta['chatbots']], dtype=np.int64)
+        index.signatures = signatures
+        index.alive = np.ones(len(index.keys), dtype=bool)
+        index.band_hashes = index._bands(signatures, index.owner)
+        index._merge()
+        return index
+
+
+def read_export(path):
+    """NDJSON gerado por ResponseCache.exportQuestions: {key, chatbotId, question}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                yield item['key'], item['chatbotId'], item['question']
+
+
+# ----------------------------------------------------------------------
+# Serviço
+# ----------------------------------------------------------------------
+def handle(index, request):
+    """Executa uma operação {op: similar|add|remove|stats, ...}"""
+    op = request.get('op', 'similar')
+    if op == 'similar':
+        start = time.perf_counter()
+        candidates = index.query(request['chatbotId'], request['question'], int(request.get('k', TOP_K)))
+        return {'success': True, 'candidates': candidates,
+                'elapsedMs': round((time.perf_counter() - start) * 1000, 3)}
+    if op == 'add':
+        index.add(request['key'], request['chatbotId'], request['question'])
+        return {'success': True}
+    if op == 'remove':
+        index.remove(request['key'])
+        return {'success': True}
+    if op == 'stats':
+        return {'success': True, 'entries': len(index), 'chatbots': len(index.chatbots)}
+    return {'success': False, 'error': f'Operação desconhecida: {op}'}
+
+
+def make_handler(index):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                request['op'] = self.path.strip('/') or 'similar'
+                status, body = 200, handle(index, request)
+            except (KeyError, ValueError) as error:
+                status, body = 400, {'success': False, 'error': str(error)}
+            self._reply(status, body)
+
+        def do_GET(self):
+            self._reply(200, handle(index, {'op': 'stats'}))
+
+        def _reply(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve_stdin(index):
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            response = handle(index, json.loads(line))
+        except (KeyError, ValueError) as error:
+            response = {'success': False, 'error': str(error)}
+        sys.stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+_SUBJECTS = ['o preço', 'o plano profissional', 'a entrega', 'o suporte', 'a garantia', 'o frete',
+             'o pagamento', 'a integração com whatsapp', 'o cancelamento', 'a nota fiscal',
+             'o horário de atendimento', 'a política de troca', 'o desconto', 'o cupom', 'a assinatura']
+_TEMPLATES = ['qual é {s}?', 'como funciona {s}', 'vocês têm informação sobre {s}?',
+              'gostaria de saber mais sobre {s}', 'pode me explicar {s} do pedido {n}?',
+              'onde vejo {s} da conta {n}', 'quanto custa {s} para {n} usuários?',
+              'tenho uma dúvida sobre {s} número {n}']
+
+
+def synthetic_questions(count, chatbots=10, seed=7):
+    rng = random.Random(seed)
+    return [(f'bot{i % chatbots}:{i:08x}', f'bot{i % chatbots}',
+             rng.choice(_TEMPLATES).format(s=rng.choice(_SUBJECTS), n=rng.randint(1, 99999)))
+            for i in range(count)]
+
+
+def _typo(question, rng):
+    chars = list(question)
+    for _ in range(max(1, len(chars) // 30)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz ')
+    return ''.join(chars)
+
+
+_NODE_SCAN = r'''
+console.log = () => {};
+const { ResponseCache } = require(process.argv[1]);
+const lines = require('fs').readFileSync(0, 'utf8').split('\n').filter(Boolean).map(JSON.parse);
+const cache = new ResponseCache();
+cache.maxCacheSize = Infinity;
+for (const e of lines.filter(e => !e.query)) {
+    cache.cache.set(e.key, { question: e.question, response: e.key, metadata: {}, timestamp: 0, hits: 0 });
+}
+const results = [];
+for (const q of lines.filter(e => e.query)) {
+    const start = process.hrtime.bigint();
+    const hit = cache.findSimilar(q.question, q.chatbotId);
+    results.push({ ms: Number(process.hrtime.bigint() - start) / 1e6, hit });
+}
+process.stdout.write(JSON.stringify(results));
+'''
+
+
+def benchmark(sizes=(1000, 10000, 100000), queries=2000, linear_queries=5):
+    print("⏱️  Benchmark do índice de similaridade")
+    print(f"{'entradas':>9}{'build s':>9}{'p50 ms':>9}{'p99 ms':>9}{'recall':>8}"
+          f"{'linear hit ms':>15}{'linear miss ms':>16}")
+    rng = random.Random(3)
+    for size in sizes:
+        entries = synthetic_questions(size)
+        start = time.perf_counter()
+        index = SimilarityIndex()
+        index.add_many(entries)
+        build = time.perf_counter() - start
+
+        sample = [rng.choice(entries) for _ in range(queries)]
+        timings = []
+        found = 0
+        for key, chatbot, question in sample:
+            typo = _typo(question, rng)
+            start = time.perf_counter()
+            result = index.query(chatbot, typo)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += any(c['question'] == question for c in result)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p99 = timings[int(len(timings) * 0.99)]
+
+        linear = _linear_scan_ms(entries, sample[:linear_queries], rng)
+        if linear is None:
+            linear_text = f"{'(sem node)':>31}"
+        else:
+            linear_text = f'{linear[0]:>15.2f}{linear[1]:>16.2f}'
+        print(f"{size:>9}{build:>9.2f}{p50:>9.3f}{p99:>9.3f}{found / queries:>8.1%}{linear_text}")
+
+
+def _linear_scan_ms(entries, sample, rng):
+    """Tempo médio (acerto, falta) do ResponseCache.findSimilar atual (Node), ou None sem node
+
+    No acerto a varredura para na primeira entrada parecida; na falta (pergunta
+    nova, o caso comum) ela percorre o cache inteiro."""
+    lines = [json.dumps({'key': k, 'chatbotId': c, 'question': q}) for k, c, q in entries]
+    lines += [json.dumps({'query': True, 'chatbotId': c, 'question': _typo(q, rng)}) for _, c, q in sample]
+    lines += [json.dumps({'query': True, 'chatbotId': c, 'question': f'pergunta inédita {n} sobre outro assunto'})
+              for n, (_, c, _) in enumerate(sample)]
+    module = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm-optimizer.js')
+    try:
+        proc = subprocess.run(['node', '-e', _NODE_SCAN, module], input='\n'.join(lines),
+                              capture_output=True, text=True, timeout=600)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0:
+        return None
+    results = json.loads(proc.stdout)
+    hits = [r['ms'] for r in results if r['hit'] is not None] or [0.0]
+    misses = [r['ms'] for r in results if r['hit'] is None] or [0.0]
+    return sum(hits) / len(hits), sum(misses) / len(misses)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Índice de similaridade do cache de respostas')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='constrói o índice a partir do export do cache')
+    p.add_argument('--input', default=EXPORT_PATH)
+    p.add_argument('--output', default=INDEX_PATH)
+
+    p = sub.add_parser('serve', help='serve buscas top-k por HTTP local ou stdin')
+    p.add_argument('--index', default=INDEX_PATH)
+    p.add_argument('--input', default=EXPORT_PATH, help='usado se o índice não existir')
+    p.add_argument('--host', default=HOST)
+    p.add_argument('--port', type=int, default=PORT)
+    p.add_argument('--stdin', action='store_true', help='NDJSON pela entrada/saída padrão')
+
+    p = sub.add_parser('benchmark', help='compara com a varredura linear do ResponseCache')
+    p.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    p.add_argument('--queries', type=int, default=2000)
+
+    args = parser.parse_args(argv)
+    if np is None:
+        print("❌ NumPy é necessário para o índice de similaridade (pip install numpy)", file=sys.stderr)
+        return 1
+
+    if args.command == 'benchmark':
+        benchmark(args.sizes, args.queries)
+        return 0
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = SimilarityIndex()
+        index.add_many(read_export(args.input))
+        index.save(args.output)
+        print(f"✅ {len(index)} perguntas indexadas em {args.output} "
+              f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return 0
+
+    if os.path.exists(args.index):
+        index = SimilarityIndex.load(args.index)
+    else:
+        index = SimilarityIndex()
+        if os.path.exists(args.input):
+            index.add_many(read_export(args.input))
+        index._merge()
+
+    if args.stdin:
+        serve_stdin(index)
+        return 0
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(index))
+    print(f"🔎 Índice de similaridade ({len(index)} perguntas) em http://{args.host}:{args.port}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
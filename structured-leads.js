@@ -1,10 +1,70 @@
 // ===== STRUCTURED LEADS MODULE =====
 // Módulo para captura estruturada de leads com validação e exportação
 
-const { db, DatabaseHelpers } = require('./database');
+const { db, DatabaseHelpers, USE_POSTGRES } = require('./database');
 const fs = require('fs').promises;
 const path = require('path');
 
+// Regras de pontuação compartilhadas com o lead_scoring.py (reprocessamento em lote).
+// Chaves são colunas da structured_leads; no saveLead os dados chegam em camelCase.
+const SCORING_RULES = require('./lead-scoring-rules.json');
+
+function columnToField(column) {
+    return column.replace(/_(\w)/g, (_, letter) => letter.toUpperCase());
+}
+
+// Resumo por chatbot mantido por triggers (SQLite); o lead_scoring.py reconstrói do zero
+const SUMMARY_SCHEMA = [
+    `CREATE TABLE IF NOT EXISTS structured_leads_summary (
+        chatbot_id TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        hot INTEGER NOT NULL DEFAULT 0,
+        warm INTEGER NOT NULL DEFAULT 0,
+        cold INTEGER NOT NULL DEFAULT 0,
+        converted INTEGER NOT NULL DEFAULT 0,
+        score_sum INTEGER NOT NULL DEFAULT 0,
+        rules_version INTEGER,
+        rescored_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )`,
+    `CREATE TRIGGER IF NOT EXISTS structured_leads_summary_insert AFTER INSERT ON structured_leads BEGIN
+        INSERT INTO structured_leads_summary (chatbot_id, total, hot, warm, cold, converted, score_sum)
+        VALUES (NEW.chatbot_id, 1, NEW.lead_status = 'hot', NEW.lead_status = 'warm', NEW.lead_status = 'cold',
+                NEW.converted_at IS NOT NULL, COALESCE(NEW.lead_score, 0))
+        ON CONFLICT(chatbot_id) DO UPDATE SET
+            total = total + 1, hot = hot + excluded.hot, warm = warm + excluded.warm, cold = cold + excluded.cold,
+            converted = converted + excluded.converted, score_sum = score_sum + excluded.score_sum,
+            updated_at = CURRENT_TIMESTAMP;
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS structured_leads_summary_delete AFTER DELETE ON structured_leads BEGIN
+        UPDATE structured_leads_summary SET
+            total = total - 1, hot = hot - (OLD.lead_status = 'hot'), warm = warm - (OLD.lead_status = 'warm'),
+            cold = cold - (OLD.lead_status = 'cold'), converted = converted - (OLD.converted_at IS NOT NULL),
+            score_sum = score_sum - COALESCE(OLD.lead_score, 0), updated_at = CURRENT_TIMESTAMP
+        WHERE chatbot_id = OLD.chatbot_id;
+    END`,
+    `CREATE TRIGGER IF NOT EXISTS structured_leads_summary_update
+    AFTER UPDATE OF chatbot_id, lead_status, lead_score, converted_at ON structured_leads BEGIN
+        UPDATE structured_leads_summary SET
+            total = total - 1, hot = hot - (OLD.lead_status = 'hot'), warm = warm - (OLD.lead_status = 'warm'),
+            cold = cold - (OLD.lead_status = 'cold'), converted = converted - (OLD.converted_at IS NOT NULL),
+            score_sum = score_sum - COALESCE(OLD.lead_score, 0), updated_at = CURRENT_TIMESTAMP
+        WHERE chatbot_id = OLD.chatbot_id;
+        INSERT INTO structured_leads_summary (chatbot_id, total, hot, warm, cold, converted, score_sum)
+        VALUES (NEW.chatbot_id, 1, NEW.lead_status = 'hot', NEW.lead_status = 'warm', NEW.lead_status = 'cold',
+                NEW.converted_at IS NOT NULL, COALESCE(NEW.lead_score, 0))
+        ON CONFLICT(chatbot_id) DO UPDATE SET
+            total = total + 1, hot = hot + excluded.hot, warm = warm + excluded.warm, cold = cold + excluded.cold,
+            converted = converted + excluded.converted, score_sum = score_sum + excluded.score_sum,
+            updated_at = CURRENT_TIMESTAMP;
+    END`,
+    // Chatbots com leads de antes do resumo existir (o lead_scoring.py rebuild corrige o resto)
+    `INSERT OR IGNORE INTO structured_leads_summary (chatbot_id, total, hot, warm, cold, converted, score_sum)
+     SELECT chatbot_id, COUNT(*), SUM(lead_status = 'hot'), SUM(lead_status = 'warm'), SUM(lead_status = 'cold'),
+            SUM(converted_at IS NOT NULL), COALESCE(SUM(lead_score), 0)
+     FROM structured_leads GROUP BY chatbot_id`
+];
+
 class StructuredLeadsManager {
     constructor() {
         this.leadFields = {
@@ -76,6 +136,11 @@ class StructuredLeadsManager {
             `;
 
             await DatabaseHelpers.run(query);
+            if (!USE_POSTGRES) {
+                for (const statement of SUMMARY_SCHEMA) {
+                    await DatabaseHelpers.run(statement);
+                }
+            }
             console.log('✅ Tabela structured_leads criada/verificada');
             return true;
         } catch (error) {
@@ -141,38 +206,33 @@ class StructuredLeadsManager {
         };
     }
 
-    // Calcular score do lead
-    calculateLeadScore(data) {
+    // Calcular score do lead (regras em lead-scoring-rules.json)
+    calculateLeadScore(data, rules = SCORING_RULES) {
         let score = 0;
 
         // Pontos por campos preenchidos
-        if (data.name) score += 10;
-        if (data.email) score += 10;
-        if (data.phone) score += 15;
-        if (data.company) score += 10;
-        if (data.position) score += 10;
-        if (data.website) score += 5;
-
-        // Pontos por interesse
-        if (data.interestProduct) score += 15;
-        if (data.interestLevel === 'high') score += 20;
-        else if (data.interestLevel === 'medium') score += 10;
-
-        // Pontos por orçamento
-        if (data.budgetRange) score += 10;
-
-        // Pontos por engajamento
-        if (data.totalMessages > 5) score += 10;
-        if (data.conversationDuration > 120) score += 10; // Mais de 2 minutos
-
-        return Math.min(score, 100); // Máximo 100
+        for (const [column, points] of Object.entries(rules.filled)) {
+            if (data[columnToField(column)]) score += points;
+        }
+
+        // Pontos por valor (ex: nível de interesse)
+        for (const [column, options] of Object.entries(rules.values)) {
+            const value = data[columnToField(column)];
+            if (Object.prototype.hasOwnProperty.call(options, value)) score += options[value];
+        }
+
+        // Pontos por engajamento (mensagens, duração em segundos)
+        for (const [column, rule] of Object.entries(rules.above)) {
+            if (data[columnToField(column)] > rule.than) score += rule.points;
+        }
+
+        return Math.min(score, rules.maxScore);
     }
 
     // Determinar status do lead baseado no score
-    determineLeadStatus(score) {
-        if (score >= 70) return 'hot';
-        if (score >= 40) return 'warm';
-        return 'cold';
+    determineLeadStatus(score, rules = SCORING_RULES) {
+        const match = rules.status.find(rule => score >= rule.min);
+        return match ? match.status : rules.status[rules.status.length - 1].status;
     }
 
     // Salvar lead estruturado
@@ -191,8 +251,10 @@ class StructuredLeadsManager {
             const score = this.calculateLeadScore(leadData);
             const status = this.determineLeadStatus(score);
 
+            // Upsert em vez de INSERT OR REPLACE: o REPLACE apaga a linha antiga sem
+            // disparar o trigger de DELETE e o resumo por chatbot contaria o lead duas vezes
             const query = `
-                INSERT OR REPLACE INTO structured_leads (
+                INSERT INTO structured_leads (
                     id, chatbot_id, session_id,
                     name, email, phone,
                     company, position, website,
@@ -204,6 +266,20 @@ class StructuredLeadsManager {
                     ip_address, user_agent,
                     updated_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(chatbot_id, email) DO UPDATE SET
+                    id = excluded.id, session_id = excluded.session_id,
+                    name = excluded.name, phone = excluded.phone,
+                    company = excluded.company, position = excluded.position, website = excluded.website,
+                    interest_product = excluded.interest_product, interest_level = excluded.interest_level,
+                    budget_range = excluded.budget_range,
+                    source_url = excluded.source_url, source_page = excluded.source_page,
+                    utm_source = excluded.utm_source, utm_medium = excluded.utm_medium, utm_campaign = excluded.utm_campaign,
+                    first_message = excluded.first_message, last_message = excluded.last_message,
+                    total_messages = excluded.total_messages, conversation_duration = excluded.conversation_duration,
+                    lead_score = excluded.lead_score, lead_status = excluded.lead_status, lead_tags = excluded.lead_tags,
+                    custom_fields = excluded.custom_fields, notes = excluded.notes,
+                    ip_address = excluded.ip_address, user_agent = excluded.user_agent,
+                    updated_at = CURRENT_TIMESTAMP
             `;
 
             await DatabaseHelpers.run(query, [
@@ -414,9 +490,32 @@ class StructuredLeadsManager {
         }
     }
 
-    // Obter estatísticas de leads
+    // Resumo pré-calculado (triggers + lead_scoring.py); null sem a tabela ou sem linha do chatbot
+    async getSummary(chatbotId) {
+        if (USE_POSTGRES) return null;
+        try {
+            const row = await DatabaseHelpers.get(
+                `SELECT total, hot, warm, cold, converted, score_sum FROM structured_leads_summary WHERE chatbot_id = ?`,
+                [chatbotId]
+            );
+            if (!row) return null;
+            return {
+                total: row.total,
+                hot_leads: row.hot,
+                warm_leads: row.warm,
+                cold_leads: row.cold,
+                avg_score: row.total > 0 ? row.score_sum / row.total : 0,
+                converted: row.converted
+            };
+        } catch (error) {
+            return null;
+        }
+    }
+
+    // Obter estatísticas de leads (do resumo; sem ele, agrega a tabela como antes)
     async getStats(chatbotId) {
         try {
+            const summary = await this.getSummary(chatbotId);
             const query = `
                 SELECT 
                     COUNT(*) as total,
@@ -429,7 +528,7 @@ class StructuredLeadsManager {
                 WHERE chatbot_id = ?
             `;
 
-            const stats = await DatabaseHelpers.get(query, [chatbotId]);
+            const stats = summary || await DatabaseHelpers.get(query, [chatbotId]);
 
             return {
                 success: true,
@@ -0,0 +1,92 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+// DATA_DIR é lido ao carregar o módulo: o diretório temporário vem antes do require
+process.env.MEMORY_STORE_DIR = fs.mkdtempSync(path.join(os.tmpdir(), 'bounded-store-'));
+const { BoundedMap, defaultTenantOf } = require('../bounded-store');
+
+test.after(() => fs.rmSync(process.env.MEMORY_STORE_DIR, { recursive: true, force: true }));
+
+test('tenant padrão vem do prefixo da chave', () => {
+    assert.strictEqual(defaultTenantOf('loja1:sessao'), 'loja1');
+    assert.strictEqual(defaultTenantOf('user_1700000000'), 'anonymous');
+    assert.strictEqual(defaultTenantOf('sem-prefixo'), 'default');
+});
+
+test('LRU remove a chave menos usada no limite global', () => {
+    const map = new BoundedMap('lru', { maxEntries: 3 });
+    map.set('a:1', 1).set('b:1', 2).set('c:1', 3);
+    assert.strictEqual(map.get('a:1'), 1);
+    map.set('d:1', 4);
+
+    assert.strictEqual(map.size, 3);
+    assert.strictEqual(map.has('b:1'), false);
+    assert.deepStrictEqual([...map.keys()], ['c:1', 'a:1', 'd:1']);
+    assert.strictEqual(map.getStats().evictedLru, 1);
+});
+
+test('cota do tenant remove só chaves do próprio tenant', () => {
+    const map = new BoundedMap('quota', { maxEntries: 10, tenantQuota: 2 });
+    map.set('a:1', 1).set('b:1', 1).set('a:2', 2).set('a:3', 3);
+
+    assert.deepStrictEqual([...map.keys()].sort(), ['a:2', 'a:3', 'b:1']);
+    const stats = map.getStats();
+    assert.strictEqual(stats.evictedQuota, 1);
+    assert.strictEqual(stats.evictedLru, 0);
+    assert.deepStrictEqual(stats.tenants, { a: 2, b: 1 });
+});
+
+test('TTL expira na leitura e no sweep', () => {
+    const realNow = Date.now;
+    let now = realNow();
+    Date.now = () => now;
+    try {
+        const map = new BoundedMap('ttl', { ttl: 1000 });
+        map.set('a:1', 1).set('a:2', 2);
+        now += 600;
+        assert.strictEqual(map.get('a:2'), 2);   // renova o a:2
+        now += 600;
+
+        assert.strictEqual(map.get('a:1'), undefined);
+        assert.strictEqual(map.sweep(), 0);
+        now += 600;
+        assert.strictEqual(map.sweep(), 1);
+        assert.strictEqual(map.size, 0);
+        assert.strictEqual(map.getStats().expired, 2);
+    } finally {
+        Date.now = realNow;
+    }
+});
+
+test('spill grava a removida em disco e restaura na leitura', () => {
+    const map = new BoundedMap('spill', { maxEntries: 2, spill: true });
+    const createdAt = new Date('2024-05-01T12:00:00.000Z');
+    map.set('loja:1', { createdAt, messages: ['oi'] });
+    map.set('loja:2', 2).set('loja:3', 3);
+
+    assert.strictEqual(map.size, 2);
+    assert.ok(fs.existsSync(map.spillPath('loja:1')));
+    const restored = map.get('loja:1');
+    assert.deepStrictEqual(restored, { createdAt, messages: ['oi'] });
+    assert.ok(restored.createdAt instanceof Date);
+    assert.strictEqual(fs.existsSync(map.spillPath('loja:1')), false);
+
+    const stats = map.getStats();
+    assert.strictEqual(stats.spilled, 2);        // loja:1 e depois loja:2
+    assert.strictEqual(stats.restored, 1);
+
+    map.delete('loja:2');
+    assert.strictEqual(fs.existsSync(map.spillPath('loja:2')), false);
+    assert.strictEqual(map.get('loja:2'), undefined);
+});
+
+test('sessões anônimas não vão para o disco', () => {
+    const map = new BoundedMap('anonymous', { maxEntries: 1, spill: true });
+    map.set('user_1', 1).set('user_2', 2);
+    assert.strictEqual(fs.existsSync(map.spillPath('user_1')), false);
+    assert.strictEqual(map.get('user_1'), undefined);
+    assert.strictEqual(map.getStats().spilled, 0);
+});
@@ -0,0 +1,41 @@
+"""
+Configuração dos testes Python (pytest). Os módulos ficam na raiz do
+repositório; os testes de paridade com o JS rodam o node com o script
+recebido e trocam JSON pela entrada/saída padrão.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def run_node(tmp_path):
+    """
+    run_node(script, payload) -> JSON impresso pelo script (cwd na raiz do
+    repositório). Vale a última linha JSON: os módulos também logam no stdout
+    """
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('node não encontrado')
+
+    env = dict(os.environ,
+               MEMORY_STORE_DIR=str(tmp_path / 'memory'),
+               CHUNK_STORE_DIR=str(tmp_path / 'chunk-store'))
+
+    def run(script, payload=None, extra_env=None):
+        result = subprocess.run([node, '-e', script], input=json.dumps(payload), capture_output=True,
+                                text=True, cwd=ROOT, env=dict(env, **(extra_env or {})), timeout=60)
+        assert result.returncode == 0, result.stderr
+        lines = [line for line in result.stdout.splitlines() if line.startswith(('[', '{'))]
+        assert lines, result.stdout
+        return json.loads(lines[-1])
+
+    return run
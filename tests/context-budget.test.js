@@ -0,0 +1,104 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+process.env.MEMORY_STORE_DIR = fs.mkdtempSync(path.join(os.tmpdir(), 'context-budget-'));
+delete process.env.CONTEXT_TOKEN_BUDGET;
+// Histórico e página vêm desligados por padrão; aqui os dois são exercitados
+process.env.CONTEXT_HISTORY = '1';
+process.env.CONTEXT_PAGE_TOKENS = '1200';
+const { assembleContext, estimateTokens, budgetFor, MODEL_BUDGETS } = require('../context-budget');
+
+test.after(() => fs.rmSync(process.env.MEMORY_STORE_DIR, { recursive: true, force: true }));
+
+const MESSAGE_OVERHEAD = 4;
+const SYSTEM = 'Você é um assistente de vendas. Responda em português, de forma curta e objetiva.';
+
+function conversation(turns) {
+    const history = [];
+    for (let i = 0; i < turns; i++) {
+        history.push({ role: 'user', content: `Pergunta ${i}: qual o prazo de entrega do produto ${i} para o Nordeste e qual a garantia?` });
+        history.push({ role: 'assistant', content: `Resposta ${i}: ` + 'O prazo é de 5 a 7 dias úteis e a garantia é de 12 meses. '.repeat(4) });
+    }
+    return history;
+}
+
+function page(paragraphs) {
+    const topics = ['frete grátis acima de R$ 200', 'garantia estendida de 24 meses', 'pagamento em até 12x sem juros',
+        'troca em até 30 dias', 'suporte técnico por WhatsApp'];
+    return Array.from({ length: paragraphs }, (_, i) =>
+        `Seção ${i}. Nossa loja oferece ${topics[i % topics.length]}. ` + 'Texto institucional repetido sobre a empresa. '.repeat(8)
+    ).join('\n\n');
+}
+
+function tokensOf(messages) {
+    return messages.reduce((sum, message) => sum + estimateTokens(message.content) + MESSAGE_OVERHEAD, 0);
+}
+
+test('o prompt montado mais a resposta cabem no orçamento do modelo', () => {
+    for (const model of Object.keys(MODEL_BUDGETS)) {
+        for (const turns of [0, 1, 3, 20, 200]) {
+            for (const maxTokens of [150, 300, 800]) {
+                const { messages, stats } = assembleContext({
+                    model, systemPrompt: SYSTEM, history: conversation(turns),
+                    question: 'Vocês têm garantia estendida?', pageText: page(60), maxTokens,
+                    conversationKey: `${model}:${turns}:${maxTokens}`
+                });
+                assert.strictEqual(stats.budget, budgetFor(model));
+                assert.strictEqual(stats.promptTokens, tokensOf(messages));
+                assert.ok(stats.promptTokens + maxTokens <= stats.budget,
+                    `${model} turns=${turns} maxTokens=${maxTokens}: ${stats.promptTokens} + ${maxTokens} > ${stats.budget}`);
+                assert.strictEqual(stats.verbatimTurns + stats.summarizedTurns, turns * 2);
+            }
+        }
+    }
+});
+
+test('sem histórico e sem página o prompt é o de antes (prompt do sistema + pergunta)', () => {
+    const { messages, stats } = assembleContext({
+        model: 'gpt-3.5-turbo', systemPrompt: SYSTEM, history: conversation(40),
+        question: 'E o frete?', pageText: page(60), maxTokens: 300,
+        includeHistory: false, pageTokens: 0
+    });
+    assert.deepStrictEqual(messages, [{ role: 'system', content: SYSTEM }, { role: 'user', content: 'E o frete?' }]);
+    assert.strictEqual(stats.promptTokens, stats.legacyTokens);
+    assert.ok(stats.fullTokens > stats.promptTokens);
+});
+
+test('a pergunta é a última mensagem e os turnos recentes vêm na íntegra e em ordem', () => {
+    const history = conversation(30);
+    const { messages, stats } = assembleContext({
+        model: 'gpt-4', systemPrompt: SYSTEM, history, question: 'E o frete?', maxTokens: 300, conversationKey: 'ordem'
+    });
+    assert.deepStrictEqual(messages[messages.length - 1], { role: 'user', content: 'E o frete?' });
+    assert.strictEqual(messages[0].role, 'system');
+    assert.ok(stats.verbatimTurns >= 4);
+    assert.ok(stats.summarizedTurns > 0);
+    assert.deepStrictEqual(messages.slice(-1 - stats.verbatimTurns, -1), history.slice(-stats.verbatimTurns));
+});
+
+test('histórico curto vai inteiro e a página entra só com os trechos relevantes', () => {
+    const history = conversation(1);
+    const pageText = page(60);
+    const { messages, stats } = assembleContext({
+        model: 'llama-3.1-70b-versatile', systemPrompt: SYSTEM, history,
+        question: 'Como funciona o pagamento em 12x sem juros?', pageText, maxTokens: 300
+    });
+    assert.strictEqual(stats.summarizedTurns, 0);
+    assert.deepStrictEqual(messages.slice(1, -1), history);
+    assert.ok(stats.pageChunksKept > 0 && stats.pageChunksKept < stats.pageChunks);
+    assert.ok(messages[0].content.includes('12x sem juros'));
+    assert.ok(stats.promptTokens < stats.fullTokens);
+});
+
+test('sem espaço livre fica só o essencial, ainda dentro do orçamento', () => {
+    const { messages, stats } = assembleContext({
+        model: 'gpt-4', systemPrompt: SYSTEM, history: conversation(10),
+        question: 'Oi?', pageText: page(10), maxTokens: 2400
+    });
+    assert.strictEqual(stats.pageChunksKept, 0);
+    assert.strictEqual(messages[messages.length - 1].content, 'Oi?');
+    assert.ok(stats.promptTokens + 2400 <= stats.budget);
+});
@@ -0,0 +1,140 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+// O módulo cria ./logs/* e usa data/ relativos ao diretório atual
+const TMP = fs.mkdtempSync(path.join(os.tmpdir(), 'robots-matcher-'));
+process.env.MEMORY_STORE_DIR = TMP;
+process.env.ROBOTS_CACHE_ENTRIES = '50';
+// Cache e .pending dentro do TMP: nada vaza para data/ do repositório
+process.env.ROBOTS_CACHE_FILE = path.join(TMP, 'data', 'robots-cache.json');
+const CWD = process.cwd();
+process.chdir(TMP);
+const { ComplianceManager } = require('../compliance-middleware');
+
+test.after(() => {
+    process.chdir(CWD);
+    fs.rmSync(TMP, { recursive: true, force: true });
+});
+
+const manager = new ComplianceManager();
+
+const ROBOTS = `
+User-agent: *
+Disallow: /admin
+Disallow: /private/
+Allow: /private/public
+Disallow: /*/checkout
+Disallow: /*-draft$
+Disallow: /tmp*
+Disallow:
+
+User-agent: LinkMagico-Bot
+Allow: /admin/help
+Disallow: /search
+Disallow: /*/print$
+
+User-agent: Googlebot
+Disallow: /
+`;
+
+// Gerador determinístico (mulberry32) para os casos aleatórios
+function random(seed) {
+    return () => {
+        seed = (seed + 0x6d2b79f5) | 0;
+        let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+const SEGMENTS = ['admin', 'help', 'private', 'public', 'search', 'print', 'checkout', 'tmp', 'a-draft', 'produtos', 'x', ''];
+
+function randomPath(next, maxSegments = 4) {
+    const count = 1 + Math.floor(next() * maxSegments);
+    return '/' + Array.from({ length: count }, () => SEGMENTS[Math.floor(next() * SEGMENTS.length)]).join('/');
+}
+
+function randomRobots(next) {
+    const lines = [];
+    for (const agent of ['*', 'linkmagico']) {
+        lines.push(`User-agent: ${agent}`);
+        const rules = Math.floor(next() * 6);
+        for (let i = 0; i < rules; i++) {
+            let pattern = randomPath(next, 2);
+            if (next() < 0.3) pattern = pattern.replace(/\/[^/]*$/, '/*' + SEGMENTS[Math.floor(next() * SEGMENTS.length)]);
+            const end = next();
+            if (end < 0.2) pattern += '$';
+            else if (end < 0.3) pattern += '*';
+            lines.push(`${next() < 0.3 ? 'Allow' : 'Disallow'}: ${pattern}`);
+        }
+    }
+    return lines.join('\n');
+}
+
+function assertSameDecision(rules, compiled, urlPath) {
+    assert.strictEqual(
+        manager.isBlockedCompiled(compiled, urlPath),
+        manager.isBlocked(rules, `https://example.com${urlPath}`),
+        urlPath
+    );
+}
+
+test('matcher compilado decide igual ao isBlocked', () => {
+    const rules = manager.parseRobotsTxt(ROBOTS);
+    const compiled = manager.compileRobotsRules(rules);
+    const expected = {
+        '/': false,
+        '/admin': true,
+        '/admin/help': false,
+        '/administrador': true,
+        '/private/': true,
+        '/private/public/a': false,
+        '/private': false,
+        '/loja/checkout/1': true,
+        '/checkout': false,
+        '/post-draft': true,
+        '/post-draft/1': false,
+        '/tmpfile': true,
+        '/search?q=1': true,
+        '/produtos/print': true,
+        '/produtos/print/2': false
+    };
+    for (const [urlPath, blocked] of Object.entries(expected)) {
+        const pathname = urlPath.split('?')[0];
+        assert.strictEqual(manager.isBlockedCompiled(compiled, pathname), blocked, urlPath);
+        assert.strictEqual(manager.isBlocked(rules, `https://example.com${urlPath}`), blocked, urlPath);
+    }
+});
+
+test('matcher compilado decide igual ao isBlocked em regras aleatórias', () => {
+    const next = random(42);
+    for (let round = 0; round < 200; round++) {
+        const rules = manager.parseRobotsTxt(randomRobots(next));
+        const compiled = manager.compileRobotsRules(rules);
+        for (let i = 0; i < 50; i++) assertSameDecision(rules, compiled, randomPath(next));
+    }
+});
+
+test('robots.txt com erro 5xx expira em 1 hora, os demais em 24 horas', () => {
+    const hour = 60 * 60 * 1000;
+    const failed = manager.rememberRobots('https://fora.example.com', 503, null);
+    const ok = manager.rememberRobots('https://ok.example.com', 200, ROBOTS);
+    const missing = manager.rememberRobots('https://sem.example.com', 404, null);
+
+    assert.strictEqual(failed.expiresAt - failed.fetchedAt, hour);
+    assert.strictEqual(ok.expiresAt - ok.fetchedAt, 24 * hour);
+    assert.strictEqual(missing.expiresAt - missing.fetchedAt, 24 * hour);
+    assert.strictEqual(failed.rules, null);
+    assert.strictEqual(manager.isBlockedCompiled(ok.rules, '/admin'), true);
+});
+
+test('cache de robots.txt em memória tem tamanho limitado', () => {
+    const cache = new ComplianceManager();
+    for (let i = 0; i < 200; i++) cache.rememberRobots(`https://site${i}.example.com`, 200, ROBOTS);
+    assert.strictEqual(cache.robotsCache.size, 50);
+    assert.strictEqual(cache.robotsCache.has('https://site0.example.com'), false);
+    assert.ok(cache.robotsCache.has('https://site199.example.com'));
+});
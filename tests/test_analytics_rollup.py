@@ -0,0 +1,59 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+import analytics_rollup
+from analytics_rollup import rollup
+
+NOW = datetime(2026, 3, 31, 12, tzinfo=timezone.utc)
+
+
+def _database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE conversations (chatbot_id TEXT, session_id TEXT, timestamp TEXT, messages TEXT,
+                                    lead_captured INTEGER, resolved INTEGER, user_satisfaction REAL);
+        CREATE TABLE analytics (chatbot_id TEXT, date TEXT, total_messages INTEGER, total_conversations INTEGER,
+                                avg_response_time REAL, success_rate REAL, error_count INTEGER,
+                                api_calls INTEGER, tokens_used INTEGER, cost_estimate REAL);
+    ''')
+    # Conversas em 4 dias; a tabela analytics só tem linha em 3 deles, e uma com NULL
+    for day in ('2026-03-02', '2026-03-03', '2026-03-10', '2026-03-11'):
+        conn.execute('INSERT INTO conversations VALUES (?, ?, ?, ?, 0, 1, NULL)',
+                     ('bot', 's-' + day, day + ' 10:00:00', '[1, 2]'))
+    conn.executemany('INSERT INTO analytics VALUES (?, ?, 10, 2, ?, ?, 0, 5, 100, 0.5)', [
+        ('bot', '2026-03-02', 200.0, 90.0),
+        ('bot', '2026-03-03', 400.0, None),
+        ('bot', '2026-03-10', None, 100.0),
+    ])
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_days_without_metrics_are_null_and_skipped_in_averages(tmp_path, monkeypatch, numpy):
+    if numpy and analytics_rollup.np is None:
+        pytest.skip('NumPy não instalado')
+    db = str(tmp_path / 'linkmagico.db')
+    _database(db)
+    output = tmp_path / 'rollups'
+    if not numpy:
+        monkeypatch.setattr(analytics_rollup, 'np', None)
+    rollup(db, str(output), days=30, now=NOW)
+    snapshot = json.loads((output / 'bot.json').read_text(encoding='utf-8'))
+
+    daily = snapshot['daily']
+    assert len(daily['day']) == 4
+    assert daily['avg_response_time'] == [200, 400, None, None]
+    assert daily['success_rate'] == [90, None, 100, None]
+    assert daily['total_messages'] == [10, 10, 10, 0]
+
+    assert snapshot['totals']['avg_response_time'] == 300
+    assert snapshot['totals']['success_rate'] == 95
+    assert snapshot['totals']['total_messages'] == 30
+    weekly = snapshot['weekly']
+    assert len(weekly['week']) == 2
+    assert weekly['avg_response_time'] == [300, None]
+    assert weekly['success_rate'] == [90, 100]
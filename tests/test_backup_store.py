@@ -0,0 +1,55 @@
+import io
+import json
+import os
+
+import backup_store
+
+
+def _write_backup(tenants_dir, tenant, name, leads, mtime):
+    directory = tenants_dir / tenant / 'backups'
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'leads-backup-{name}.json'
+    path.write_text(json.dumps({'timestamp': f'2025-10-0{mtime}T00:00:00.000Z', 'type': 'daily',
+                                'leadsCount': len(leads), 'leads': leads}, indent=2), encoding='utf-8')
+    os.utime(path, (1759276800 + mtime * 86400,) * 2)
+    return path
+
+
+def _tenant_index(store, tenant):
+    with open(store / 'tenants' / f'{tenant}.json', encoding='utf-8') as f:
+        return [entry['filename'] for entry in json.load(f)['backups']]
+
+
+def test_tenant_index_and_forget(tmp_path, capsys):
+    tenants_dir, store = tmp_path / 'tenants', tmp_path / 'store'
+    leads = [{'id': i, 'name': f'Lead {i}', 'email': f'lead{i}@example.com'} for i in range(50)]
+    for day in range(1, 4):
+        _write_backup(tenants_dir, 'key-a', f'daily-{day}', leads[:40 + day], day)
+    last = _write_backup(tenants_dir, 'key-b', 'daily-1', leads[:10], 1)
+
+    backup_store.migrate(str(tenants_dir), str(store))
+    assert _tenant_index(store, 'key-a') == [f'leads-backup-daily-{day}.json' for day in (1, 2, 3)]
+    assert _tenant_index(store, 'key-b') == ['leads-backup-daily-1.json']
+
+    assert backup_store.main(['--store', str(store), 'forget', '--keep', '1']) == 0
+    assert _tenant_index(store, 'key-a') == ['leads-backup-daily-3.json']
+    assert _tenant_index(store, 'key-b') == ['leads-backup-daily-1.json']
+    index = backup_store.load_index(str(store))
+    assert [e['filename'] for e in index['tenants']['key-a']] == ['leads-backup-daily-3.json']
+
+    out = io.BytesIO()
+    backup_store.restore(backup_store.find_backup(index, 'key-b'), out, str(store))
+    assert out.getvalue() == last.read_bytes()
+
+
+def test_migrate_writes_tenant_index_for_older_store(tmp_path, capsys):
+    tenants_dir, store = tmp_path / 'tenants', tmp_path / 'store'
+    _write_backup(tenants_dir, 'key-a', 'daily-1', [{'id': 1}], 1)
+    backup_store.migrate(str(tenants_dir), str(store))
+    # Store gravado antes dos índices por tenant: só o index.json
+    for name in os.listdir(store / 'tenants'):
+        os.remove(store / 'tenants' / name)
+    os.rmdir(store / 'tenants')
+
+    backup_store.migrate(str(tenants_dir), str(store))
+    assert _tenant_index(store, 'key-a') == ['leads-backup-daily-1.json']
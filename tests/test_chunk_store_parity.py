@@ -0,0 +1,87 @@
+import random
+
+from chunk_store import ChunkStore, canonical_url, chunk_lines
+
+URLS = [
+    'HTTPS://Loja.Example.com:443/produtos/?utm_source=x&b=2&a=1#topo',
+    'http://example.com:80',
+    'http://example.com:8080//a//',
+    'https://example.com/busca?q=caf%C3%A9&fbclid=abc&ref=home&q2=',
+    'https://example.com/?gclid=1&_ga=2',
+    '  https://example.com/a?z&y=1&&x= ',
+    'mailto:contato@example.com',
+    '/caminho/relativo?b=1&a=2',
+    'https://exemplo.com.br/ação/?página=2&ordem=preço',
+]
+
+CANONICAL = '''
+const { canonicalUrl } = require('./chunk-store');
+const urls = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(urls.map(canonicalUrl)));
+'''
+
+CHUNKS = '''
+const { chunkLines } = require('./chunk-store');
+const lines = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(chunkLines(lines)));
+'''
+
+PACK = '''
+const { packPage } = require('./chunk-store');
+const page = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(packPage(page)));
+'''
+
+UNPACK = '''
+const { unpackPage } = require('./chunk-store');
+const page = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(unpackPage(page)));
+'''
+
+
+def _lines(count, seed=3):
+    rng = random.Random(seed)
+    words = ['preço', 'frete', 'garantia', 'entrega', 'ação', 'café', 'produto', 'loja', '🚀']
+    return [(' ' * rng.randint(0, 3)).join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+            + rng.choice(['', '\t', ' ', '  '])
+            for _ in range(count)]
+
+
+def _page(seed=3):
+    lines = _lines(400, seed)
+    return {'title': 'Página de teste', 'url': 'https://example.com/',
+            'cleanText': '\n'.join(lines), 'textos': lines[:150], 'meta': {'lang': 'pt-BR'}}
+
+
+def test_canonical_url_matches_node(run_node):
+    assert run_node(CANONICAL, URLS) == [canonical_url(url) for url in URLS]
+
+
+def test_chunk_lines_matches_node(run_node):
+    lines = _lines(2000)
+    chunks = chunk_lines(lines)
+    assert len(chunks) > 10
+    assert run_node(CHUNKS, lines) == chunks
+
+
+def test_pack_in_python_unpack_in_node(run_node, tmp_path):
+    page = _page()
+    packed = ChunkStore(str(tmp_path / 'chunk-store')).pack_page(page)
+    assert 'cleanText' not in packed and 'textos' not in packed
+    assert run_node(UNPACK, packed) == page
+
+
+def test_pack_in_node_unpack_in_python(run_node, tmp_path):
+    page = _page(seed=5)
+    store = ChunkStore(str(tmp_path / 'chunk-store'))
+    packed = run_node(PACK, page)
+    assert packed['chunks']['cleanText'] == store.put_lines(page['cleanText'].split('\n'))
+    assert store.unpack_page(packed) == page
+
+
+def test_missing_chunk_invalidates_page(tmp_path):
+    store = ChunkStore(str(tmp_path / 'chunk-store'))
+    packed = store.pack_page(_page())
+    digest = packed['chunks']['textos'][0]
+    (tmp_path / 'chunk-store' / digest[:2] / f'{digest}.txt').unlink()
+    assert store.unpack_page(packed) is None
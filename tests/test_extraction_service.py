@@ -0,0 +1,37 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from extraction_service import fetch
+
+BODY = '<html><body><p>Promoção de verão</p></body></html>'.encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', f'text/html; charset={self.path.strip("/")}')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin():
+    server = HTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('charset', ['utf8mb4', 'base64', 'utf-8'])
+def test_fetch_falls_back_to_utf8_on_unknown_charset(origin, charset):
+    status, html, _, _ = fetch(f'{origin}/{charset}')
+    assert status == 200
+    assert 'Promoção de verão' in html
@@ -0,0 +1,49 @@
+import pytest
+
+import html_insert
+from html_insert import InsertionPoint, insert_into_file
+
+PANEL = '''<div class="tabs">
+    <button class="tab" onclick="show('system')">Sistema</button>
+</div>
+<div id="system-section"><div>Status</div></div>
+'''
+
+BUTTON = ('button', 'onclick', "show('system')")
+SECTION = ('div', 'id', 'system-section')
+
+
+def _points():
+    return [
+        InsertionPoint('a-tab', BUTTON, 'after', '<button onclick="show(\'a\')">A</button>', "show('a')"),
+        InsertionPoint('b-tab', BUTTON, 'after', '<button onclick="show(\'b\')">B</button>', "show('b')"),
+        InsertionPoint('a-section', SECTION, 'after', '<div id="a-section"></div>', 'id="a-section"'),
+    ]
+
+
+def test_insert_skips_points_already_present(tmp_path):
+    panel = tmp_path / 'painel.html'
+    panel.write_text(PANEL.replace('</div>\n<div id', '<button onclick="show(\'b\')">B</button></div>\n<div id'),
+                     encoding='utf-8')
+    _, skipped = insert_into_file(str(panel), _points())
+    html = panel.read_text(encoding='utf-8')
+    assert skipped == ['b-tab']
+    assert html.count("show('a')") == 1 and html.count("show('b')") == 1
+    assert html.index('</div></div>') < html.index('id="a-section"')
+    assert insert_into_file(str(panel), _points())[1] == ['a-tab', 'b-tab', 'a-section']
+    assert not (tmp_path / 'painel.html.tmp').exists()
+
+
+def test_failed_write_keeps_original_panel(tmp_path, monkeypatch):
+    panel = tmp_path / 'painel.html'
+    panel.write_text(PANEL, encoding='utf-8')
+
+    def broken(html, insertions, out):
+        out.write(html[:10])
+        raise OSError('disco cheio')
+
+    monkeypatch.setattr(html_insert, 'apply_insertions', broken)
+    with pytest.raises(OSError):
+        insert_into_file(str(panel), _points())
+    assert panel.read_text(encoding='utf-8') == PANEL
+    assert list(tmp_path.iterdir()) == [panel]
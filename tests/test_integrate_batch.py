@@ -0,0 +1,45 @@
+import json
+
+from integrate import integrate_batch
+from test_patch_engine import SERVER
+
+
+def _manifest(tmp_path, items):
+    path = tmp_path / 'manifest.json'
+    path.write_text(json.dumps(items), encoding='utf-8')
+    return str(path)
+
+
+def test_missing_source_is_reported_and_others_continue(tmp_path, capsys):
+    present = tmp_path / 'server.js'
+    present.write_bytes(SERVER)
+    manifest = _manifest(tmp_path, [str(tmp_path / 'sumiu.js'), str(present)])
+
+    ok = integrate_batch(manifest=manifest, output_dir=str(tmp_path / 'out'),
+                         cache_file=str(tmp_path / 'cache.json'), workers=1)
+    out = capsys.readouterr().out
+    assert ok is False
+    assert 'sumiu.js' in out and '❌' in out
+    assert (tmp_path / 'out' / 'server.js').exists()
+    assert list(json.loads((tmp_path / 'cache.json').read_text())) == [str(present)]
+
+
+def test_same_basename_is_rejected(tmp_path, capsys):
+    for folder in ('a', 'b'):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / 'server.js').write_bytes(SERVER)
+    manifest = _manifest(tmp_path, [str(tmp_path / 'a' / 'server.js'), str(tmp_path / 'b' / 'server.js')])
+
+    ok = integrate_batch(manifest=manifest, output_dir=str(tmp_path / 'out'),
+                         cache_file=str(tmp_path / 'cache.json'), workers=1)
+    assert ok is False
+    assert 'mesmo destino' in capsys.readouterr().out
+    assert not (tmp_path / 'out').exists()
+
+    # Com destinos explícitos no manifesto os dois são integrados
+    manifest = _manifest(tmp_path, [
+        {'source': str(tmp_path / folder / 'server.js'), 'output': str(tmp_path / 'out' / f'{folder}.js')}
+        for folder in ('a', 'b')])
+    assert integrate_batch(manifest=manifest, output_dir=str(tmp_path / 'out'),
+                           cache_file=str(tmp_path / 'cache.json'), workers=1)
+    assert sorted(p.name for p in (tmp_path / 'out').iterdir()) == ['a.js', 'b.js']
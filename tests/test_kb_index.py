@@ -0,0 +1,34 @@
+import json
+
+from kb_index import TOKENIZER_VERSION, BM25Index, load_manifest, stem, tokenize, update_index
+
+KB = {'faqs': [
+    {'id': 'f1', 'active': True, 'question': 'Quais ações posso fazer no painel?', 'answer': 'Editar e exportar.'},
+    {'id': 'f2', 'active': True, 'question': 'Qual o prazo de entrega?', 'answer': 'Até 5 dias úteis.'},
+]}
+
+
+def test_plural_and_singular_share_the_stem():
+    assert stem('acoes') == stem('acao') == 'acao'
+    assert tokenize('Ações') == tokenize('ação') == ['acao']
+    assert stem('canais') == 'canal'
+    assert stem('cores') == 'cor'
+
+
+def test_singular_query_finds_plural_entry():
+    index = BM25Index.build(KB)
+    assert index.search('ação')[0]['id'] == 'f1'
+
+
+def test_index_from_older_tokenizer_is_rebuilt(tmp_path):
+    kb_dir, index_dir = tmp_path / 'knowledge', tmp_path / 'index'
+    kb_dir.mkdir()
+    (kb_dir / 'bot.json').write_text(json.dumps(KB), encoding='utf-8')
+    assert update_index(str(kb_dir), str(index_dir))[0] == ['bot']
+    assert update_index(str(kb_dir), str(index_dir))[1] == ['bot']
+
+    manifest = load_manifest(str(index_dir))
+    del manifest['chatbots']['bot']['tokenizer']
+    (index_dir / 'manifest.json').write_text(json.dumps(manifest), encoding='utf-8')
+    assert update_index(str(kb_dir), str(index_dir))[0] == ['bot']
+    assert load_manifest(str(index_dir))['chatbots']['bot']['tokenizer'] == TOKENIZER_VERSION
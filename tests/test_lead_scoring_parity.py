@@ -0,0 +1,66 @@
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from lead_scoring import RULES_FILE, load_rules, score_block
+from conftest import ROOT
+
+# structured-leads.js importa ./database; o módulo falso evita abrir o banco
+SCORE = '''
+const path = require('path');
+const database = path.resolve('database.js');
+require.cache[database] = {
+    id: database, filename: database, loaded: true,
+    exports: {
+        db: null, USE_POSTGRES: false,
+        DatabaseHelpers: { run: async () => ({}), get: async () => null, all: async () => [] }
+    }
+};
+const { structuredLeadsManager } = require('./structured-leads');
+const leads = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(leads.map(lead => {
+    const score = structuredLeadsManager.calculateLeadScore(lead);
+    return [score, structuredLeadsManager.determineLeadStatus(score)];
+})));
+'''
+
+
+def _camel(column):
+    head, *rest = column.split('_')
+    return head + ''.join(part.title() for part in rest)
+
+
+def _leads(rules, count=500, seed=9):
+    rng = random.Random(seed)
+    leads = []
+    for _ in range(count):
+        lead = {}
+        for column in rules['filled']:
+            lead[_camel(column)] = rng.choice([None, '', 'x', 'valor'])
+        for column, options in rules['values'].items():
+            lead[_camel(column)] = rng.choice([None, '', 'low', *options])
+        for column, rule in rules['above'].items():
+            lead[_camel(column)] = rng.choice([None, 0, rule['than'], rule['than'] + 1, rule['than'] * 10])
+        leads.append(lead)
+    return leads
+
+
+def _columns(rules, leads):
+    """Colunas no formato do _select_sql (rowid, chatbot_id, score, status, ...)"""
+    columns = [list(range(len(leads))), ['bot'] * len(leads), [0] * len(leads), [''] * len(leads)]
+    columns += [[int(bool(lead[_camel(c)])) for lead in leads] for c in rules['filled']]
+    columns += [[lead[_camel(c)] or '' for lead in leads] for c in rules['values']]
+    columns += [[lead[_camel(c)] for lead in leads] for c in rules['above']]
+    return columns
+
+
+def test_score_block_matches_calculate_lead_score(run_node):
+    rules = load_rules(os.path.join(ROOT, RULES_FILE))
+    leads = _leads(rules)
+    score, status = score_block(rules, _columns(rules, leads))
+    expected = run_node(SCORE, leads)
+    assert [[int(s), str(st)] for s, st in zip(score, status)] == expected
+    assert {st for _, st in expected} == {'hot', 'warm', 'cold'}
@@ -0,0 +1,103 @@
+import io
+
+from integrate import CLOSE_ASYNC, INIT_CODE, NEW_IMPORTS, TIMING_CODE, build_insertions
+from patch_engine import AnchorIndex, apply_insertions, patch_file
+
+SERVER = b'''require("dotenv").config();
+const express = require('express');
+const app = express();
+const note = `app.listen(${PORT}) e require('./init') dentro de template`;
+// app.get('/comentario', handler);
+const re = /app\\.listen\\(/;
+app.use(express.json());
+
+app.get('/api/ping', (req, res) => {
+    res.json({ ok: true, msg: "app.post('/falso')" });
+});
+
+function start() {
+    app.post('/interna', handler);
+}
+
+const server = app.listen(PORT, () => {
+    console.log('ok');
+});
+'''
+
+
+def _patch(source, timing=False):
+    out = io.BytesIO()
+    insertions = build_insertions(AnchorIndex(source), timing=timing)
+    if insertions is None:
+        return None
+    apply_insertions(source, insertions, out)
+    return out.getvalue()
+
+
+def test_anchors_skip_strings_comments_templates_and_regex():
+    index = AnchorIndex(SERVER)
+    assert [a.arg for a in index.find('require')] == ['dotenv', 'express']
+    assert index.require('./init') is None
+    routes = index.routes()
+    assert [(a.name, a.arg, a.depth) for a in routes] == [
+        ('use', None, 0), ('get', '/api/ping', 0), ('post', '/interna', 1)]
+    listen = index.listen()
+    assert listen.line == 17
+    assert SERVER[listen.stmt_start:listen.start] == b'const server = '
+
+
+def test_anchor_offsets_are_bytes():
+    source = 'const título = "ação";\n'.encode('utf-8') + SERVER
+    index = AnchorIndex(source)
+    dotenv = index.require('dotenv')
+    assert source[dotenv.start:dotenv.start + 7] == b'require'
+    assert source[dotenv.stmt_start:dotenv.stmt_end] == b'require("dotenv").config();'
+
+
+def test_integration_inserts_blocks_at_anchors():
+    patched = _patch(SERVER).decode('utf-8')
+    assert patched.startswith('require("dotenv").config();' + NEW_IMPORTS)
+    assert INIT_CODE + 'const server = app.listen(' in patched
+    assert patched.rstrip().endswith(CLOSE_ASYNC.rstrip())
+    # O original continua inteiro, só com os trechos inseridos
+    stripped = patched.replace(NEW_IMPORTS, '', 1).replace(INIT_CODE, '', 1).replace(CLOSE_ASYNC, '', 1)
+    assert stripped.encode('utf-8') == SERVER
+
+
+def test_integration_is_idempotent():
+    once = _patch(SERVER)
+    assert _patch(once) is None
+    assert _patch(once, timing=True) is not None
+
+
+def test_timing_on_integrated_file_adds_only_timing_block():
+    once = _patch(SERVER)
+    timed = _patch(once, timing=True).decode('utf-8')
+    assert timed.count(TIMING_CODE) == 1
+    assert timed.count(NEW_IMPORTS) == 1
+    assert timed.index(TIMING_CODE) < timed.index('app.use(express.json())')
+    assert _patch(timed.encode('utf-8'), timing=True) is None
+
+
+def test_patch_file_preserves_crlf(tmp_path):
+    source = tmp_path / 'server.js'
+    source.write_bytes(SERVER.replace(b'\n', b'\r\n'))
+    result = patch_file(str(source), str(source), build_insertions)
+    assert result is not None
+    data = source.read_bytes()
+    assert data.count(b'console.log(\'ok\');\r\n') == 1
+    assert patch_file(str(source), str(source), build_insertions) is None
+
+
+def test_plain_comments_and_strings_do_not_open_strings_or_templates():
+    # Comentários e strings sem ( ) { } passam direto pelo prefixo da regex:
+    # as aspas e crases dentro deles não podem abrir string nem template
+    source = (b"// don't `quote` here\n"
+              b"const tip = \"it's\", other = 'say \"oi\"';\n"
+              b"const brace = '{';\n"
+              b"app.get('/a', handler);\n"
+              b"app.listen(PORT);\n"
+              b"// fim sem quebra")
+    index = AnchorIndex(source)
+    assert [(a.name, a.arg, a.depth) for a in index.routes()] == [('get', '/a', 0)]
+    assert index.listen().line == 5
@@ -0,0 +1,70 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import similarity_index
+from similarity_index import SimilarityIndex, synthetic_questions
+
+
+@pytest.fixture
+def index():
+    index = SimilarityIndex()
+    index.add_many([
+        ('k1', 'bot1', 'Qual é o preço do plano profissional?'),
+        ('k2', 'bot1', 'Como funciona a entrega para o Nordeste?'),
+        ('k3', 'bot2', 'Qual é o preço do plano profissional?'),
+    ])
+    return index
+
+
+def test_query_finds_near_duplicate_of_same_chatbot(index):
+    results = index.query('bot1', 'qual e o preço do plano profissional')
+    assert results[0]['key'] == 'k1'
+    assert results[0]['score'] > 0.5
+    assert all(result['key'] != 'k3' for result in results)
+    assert index.query('bot-desconhecido', 'qual é o preço?') == []
+
+
+def test_remove_hides_entry_and_add_replaces_key(index):
+    index.remove('k1')
+    assert [r['key'] for r in index.query('bot1', 'Qual é o preço do plano profissional?')] == []
+    assert len(index) == 2
+
+    index.add('k2', 'bot1', 'Vocês aceitam boleto?')
+    assert [r['key'] for r in index.query('bot1', 'vocês aceitam boleto')] == ['k2']
+    assert index.query('bot1', 'Como funciona a entrega para o Nordeste?') == []
+    assert len(index) == 2
+
+
+def test_merge_compacts_dead_rows(monkeypatch):
+    monkeypatch.setattr(similarity_index, 'MERGE_EVERY', 16)
+    index = SimilarityIndex()
+    entries = synthetic_questions(200, chatbots=4)
+    for key, chatbot, question in entries:
+        index.add(key, chatbot, question)
+    for key, _, _ in entries[:150]:
+        index.remove(key)
+
+    assert len(index) == 50
+    # O merge descarta as linhas mortas: os arrays não guardam as 150 removidas
+    assert len(index.keys) < 200
+    assert sorted(index.positions) == sorted(key for key, _, _ in entries[150:])
+    assert all(index.keys[i] == key for key, i in index.positions.items())
+    key, chatbot, question = entries[-1]
+    assert index.query(chatbot, question)[0]['key'] == key
+
+
+def test_pending_buffer_is_searchable_before_merge():
+    index = SimilarityIndex()
+    index.add('a', 'bot', 'Qual o prazo de garantia do produto?')
+    assert index._merged < len(index.keys)
+    assert index.query('bot', 'qual o prazo de garantia do produto')[0]['key'] == 'a'
+
+
+def test_save_and_load_keep_only_live_entries(tmp_path, index):
+    index.remove('k2')
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = SimilarityIndex.load(path)
+    assert sorted(loaded.keys) == ['k1', 'k3']
+    assert loaded.query('bot2', 'Qual é o preço do plano profissional?')[0]['key'] == 'k3'
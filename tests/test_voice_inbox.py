@@ -0,0 +1,47 @@
+import wave
+
+import voice_inbox
+from voice_inbox import StandInModel, TranscriptStore, watch
+
+
+def _audio(path, seed):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(bytes([seed]) * 1600)
+
+
+def test_watch_once_drains_inbox_and_saves_index_once(tmp_path, monkeypatch):
+    inbox, store_dir = tmp_path / 'inbox', tmp_path / 'store'
+    for i in range(3):
+        _audio(inbox / 'bot' / 's1' / f'a{i}.wav', i)
+    _audio(inbox / 'bot' / 's2' / 'b.wav', 0)      # mesmo áudio que a0: vem do cache
+    _audio(inbox / 'outro' / 'c.wav', 7)            # sem pasta de sessão
+
+    store = TranscriptStore(str(store_dir))
+    saves = []
+    original = TranscriptStore.save_index
+    monkeypatch.setattr(TranscriptStore, 'save_index', lambda self: saves.append(1) or original(self))
+    watch(str(inbox), store, StandInModel(), batch_size=2, once=True)
+
+    assert len(saves) == 1
+    assert list(inbox.iterdir()) == []
+    reloaded = TranscriptStore(str(store_dir))
+    assert reloaded.stats()['records'] == 5
+    assert reloaded.stats()['uniqueAudios'] == 4
+    records = reloaded.session('bot', 's1') + reloaded.session('bot', 's2')
+    assert sum(r['cached'] for r in records) == 1
+
+
+def test_unsaved_index_is_recovered_from_log(tmp_path):
+    inbox, store_dir = tmp_path / 'inbox', tmp_path / 'store'
+    _audio(inbox / 'bot' / 's1' / 'a.wav', 1)
+    store = TranscriptStore(str(store_dir))
+    jobs = [(str(inbox / 'bot' / 's1' / 'a.wav'), 'bot', 's1')]
+    voice_inbox.process_batch(jobs, store, StandInModel(), str(inbox))
+    assert store.dirty
+
+    # Sem flush (processo caiu): o log é reindexado ao abrir
+    assert len(TranscriptStore(str(store_dir)).session('bot', 's1')) == 1
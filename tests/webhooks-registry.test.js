@@ -0,0 +1,41 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+const TMP = fs.mkdtempSync(path.join(os.tmpdir(), 'webhooks-registry-'));
+process.env.WEBHOOK_QUEUE_DIR = TMP;
+
+// Só a fila em disco é exercitada: sem node_modules, um axios vazio basta
+try {
+    require.resolve('axios');
+} catch (error) {
+    fs.mkdirSync(path.join(TMP, 'node_modules', 'axios'), { recursive: true });
+    fs.writeFileSync(path.join(TMP, 'node_modules', 'axios', 'index.js'), 'module.exports = {};');
+    process.env.NODE_PATH = path.join(TMP, 'node_modules');
+    require('module').Module._initPaths();
+}
+const WebhookManager = require('../webhooks').webhookManager.constructor;
+
+test.after(() => fs.rmSync(TMP, { recursive: true, force: true }));
+
+function registry() {
+    return JSON.parse(fs.readFileSync(path.join(TMP, 'webhooks.json'), 'utf8'));
+}
+
+test('ids registrados antes de reiniciar continuam em webhooks.json', () => {
+    const first = new WebhookManager();
+    const kept = first.registerWebhook('bot1', 'lead_captured', 'https://example.com/a', { secret: 's1' });
+    const removed = first.registerWebhook('bot1', '*', 'https://example.com/b');
+
+    // Novo processo: o Map em memória começa vazio
+    const second = new WebhookManager();
+    const added = second.registerWebhook('bot2', 'message_sent', 'https://example.com/c', { headers: { 'X-A': '1' } });
+    assert.deepStrictEqual(Object.keys(registry()).sort(), [kept.id, removed.id, added.id].sort());
+    assert.deepStrictEqual(registry()[kept.id], { secret: 's1', headers: {} });
+
+    assert.strictEqual(first.removeWebhook('bot1', removed.id), true);
+    assert.deepStrictEqual(Object.keys(registry()).sort(), [kept.id, added.id].sort());
+    assert.strictEqual(fs.statSync(path.join(TMP, 'webhooks.json')).mode & 0o777, 0o600);
+});
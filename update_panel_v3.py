@@ -1,45 +1,72 @@
 #!/usr/bin/env python3
 # Script para adicionar novas integrações ao painel
+#
+# Cada aba e cada seção é um ponto de inserção nomeado (html_insert.py):
+# o HTML é tokenizado uma vez, todas as inserções saem numa única escrita
+# e uma âncora ausente gera erro em vez de deixar o painel como estava.
+# Com --fragments as seções vão para public/fragments/ e só são buscadas
+# quando a aba é aberta (panel_fragments.py).
+# No fim os assets de public/ ganham versões .gz/.br (precompress.py).
 
+import argparse
+import io
 import re
+import sys
+import time
 
-# Ler o HTML atual
-with open('public/index_app.html', 'r', encoding='utf-8') as f:
-    html = f.read()
+from html_insert import InsertionPoint, insert_into_file, resolve
+from patch_engine import apply_insertions
 
-# Adicionar novas abas ao painel de sistemas V2.0
-new_tabs_html = '''
+PANEL_PATH = 'public/index_app.html'
+
+# Âncoras: aba e seção "Sistema" do painel de sistemas V2.0
+SYSTEM_TAB = ('button', 'onclick', "switchNewSystemsTab('system')")
+SYSTEM_SECTION = ('div', 'id', 'system-section')
+
+# Integrações V3.0, na ordem em que entram depois da aba/seção Sistema
+INTEGRATIONS = ['gmail', 'whatsapp', 'chatgpt', 'whitelabel', 'leads']
+
+# Aba Gmail
+GMAIL_TAB = '''
                 <!-- Aba Gmail -->
                 <button class="new-systems-tab" onclick="switchNewSystemsTab('gmail')">
                     📧 Gmail
-                </button>
+                </button>'''
+
+# Aba WhatsApp
+WHATSAPP_TAB = '''
                 
                 <!-- Aba WhatsApp -->
                 <button class="new-systems-tab" onclick="switchNewSystemsTab('whatsapp')">
                     📱 WhatsApp
-                </button>
+                </button>'''
+
+# Aba ChatGPT
+CHATGPT_TAB = '''
                 
                 <!-- Aba ChatGPT -->
                 <button class="new-systems-tab" onclick="switchNewSystemsTab('chatgpt')">
                     🤖 ChatGPT
-                </button>
+                </button>'''
+
+# Aba Whitelabel
+WHITELABEL_TAB = '''
                 
                 <!-- Aba Whitelabel -->
                 <button class="new-systems-tab" onclick="switchNewSystemsTab('whitelabel')">
                     🎨 Whitelabel
-                </button>
+                </button>'''
+
+# Aba Leads
+LEADS_TAB = '''
                 
                 <!-- Aba Leads -->
                 <button class="new-systems-tab" onclick="switchNewSystemsTab('leads')">
                     📝 Leads
                 </button>'''
 
-# Encontrar onde inserir as novas abas (depois da aba Sistema)
-pattern = r'(<button class="new-systems-tab" onclick="switchNewSystemsTab\(\'system\'\)">.*?</button>)'
-html = re.sub(pattern, r'\1' + new_tabs_html, html, count=1)
-
-# Adicionar novas seções de conteúdo
-new_sections_html = '''
+# Seção Gmail
+GMAIL_SECTION = '''
             <!-- Seção Gmail -->
             <div id="gmail-section" class="new-systems-section" style="display: none;">
                 <h2 style="margin-bottom: 20px;">📧 Integração Gmail</h2>
@@ -89,7 +116,10 @@ new_sections_html = '''
                         </div>
                     </div>
                 </div>
-            </div>
+            </div>'''
+
+# Seção WhatsApp
+WHATSAPP_SECTION = '''
 
             <!-- Seção WhatsApp -->
             <div id="whatsapp-section" class="new-systems-section" style="display: none;">
@@ -165,7 +195,10 @@ new_sections_html = '''
                         </button>
                     </form>
                 </div>
-            </div>
+            </div>'''
+
+# Seção ChatGPT
+CHATGPT_SECTION = '''
 
             <!-- Seção ChatGPT -->
             <div id="chatgpt-section" class="new-systems-section" style="display: none;">
@@ -236,7 +269,10 @@ new_sections_html = '''
                         </tbody>
                     </table>
                 </div>
-            </div>
+            </div>'''
+
+# Seção Whitelabel
+WHITELABEL_SECTION = '''
 
             <!-- Seção Whitelabel -->
             <div id="whitelabel-section" class="new-systems-section" style="display: none;">
@@ -291,7 +327,10 @@ new_sections_html = '''
                         <p style="color: #9ca3af;">Configure as opções acima para ver o preview</p>
                     </div>
                 </div>
-            </div>
+            </div>'''
+
+# Seção Leads
+LEADS_SECTION = '''
 
             <!-- Seção Leads Estruturados -->
             <div id="leads-section" class="new-systems-section" style="display: none;">
@@ -354,13 +393,161 @@ new_sections_html = '''
                 </div>
             </div>'''
 
-# Encontrar onde inserir as novas seções (depois da seção Sistema)
-pattern = r'(<div id="system-section" class="new-systems-section".*?</div>\s*</div>)'
-html = re.sub(pattern, r'\1' + new_sections_html, html, count=1, flags=re.DOTALL)
+TABS = {
+    'gmail': GMAIL_TAB,
+    'whatsapp': WHATSAPP_TAB,
+    'chatgpt': CHATGPT_TAB,
+    'whitelabel': WHITELABEL_TAB,
+    'leads': LEADS_TAB,
+}
+
+SECTIONS = {
+    'gmail': GMAIL_SECTION,
+    'whatsapp': WHATSAPP_SECTION,
+    'chatgpt': CHATGPT_SECTION,
+    'whitelabel': WHITELABEL_SECTION,
+    'leads': LEADS_SECTION,
+}
+
+# Loader das seções em fragmentos: busca a seção antes de switchNewSystemsTab abrir
+FRAGMENT_LOADER_BLOCK = 'v3-fragment-loader'
+LAZY_SECTIONS_JS = '''    <script>
+        lazyTabs('switchNewSystemsTab', name => name + '-section');
+    </script>
+'''
+
+
+def insertion_points(fragments=False):
+    """
+    Pontos de inserção das abas e seções. Com fragments=True cada seção
+    entra vazia e o conteúdo vai para public/fragments/v3-<nome>.html.
+    """
+    sections = SECTIONS
+    if fragments:
+        from panel_fragments import split_fragments
+
+        sections = {name: split_fragments(SECTIONS[name], {f'{name}-section': f'v3-{name}'})[0]
+                    for name in INTEGRATIONS}
+    return (
+        [InsertionPoint(f'{name}-tab', SYSTEM_TAB, 'after', TABS[name],
+                        f"switchNewSystemsTab('{name}')") for name in INTEGRATIONS] +
+        [InsertionPoint(f'{name}-section', SYSTEM_SECTION, 'after', sections[name],
+                        f'id="{name}-section"') for name in INTEGRATIONS]
+    )
+
+
+INSERTION_POINTS = insertion_points()
+
+
+def update_panel(path=PANEL_PATH, fragments=False):
+    try:
+        _, skipped = insert_into_file(path, insertion_points(fragments))
+        if fragments:
+            from panel_blocks import upsert_block
+            from panel_fragments import LOADER_JS, refresh_fragment_urls
+
+            # Seções já presentes mantêm o contêiner antigo: o ?v= acompanha o fragmento regravado
+            refreshed = refresh_fragment_urls(path)
+            upsert_block(path, FRAGMENT_LOADER_BLOCK, LOADER_JS + LAZY_SECTIONS_JS)
+            print("🧩 Seções V3.0 em fragmentos carregados sob demanda")
+            if refreshed:
+                print(f"🔄 {refreshed} URL(s) de fragmento atualizada(s)")
+    except LookupError as error:
+        print(f"❌ {error}")
+        return False
+
+    with open(path, 'r', encoding='utf-8') as f:
+        size = len(f.read())
+
+    if len(skipped) == len(INSERTION_POINTS):
+        print("⏭️  Todas as integrações já estão no painel, nada a fazer")
+    else:
+        if skipped:
+            print(f"⏭️  Já presentes: {', '.join(skipped)}")
+        print("✅ Painel atualizado com sucesso!")
+    print(f"📊 Tamanho final: {size} caracteres")
+    return True
+
+
+def _regex_update(html):
+    """Implementação anterior (dois re.sub no documento inteiro), mantida só para o benchmark"""
+    new_tabs_html = ''.join(TABS[name] for name in INTEGRATIONS)
+    new_sections_html = ''.join(SECTIONS[name] for name in INTEGRATIONS)
+    pattern = r'(<button class="new-systems-tab" onclick="switchNewSystemsTab\(\'system\'\)">.*?</button>)'
+    html = re.sub(pattern, lambda m: m.group(1) + new_tabs_html, html, count=1)
+    pattern = r'(<div id="system-section" class="new-systems-section".*?</div>\s*</div>)'
+    return re.sub(pattern, lambda m: m.group(1) + new_sections_html, html, count=1, flags=re.DOTALL)
+
+
+def _synthetic_panel(target_size):
+    """Painel sintético com as âncoras da aba/seção Sistema, com ~target_size caracteres"""
+    filler = (
+        '        <div class="card" style="padding: 20px;">\n'
+        '            <h3>Bloco</h3>\n'
+        '            <p style="color: #6b7280;">Conteúdo de preenchimento do painel</p>\n'
+        '            <button onclick="doSomething()">Ação</button>\n'
+        '        </div>\n'
+    )
+    head = '<!DOCTYPE html>\n<html>\n<body>\n    <div class="container">\n'
+    panel = (
+        '        <div class="new-systems-tabs">\n'
+        '                <button class="new-systems-tab" onclick="switchNewSystemsTab(\'system\')">\n'
+        '                    ⚙️ Sistema\n'
+        '                </button>\n'
+        '        </div>\n'
+        '            <div id="system-section" class="new-systems-section" style="display: none;">\n'
+        '                <h2>⚙️ Sistema</h2>\n'
+        '                <div style="background: white;"><p>Status</p></div>\n'
+        '            </div>\n'
+    )
+    tail = '    </div>\n<script>\n    function switchNewSystemsTab(name) {}\n</script>\n</body>\n</html>\n'
+    repeat = max(0, (target_size - len(head) - len(panel) - len(tail)) // len(filler))
+    return head + filler * repeat + panel + tail
+
+
+def benchmark(sizes=(128 * 1024, 512 * 1024, 2 * 1024 * 1024), rounds=20):
+    """Compara o tokenizador de passada única com os dois re.sub antigos"""
+    print(f"⏱️  Benchmark de atualização do painel ({rounds} rodadas)")
+    print(f"{'tamanho':>10}{'regex ms':>11}{'passada única ms':>18}")
+    for size in sizes:
+        html = _synthetic_panel(size)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            _regex_update(html)
+        regex_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            insertions, _ = resolve(html, INSERTION_POINTS)
+            apply_insertions(html, insertions, io.StringIO())
+        single_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        print(f"{len(html):>10}{regex_ms:>11.2f}{single_ms:>18.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Adiciona as integrações V3.0 ao painel')
+    parser.add_argument('path', nargs='?', default=PANEL_PATH)
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compara com a implementação antiga baseada em re.sub')
+    parser.add_argument('--fragments', action='store_true',
+                        help='gera as seções como fragmentos carregados sob demanda')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='não gera as versões .gz/.br dos assets')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark()
+        return 0
+
+    if not update_panel(args.path, fragments=args.fragments):
+        return 1
+    if not args.no_compress:
+        from precompress import precompress
+        precompress()
+    return 0
 
-# Salvar o HTML atualizado
-with open('public/index_app.html', 'w', encoding='utf-8') as f:
-    f.write(html)
 
-print("✅ Painel atualizado com sucesso!")
-print(f"📊 Tamanho final: {len(html)} caracteres")
+if __name__ == '__main__':
+    sys.exit(main())
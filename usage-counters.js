@@ -0,0 +1,179 @@
+/**
+ * 📊 CONTADORES DE USO POR API KEY - Link Mágico
+ * Arquivo de largura fixa gerado por usage_counters.py (data/usage.counters)
+ *
+ * Cada API key tem um slot de 64 bytes; incrementos e o rate limit
+ * leem e gravam só o slot da key (leitura/escrita posicional), sem
+ * reescrever o data/usage.json inteiro.
+ *
+ * Layout do slot (little-endian), igual ao SLOT de usage_counters.py:
+ *   0  hash da key (16 bytes, sha256 truncado)
+ *   16 dia (dias desde 1970, UTC)   20 requisições do dia
+ *   24 mês (ano * 12 + mês - 1)     28 requisições do mês
+ *   32 início da janela (segundos)  36 requisições na janela
+ *   40 total (uint64)               48 último uso em ms (uint64)
+ */
+
+const fs = require('fs');
+const path = require('path');
+const crypto = require('crypto');
+
+const HEADER_SIZE = 64;
+const SLOT_SIZE = 64;
+const MAGIC = 'LMUC';
+
+class UsageCounters {
+    constructor(countersPath, indexPath) {
+        this.countersPath = countersPath;
+        this.indexPath = indexPath;
+        this.fd = fs.openSync(countersPath, 'r+');
+        this.slot = Buffer.alloc(SLOT_SIZE);
+        this.loadIndex();
+
+        const header = Buffer.alloc(HEADER_SIZE);
+        fs.readSync(this.fd, header, 0, HEADER_SIZE, 0);
+        if (header.toString('latin1', 0, 4) !== MAGIC || header.readUInt32LE(8) !== SLOT_SIZE) {
+            fs.closeSync(this.fd);
+            throw new Error(`${countersPath}: arquivo de contadores inválido`);
+        }
+    }
+
+    /**
+     * Abrir os arquivos padrão (null se a migração ainda não foi feita)
+     */
+    static open(dataDir = path.join(__dirname, 'data')) {
+        const countersPath = path.join(dataDir, 'usage.counters');
+        const indexPath = path.join(dataDir, 'usage.index.json');
+
+        if (!fs.existsSync(countersPath) || !fs.existsSync(indexPath)) {
+            return null;
+        }
+
+        try {
+            return new UsageCounters(countersPath, indexPath);
+        } catch (error) {
+            console.error('❌ Erro ao abrir contadores de uso:', error.message);
+            return null;
+        }
+    }
+
+    loadIndex() {
+        this.indexMtime = fs.statSync(this.indexPath).mtimeMs;
+        this.slots = JSON.parse(fs.readFileSync(this.indexPath, 'utf8')).slots || {};
+    }
+
+    /**
+     * Slot da API key; se ela não existir e o índice mudou (nova migração), recarrega
+     */
+    slotOf(apiKey) {
+        if (!(apiKey in this.slots)) {
+            try {
+                if (fs.statSync(this.indexPath).mtimeMs !== this.indexMtime) this.loadIndex();
+            } catch (error) {
+                return null;
+            }
+        }
+        const slot = this.slots[apiKey];
+        return slot === undefined ? null : slot;
+    }
+
+    /**
+     * Ler o slot da key (zerado se pertencer a outra key)
+     */
+    readSlot(slot, apiKey) {
+        const offset = HEADER_SIZE + slot * SLOT_SIZE;
+        fs.readSync(this.fd, this.slot, 0, SLOT_SIZE, offset);
+
+        const hash = crypto.createHash('sha256').update(apiKey).digest().subarray(0, 16);
+        if (!hash.equals(this.slot.subarray(0, 16))) {
+            this.slot.fill(0);
+            hash.copy(this.slot, 0);
+        }
+        return offset;
+    }
+
+    /**
+     * Contar uma requisição e aplicar o rate limit da janela, numa única leitura/escrita
+     * Retorna null se a API key não tiver slot (quem chamou usa o caminho antigo)
+     */
+    hit(apiKey, maxRequests, windowSeconds, amount = 1) {
+        const slot = this.slotOf(apiKey);
+        if (slot === null) return null;
+
+        const offset = this.readSlot(slot, apiKey);
+        const buf = this.slot;
+        const now = Date.now();
+        const nowSeconds = Math.floor(now / 1000);
+        const day = Math.floor(nowSeconds / 86400);
+        const date = new Date(now);
+        const month = date.getUTCFullYear() * 12 + date.getUTCMonth();
+
+        // Janela do rate limit
+        let windowStart = buf.readUInt32LE(32);
+        let windowCount = buf.readUInt32LE(36);
+        if (nowSeconds - windowStart >= windowSeconds) {
+            windowStart = nowSeconds;
+            windowCount = 0;
+        }
+        windowCount += amount;
+        buf.writeUInt32LE(windowStart, 32);
+        buf.writeUInt32LE(windowCount, 36);
+
+        // Uso diário, mensal e total
+        if (buf.readUInt32LE(16) !== day) {
+            buf.writeUInt32LE(day, 16);
+            buf.writeUInt32LE(0, 20);
+        }
+        if (buf.readUInt32LE(24) !== month) {
+            buf.writeUInt32LE(month, 24);
+            buf.writeUInt32LE(0, 28);
+        }
+        buf.writeUInt32LE(buf.readUInt32LE(20) + amount, 20);
+        buf.writeUInt32LE(buf.readUInt32LE(28) + amount, 28);
+        buf.writeBigUInt64LE(buf.readBigUInt64LE(40) + BigInt(amount), 40);
+        buf.writeBigUInt64LE(BigInt(now), 48);
+
+        fs.writeSync(this.fd, buf, 0, SLOT_SIZE, offset);
+
+        const resetIn = windowStart + windowSeconds - nowSeconds;
+        return {
+            allowed: windowCount <= maxRequests,
+            remaining: Math.max(0, maxRequests - windowCount),
+            resetIn
+        };
+    }
+
+    /**
+     * Uso atual da key (mesmo formato do usage.json)
+     */
+    getUsage(apiKey) {
+        const slot = this.slotOf(apiKey);
+        if (slot === null) return null;
+
+        this.readSlot(slot, apiKey);
+        const buf = this.slot;
+        const now = new Date();
+        const today = Math.floor(now.getTime() / 86400000);
+        const month = now.getUTCFullYear() * 12 + now.getUTCMonth();
+
+        return {
+            daily: {
+                date: now.toDateString(),
+                requests: buf.readUInt32LE(16) === today ? buf.readUInt32LE(20) : 0
+            },
+            monthly: {
+                month: `${now.getUTCFullYear()}-${String(now.getUTCMonth() + 1).padStart(2, '0')}`,
+                requests: buf.readUInt32LE(24) === month ? buf.readUInt32LE(28) : 0
+            },
+            total: Number(buf.readBigUInt64LE(40))
+        };
+    }
+
+    close() {
+        fs.closeSync(this.fd);
+    }
+}
+
+module.exports = {
+    UsageCounters
+};
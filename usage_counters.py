@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Contadores de uso por API key em arquivo de largura fixa (mmap)
+
+O data/usage.json guarda os contadores diário/mensal de cada API key num
+array JSON reescrito inteiro a cada gravação. Aqui cada API key de
+data/api_keys.json ganha um slot de 64 bytes em data/usage.counters:
+
+  cabeçalho (64 bytes): magic, versão, tamanho do slot, número de slots
+  slot (64 bytes): hash da key, dia + requisições do dia, mês +
+                   requisições do mês, janela do rate limit (início +
+                   contagem), total e último uso
+
+data/usage.index.json mapeia API key -> slot. Um incremento lê e grava
+só o slot da key (usage-counters.js faz o mesmo no Node, com escrita
+posicional no arquivo), sem serializar nada.
+
+Uso:
+  python3 usage_counters.py migrate     # cria/estende a partir de api_keys.json + usage.json
+  python3 usage_counters.py inspect [KEY]
+  python3 usage_counters.py rollup [--write-usage-json]
+  python3 usage_counters.py benchmark   # JSON inteiro x slot no lugar
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+COUNTERS_PATH = os.path.join('data', 'usage.counters')
+INDEX_PATH = os.path.join('data', 'usage.index.json')
+API_KEYS_PATH = os.path.join('data', 'api_keys.json')
+USAGE_PATH = os.path.join('data', 'usage.json')
+
+MAGIC = b'LMUC'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQ40x')        # 64 bytes
+SLOT = struct.Struct('<16sIIIIIIQQ8x')      # 64 bytes
+# key_hash, day, daily, month, monthly, window_start, window_count, total, last_used_ms
+_DAY_SECONDS = 86400
+
+
+def key_hash(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).digest()[:16]
+
+
+def day_number(ts):
+    return int(ts // _DAY_SECONDS)
+
+
+def month_number(ts):
+    moment = datetime.fromtimestamp(ts, timezone.utc)
+    return moment.year * 12 + moment.month - 1
+
+
+def format_month(month):
+    return f'{month // 12}-{month % 12 + 1:02d}'
+
+
+def load_api_keys(path=API_KEYS_PATH):
+    """{key: dados}; aceita o formato do setup-auth ({apiKeys: [[key, dados]]}) e o objeto simples"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data.get('apiKeys'), list):
+        return {key: value for key, value in data['apiKeys']}
+    return {key: value for key, value in data.items() if isinstance(value, dict)}
+
+
+def load_index(path=INDEX_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'version': VERSION, 'slots': {}}
+
+
+def save_index(index, path=INDEX_PATH):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+class CounterFile:
+    """Arquivo de slots mapeado em memória"""
+
+    def __init__(self, path=COUNTERS_PATH, writable=False):
+        self.path = path
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, slot_size, self.slots, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+            self.close()
+            raise ValueError(f'{path}: arquivo de contadores inválido')
+
+    @staticmethod
+    def create_or_extend(path, slots):
+        """Garante pelo menos `slots` slots (slots novos começam zerados)"""
+        current, created = 0, int(time.time())
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            with open(path, 'rb') as f:
+                magic, version, slot_size, current, created = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+                raise ValueError(f'{path}: arquivo de contadores inválido')
+        slots = max(slots, current)
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+            f.truncate(HEADER.size + slots * SLOT.size)
+            f.write(HEADER.pack(MAGIC, VERSION, SLOT.size, slots, created))
+
+    def offset(self, slot):
+        if not 0 <= slot < self.slots:
+            raise IndexError(f'slot {slot} fora do arquivo ({self.slots} slots)')
+        return HEADER.size + slot * SLOT.size
+
+    def read(self, slot):
+        fields = SLOT.unpack_from(self.map, self.offset(slot))
+        return dict(zip(('hash', 'day', 'daily', 'month', 'monthly', 'window_start', 'window_count',
+                         'total', 'last_used'), fields))
+
+    def write(self, slot, values):
+        SLOT.pack_into(self.map, self.offset(slot), values['hash'], values['day'], values['daily'],
+                       values['month'], values['monthly'], values['window_start'], values['window_count'],
+                       values['total'], values['last_used'])
+
+    def increment(self, slot, api_key, amount=1, now=None):
+        """O(1): lê o slot, vira dia/mês se preciso e grava no lugar"""
+        now = time.time() if now is None else now
+        values = self.read(slot)
+        if values['hash'] != key_hash(api_key):
+            values = dict.fromkeys(values, 0)
+            values['hash'] = key_hash(api_key)
+        day, month = day_number(now), month_number(now)
+        if values['day'] != day:
+            values['day'], values['daily'] = day, 0
+        if values['month'] != month:
+            values['month'], values['monthly'] = month, 0
+        values['daily'] += amount
+        values['monthly'] += amount
+        values['total'] += amount
+        values['last_used'] = int(now * 1000)
+        self.write(slot, values)
+        return values
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# ----------------------------------------------------------------------
+# Migração, inspeção e rollup
+# ----------------------------------------------------------------------
+def _parse_date_string(text):
+    """'Sun Sep 28 2025' (Date.toDateString) -> número do dia"""
+    try:
+        moment = datetime.strptime(text, '%a %b %d %Y').replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return 0
+    return day_number(moment.timestamp())
+
+
+def _parse_month_string(text):
+    try:
+        year, month = map(int, text.split('-'))
+    except (AttributeError, ValueError):
+        return 0
+    return year * 12 + month - 1
+
+
+def migrate(api_keys_path=API_KEYS_PATH, usage_path=USAGE_PATH, counters_path=COUNTERS_PATH,
+            index_path=INDEX_PATH):
+    """Atribui slots às keys novas (as existentes mantêm o slot) e importa o usage.json"""
+    keys = load_api_keys(api_keys_path)
+    index = load_index(index_path)
+    slots = index['slots']
+    added = [key for key in keys if key not in slots]
+    for key in added:
+        slots[key] = len(slots)
+    CounterFile.create_or_extend(counters_path, len(slots))
+
+    imported = 0
+    usage = []
+    if usage_path and os.path.exists(usage_path):
+        with open(usage_path, 'r', encoding='utf-8') as f:
+            usage = json.load(f).get('usage') or []
+    counters = CounterFile(counters_path, writable=True)
+    try:
+        for key, slot in slots.items():
+            values = counters.read(slot)
+            if values['hash'] != key_hash(key):
+                values = dict.fromkeys(values, 0)
+                values['hash'] = key_hash(key)
+                counters.write(slot, values)
+        for key, data in usage:
+            if key not in slots:
+                continue
+            values = counters.read(slots[key])
+            if values['total']:
+                continue   # já tem contagem própria: o usage.json é mais antigo
+            daily, monthly = data.get('daily') or {}, data.get('monthly') or {}
+            values.update(day=_parse_date_string(daily.get('date')), daily=int(daily.get('requests') or 0),
+                          month=_parse_month_string(monthly.get('month')),
+                          monthly=int(monthly.get('requests') or 0))
+            values['total'] = values['monthly']
+            counters.write(slots[key], values)
+            imported += 1
+        counters.map.flush()
+    finally:
+        counters.close()
+
+    index.update(version=VERSION, file=os.path.basename(counters_path), slotSize=SLOT.size,
+                 builtAt=datetime.now(timezone.utc).isoformat(), slots=slots)
+    save_index(index, index_path)
+    return added, imported
+
+
+def snapshot(counters_path=COUNTERS_PATH, index_path=INDEX_PATH, now=None):
+    """Lista de (key, valores) com dia/mês já virados para `now`"""
+    now = time.time() if now is None else now
+    today, this_month = day_number(now), month_number(now)
+    counters = CounterFile(counters_path)
+    try:
+        rows = []
+        for key, slot in load_index(index_path)['slots'].items():
+            values = counters.read(slot)
+            if values['hash'] != key_hash(key):
+                values = dict.fromkeys(values, 0)
+            values['daily_current'] = values['daily'] if values['day'] == today else 0
+            values['monthly_current'] = values['monthly'] if values['month'] == this_month else 0
+            rows.append((key, slot, values))
+        return rows
+    finally:
+        counters.close()
+
+
+def _mask(key):
+    return key if len(key) <= 12 else f'{key[:8]}…{key[-4:]}'
+
+
+def rollup(rows, api_keys):
+    """Totais por plano (plano vem do api_keys.json)"""
+    plans = {}
+    for key, _, values in rows:
+        plan = (api_keys.get(key) or {}).get('plano') or (api_keys.get(key) or {}).get('plan') or 'desconhecido'
+        entry = plans.setdefault(plan, {'keys': 0, 'active_today': 0, 'today': 0, 'month': 0, 'total': 0})
+        entry['keys'] += 1
+        entry['active_today'] += 1 if values['daily_current'] else 0
+        entry['today'] += values['daily_current']
+        entry['month'] += values['monthly_current']
+        entry['total'] += values['total']
+    return plans
+
+
+def write_usage_json(rows, path=USAGE_PATH):
+    """Regrava o usage.json no formato antigo, para quem ainda o lê"""
+    usage = []
+    for key, _, values in rows:
+        day = datetime.fromtimestamp(values['day'] * _DAY_SECONDS, timezone.utc) if values['day'] else None
+        usage.append([key, {
+            'daily': {'date': day.strftime('%a %b %d %Y') if day else '', 'requests': values['daily_current']},
+            'monthly': {'month': format_month(values['month']) if values['month'] else '',
+                        'requests': values['monthly_current']},
+        }])
+    data = {'usage': usage, 'saved': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'}
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def benchmark(keys=10000, increments=20000):
+    """Incremento reescrevendo o JSON inteiro x incremento no slot"""
+    print(f"⏱️  Benchmark de incrementos ({keys} API keys)")
+    with tempfile.TemporaryDirectory() as tmp:
+        names = [f'lm_{i:08x}' for i in range(keys)]
+        usage = {name: {'daily': {'date': 'Sun Oct 18 2026', 'requests': 0},
+                        'monthly': {'month': '2026-10', 'requests': 0}} for name in names}
+        json_path = os.path.join(tmp, 'usage.json')
+        json_rounds = max(1, increments // 100)
+        start = time.perf_counter()
+        for i in range(json_rounds):
+            entry = usage[names[i % keys]]
+            entry['daily']['requests'] += 1
+            entry['monthly']['requests'] += 1
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'usage': list(usage.items()), 'saved': ''}, f, indent=2)
+        json_us = (time.perf_counter() - start) / json_rounds * 1e6
+
+        counters_path = os.path.join(tmp, 'usage.counters')
+        CounterFile.create_or_extend(counters_path, keys)
+        counters = CounterFile(counters_path, writable=True)
+        start = time.perf_counter()
+        for i in range(increments):
+            counters.increment(i % keys, names[i % keys])
+        slot_us = (time.perf_counter() - start) / increments * 1e6
+        counters.close()
+
+        print(f"   JSON inteiro: {json_us:10.1f} µs/incremento ({os.path.getsize(json_path) // 1024} KB por gravação)")
+        print(f"   slot (mmap):  {slot_us:10.1f} µs/incremento ({SLOT.size} bytes por gravação)")
+        print(f"   {json_us / slot_us:.0f}x mais rápido")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Contadores de uso por API key (arquivo de largura fixa)')
+    parser.add_argument('--counters', default=COUNTERS_PATH)
+    parser.add_argument('--index', default=INDEX_PATH)
+    parser.add_argument('--api-keys', default=API_KEYS_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('migrate', help='cria/estende o arquivo de contadores e importa o usage.json')
+    p.add_argument('--usage', default=USAGE_PATH)
+
+    p = sub.add_parser('inspect', help='mostra os contadores')
+    p.add_argument('key', nargs='?')
+
+    p = sub.add_parser('rollup', help='totais por plano')
+    p.add_argument('--write-usage-json', action='store_true', help='regrava data/usage.json a partir dos slots')
+    p.add_argument('--usage', default=USAGE_PATH)
+
+    p = sub.add_parser('benchmark', help='JSON inteiro x slot no lugar')
+    p.add_argument('--keys', type=int, default=10000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.keys)
+        return 0
+
+    try:
+        if args.command == 'migrate':
+            added, imported = migrate(args.api_keys, args.usage, args.counters, args.index)
+            print(f"✅ {len(added)} slot(s) novo(s), {imported} contador(es) importado(s) do usage.json")
+            return 0
+        rows = snapshot(args.counters, args.index)
+    except (OSError, ValueError) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+
+    if args.command == 'inspect':
+        if args.key:
+            rows = [row for row in rows if row[0] == args.key]
+            if not rows:
+                print(f"❌ API key sem slot: {args.key}", file=sys.stderr)
+                return 1
+        print(f"{'slot':>5}  {'api key':<16}{'hoje':>8}{'mês':>9}{'total':>11}  último uso")
+        for key, slot, values in rows:
+            last = (datetime.fromtimestamp(values['last_used'] / 1000, timezone.utc).strftime('%Y-%m-%d %H:%M')
+                    if values['last_used'] else '-')
+            print(f"{slot:>5}  {_mask(key):<16}{values['daily_current']:>8}{values['monthly_current']:>9}"
+                  f"{values['total']:>11}  {last}")
+        return 0
+
+    try:
+        api_keys = load_api_keys(args.api_keys)
+    except FileNotFoundError:
+        api_keys = {}
+    print(f"{'plano':<14}{'keys':>6}{'ativas hoje':>13}{'hoje':>9}{'mês':>10}{'total':>12}")
+    for plan, totals in sorted(rollup(rows, api_keys).items()):
+        print(f"{plan:<14}{totals['keys']:>6}{totals['active_today']:>13}{totals['today']:>9}"
+              f"{totals['month']:>10}{totals['total']:>12}")
+    if args.write_usage_json:
+        write_usage_json(rows, args.usage)
+        print(f"💾 {args.usage} regravado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Ingestão de transcrições de voz: caixa de entrada, lotes e cache por hash
+
+Hoje cada transcrição vira um arquivo solto
+(voice_transcription_20251010_131653.json: text, duration, language,
+segments). Aqui os áudios chegam em data/voice-inbox/<chatbotId>/<sessão>/
+e o watcher:
+
+- espera o arquivo parar de crescer e agrupa os áudios em lotes
+  (até --batch-size ou --max-wait segundos);
+- calcula o sha256 do áudio: se ele já foi transcrito, reaproveita o
+  texto sem chamar o modelo;
+- acrescenta o resultado (mesmos campos do JSON acima) ao
+  data/voice-store/transcripts.ndjson, com índice por chatbot/sessão e
+  por hash em index.json (salvo uma vez por varredura, não por lote);
+- apaga o áudio processado (--keep-audio move para archive/) e as pastas
+  de sessão que ficaram vazias.
+
+O modelo fica carregado entre lotes: faster-whisper se instalado, ou
+--model stand-in, um modelo local determinístico para testes.
+
+Uso:
+  python3 voice_inbox.py watch [--once] [--model stand-in]
+  python3 voice_inbox.py import voice_transcription_*.json --chatbot ID --session ID
+  python3 voice_inbox.py get CHATBOT SESSAO
+  python3 voice_inbox.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import wave
+from datetime import datetime, timezone
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+INBOX_DIR = os.path.join('data', 'voice-inbox')
+STORE_DIR = os.path.join('data', 'voice-store')
+LOG_FILE = 'transcripts.ndjson'
+INDEX_FILE = 'index.json'
+FAILED_DIR = '_failed'
+ARCHIVE_DIR = 'archive'
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.oga', '.opus', '.m4a', '.webm', '.flac')
+DEFAULT_SESSION = 'sem-sessao'
+BATCH_SIZE = 16
+MAX_WAIT = 10.0
+INTERVAL = 2.0
+
+
+def _now():
+    now = datetime.now(timezone.utc)
+    return now.strftime('%Y-%m-%dT%H:%M:%S.') + f'{now.microsecond // 1000:03d}Z'
+
+
+def _dumps(record):
+    return (json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def session_key(chatbot_id, session_id):
+    return f'{chatbot_id}/{session_id}'
+
+
+# ----------------------------------------------------------------------
+# Armazenamento NDJSON indexado
+# ----------------------------------------------------------------------
+class TranscriptStore:
+    """transcripts.ndjson append-only + índice (chatbot/sessão -> offsets, hash -> offset)"""
+
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            index = {}
+        self.log_size = index.get('log_size', 0)
+        self.sessions = index.get('sessions', {})
+        self.hashes = index.get('hashes', {})
+        self.dirty = False      # registros no log ainda fora do index.json
+        self._recover()
+
+    def _recover(self):
+        """Indexa o que foi gravado depois do último índice salvo"""
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if size < self.log_size:
+            # Log menor que o índice: reconstrói do zero
+            self.log_size, self.sessions, self.hashes = 0, {}, {}
+        if size == self.log_size:
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.log_size)
+            offset = self.log_size
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break   # escrita interrompida: a linha incompleta é descartada
+                self._index(json.loads(line), offset)
+                offset += len(line)
+        if offset < size:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+        self.log_size = offset
+        self.save_index()
+
+    def _index(self, record, offset):
+        self.sessions.setdefault(session_key(record['chatbotId'], record['sessionId']), []).append(offset)
+        self.hashes.setdefault(record['sha256'], offset)
+
+    def save_index(self):
+        index = {'version': 1, 'log_size': self.log_size, 'count': sum(map(len, self.sessions.values())),
+                 'sessions': self.sessions, 'hashes': self.hashes}
+        _write_atomic(self.index_path, json.dumps(index, separators=(',', ':')).encode('utf-8'))
+        self.dirty = False
+
+    def flush(self):
+        """Salva o índice se houve append desde o último save"""
+        if self.dirty:
+            self.save_index()
+
+    def append(self, records):
+        """
+        Acrescenta vários registros com um único fsync. O índice só vai para o
+        disco no flush(): se o processo cair antes, o _recover reindexa o log.
+        """
+        if not records:
+            return
+        with open(self.log_path, 'ab') as f:
+            offset = self.log_size
+            for record in records:
+                data = _dumps(record)
+                f.write(data)
+                self._index(record, offset)
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.log_size = offset
+        self.dirty = True
+
+    def read(self, offset):
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def cached(self, sha256):
+        offset = self.hashes.get(sha256)
+        return self.read(offset) if offset is not None else None
+
+    def session(self, chatbot_id, session_id):
+        return [self.read(offset) for offset in self.sessions.get(session_key(chatbot_id, session_id), [])]
+
+    def stats(self):
+        return {'records': sum(map(len, self.sessions.values())), 'sessions': len(self.sessions),
+                'uniqueAudios': len(self.hashes), 'bytes': self.log_size}
+
+
+def make_record(chatbot_id, session_id, sha256, filename, transcript, model, cached):
+    return {
+        'chatbotId': chatbot_id,
+        'sessionId': session_id,
+        'sha256': sha256,
+        'file': filename,
+        'transcribedAt': _now(),
+        'model': model,
+        'cached': cached,
+        'text': transcript.get('text', ''),
+        'duration': transcript.get('duration'),
+        'language': transcript.get('language'),
+        'segments': transcript.get('segments', []),
+    }
+
+
+# ----------------------------------------------------------------------
+# Modelos
+# ----------------------------------------------------------------------
+class StandInModel:
+    """Modelo local determinístico: mesmo formato do Whisper, texto derivado do hash"""
+
+    name = 'stand-in'
+
+    def __init__(self, seconds_per_audio=0.0):
+        self.seconds_per_audio = seconds_per_audio
+
+    @staticmethod
+    def _duration(path):
+        try:
+            with wave.open(path, 'rb') as audio:
+                return audio.getnframes() / float(audio.getframerate())
+        except (wave.Error, EOFError, OSError):
+            return os.path.getsize(path) / 16000.0
+
+    def transcribe_batch(self, paths):
+        results = []
+        for path in paths:
+            if self.seconds_per_audio:
+                time.sleep(self.seconds_per_audio)
+            digest = file_sha256(path)[:8]
+            duration = self._duration(path)
+            segments, start = [], 0.0
+            while start < duration or not segments:
+                end = min(duration, start + 5.0)
+                segments.append({'start': start, 'end': end, 'text': f'trecho {len(segments) + 1} do áudio {digest}'})
+                start = end
+                if end >= duration:
+                    break
+            results.append({'text': ' '.join(s['text'] for s in segments), 'duration': duration,
+                            'language': 'portuguese', 'segments': segments})
+        return results
+
+
+class WhisperBatchModel:
+    """faster-whisper carregado uma vez e reaproveitado em todos os lotes"""
+
+    def __init__(self, size='small'):
+        self.name = f'faster-whisper-{size}'
+        self.model = WhisperModel(size, device='auto', compute_type='int8')
+
+    def transcribe_batch(self, paths):
+        results = []
+        for path in paths:
+            segments, info = self.model.transcribe(path, language='pt')
+            segments = [{'start': s.start, 'end': s.end, 'text': s.text.strip()} for s in segments]
+            results.append({'text': ' '.join(s['text'] for s in segments), 'duration': info.duration,
+                            'language': 'portuguese', 'segments': segments})
+        return results
+
+
+def load_model(name, stand_in_delay=0.0):
+    if name == 'stand-in' or (name == 'auto' and WhisperModel is None):
+        return StandInModel(stand_in_delay)
+    if WhisperModel is None:
+        raise RuntimeError('faster-whisper não está instalado (pip install faster-whisper)')
+    return WhisperBatchModel(name if name != 'auto' else 'small')
+
+
+# ----------------------------------------------------------------------
+# Caixa de entrada
+# ----------------------------------------------------------------------
+def scan_inbox(inbox):
+    """{caminho: (chatbotId, sessão, tamanho, mtime)} dos áudios na caixa de entrada"""
+    found = {}
+    for folder, dirs, names in os.walk(inbox):
+        dirs[:] = [d for d in dirs if d not in (FAILED_DIR, ARCHIVE_DIR)]
+        parts = os.path.relpath(folder, inbox).split(os.sep)
+        if parts == ['.']:
+            continue
+        chatbot_id = parts[0]
+        session_id = parts[1] if len(parts) > 1 else DEFAULT_SESSION
+        for name in names:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found[path] = (chatbot_id, session_id, stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+def process_batch(jobs, store, model, inbox, keep_audio=False):
+    """
+    jobs: lista de (caminho, chatbotId, sessão). Áudios já vistos (mesmo hash,
+    inclusive dentro do lote) não passam pelo modelo. Retorna (transcritos, do cache, falhas).
+    """
+    hashed, failed = [], []
+    for path, chatbot_id, session_id in jobs:
+        try:
+            hashed.append((path, chatbot_id, session_id, file_sha256(path)))
+        except OSError:
+            failed.append(path)
+
+    # Um áudio novo vai ao modelo uma vez só, mesmo repetido no lote
+    to_model = {}
+    for path, _, _, sha256 in hashed:
+        if sha256 not in store.hashes and sha256 not in to_model:
+            to_model[sha256] = path
+    transcripts = {}
+    if to_model:
+        try:
+            transcripts = dict(zip(to_model, model.transcribe_batch(list(to_model.values()))))
+        except Exception as error:  # o lote inteiro vai para _failed; o watcher continua
+            print(f"❌ Falha no lote de transcrição: {error}", file=sys.stderr)
+            failed.extend(path for path, _, _, sha256 in hashed if sha256 in to_model)
+            hashed = [job for job in hashed if job[3] not in to_model]
+
+    records, cached_count = [], 0
+    for path, chatbot_id, session_id, sha256 in hashed:
+        if sha256 in transcripts:
+            transcript, model_name, cached = transcripts.pop(sha256), model.name, False
+        else:
+            previous = store.cached(sha256) or next(r for r in records if r['sha256'] == sha256)
+            transcript, model_name, cached = previous, previous['model'], True
+            cached_count += 1
+        records.append(make_record(chatbot_id, session_id, sha256, os.path.basename(path),
+                                   transcript, model_name, cached))
+    store.append(records)
+
+    # Só depois do fsync do log os áudios saem da caixa de entrada
+    for path, chatbot_id, session_id, _ in hashed:
+        if keep_audio:
+            target = os.path.join(inbox, ARCHIVE_DIR, chatbot_id, session_id)
+            os.makedirs(target, exist_ok=True)
+            shutil.move(path, os.path.join(target, os.path.basename(path)))
+        else:
+            os.remove(path)
+    for path in failed:
+        if os.path.exists(path):
+            target = os.path.join(inbox, FAILED_DIR)
+            os.makedirs(target, exist_ok=True)
+            shutil.move(path, os.path.join(target, os.path.basename(path)))
+    _remove_empty_dirs({os.path.dirname(path) for path, _, _ in jobs}, inbox)
+    return len(records) - cached_count, cached_count, len(failed)
+
+
+def _remove_empty_dirs(folders, inbox):
+    """Remove as pastas de sessão (e de chatbot) que ficaram vazias, nunca a própria caixa"""
+    inbox = os.path.abspath(inbox)
+    for folder in sorted(folders, key=len, reverse=True):
+        folder = os.path.abspath(folder)
+        while folder.startswith(inbox + os.sep):
+            try:
+                os.rmdir(folder)   # falha se chegou áudio novo: a pasta fica
+            except OSError:
+                break
+            folder = os.path.dirname(folder)
+
+
+def watch(inbox, store, model, batch_size=BATCH_SIZE, max_wait=MAX_WAIT, interval=INTERVAL,
+          once=False, keep_audio=False):
+    """Loop de polling: arquivo estável por uma varredura entra na fila; a fila vira lotes"""
+    os.makedirs(inbox, exist_ok=True)
+    try:
+        _watch_loop(inbox, store, model, batch_size, max_wait, interval, once, keep_audio)
+    finally:
+        store.flush()
+
+
+def _watch_loop(inbox, store, model, batch_size, max_wait, interval, once, keep_audio):
+    previous, queue, oldest = {}, [], None
+    while True:
+        current = scan_inbox(inbox)
+        queued = {path for path, _, _ in queue}
+        for path, (chatbot_id, session_id, size, mtime) in current.items():
+            stable = previous.get(path) == (chatbot_id, session_id, size, mtime)
+            if path not in queued and (stable or once):
+                queue.append((path, chatbot_id, session_id))
+                oldest = oldest or time.monotonic()
+        previous = current
+
+        while queue and (len(queue) >= batch_size or once or time.monotonic() - oldest >= max_wait):
+            batch, queue = queue[:batch_size], queue[batch_size:]
+            start = time.perf_counter()
+            transcribed, cached, failed = process_batch(batch, store, model, inbox, keep_audio)
+            print(f"🎙️  Lote de {len(batch)}: {transcribed} transcrito(s), {cached} do cache, "
+                  f"{failed} com falha ({time.perf_counter() - start:.2f}s)")
+            oldest = time.monotonic() if queue else None
+        # Um save do índice por varredura, não um por lote
+        store.flush()
+
+        if once:
+            return
+        time.sleep(interval)
+
+
+def import_files(store, paths, chatbot_id, session_id):
+    """Importa JSONs avulsos (voice_transcription_*.json) para o armazenamento"""
+    records = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        transcript = json.loads(data)
+        sha256 = hashlib.sha256(data).hexdigest()
+        if sha256 in store.hashes:
+            continue
+        records.append(make_record(chatbot_id, session_id, sha256, os.path.basename(path),
+                                   transcript, 'importado', False))
+    store.append(records)
+    store.flush()
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingestão de transcrições de voz com cache por hash')
+    parser.add_argument('--store', default=STORE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('watch', help='processa a caixa de entrada em lotes')
+    p.add_argument('--inbox', default=INBOX_DIR)
+    p.add_argument('--model', default='auto', help="auto, stand-in ou tamanho do faster-whisper (small, medium...)")
+    p.add_argument('--stand-in-delay', type=float, default=0.0, help='segundos simulados por áudio')
+    p.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    p.add_argument('--max-wait', type=float, default=MAX_WAIT)
+    p.add_argument('--interval', type=float, default=INTERVAL)
+    p.add_argument('--once', action='store_true', help='processa o que houver e sai')
+    p.add_argument('--keep-audio', action='store_true', help='move os áudios para archive/ em vez de apagar')
+
+    p = sub.add_parser('import', help='importa JSONs de transcrição avulsos')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--chatbot', required=True)
+    p.add_argument('--session', default=DEFAULT_SESSION)
+
+    p = sub.add_parser('get', help='transcrições de uma sessão')
+    p.add_argument('chatbot_id')
+    p.add_argument('session_id')
+
+    sub.add_parser('stats', help='resumo do armazenamento')
+
+    args = parser.parse_args(argv)
+    store = TranscriptStore(args.store)
+
+    if args.command == 'watch':
+        try:
+            model = load_model(args.model, args.stand_in_delay)
+        except RuntimeError as error:
+            print(f"❌ {error}", file=sys.stderr)
+            return 1
+        print(f"👂 Observando {args.inbox} (modelo {model.name})")
+        try:
+            watch(args.inbox, store, model, args.batch_size, args.max_wait, args.interval,
+                  args.once, args.keep_audio)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == 'import':
+        try:
+            count = import_files(store, args.files, args.chatbot, args.session)
+        except (OSError, json.JSONDecodeError) as error:
+            print(f"❌ Erro ao importar: {error}", file=sys.stderr)
+            return 1
+        print(f"✅ {count} transcrição(ões) importada(s) para {session_key(args.chatbot, args.session)}")
+        return 0
+
+    if args.command == 'get':
+        records = store.session(args.chatbot_id, args.session_id)
+        if not records:
+            print(f"❌ Sessão não encontrada: {session_key(args.chatbot_id, args.session_id)}", file=sys.stderr)
+            return 1
+        print(json.dumps(records, indent=2, ensure_ascii=False))
+        return 0
+
+    print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+"""
+Worker de entrega de webhooks com fila durável em disco
+
+Com WEBHOOK_QUEUE_DIR definido, o webhooks.js não entrega mais nada: cada
+evento vira uma linha em <dir>/queue.ndjson, já com o corpo serializado
+(JSON.stringify do payload). Este worker consome a fila:
+
+- conexões keep-alive reaproveitadas por host (scheme + host + porta);
+- no máximo MAX_PER_HOST requisições simultâneas por host, então um
+  endpoint lento só ocupa as próprias vagas e não trava os outros;
+- lotes por endpoint quando o webhook foi registrado com `batch`
+  (payload {event: 'batch', ..., events: [...]}, montado com os corpos
+  originais, então cada evento continua byte a byte igual);
+- mesma assinatura do generateSignature: HMAC-SHA256 (hex) do corpo,
+  com a secret do webhook, no header X-Webhook-Signature. As linhas da
+  fila só trazem id/url do webhook; secret e headers vêm de
+  <dir>/webhooks.json (0600), regravado pelo webhooks.js a cada
+  registro/remoção — evento de webhook removido vai direto para dead.ndjson;
+- mesmas 3 novas tentativas com espera retryDelay * tentativa; o que
+  esgota as tentativas vai para dead.ndjson.
+
+O cursor (cursor.json) só avança até o primeiro evento ainda não
+resolvido, então um restart reenvia o que estava em voo (entrega pelo
+menos uma vez; X-Webhook-Delivery identifica o evento). Quando a fila é
+toda consumida e passa de ROTATE_BYTES, queue.ndjson é selado e
+removido depois de drenado.
+
+Uso:
+  python3 webhook_worker.py run [--queue-dir data/webhook-queue]
+  python3 webhook_worker.py drain          # entrega o que houver e sai
+  python3 webhook_worker.py stats
+  python3 webhook_worker.py benchmark [--events 5000] [--endpoints 8]
+"""
+
+import argparse
+import hashlib
+import heapq
+import hmac
+import http.client
+import json
+import os
+import queue
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+QUEUE_DIR = os.path.join('data', 'webhook-queue')
+ACTIVE = 'queue.ndjson'
+SEALED = 'queue.sealed.ndjson'
+CURSOR = 'cursor.json'
+DEAD = 'dead.ndjson'
+REGISTRY = 'webhooks.json'
+
+RETRY_ATTEMPTS = 3                  # mesmos valores do WebhookManager
+RETRY_DELAY = 1.0
+TIMEOUT = 10
+MAX_PER_HOST = 4
+MAX_BATCH = 50
+WORKERS = 32
+ROTATE_BYTES = 8 << 20
+SEAL_GRACE = 1.0                    # espera appends que já tinham o arquivo aberto
+READ_BYTES = 4 << 20
+MAX_READY = 20000                   # não lê mais da fila com tantos eventos esperando
+POLL_INTERVAL = 0.2
+COMMIT_INTERVAL = 0.5
+
+
+def _now():
+    # Mesmo formato do new Date().toISOString()
+    now = datetime.now(timezone.utc)
+    return now.strftime('%Y-%m-%dT%H:%M:%S.') + f'{now.microsecond // 1000:03d}Z'
+
+
+def generate_signature(body, secret):
+    """generateSignature do webhooks.js: HMAC-SHA256 do JSON.stringify(payload)"""
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def batch_limit(webhook, max_batch=MAX_BATCH):
+    """`batch` do registro: true, número máximo de eventos ou {maxEvents}"""
+    batch = webhook.get('batch')
+    if isinstance(batch, dict):
+        batch = batch.get('maxEvents', True)
+    if batch is True:
+        return max_batch
+    if isinstance(batch, int) and batch > 1:
+        return min(batch, max_batch)
+    return 1
+
+
+def build_request(items, credentials):
+    """
+    Corpo e headers de um envio (um evento ou lote do mesmo webhook);
+    `credentials` é a entrada do webhook em webhooks.json ({secret, headers}).
+    """
+    webhook = items[0]['webhook']
+    if len(items) == 1:
+        body = items[0]['body']
+        event = items[0]['eventType']
+        extra = {'X-Webhook-Delivery': items[0]['id']}
+    else:
+        head = json.dumps({'event': 'batch', 'chatbotId': webhook['chatbotId'], 'timestamp': _now(),
+                           'count': len(items)}, separators=(',', ':'), ensure_ascii=False)
+        body = head[:-1] + ',"events":[' + ','.join(item['body'] for item in items) + ']}'
+        event = 'batch'
+        extra = {'X-Webhook-Batch-Size': str(len(items))}
+
+    body = body.encode('utf-8')
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Webhook-Signature': generate_signature(body, credentials['secret']),
+        'X-Webhook-Event': event,
+        'X-Webhook-Id': webhook['id'],
+        **extra,
+        **(credentials.get('headers') or {}),
+    }
+    return body, headers
+
+
+class WebhookRegistry:
+    """webhooks.json do webhooks.js (id -> {secret, headers}), relido quando muda"""
+
+    def __init__(self, directory=QUEUE_DIR):
+        self.path = os.path.join(directory, REGISTRY)
+        self.mtime = None
+        self.entries = {}
+
+    def get(self, record):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.mtime:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.entries = {}
+            self.mtime = mtime
+        found = self.entries.get(record['webhook']['id'])
+        if found is None and record['webhook'].get('secret'):
+            # Linha gravada antes do registro existir (a secret ia junto no evento)
+            found = {'secret': record['webhook']['secret'], 'headers': record['webhook'].get('headers')}
+        return found
+
+
+# ----------------------------------------------------------------------
+# Conexões por host
+# ----------------------------------------------------------------------
+class HostPool:
+    """Conexões keep-alive reaproveitadas para um host"""
+
+    def __init__(self, scheme, netloc, timeout=TIMEOUT):
+        self.factory = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        self.netloc = netloc
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def post(self, path, body, headers):
+        for attempt in (0, 1):
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+                if conn is None:
+                    self.opened += 1
+            reused = conn is not None
+            if conn is None:
+                conn = self.factory(self.netloc, timeout=self.timeout)
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused and attempt == 0:
+                    continue                # keep-alive fechado pelo servidor: tenta numa conexão nova
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    self.idle.append(conn)
+            return response.status
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle.clear()
+
+
+# ----------------------------------------------------------------------
+# Fila em disco
+# ----------------------------------------------------------------------
+class DurableQueue:
+    """queue.ndjson recebe appends do Node; o cursor só passa de eventos resolvidos"""
+
+    def __init__(self, directory=QUEUE_DIR, rotate_bytes=ROTATE_BYTES):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.cursor_path = os.path.join(directory, CURSOR)
+        try:
+            with open(self.cursor_path, 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cursor = {'file': ACTIVE, 'offset': 0}
+
+        if os.path.exists(self._path(SEALED)):
+            # Se o processo caiu logo depois de selar, o cursor ainda aponta para o ACTIVE antigo
+            self.file, self.offset = SEALED, cursor['offset']
+        else:
+            self.file = ACTIVE
+            self.offset = cursor['offset'] if cursor['file'] == ACTIVE else 0
+        self.read_offset = self.offset
+        self.unresolved = OrderedDict()     # offset de início -> None, em ordem de leitura
+        self.sealed_at = 0.0
+        self.invalid = 0
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read_new(self):
+        """Eventos completos (linha terminada) acrescentados desde a última leitura"""
+        try:
+            with open(self._path(self.file), 'rb') as f:
+                f.seek(self.read_offset)
+                data = f.read(READ_BYTES)
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b'\n')
+        if end < 0:
+            return []
+
+        records, position = [], self.read_offset
+        for line in data[:end + 1].splitlines(keepends=True):
+            start, position = position, position + len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self.invalid += 1
+                continue
+            record['_offset'] = start
+            self.unresolved[start] = None
+            records.append(record)
+        self.read_offset = position
+        return records
+
+    def resolve(self, record):
+        self.unresolved.pop(record['_offset'], None)
+
+    def commit(self):
+        offset = next(iter(self.unresolved)) if self.unresolved else self.read_offset
+        if offset != self.offset:
+            self.offset = offset
+            self._save_cursor()
+
+    def _save_cursor(self):
+        with open(self.cursor_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'file': self.file, 'offset': self.offset}, f)
+        os.replace(self.cursor_path + '.tmp', self.cursor_path)
+
+    def maybe_rotate(self):
+        """Sela o arquivo ativo quando grande e consumido; apaga o selado quando drenado"""
+        if self.unresolved:
+            return
+        path = self._path(self.file)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        if self.read_offset < size:
+            return
+
+        if self.file == SEALED:
+            if time.monotonic() - self.sealed_at < SEAL_GRACE:
+                return
+            os.remove(path)
+            self.file, self.offset, self.read_offset = ACTIVE, 0, 0
+            self._save_cursor()
+        elif size >= self.rotate_bytes:
+            os.replace(path, self._path(SEALED))
+            self.file = SEALED
+            self.sealed_at = time.monotonic()
+            self._save_cursor()
+
+    def pending_bytes(self):
+        total = 0
+        for name in (SEALED, ACTIVE):
+            try:
+                size = os.path.getsize(self._path(name))
+            except FileNotFoundError:
+                continue
+            total += size - self.offset if name == self.file else size
+        return total
+
+
+# ----------------------------------------------------------------------
+# Entrega
+# ----------------------------------------------------------------------
+class DeliveryWorker:
+    """Despacha eventos prontos respeitando o limite por host; callbacks voltam numa fila"""
+
+    def __init__(self, durable, workers=WORKERS, max_per_host=MAX_PER_HOST, max_batch=MAX_BATCH,
+                 timeout=TIMEOUT, retry_attempts=RETRY_ATTEMPTS, retry_delay=RETRY_DELAY, verbose=True):
+        self.queue = durable
+        self.registry = WebhookRegistry(durable.directory)
+        self.max_per_host = max_per_host
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pools = {}
+        self.ready = OrderedDict()          # (webhook id, url) -> deque de eventos
+        self.ready_count = 0
+        self.delayed = []                   # heap (quando, seq, evento)
+        self.inflight = Counter()           # host -> requisições em voo
+        self.done = queue.SimpleQueue()
+        self.stats = Counter()
+        self._seq = 0
+
+    def _pool(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        if key not in self.pools:
+            self.pools[key] = HostPool(parts.scheme, parts.netloc, self.timeout)
+        return key
+
+    def ingest(self, records):
+        for record in records:
+            self._enqueue(record)
+
+    def _enqueue(self, record):
+        key = (record['webhook']['id'], record['webhook']['url'])
+        self.ready.setdefault(key, deque()).append(record)
+        self.ready_count += 1
+
+    def release_due(self, now):
+        while self.delayed and self.delayed[0][0] <= now:
+            self._enqueue(heapq.heappop(self.delayed)[2])
+
+    def dispatch(self):
+        for key in list(self.ready):
+            items = self.ready[key]
+            host = self._pool(key[1])
+            limit = batch_limit(items[0]['webhook'], self.max_batch)
+            while items and self.inflight[host] < self.max_per_host:
+                batch = [items.popleft() for _ in range(min(limit, len(items)))]
+                self.ready_count -= len(batch)
+                credentials = self.registry.get(batch[0])
+                if credentials is None:
+                    for item in batch:
+                        self._dead_letter(item, 'webhook não registrado', 0)
+                        self.queue.resolve(item)
+                    continue
+                self.inflight[host] += 1
+                future = self.executor.submit(self._deliver, host, batch, credentials)
+                future.add_done_callback(lambda f, h=host, b=batch: self.done.put((h, b, f)))
+            if not items:
+                del self.ready[key]
+
+    def _deliver(self, host, batch, credentials):
+        body, headers = build_request(batch, credentials)
+        parts = urlsplit(batch[0]['webhook']['url'])
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        return self.pools[host].post(path, body, headers)
+
+    def collect(self, timeout):
+        try:
+            finished = [self.done.get(timeout=timeout)]
+        except queue.Empty:
+            return
+        while True:
+            try:
+                finished.append(self.done.get_nowait())
+            except queue.Empty:
+                break
+        for host, batch, future in finished:
+            self._finish(host, batch, future)
+
+    def _finish(self, host, batch, future):
+        self.inflight[host] -= 1
+        self.stats['requests'] += 1
+        try:
+            status = future.result()
+            error = None if 200 <= status < 300 else f'HTTP {status}'
+        except (OSError, http.client.HTTPException, ValueError) as exc:
+            error = str(exc) or type(exc).__name__
+
+        if error is None:
+            self.stats['delivered'] += len(batch)
+            if len(batch) > 1:
+                self.stats['batches'] += 1
+            for item in batch:
+                self.queue.resolve(item)
+            return
+
+        self.stats['failed_requests'] += 1
+        now = time.monotonic()
+        for item in batch:
+            attempts = item.get('attempts', 0)
+            if attempts < self.retry_attempts:
+                item['attempts'] = attempts + 1
+                self._seq += 1
+                heapq.heappush(self.delayed, (now + self.retry_delay * (attempts + 1), self._seq, item))
+                self.stats['retries'] += 1
+            else:
+                self._dead_letter(item, error, attempts + 1)
+                self.queue.resolve(item)
+
+    def _dead_letter(self, item, error, tries):
+        self.stats['dead'] += 1
+        record = {key: value for key, value in item.items() if key != '_offset'}
+        # Dead letters ficam para sempre: nada de secret/headers, mesmo de linhas antigas
+        record['webhook'] = {key: value for key, value in item['webhook'].items()
+                             if key not in ('secret', 'headers')}
+        record.update(error=error, failedAt=_now())
+        with open(os.path.join(self.queue.directory, DEAD), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if self.verbose:
+            print(f"❌ Webhook descartado após {tries} tentativa(s): "
+                  f"{item['eventType']} -> {item['webhook']['url']} ({error})")
+
+    def busy(self):
+        return self.ready_count > 0 or bool(self.delayed) or sum(self.inflight.values()) > 0
+
+    def run(self, drain=False, poll=POLL_INTERVAL):
+        last_commit = 0.0
+        try:
+            while True:
+                records = self.queue.read_new() if self.ready_count < MAX_READY else []
+                self.ingest(records)
+                now = time.monotonic()
+                self.release_due(now)
+                self.dispatch()
+
+                if sum(self.inflight.values()):
+                    self.collect(poll)
+                elif not records:
+                    if drain and not self.busy():
+                        break
+                    wait = poll
+                    if self.delayed:
+                        wait = max(0.0, min(poll, self.delayed[0][0] - now))
+                    time.sleep(wait)
+
+                if time.monotonic() - last_commit >= COMMIT_INTERVAL:
+                    self.queue.commit()
+                    self.queue.maybe_rotate()
+                    last_commit = time.monotonic()
+        finally:
+            self.queue.commit()
+            self.executor.shutdown(wait=True)
+            for pool in self.pools.values():
+                pool.close()
+        return self.stats
+
+    def connections_opened(self):
+        return sum(pool.opened for pool in self.pools.values())
+
+
+def queue_stats(directory=QUEUE_DIR):
+    durable = DurableQueue(directory)
+    dead = 0
+    try:
+        with open(os.path.join(directory, DEAD), 'rb') as f:
+            dead = sum(1 for _ in f)
+    except FileNotFoundError:
+        pass
+    return {'file': durable.file, 'offset': durable.offset, 'pendingBytes': durable.pending_bytes(),
+            'deadLetters': dead}
+
+
+# ----------------------------------------------------------------------
+# Benchmark com receptores locais
+# ----------------------------------------------------------------------
+class _Receiver(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'WebhookStandIn/1.0'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if generate_signature(body, server.secret) != self.headers.get('X-Webhook-Signature'):
+            server.count('bad_signature')
+        time.sleep(server.latency)
+        if random.random() < server.fail_rate:
+            status = 500
+        else:
+            status = 200
+            server.count('events', int(self.headers.get('X-Webhook-Batch-Size', 1)))
+            server.last_event = time.perf_counter()
+        payload = b'{"ok":true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ReceiverServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, secret, latency, fail_rate):
+        super().__init__(('127.0.0.1', 0), _Receiver)
+        self.secret = secret
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.counts = Counter()
+        self.last_event = 0.0
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+
+def _write_events(directory, endpoints, events):
+    with open(os.path.join(directory, REGISTRY), 'w', encoding='utf-8') as f:
+        json.dump({hook['id']: {'secret': hook['secret'], 'headers': {}} for hook in endpoints}, f)
+    with open(os.path.join(directory, ACTIVE), 'w', encoding='utf-8') as f:
+        for i in range(events):
+            webhook = {key: endpoints[i % len(endpoints)][key] for key in ('id', 'chatbotId', 'url', 'batch')}
+            payload = {'event': 'message_received', 'chatbotId': webhook['chatbotId'], 'timestamp': _now(),
+                       'data': {'sessionId': f's{i % 97}', 'message': f'Olá, mensagem número {i}'}}
+            f.write(json.dumps({'id': secrets.token_hex(8), 'webhook': webhook, 'eventType': 'message_received',
+                                'body': json.dumps(payload, separators=(',', ':'), ensure_ascii=False),
+                                'queuedAt': int(time.time() * 1000)}, ensure_ascii=False) + '\n')
+
+
+def _sequential_baseline(directory, limit):
+    """Um evento por vez, conexão nova a cada envio (como o processQueue atual)"""
+    registry = WebhookRegistry(directory)
+    with open(os.path.join(directory, ACTIVE), 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for _, line in zip(range(limit), f)]
+    start = time.perf_counter()
+    for record in records:
+        body, headers = build_request([record], registry.get(record))
+        request = urllib.request.Request(record['webhook']['url'], data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+                response.read()
+        except OSError:
+            pass
+    return len(records) / (time.perf_counter() - start)
+
+
+def benchmark(events=5000, endpoints=8, latency=0.005, slow_latency=0.2, fail_rate=0.01,
+              workers=WORKERS, max_per_host=MAX_PER_HOST, max_batch=MAX_BATCH, baseline_events=300):
+    """Metade dos endpoints aceita lote; o último responde devagar"""
+    servers, hooks = [], []
+    for i in range(endpoints):
+        secret = secrets.token_hex(16)
+        server = _ReceiverServer(secret, slow_latency if i == endpoints - 1 else latency, fail_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        hooks.append({'id': secrets.token_hex(8), 'chatbotId': f'bot{i}', 'secret': secret, 'headers': {},
+                      'url': f'http://127.0.0.1:{server.server_address[1]}/webhook',
+                      'batch': True if i % 2 == 0 else None})
+
+    tmp = tempfile.mkdtemp(prefix='webhook-bench-')
+    try:
+        _write_events(tmp, hooks, events)
+        baseline = _sequential_baseline(tmp, baseline_events)
+        for server in servers:
+            server.counts.clear()
+
+        worker = DeliveryWorker(DurableQueue(tmp), workers=workers, max_per_host=max_per_host,
+                                max_batch=max_batch, retry_delay=0.05, verbose=False)
+        start = time.perf_counter()
+        stats = worker.run(drain=True, poll=0.01)
+        elapsed = time.perf_counter() - start
+        received = sum(server.counts['events'] for server in servers)
+        fast_events = sum(server.counts['events'] for server in servers[:-1])
+        fast_elapsed = max(server.last_event for server in servers[:-1]) - start
+        bad = sum(server.counts['bad_signature'] for server in servers)
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"📬 {events} eventos, {endpoints} endpoints (latência {latency * 1000:.0f} ms, "
+          f"um lento com {slow_latency * 1000:.0f} ms, {fail_rate:.0%} de erros 500)")
+    print(f"   sequencial (processQueue): {baseline:,.0f} eventos/s")
+    print(f"   worker, endpoints rápidos: {fast_events / fast_elapsed:,.0f} eventos/s "
+          f"({fast_events} em {fast_elapsed:.2f}s, sem esperar o lento)")
+    print(f"   worker, total: {stats['delivered'] / elapsed:,.0f} eventos/s em {elapsed:.2f}s "
+          f"({stats['requests']} requisições, {stats['batches']} lotes, {stats['retries']} retries, "
+          f"{worker.connections_opened()} conexões)")
+    print(f"   recebidos {received}/{events}, assinaturas inválidas: {bad}, dead letters: {stats['dead']}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Worker de entrega de webhooks (fila durável)')
+    parser.add_argument('--queue-dir', default=os.environ.get('WEBHOOK_QUEUE_DIR', QUEUE_DIR))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    for name, text in (('run', 'consome a fila continuamente'), ('drain', 'entrega o que houver e sai')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('--workers', type=int, default=WORKERS)
+        p.add_argument('--max-per-host', type=int, default=MAX_PER_HOST)
+        p.add_argument('--max-batch', type=int, default=MAX_BATCH)
+
+    sub.add_parser('stats', help='posição do cursor e dead letters')
+
+    p = sub.add_parser('benchmark', help='entregas por segundo contra receptores locais')
+    p.add_argument('--events', type=int, default=5000)
+    p.add_argument('--endpoints', type=int, default=8)
+    p.add_argument('--latency', type=float, default=0.005, help='segundos por resposta')
+    p.add_argument('--workers', type=int, default=WORKERS)
+    p.add_argument('--max-per-host', type=int, default=MAX_PER_HOST)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'benchmark':
+        benchmark(args.events, args.endpoints, args.latency, workers=args.workers, max_per_host=args.max_per_host)
+        return 0
+
+    if args.command == 'stats':
+        stats = queue_stats(args.queue_dir)
+        print(f"📬 {args.queue_dir}: {stats['file']} @ {stats['offset']}, "
+              f"{stats['pendingBytes']} bytes pendentes, {stats['deadLetters']} dead letter(s)")
+        return 0
+
+    worker = DeliveryWorker(DurableQueue(args.queue_dir), workers=args.workers,
+                            max_per_host=args.max_per_host, max_batch=args.max_batch)
+    print(f"🔗 Worker de webhooks consumindo {args.queue_dir} "
+          f"({args.max_per_host} por host, lotes de até {args.max_batch})")
+    try:
+        stats = worker.run(drain=args.command == 'drain')
+    except KeyboardInterrupt:
+        stats = worker.stats
+    print(f"✅ {stats['delivered']} evento(s) entregue(s) em {stats['requests']} requisição(ões), "
+          f"{stats['retries']} retry(s), {stats['dead']} dead letter(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
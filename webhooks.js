@@ -13,6 +13,8 @@
 
 const axios = require('axios');
 const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
 
 class WebhookManager {
     constructor() {
@@ -21,6 +23,23 @@ class WebhookManager {
         this.processing = false;
         this.retryAttempts = 3;
         this.retryDelay = 1000; // 1 segundo
+
+        // Fila durável: os eventos vão para disco e o webhook_worker.py entrega.
+        // Secrets e headers ficam só em webhooks.json (0600), nunca nas linhas da fila.
+        this.queueFile = process.env.WEBHOOK_QUEUE_DIR
+            ? path.join(process.env.WEBHOOK_QUEUE_DIR, 'queue.ndjson')
+            : null;
+        this.registryFile = process.env.WEBHOOK_QUEUE_DIR
+            ? path.join(process.env.WEBHOOK_QUEUE_DIR, 'webhooks.json')
+            : null;
+        this.pendingAppends = [];
+        this.appending = false;
+        if (this.queueFile) {
+            fs.mkdirSync(process.env.WEBHOOK_QUEUE_DIR, { recursive: true });
+            process.on('exit', () => this.flushDurableSync());
+        }
+        // Registro de execuções anteriores: eventos ainda na fila dependem dessas secrets
+        this.registry = this.loadRegistry();
         
         console.log('🔗 Sistema de Webhooks inicializado');
     }
@@ -39,6 +58,7 @@ class WebhookManager {
             active: true,
             secret: config.secret || crypto.randomBytes(16).toString('hex'),
             headers: config.headers || {},
+            batch: config.batch || null, // receptor aceita lotes (só na fila durável)
             createdAt: new Date().toISOString()
         };
 
@@ -47,6 +67,7 @@ class WebhookManager {
         }
 
         this.webhooks.get(chatbotId).push(webhook);
+        this.updateRegistry(webhookId, { secret: webhook.secret, headers: webhook.headers });
         
         console.log(`✅ Webhook registrado: ${eventType} para chatbot ${chatbotId}`);
         
@@ -63,6 +84,7 @@ class WebhookManager {
             const index = chatbotWebhooks.findIndex(w => w.id === webhookId);
             if (index !== -1) {
                 chatbotWebhooks.splice(index, 1);
+                this.updateRegistry(webhookId, null);
                 console.log(`🗑️ Webhook removido: ${webhookId}`);
                 return true;
             }
@@ -112,6 +134,10 @@ class WebhookManager {
      * Adicionar webhook à fila
      */
     queueWebhook(webhook, eventType, data) {
+        if (this.queueFile && this.appendDurable(webhook, eventType, data)) {
+            return;
+        }
+
         this.queue.push({
             webhook,
             eventType,
@@ -121,6 +147,121 @@ class WebhookManager {
         });
     }
 
+    /**
+     * Ler webhooks.json (id -> secret/headers); `fallback` se não der para ler
+     */
+    loadRegistry(fallback = {}) {
+        if (!this.registryFile) {
+            return fallback;
+        }
+
+        try {
+            return JSON.parse(fs.readFileSync(this.registryFile, 'utf8'));
+        } catch (error) {
+            if (error.code !== 'ENOENT') {
+                console.error('❌ Erro ao ler registro de webhooks:', error.message);
+            }
+            return fallback;
+        }
+    }
+
+    /**
+     * Incluir (entry) ou remover (null) um id em webhooks.json, o que o worker precisa para assinar.
+     * Relê o arquivo antes de gravar: ids de execuções anteriores (ou de outro processo) são mantidos;
+     * um id só sai do registro pelo removeWebhook
+     */
+    updateRegistry(webhookId, entry) {
+        if (!this.registryFile) {
+            return;
+        }
+
+        this.registry = this.loadRegistry(this.registry);
+        if (entry) {
+            this.registry[webhookId] = entry;
+        } else {
+            delete this.registry[webhookId];
+        }
+
+        const tmp = `${this.registryFile}.${process.pid}.tmp`;
+        try {
+            fs.writeFileSync(tmp, JSON.stringify(this.registry), { mode: 0o600 });
+            fs.renameSync(tmp, this.registryFile);
+        } catch (error) {
+            console.error('❌ Erro ao gravar registro de webhooks:', error.message);
+        }
+    }
+
+    /**
+     * Enfileirar evento para a fila em disco (corpo já serializado, como o sendWebhook assinaria).
+     * A gravação é agrupada e assíncrona; só id/url do webhook vão para o disco.
+     */
+    appendDurable(webhook, eventType, data) {
+        const payload = {
+            event: eventType,
+            chatbotId: webhook.chatbotId,
+            timestamp: new Date().toISOString(),
+            data: data
+        };
+
+        const record = {
+            id: crypto.randomBytes(8).toString('hex'),
+            webhook: {
+                id: webhook.id,
+                chatbotId: webhook.chatbotId,
+                url: webhook.url,
+                batch: webhook.batch || null
+            },
+            eventType,
+            body: JSON.stringify(payload),
+            queuedAt: Date.now()
+        };
+
+        this.pendingAppends.push({ line: JSON.stringify(record) + '\n', webhook, eventType, data });
+        if (!this.appending) {
+            this.appending = true;
+            setImmediate(() => this.flushDurable());
+        }
+        return true;
+    }
+
+    /**
+     * Gravar de uma vez tudo o que foi enfileirado desde o último flush
+     */
+    async flushDurable() {
+        while (this.pendingAppends.length > 0) {
+            const batch = this.pendingAppends;
+            this.pendingAppends = [];
+            try {
+                await fs.promises.appendFile(this.queueFile, batch.map(item => item.line).join(''));
+            } catch (error) {
+                console.error('❌ Erro ao gravar webhooks na fila em disco:', error.message);
+                // Sem disco, entrega em memória como antes da fila durável
+                for (const { webhook, eventType, data } of batch) {
+                    this.queue.push({ webhook, eventType, data, attempts: 0, queuedAt: Date.now() });
+                }
+                if (!this.processing) {
+                    this.processQueue();
+                }
+            }
+        }
+        this.appending = false;
+    }
+
+    /**
+     * No encerramento do processo não há mais event loop: grava o que faltou de forma síncrona
+     */
+    flushDurableSync() {
+        if (this.pendingAppends.length === 0) {
+            return;
+        }
+        try {
+            fs.appendFileSync(this.queueFile, this.pendingAppends.map(item => item.line).join(''));
+            this.pendingAppends = [];
+        } catch (error) {
+            console.error('❌ Erro ao gravar webhooks na fila em disco:', error.message);
+        }
+    }
+
     /**
      * Processar fila de webhooks
      */
@@ -259,7 +400,9 @@ class WebhookManager {
             totalWebhooks,
             activeWebhooks,
             queueSize: this.queue.length,
-            processing: this.processing
+            processing: this.processing,
+            durableQueue: Boolean(this.queueFile),
+            pendingAppends: this.pendingAppends.length
         };
     }
 }